@@ -0,0 +1,33 @@
+"""
+add feedback aggregation indexes
+
+Revision ID: 20251029100003
+Revises: 20251029100002
+Create Date: 2025-10-29 10:00:03.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251029100003'
+down_revision = '20251029100002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 回饋彙總的 GROUP BY 查詢只需掃描索引
+    op.create_index('ix_practice_card_feedback_rating_favorite', 'practice_card_feedback',
+                    ['rating', 'is_favorite'], unique=False)
+    op.create_index('ix_practice_card_feedback_practice_rating', 'practice_card_feedback',
+                    ['practice_id', 'rating', 'is_favorite'], unique=False)
+    op.create_index('ix_session_feedback_rating_type', 'session_feedback',
+                    ['rating', 'feedback_type'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_session_feedback_rating_type', table_name='session_feedback')
+    op.drop_index('ix_practice_card_feedback_practice_rating', table_name='practice_card_feedback')
+    op.drop_index('ix_practice_card_feedback_rating_favorite', table_name='practice_card_feedback')
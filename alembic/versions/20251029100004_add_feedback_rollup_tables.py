@@ -0,0 +1,87 @@
+"""
+add feedback rollup tables
+
+Revision ID: 20251029100004
+Revises: 20251029100003
+Create Date: 2025-10-29 10:00:04.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251029100004'
+down_revision = '20251029100003'
+branch_labels = None
+depends_on = None
+
+
+# 由原始回饋表回填彙總表（INSERT ... SELECT ... GROUP BY 在資料庫端完成），
+# 鍵與 backend.services.feedback_rollup.rebuild_rollups 相同：（練習卡, 會話選定症狀, 日期）、（症狀, 日期）
+PRACTICE_ROLLUP_BACKFILL = """
+INSERT INTO practice_card_feedback_rollup (
+    practice_id, symptom_id, day, rating_1, rating_2, rating_3, rating_4, rating_5,
+    rating_count, rated_count, rating_sum, favorite_count)
+SELECT f.practice_id, COALESCE(s.chosen_symptom_id, 0),
+    DATE(COALESCE(f.created_at, CURRENT_TIMESTAMP)),
+    SUM(CASE WHEN f.rating = 1 THEN 1 ELSE 0 END), SUM(CASE WHEN f.rating = 2 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.rating = 3 THEN 1 ELSE 0 END), SUM(CASE WHEN f.rating = 4 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.rating = 5 THEN 1 ELSE 0 END),
+    COUNT(*), SUM(CASE WHEN f.rating BETWEEN 1 AND 5 THEN 1 ELSE 0 END), COALESCE(SUM(f.rating), 0),
+    SUM(CASE WHEN f.is_favorite THEN 1 ELSE 0 END)
+FROM practice_card_feedback f LEFT JOIN sessions s ON s.id = f.session_id
+GROUP BY f.practice_id, COALESCE(s.chosen_symptom_id, 0),
+    DATE(COALESCE(f.created_at, CURRENT_TIMESTAMP))
+"""
+SESSION_ROLLUP_BACKFILL = """
+INSERT INTO session_feedback_rollup (
+    symptom_id, day, not_applicable, partially_applicable, applicable, "immediate", delayed,
+    total_count)
+SELECT COALESCE(s.chosen_symptom_id, 0), DATE(COALESCE(f.created_at, CURRENT_TIMESTAMP)),
+    SUM(CASE WHEN f.rating = 'not_applicable' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.rating = 'partially_applicable' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.rating = 'applicable' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.feedback_type = 'immediate' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.feedback_type = 'delayed' THEN 1 ELSE 0 END),
+    COUNT(*)
+FROM session_feedback f LEFT JOIN sessions s ON s.id = f.session_id
+GROUP BY COALESCE(s.chosen_symptom_id, 0), DATE(COALESCE(f.created_at, CURRENT_TIMESTAMP))
+"""
+
+
+def upgrade():
+    # 回饋彙總表，建立後立即回填既有資料（FEEDBACK_ROLLUP_ENABLED 預設開啟，分析端點升級後即讀彙總表）
+    op.create_table('practice_card_feedback_rollup',
+        sa.Column('practice_id', sa.Integer(), nullable=False),
+        sa.Column('symptom_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('rating_1', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_2', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_3', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_4', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_5', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rated_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('favorite_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('practice_id', 'symptom_id', 'day')
+    )
+    op.create_table('session_feedback_rollup',
+        sa.Column('symptom_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('not_applicable', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('partially_applicable', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('applicable', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('immediate', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('delayed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('symptom_id', 'day')
+    )
+    op.execute(PRACTICE_ROLLUP_BACKFILL)
+    op.execute(SESSION_ROLLUP_BACKFILL)
+
+
+def downgrade():
+    op.drop_table('session_feedback_rollup')
+    op.drop_table('practice_card_feedback_rollup')
@@ -0,0 +1,58 @@
+"""
+add feedback time indexes and optional monthly partitioning
+
+Revision ID: 20251029100005
+Revises: 20251029100004
+Create Date: 2025-10-29 10:00:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251029100005'
+down_revision = '20251029100004'
+branch_labels = None
+depends_on = None
+
+# 本遷移完成時兩張回饋表的索引，分區轉換後依此重建（固定於此，不隨日後的模型定義變動）
+PARTITIONED_INDEXES = {
+    'practice_card_feedback': [
+        ('ix_practice_card_feedback_id', ['id']),
+        ('ix_practice_card_feedback_rating_favorite', ['rating', 'is_favorite']),
+        ('ix_practice_card_feedback_practice_rating', ['practice_id', 'rating', 'is_favorite']),
+        ('ix_practice_card_feedback_created_at', ['created_at']),
+        ('ix_practice_card_feedback_practice_created_at', ['practice_id', 'created_at']),
+    ],
+    'session_feedback': [
+        ('ix_session_feedback_id', ['id']),
+        ('ix_session_feedback_rating_type', ['rating', 'feedback_type']),
+        ('ix_session_feedback_created_at', ['created_at']),
+    ],
+}
+
+def upgrade():
+    # 時間區間分析只掃描相關日期範圍
+    op.create_index('ix_practice_card_feedback_created_at', 'practice_card_feedback',
+                    ['created_at'], unique=False)
+    op.create_index('ix_practice_card_feedback_practice_created_at', 'practice_card_feedback',
+                    ['practice_id', 'created_at'], unique=False)
+    op.create_index('ix_session_feedback_created_at', 'session_feedback', ['created_at'],
+                    unique=False)
+
+    # PostgreSQL 選擇性轉為按月分區（重建資料表與索引，大表請在維護時段執行）
+    from backend.core.config import settings
+    bind = op.get_bind()
+    if settings.FEEDBACK_PARTITIONING and bind.dialect.name == "postgresql":
+        from backend.services.feedback_partitions import PARTITIONED_TABLES, convert_to_partitioned
+        for table in PARTITIONED_TABLES:
+            convert_to_partitioned(bind, table, PARTITIONED_INDEXES[table])
+
+
+def downgrade():
+    # 分區表不還原為一般資料表，只移除本遷移的索引
+    op.drop_index('ix_session_feedback_created_at', table_name='session_feedback')
+    op.drop_index('ix_practice_card_feedback_practice_created_at',
+                  table_name='practice_card_feedback')
+    op.drop_index('ix_practice_card_feedback_created_at', table_name='practice_card_feedback')
@@ -0,0 +1,87 @@
+"""
+add unique constraint to practice_card_feedback (session_id, practice_id)
+
+Revision ID: 20251029100006
+Revises: 20251029100005
+Create Date: 2025-10-29 10:00:06.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251029100006'
+down_revision = '20251029100005'
+branch_labels = None
+depends_on = None
+
+
+# 由原始回饋表重算練習卡彙總表（INSERT ... SELECT ... GROUP BY 在資料庫端完成），
+# 鍵與 backend.services.feedback_rollup.rebuild_rollups 相同：（練習卡, 會話選定症狀, 日期）
+PRACTICE_ROLLUP_BACKFILL = """
+INSERT INTO practice_card_feedback_rollup (
+    practice_id, symptom_id, day, rating_1, rating_2, rating_3, rating_4, rating_5,
+    rating_count, rated_count, rating_sum, favorite_count)
+SELECT f.practice_id, COALESCE(s.chosen_symptom_id, 0),
+    DATE(COALESCE(f.created_at, CURRENT_TIMESTAMP)),
+    SUM(CASE WHEN f.rating = 1 THEN 1 ELSE 0 END), SUM(CASE WHEN f.rating = 2 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.rating = 3 THEN 1 ELSE 0 END), SUM(CASE WHEN f.rating = 4 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN f.rating = 5 THEN 1 ELSE 0 END),
+    COUNT(*), SUM(CASE WHEN f.rating BETWEEN 1 AND 5 THEN 1 ELSE 0 END), COALESCE(SUM(f.rating), 0),
+    SUM(CASE WHEN f.is_favorite THEN 1 ELSE 0 END)
+FROM practice_card_feedback f LEFT JOIN sessions s ON s.id = f.session_id
+GROUP BY f.practice_id, COALESCE(s.chosen_symptom_id, 0),
+    DATE(COALESCE(f.created_at, CURRENT_TIMESTAMP))
+"""
+
+
+def upgrade():
+    # 合併重複的（會話, 練習卡）回饋，語意同 merge_feedback：保留最新一筆，任一筆為最愛則保留最愛，
+    # 最新一筆為僅加入最愛（rating=0）或沒有文字時，沿用較早一筆的星數與文字
+    op.execute(
+        "UPDATE practice_card_feedback SET is_favorite = TRUE WHERE id IN ("
+        "SELECT MAX(id) FROM practice_card_feedback GROUP BY session_id, practice_id "
+        "HAVING COUNT(*) > 1 AND MAX(CASE WHEN is_favorite THEN 1 ELSE 0 END) = 1)"
+    )
+    for column, has_value in (("rating", "COALESCE({t}.rating, 0) > 0"),
+                              ("feedback_text", "{t}.feedback_text IS NOT NULL")):
+        op.execute(
+            f"UPDATE practice_card_feedback SET {column} = ("
+            f"SELECT d.{column} FROM practice_card_feedback d "
+            f"WHERE d.session_id = practice_card_feedback.session_id "
+            f"AND d.practice_id = practice_card_feedback.practice_id "
+            f"AND {has_value.format(t='d')} ORDER BY d.id DESC LIMIT 1) "
+            f"WHERE NOT ({has_value.format(t='practice_card_feedback')}) AND id IN ("
+            f"SELECT MAX(id) FROM practice_card_feedback GROUP BY session_id, practice_id "
+            f"HAVING COUNT(*) > 1 AND MAX(CASE WHEN {has_value.format(t='practice_card_feedback')} "
+            f"THEN 1 ELSE 0 END) = 1)"
+        )
+    op.execute(
+        "DELETE FROM practice_card_feedback WHERE id NOT IN ("
+        "SELECT MAX(id) FROM practice_card_feedback GROUP BY session_id, practice_id)"
+    )
+    # 合併改變了練習卡回饋筆數與最愛數，練習卡彙總表整張重算（會話回饋不受影響）
+    op.execute("DELETE FROM practice_card_feedback_rollup")
+    op.execute(PRACTICE_ROLLUP_BACKFILL)
+
+    # 按月分區的 PostgreSQL 資料表，唯一約束必須包含分區鍵 created_at，無法約束（會話, 練習卡）；
+    # 此時不建立約束，最愛切換偵測到分區後改走先查再寫的路徑
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        from backend.services.feedback_partitions import is_partitioned
+        if is_partitioned(bind, 'practice_card_feedback'):
+            return
+    with op.batch_alter_table('practice_card_feedback', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_practice_card_feedback_session_practice',
+                                          ['session_id', 'practice_id'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        from backend.services.feedback_partitions import is_partitioned
+        if is_partitioned(bind, 'practice_card_feedback'):
+            return
+    with op.batch_alter_table('practice_card_feedback', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_practice_card_feedback_session_practice', type_='unique')
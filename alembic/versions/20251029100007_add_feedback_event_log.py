@@ -0,0 +1,32 @@
+"""
+add feedback event log
+
+Revision ID: 20251029100007
+Revises: 20251029100006
+Create Date: 2025-10-29 10:00:07.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251029100007'
+down_revision = '20251029100006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 只追加的回饋事件日誌 (API-204.7)：刻意只有主鍵，追加不需維護其他索引
+    op.create_table('feedback_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('feedback_events')
@@ -0,0 +1,37 @@
+"""
+add feedback updated_at for incremental export
+
+Revision ID: 20251029100008
+Revises: 20251029100007
+Create Date: 2025-10-29 10:00:08.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20251029100008'
+down_revision = '20251029100007'
+branch_labels = None
+depends_on = None
+
+FEEDBACK_TABLES = ('practice_card_feedback', 'session_feedback')
+
+
+def upgrade():
+    # 回饋列會被原地更新（最愛切換、合併），增量匯出改以最後修改時間為水位 (API-207.6)；
+    # 既有資料以建立時間回填
+    for table in FEEDBACK_TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(FEEDBACK_TABLES):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -6,8 +6,11 @@
 2. 練習卡管理
 3. 症狀↔練習卡映射管理
 4. 同義詞庫管理
+5. 練習卡生成語意快取管理
+6. 請求取樣剖析開關與結果
 """
 from fastapi import APIRouter, Query, Depends, Body, Path
+from fastapi.responses import PlainTextResponse
 from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
@@ -20,6 +23,8 @@ from ...database.repositories import (
 from ...models.symptom import Symptom
 from ...models.practice_card import PracticeCard
 from ...models.symptom_practice_mapping import SymptomPracticeMapping
+from ...services.semantic_cache import practice_card_cache
+from ...core.profiling import profiling_state
 import logging
 
 logger = logging.getLogger(__name__)
@@ -515,4 +520,74 @@ async def get_symptom_practice_cards(
         return {
             "status": "error",
             "message": f"獲取症狀練習卡時出錯: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+@router.get("/admin/semantic-cache", tags=["admin"])
+async def get_semantic_cache_stats():
+    """
+    查看練習卡生成語意快取統計 (API-205.5)
+    """
+    return {
+        "status": "success",
+        "cache": practice_card_cache.stats()
+    }
+
+@router.delete("/admin/semantic-cache", tags=["admin"])
+async def purge_semantic_cache(
+    symptom: Optional[str] = Query(None, description="只清除該症狀的快取，未提供時全部清除")
+):
+    """
+    清除練習卡生成語意快取 (API-205.5)
+    
+    調整症狀或練習卡內容後使用，避免繼續返回舊的生成結果
+    """
+    purged = practice_card_cache.purge(symptom)
+    logger.info(f"清除語意快取: symptom={symptom}, 共 {purged} 項")
+    return {
+        "status": "success",
+        "purged_count": purged
+    }
+
+@router.get("/admin/profiling", tags=["admin"])
+async def get_profiling_captures():
+    """
+    查看取樣剖析設定與已保存的結果（新到舊） (API-209)
+    """
+    return {
+        "status": "success",
+        "profiling": profiling_state.settings_snapshot(),
+        "captures": profiling_state.list_captures()
+    }
+
+@router.put("/admin/profiling", tags=["admin"])
+async def update_profiling(
+    enabled: Optional[bool] = Body(None, description="是否啟用剖析"),
+    sample_rate: Optional[float] = Body(None, ge=0.0, le=1.0, description="隨機剖析的請求比例")
+):
+    """
+    執行期切換取樣剖析 (API-209)
+    
+    只影響目前進程，重新啟動後回到環境變數設定
+    """
+    if enabled is not None:
+        profiling_state.enabled = enabled
+    if sample_rate is not None:
+        profiling_state.sample_rate = sample_rate
+    logger.info(f"更新剖析設定: {profiling_state.settings_snapshot()}")
+    return {
+        "status": "success",
+        "profiling": profiling_state.settings_snapshot()
+    }
+
+@router.get("/admin/profiling/captures/{name}", tags=["admin"])
+async def get_profiling_capture(name: str = Path(..., description="剖析結果檔名")):
+    """
+    下載一個剖析結果（collapsed stack 格式，可交給 flamegraph.pl 或 speedscope） (API-209)
+    """
+    content = profiling_state.read_capture(name)
+    if content is None:
+        return {
+            "status": "error",
+            "message": f"剖析結果 {name} 不存在"
+        }
+    return PlainTextResponse(content)
@@ -3,180 +3,339 @@
 
 提供管理者回饋分析接口
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from starlette.background import BackgroundTask
+from typing import Dict, Any, Optional, Union
+from datetime import date, datetime, time, timezone
+from ...core.config import settings
 from ...database.base import get_db
 from ...database.repositories import (
     SessionFeedbackRepository,
     PracticeCardFeedbackRepository,
-    SymptomRepository
+    FeedbackRollupRepository,
+    FeedbackAnalyticsRepository
+)
+from ...services.card_quality import card_quality
+from ...services.card_ranking import ranking_scores
+from ...services.feedback_events import feedback_materializer, get_event_log_status
+from ...services.feedback_export import (
+    EXPORT_TABLES, EXPORT_FORMATS, DEFAULT_BATCH_SIZE, export_table, supports_incremental
 )
 import logging
+import os
+import tempfile
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin/feedback-analytics", tags=["admin", "feedback"])
 
+
+class AnalyticsWindow:
+    """
+    分析時間區間查詢參數 (API-207.8)
+
+    from 含、to 不含，只給日期時為當日 00:00；帶時區的時間轉為 UTC（資料庫存放 UTC 無時區時間）；
+    提供 bucket 時端點附帶按 hour / day / week 分桶的趨勢
+    """
+
+    def __init__(
+        self,
+        date_from: Optional[Union[datetime, date]] = Query(
+            None, alias="from", description="起始時間（含），例如 2025-12-01"),
+        date_to: Optional[Union[datetime, date]] = Query(
+            None, alias="to", description="結束時間（不含），例如 2026-01-01T12:00:00"),
+        bucket: Optional[str] = Query(None, regex="^(hour|day|week)$", description="趨勢分桶粒度")
+    ):
+        self.start = self._to_utc(date_from)
+        self.end = self._to_utc(date_to)
+        self.bucket = bucket
+        if self.start and self.end and self.start >= self.end:
+            raise HTTPException(status_code=400, detail="from 必須早於 to")
+
+    @staticmethod
+    def _to_utc(value: Optional[Union[datetime, date]]) -> Optional[datetime]:
+        if value is not None and not isinstance(value, datetime):
+            return datetime.combine(value, time.min)
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    @property
+    def day_aligned(self) -> bool:
+        """區間邊界都落在整日，可直接用日彙總列計算"""
+        return all(value is None or value.time() == time.min for value in (self.start, self.end))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "from": self.start.isoformat() if self.start else None,
+            "to": self.end.isoformat() if self.end else None,
+            "bucket": self.bucket
+        }
+
+
 @router.get("/summary")
-def get_feedback_analytics_summary(db: Session = Depends(get_db)):
+def get_feedback_analytics_summary(window: AnalyticsWindow = Depends(),
+                                   db: Session = Depends(get_db)):
     """
     獲取回饋分析摘要 (API-207.1)
     
-    返回回饋分析的摘要數據
+    返回回饋分析的摘要數據，可用 from / to 限制期間、bucket 附帶趨勢 (API-207.8)
     """
     try:
-        session_feedback_repo = SessionFeedbackRepository(db)
-        practice_card_feedback_repo = PracticeCardFeedbackRepository(db)
-        
-        # 獲取會話回饋分布
-        all_session_feedback = session_feedback_repo.get_all()
-        session_feedback_distribution = {"not_applicable": 0, "partially_applicable": 0, "applicable": 0}
-        feedback_type_distribution = {"immediate": 0, "delayed": 0}
-        
-        for feedback in all_session_feedback:
-            if feedback.rating in session_feedback_distribution:
-                session_feedback_distribution[feedback.rating] += 1
-            if feedback.feedback_type in feedback_type_distribution:
-                feedback_type_distribution[feedback.feedback_type] += 1
-                
-        total_sessions = len(all_session_feedback)
-        total_feedback = len(all_session_feedback)
+        # 會話回饋與練習卡回饋各一次查詢：啟用彙總表且區間為整日時加總預先彙總的日列，否則在原始表分組計數
+        if settings.FEEDBACK_ROLLUP_ENABLED and window.day_aligned:
+            rollup_repo = FeedbackRollupRepository(db)
+            start_day = window.start.date() if window.start else None
+            end_day = window.end.date() if window.end else None
+            session_stats = rollup_repo.get_session_summary(start_day=start_day, end_day=end_day)
+            practice_stats = rollup_repo.get_practice_summary(start_day=start_day, end_day=end_day)
+        else:
+            session_stats = SessionFeedbackRepository(db).get_summary_stats(
+                window.start, window.end)
+            practice_stats = PracticeCardFeedbackRepository(db).get_summary_stats(
+                None, window.start, window.end)
+
+        session_feedback_distribution = session_stats["rating_distribution"]
+        feedback_type_distribution = session_stats["feedback_type_distribution"]
+        total_sessions = session_stats["total_count"]
+        total_feedback = session_stats["total_count"]
         feedback_completion_rate = 1.0 if total_sessions > 0 else 0.0
-        
-        # 獲取練習卡回饋星數分布
-        all_practice_feedback = practice_card_feedback_repo.get_all()
-        rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        favorite_count = 0
-        
-        for feedback in all_practice_feedback:
-            if feedback.rating in rating_distribution:
-                rating_distribution[feedback.rating] += 1
-            if feedback.is_favorite:
-                favorite_count += 1
-                
-        total_practice_count = len(all_practice_feedback)
-        average_rating = sum(f.rating for f in all_practice_feedback) / total_practice_count if total_practice_count > 0 else 0
+
+        # 練習卡回饋星數分布：平均只計 1-5 星（rating=0 為僅加入最愛），最愛率以全部回饋為分母
+        rating_distribution = practice_stats["rating_distribution"]
+        favorite_count = practice_stats["favorite_count"]
+        total_practice_count = practice_stats["rating_count"]
+        rated_count = practice_stats["rated_count"]
+        average_rating = practice_stats["rating_sum"] / rated_count if rated_count > 0 else 0
         favorite_rate = favorite_count / total_practice_count if total_practice_count > 0 else 0
         
-        return {
+        result = {
             "status": "success",
+            "window": window.as_dict(),
             "session_feedback_distribution": session_feedback_distribution,
             "immediate_vs_delayed": feedback_type_distribution,
             "feedback_completion_rate": feedback_completion_rate,
             "total_feedback_count": total_feedback,
             "rating_distribution": rating_distribution,
             "average_rating": average_rating,
-            "rating_count": total_practice_count,
+            "rating_count": rated_count,
+            "feedback_count": total_practice_count,
             "favorite_count": favorite_count,
             "favorite_rate": favorite_rate
         }
+        if window.bucket:
+            analytics_repo = FeedbackAnalyticsRepository(db)
+            result["trend"] = {
+                "session_feedback": analytics_repo.get_session_trend(
+                    window.bucket, window.start, window.end),
+                "practice_card_feedback": analytics_repo.get_practice_trend(
+                    window.bucket, window.start, window.end)
+            }
+        return result
     except Exception as e:
         logger.error(f"獲取回饋分析摘要時出錯: {e}")
         raise HTTPException(status_code=500, detail=f"獲取回饋分析摘要時出錯: {str(e)}")
 
 @router.get("/practice-cards/{practice_card_id}")
-def get_practice_card_feedback_analysis(practice_card_id: int, db: Session = Depends(get_db)):
+def get_practice_card_feedback_analysis(practice_card_id: int, window: AnalyticsWindow = Depends(),
+                                        db: Session = Depends(get_db)):
     """
     獲取特定練習卡的回饋分析 (API-207.2)
     
-    返回特定練習卡的回饋分析數據
+    返回特定練習卡的回饋分析數據（練習卡資訊與星數分布一次分組查詢取得），bucket 提供時附帶 rating_trend
     """
     try:
-        practice_card_feedback_repo = PracticeCardFeedbackRepository(db)
-        
-        # 獲取練習卡信息
-        card_info = practice_card_feedback_repo.get_practice_card_info(practice_card_id)
-        
-        # 獲取星數分布
-        rating_distribution = practice_card_feedback_repo.get_rating_distribution_by_practice(practice_card_id)
-        
-        # 獲取平均評分
-        average_rating = practice_card_feedback_repo.get_average_rating_by_practice(practice_card_id)
-        
-        # 獲取評分數量
-        rating_count = practice_card_feedback_repo.get_rating_count_by_practice(practice_card_id)
-        
-        # 獲取最愛數量
-        favorite_count = practice_card_feedback_repo.get_favorite_count_by_practice(practice_card_id)
-        
-        # 獲取最愛率
-        total_ratings = practice_card_feedback_repo.get_rating_count_by_practice(practice_card_id)
-        favorite_rate = (favorite_count / total_ratings) if total_ratings > 0 else 0
+        analytics_repo = FeedbackAnalyticsRepository(db)
+        analysis = analytics_repo.get_practice_card_analysis(practice_card_id, window.start,
+                                                             window.end)
+        if analysis is None:
+            return {
+                "status": "error",
+                "message": "練習卡不存在"
+            }
+        if window.bucket:
+            analysis["rating_trend"] = analytics_repo.get_practice_trend(
+                window.bucket, window.start, window.end, practice_id=practice_card_id)
         
         return {
             "status": "success",
-            "card_info": card_info,
-            "rating_distribution": rating_distribution,
-            "average_rating": average_rating,
-            "rating_count": rating_count,
-            "favorite_count": favorite_count,
-            "favorite_rate": favorite_rate
+            "window": window.as_dict(),
+            **analysis
         }
     except Exception as e:
         logger.error(f"獲取練習卡回饋分析時出錯: {e}")
         raise HTTPException(status_code=500, detail=f"獲取練習卡回饋分析時出錯: {str(e)}")
 
 @router.get("/symptoms/{symptom_id}")
-def get_symptom_feedback_analysis(symptom_id: int, db: Session = Depends(get_db)):
+def get_symptom_feedback_analysis(symptom_id: int, window: AnalyticsWindow = Depends(),
+                                  db: Session = Depends(get_db)):
     """
     獲取特定症狀的回饋分析 (API-207.3)
     
-    返回特定症狀的回饋分析數據
+    返回特定症狀的回饋分析數據（層一分布與映射練習卡統計各一次分組查詢），bucket 提供時附帶 session_trend
     """
     try:
-        session_feedback_repo = SessionFeedbackRepository(db)
-        
-        # 獲取症狀信息
-        symptom_info = session_feedback_repo.get_symptom_info(symptom_id)
-        
-        # 獲取會話回饋分布
-        session_feedback_distribution = session_feedback_repo.get_rating_distribution_by_symptom(symptom_id)
-        
-        # 獲取相關練習卡分析
-        related_cards_analysis = session_feedback_repo.get_related_cards_analysis_by_symptom(symptom_id)
-        
-        # 獲取高表現和低表現練習卡
-        high_performers = session_feedback_repo.get_high_performers_by_symptom(symptom_id)
-        low_performers = session_feedback_repo.get_low_performers_by_symptom(symptom_id)
+        analytics_repo = FeedbackAnalyticsRepository(db)
+        analysis = analytics_repo.get_symptom_analysis(symptom_id, window.start, window.end)
+        if analysis is None:
+            return {
+                "status": "error",
+                "message": "症狀不存在"
+            }
+        if window.bucket:
+            analysis["session_trend"] = analytics_repo.get_session_trend(
+                window.bucket, window.start, window.end, symptom_id=symptom_id)
         
         return {
             "status": "success",
-            "symptom_info": symptom_info,
-            "session_feedback_distribution": session_feedback_distribution,
-            "related_cards_analysis": related_cards_analysis,
-            "high_performers": high_performers,
-            "low_performers": low_performers
+            "window": window.as_dict(),
+            **analysis
         }
     except Exception as e:
         logger.error(f"獲取症狀回饋分析時出錯: {e}")
         raise HTTPException(status_code=500, detail=f"獲取症狀回饋分析時出錯: {str(e)}")
 
 @router.get("/user-preferences")
-def get_user_preference_analysis(db: Session = Depends(get_db)):
+def get_user_preference_analysis(window: AnalyticsWindow = Depends(),
+                                 db: Session = Depends(get_db)):
     """
     獲取用戶偏好分析 (API-207.4)
     
-    返回用戶偏好分析數據
+    返回用戶偏好分析數據（依練習卡與會話等級一次分組查詢），from / to 限制期間
     """
     try:
-        practice_card_feedback_repo = PracticeCardFeedbackRepository(db)
-        
-        # 獲取最高評分練習卡
-        top_rated_cards = practice_card_feedback_repo.get_top_rated_cards()
-        
-        # 獲取最常被加入最愛的卡片
-        most_favorited_cards = practice_card_feedback_repo.get_most_favorited_cards()
-        
-        # 獲取用戶段落分析
-        user_segment_analysis = practice_card_feedback_repo.get_user_segment_analysis()
+        analysis = FeedbackAnalyticsRepository(db).get_user_preference_analysis(
+            start=window.start, end=window.end)
         
         return {
             "status": "success",
-            "top_rated_cards": top_rated_cards,
-            "most_favorited_cards": most_favorited_cards,
-            "user_segment_analysis": user_segment_analysis
+            "window": window.as_dict(),
+            **analysis
         }
     except Exception as e:
         logger.error(f"獲取用戶偏好分析時出錯: {e}")
-        raise HTTPException(status_code=500, detail=f"獲取用戶偏好分析時出錯: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"獲取用戶偏好分析時出錯: {str(e)}")
+
+@router.get("/card-quality")
+def get_card_quality_ranking(
+    limit: int = Query(20, ge=1, le=500, description="返回的卡片數"),
+    min_ratings: int = Query(0, ge=0, description="只列出至少有此筆數 1-5 星評分的卡片"),
+    refresh: bool = Query(False, description="略過快取立即重算"),
+    db: Session = Depends(get_db)
+):
+    """
+    練習卡品質排名 (API-211)
+
+    依貝氏平滑平均排序（同分再依最愛率 Wilson 下界），附平均星數信賴區間；
+    所有卡片的分數來自同一次向量化計算，version 標示品質表版本
+    """
+    try:
+        table = card_quality.refresh(db) if refresh else card_quality.get(db)
+        return {
+            "status": "success",
+            "version": table.version,
+            "computed_at": table.computed_at.isoformat(),
+            "card_count": len(table),
+            "prior_mean": round(table.prior_mean, 3),
+            "prior_weight": table.prior_weight,
+            "cards": table.ranking(limit=limit, min_ratings=min_ratings)
+        }
+    except Exception as e:
+        logger.error(f"獲取練習卡品質排名時出錯: {e}")
+        raise HTTPException(status_code=500, detail=f"獲取練習卡品質排名時出錯: {str(e)}")
+
+@router.get("/ranking-scores")
+def get_ranking_scores(refresh: bool = Query(False, description="立即重算並替換分數表"),
+                       db: Session = Depends(get_db)):
+    """
+    推薦排序分數表狀態 (API-212)
+
+    返回目前分數表的版本與涵蓋範圍；refresh=true 時立即重算（不等背景週期）
+    """
+    try:
+        scores = ranking_scores.refresh(db) if refresh else ranking_scores.current
+        if scores is None:
+            return {"status": "error", "message": "排序分數表尚未載入"}
+        return {
+            "status": "success",
+            **scores.summary(),
+            "weights": {
+                "level": settings.RANKING_WEIGHT_LEVEL,
+                "terrain": settings.RANKING_WEIGHT_TERRAIN,
+                "quality": settings.RANKING_WEIGHT_QUALITY,
+                "symptom": settings.RANKING_WEIGHT_SYMPTOM
+            }
+        }
+    except Exception as e:
+        logger.error(f"獲取排序分數表時出錯: {e}")
+        raise HTTPException(status_code=500, detail=f"獲取排序分數表時出錯: {str(e)}")
+
+@router.get("/event-log")
+def get_feedback_event_log(materialize: bool = Query(False, description="立即物化所有待處理事件"),
+                           db: Session = Depends(get_db)):
+    """
+    回饋事件日誌狀態 (API-204.7)
+
+    返回尚未物化的事件數；materialize=true 時先物化（不等背景週期）
+    """
+    try:
+        materialized = feedback_materializer.drain(db) if materialize else 0
+        return {
+            "status": "success",
+            **get_event_log_status(db),
+            "materialized": materialized
+        }
+    except Exception as e:
+        logger.error(f"獲取回饋事件日誌狀態時出錯: {e}")
+        raise HTTPException(status_code=500, detail=f"獲取回饋事件日誌狀態時出錯: {str(e)}")
+
+@router.get("/export/{table_name}")
+def export_feedback_table(
+    table_name: str,
+    format: str = Query("parquet", regex="^(parquet|arrow)$", description="檔案格式"),
+    since: Optional[datetime] = Query(
+        None, description="增量水位（上次回應的 X-Export-Watermark）：只匯出此時間之後修改的列；sessions 不支援"
+    ),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1000, le=500000, description="每個 row group 的列數"),
+    db: Session = Depends(get_db)
+):
+    """
+    列式匯出回饋資料表 (API-207.6)
+
+    以伺服器端游標逐批寫入暫存檔後回傳，回應標頭 X-Export-Rows / X-Export-Watermark
+    提供本次列數與下次增量匯出的 since（回饋表以最後修改時間為水位，sessions 只支援完整快照）
+    """
+    if table_name not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"不支援匯出的資料表: {table_name}")
+    if since is not None and not supports_incremental(table_name):
+        raise HTTPException(status_code=400, detail=f"{table_name} 只支援完整快照，不接受 since")
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    fd, path = tempfile.mkstemp(suffix=EXPORT_FORMATS[format], prefix=f"{table_name}-")
+    os.close(fd)
+    try:
+        result = export_table(db.get_bind(), table_name, path, format, since, batch_size)
+    except RuntimeError as e:
+        os.remove(path)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        os.remove(path)
+        logger.error(f"匯出 {table_name} 時出錯: {e}")
+        raise HTTPException(status_code=500, detail=f"匯出 {table_name} 時出錯: {str(e)}")
+
+    return FileResponse(
+        path,
+        filename=os.path.basename(path),
+        media_type=(
+            "application/vnd.apache.parquet" if format == "parquet"
+            else "application/vnd.apache.arrow.file"
+        ),
+        headers={
+            "X-Export-Rows": str(result["rows"]),
+            "X-Export-Watermark": result["watermark"].isoformat() if result["watermark"] else ""
+        },
+        background=BackgroundTask(os.remove, path)
+    )
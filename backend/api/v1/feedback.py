@@ -7,15 +7,20 @@
 """
 from fastapi import APIRouter, Query, Depends, Body, Path
 from typing import Optional, List, Dict, Any
+from datetime import datetime
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from ...core.config import settings
 from ...database.base import get_db
 from ...database.repositories import (
     SessionFeedbackRepository,
-    PracticeCardFeedbackRepository
+    PracticeCardFeedbackRepository,
+    FeedbackEventRepository
 )
 from ...models.session_feedback import SessionFeedback
 from ...models.practice_card_feedback import PracticeCardFeedback
+from ...services.feedback_service import bulk_create_feedback
+from ...services.feedback_events import append_feedback_events
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,6 +42,20 @@ class PracticeCardFeedbackCreate(BaseModel):
     feedback_text: Optional[str] = None
     is_favorite: bool = False
 
+class BulkSessionFeedbackItem(SessionFeedbackCreate):
+    """批次會話回饋項目（created_at 為離線時的實際回饋時間，未提供時使用伺服器時間）"""
+    feedback_type: str = "delayed"
+    created_at: Optional[datetime] = None
+
+class BulkPracticeCardFeedbackItem(PracticeCardFeedbackCreate):
+    """批次練習卡回饋項目"""
+    created_at: Optional[datetime] = None
+
+class BulkFeedbackCreate(BaseModel):
+    """批次回饋請求模型"""
+    session_feedback: List[BulkSessionFeedbackItem] = []
+    practice_card_feedback: List[BulkPracticeCardFeedbackItem] = []
+
 class PracticeCardFavoriteUpdate(BaseModel):
     """更新練習卡最愛狀態請求模型"""
     is_favorite: bool
@@ -55,8 +74,14 @@ async def create_session_feedback(
     - "not_applicable" (❌ 不適用) - 推薦的練習卡與我的問題無關或不適合我
     - "partially_applicable" (△ 部分適用) - 有些內容有用，但大部分不適用
     - "applicable" (✓ 適用) - 相當有幫助
+
+    啟用 FEEDBACK_EVENT_LOG_ENABLED 時只追加事件並返回 "accepted"，由背景物化寫入 (API-204.7)
     """
     try:
+        if settings.FEEDBACK_EVENT_LOG_ENABLED:
+            event_ids = append_feedback_events(db, "session_feedback", [feedback_data.model_dump()])
+            return {"status": "accepted", "event_id": event_ids[0]}
+
         feedback_repo = SessionFeedbackRepository(db)
         
         # 創建會話回饋記錄
@@ -105,21 +130,26 @@ async def create_practice_card_feedback(
     - 5 顆星 ⭐⭐⭐⭐⭐：非常適用 - 完全符合我的需求
     
     is_favorite：布林值，是否加入最愛清單（預設 false），可獨立於星數設定
+
+    啟用 FEEDBACK_EVENT_LOG_ENABLED 時只追加事件並返回 "accepted"，由背景物化寫入 (API-204.7)
     """
     try:
+        if settings.FEEDBACK_EVENT_LOG_ENABLED:
+            event_ids = append_feedback_events(db, "practice_card_feedback",
+                                               [feedback_data.model_dump(exclude_unset=True)])
+            return {"status": "accepted", "event_id": event_ids[0]}
+
         feedback_repo = PracticeCardFeedbackRepository(db)
         
-        # 創建練習卡回饋記錄
-        feedback = PracticeCardFeedback(
-            session_id=feedback_data.session_id,
-            practice_id=feedback_data.practice_id,
+        # 已有回饋（例如先加入最愛）時合併評分與文字，最愛狀態不被取消 (API-206.4)
+        created_feedback = feedback_repo.upsert(
+            feedback_data.session_id,
+            feedback_data.practice_id,
             rating=feedback_data.rating,
             feedback_text=feedback_data.feedback_text,
             is_favorite=feedback_data.is_favorite
         )
         
-        created_feedback = feedback_repo.create(feedback)
-        
         return {
             "status": "success",
             "feedback": {
@@ -183,4 +213,57 @@ async def toggle_practice_card_favorite(
         return {
             "status": "error",
             "message": f"更新練習卡最愛狀態時出錯: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+@router.post("/feedback/bulk", tags=["feedback"])
+async def create_feedback_bulk(
+    bulk_data: BulkFeedbackCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    批次建立回饋 (API-204.6)
+
+    行動端離線同步用：一次送出多筆會話回饋與練習卡回饋，
+    每個資料表一個 INSERT 語句、整批一個交易
+
+    逐筆驗證，未通過的項目不寫入，並在各資料表的逐筆結果中以 index（輸入順序）回報原因；
+    會話回饋的 feedback_type 預設為 "delayed"
+
+    啟用 FEEDBACK_EVENT_LOG_ENABLED 時整批只追加事件並返回事件ID，驗證與寫入由背景物化進行 (API-204.7)
+    """
+    item_count = len(bulk_data.session_feedback) + len(bulk_data.practice_card_feedback)
+    if item_count > settings.FEEDBACK_BULK_MAX_ITEMS:
+        return {
+            "status": "error",
+            "message": f"單次最多 {settings.FEEDBACK_BULK_MAX_ITEMS} 筆回饋，收到 {item_count} 筆"
+        }
+
+    try:
+        if settings.FEEDBACK_EVENT_LOG_ENABLED:
+            events = ([("session_feedback", item.model_dump())
+                       for item in bulk_data.session_feedback]
+                      + [("practice_card_feedback", item.model_dump(exclude_unset=True))
+                         for item in bulk_data.practice_card_feedback])
+            event_ids = FeedbackEventRepository(db).append(events)
+            return {
+                "status": "accepted",
+                "session_feedback": event_ids[:len(bulk_data.session_feedback)],
+                "practice_card_feedback": event_ids[len(bulk_data.session_feedback):]
+            }
+
+        result = bulk_create_feedback(
+            db,
+            [item.model_dump() for item in bulk_data.session_feedback],
+            # 只帶客戶端實際送出的欄位，未送出的最愛狀態不會覆蓋既有回饋
+            [item.model_dump(exclude_unset=True) for item in bulk_data.practice_card_feedback]
+        )
+        return {
+            "status": "success",
+            **result
+        }
+    except Exception as e:
+        logger.error(f"批次建立回饋時出錯: {e}")
+        return {
+            "status": "error",
+            "message": f"批次建立回饋時出錯: {str(e)}"
+        }
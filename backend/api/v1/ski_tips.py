@@ -7,8 +7,9 @@ from fastapi import APIRouter, Query, Depends, Body
 from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from ...core.config import settings
 from ...database.base import get_db
-from ...services.simple_ski_tips import get_ski_tips, identify_symptom
+from ...services.simple_ski_tips import get_ski_tips
 from ...services.followup_questions import get_followup_needs
 from ...services.feedback_service import (
     create_session_feedback,
@@ -17,6 +18,7 @@ from ...services.feedback_service import (
     get_session_feedback_stats,
     get_practice_card_feedback_stats
 )
+from ...services.feedback_events import append_feedback_events
 from ...database.repositories import (
     SymptomRepository,
     PracticeCardRepository,
@@ -146,12 +148,8 @@ async def get_followup_needs_endpoint(
     
     實現 LLM 輔助的置信度判斷和追問問題生成
     """
-    # 首先識別症狀
-    symptom_repo = SymptomRepository(db)
-    recognized_symptom = identify_symptom(symptom_repo, input_text)
-    
-    # 評估是否需要追問
-    followup_info = get_followup_needs(input_text, recognized_symptom, level, terrain, style)
+    # 評估是否需要追問（症狀識別在服務層進行）
+    followup_info = get_followup_needs(db, input_text, level, terrain, style)
     
     return {
         "status": "success",
@@ -440,7 +438,11 @@ async def create_session_feedback(
     feedback: SessionFeedbackCreate,
     db: Session = Depends(get_db)
 ):
-    """創建會話回饋 (API-204.1)"""
+    """創建會話回饋 (API-204.1)；啟用事件日誌時只追加事件 (API-204.7)"""
+    if settings.FEEDBACK_EVENT_LOG_ENABLED:
+        event_ids = append_feedback_events(db, "session_feedback", [feedback.model_dump()])
+        return {"status": "accepted", "event_id": event_ids[0]}
+
     session_feedback_repo = SessionFeedbackRepository(db)
     new_feedback = session_feedback_repo.create(SessionFeedback(
         session_id=feedback.session_id,
@@ -466,15 +468,21 @@ async def create_practice_card_feedback(
     feedback: PracticeCardFeedbackCreate,
     db: Session = Depends(get_db)
 ):
-    """創建練習卡回饋 (API-204.3)"""
+    """創建練習卡回饋 (API-204.3)；啟用事件日誌時只追加事件 (API-204.7)"""
+    if settings.FEEDBACK_EVENT_LOG_ENABLED:
+        event_ids = append_feedback_events(db, "practice_card_feedback",
+                                           [feedback.model_dump(exclude_unset=True)])
+        return {"status": "accepted", "event_id": event_ids[0]}
+
     feedback_repo = PracticeCardFeedbackRepository(db)
-    new_feedback = feedback_repo.create(PracticeCardFeedback(
-        session_id=feedback.session_id,
-        practice_id=feedback.practice_id,
+    # 已有回饋（例如先加入最愛）時合併評分與文字，最愛狀態不被取消 (API-206.4)
+    new_feedback = feedback_repo.upsert(
+        feedback.session_id,
+        feedback.practice_id,
         rating=feedback.rating,
         feedback_text=feedback.feedback_text,
         is_favorite=feedback.is_favorite
-    ))
+    )
     
     return {
         "status": "success",
@@ -571,28 +579,18 @@ async def toggle_favorite_card(
     更新練習卡的最愛標記狀態
     """
     try:
-        # 查找現有的回饋記錄
+        # 單一 UPSERT：不存在時建立 rating=0 的回饋，存在時更新最愛狀態 (API-206.4)
         feedback_repo = PracticeCardFeedbackRepository(db)
-        existing_feedback = feedback_repo.get_by_session_and_practice(session_id, practice_card_id)
-        
-        if existing_feedback:
-            # 更新現有回饋的最愛狀態
-            updated_feedback = feedback_repo.update(existing_feedback.id, is_favorite=is_favorite)
-        else:
-            # 創建新的回饋記錄
-            updated_feedback = feedback_repo.create(PracticeCardFeedback(
-                session_id=session_id,
-                practice_id=practice_card_id,
-                rating=0,  # 默認評分
-                is_favorite=is_favorite
-            ))
+        feedback_id, favorite = feedback_repo.set_favorite(
+            session_id, practice_card_id, is_favorite
+        )
         
         return {
             "status": "success",
             "message": f"練習卡已{'加入' if is_favorite else '移除'}最愛清單",
             "feedback": {
-                "id": updated_feedback.id,
-                "is_favorite": updated_feedback.is_favorite
+                "id": feedback_id,
+                "is_favorite": favorite
             }
         }
     except Exception as e:
@@ -610,17 +608,17 @@ async def remove_favorite_card(
     取消練習卡的最愛標記
     """
     try:
+        # 單一 UPDATE ... RETURNING，只更新目前為最愛的列 (API-206.4)
         feedback_repo = PracticeCardFeedbackRepository(db)
-        existing_feedback = feedback_repo.get_by_session_and_practice(session_id, practice_card_id)
+        feedback_id = feedback_repo.unset_favorite(session_id, practice_card_id)
         
-        if existing_feedback:
-            updated_feedback = feedback_repo.update(existing_feedback.id, is_favorite=False)
+        if feedback_id is not None:
             return {
                 "status": "success",
                 "message": "練習卡已移除最愛清單",
                 "feedback": {
-                    "id": updated_feedback.id,
-                    "is_favorite": updated_feedback.is_favorite
+                    "id": feedback_id,
+                    "is_favorite": False
                 }
             }
         else:
@@ -19,10 +19,38 @@ class Settings:
     # AI 模型設定
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
     AI_PROVIDER: str = os.getenv("AI_PROVIDER", "huggingface")
+    # false 時不載入嵌入模型（僅管理功能的進程）
+    RAG_ENABLED: bool = os.getenv("RAG_ENABLED", "True").lower() == "true"
+    LLM_API_BASE: Optional[str] = os.getenv("LLM_API_BASE")  # OpenAI 相容服務位址，未設定時使用本地樁服務
+    LLM_API_KEY: Optional[str] = os.getenv("LLM_API_KEY")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "qwen2.5-7b-instruct")
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "20"))  # 單次呼叫逾時（秒）
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # 同時進行的呼叫數與連線池大小
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "2"))  # 併發已滿時最多等待秒數
     
     # 向量資料庫設定
     VECTOR_DB_TYPE: str = os.getenv("VECTOR_DB_TYPE", "chroma")
     VECTOR_DB_PATH: str = os.getenv("VECTOR_DB_PATH", "./vector_store")
+    # 值域：none / float16 / int8
+    EMBEDDING_QUANTIZATION: str = os.getenv("EMBEDDING_QUANTIZATION", "none")
+    # float32 精確重排的候選數
+    QUANTIZATION_RESCORE_CANDIDATES: int = int(os.getenv("QUANTIZATION_RESCORE_CANDIDATES", "50"))
+    # 量化索引與集合片段數的比對間隔（秒），偵測其他程序寫入集合造成的漂移
+    INDEX_DRIFT_CHECK_SECONDS: float = float(os.getenv("INDEX_DRIFT_CHECK_SECONDS", "60"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "256"))  # 知識導入每批向量化與寫入的片段數
+    # 以內容雜湊保存已計算的嵌入向量
+    EMBEDDING_STORE_PATH: str = os.getenv("EMBEDDING_STORE_PATH", "./embedding_store")
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "0"))  # 離線導入的向量化進程數，0 或 1 為單進程
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024"))  # 提示詞上下文的 token 預算
+    # 知識片段近似重複的餘弦相似度門檻
+    CONTEXT_DEDUP_THRESHOLD: float = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() == "true"
+    # 上下文餘弦相似度達此值視為命中
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_TTL_SECONDS: float = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
     
     # Supabase 設定
     SUPABASE_URL: Optional[str] = os.getenv("SUPABASE_URL")
@@ -38,6 +66,53 @@ class Settings:
     
     # 性能設定
     MAX_RESPONSE_TIME_P95: float = 2.5  # 秒
+    # 啟動時暖機（完成後才接受連線），關鍵步驟失敗時 /ready 返回 503
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+    # 暖機時預熱推薦流程的症狀數
+    WARMUP_RECOMMENDATION_QUERIES: int = int(os.getenv("WARMUP_RECOMMENDATION_QUERIES", "20"))
+    # 記錄各階段耗時並提供 /metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    # 每個序列保留的最近樣本數（計算分位數）
+    METRICS_SAMPLE_WINDOW: int = int(os.getenv("METRICS_SAMPLE_WINDOW", "2048"))
+    # 超過此耗時的 SQL 語句連同參數寫入日誌
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+    # 請求取樣剖析，執行期可由管理端點切換
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    # 隨機剖析的請求比例（0~1）
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0.0"))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))  # 堆疊取樣間隔
+    PROFILING_DIR: str = os.getenv("PROFILING_DIR", "./profiles")
+    PROFILING_MAX_CAPTURES: int = int(os.getenv("PROFILING_MAX_CAPTURES", "50"))  # 保留的剖析檔案數
+    # 寫入回饋時同步維護彙總表，分析端點讀彙總表
+    FEEDBACK_ROLLUP_ENABLED: bool = os.getenv("FEEDBACK_ROLLUP_ENABLED", "True").lower() == "true"
+    # PostgreSQL 回饋表按月分區（遷移時生效）
+    FEEDBACK_PARTITIONING: bool = os.getenv("FEEDBACK_PARTITIONING", "False").lower() == "true"
+    # 貝氏平滑的先驗筆數，評分少的卡片向全體平均收斂
+    CARD_QUALITY_PRIOR_WEIGHT: float = float(os.getenv("CARD_QUALITY_PRIOR_WEIGHT", "5"))
+    # 信賴區間與 Wilson 下界的 z 值
+    CARD_QUALITY_CONFIDENCE_Z: float = float(os.getenv("CARD_QUALITY_CONFIDENCE_Z", "1.96"))
+    CARD_QUALITY_TTL_SECONDS: float = float(os.getenv("CARD_QUALITY_TTL_SECONDS", "300"))  # 品質表快取秒數
+    RANKING_WEIGHT_LEVEL: float = float(os.getenv("RANKING_WEIGHT_LEVEL", "10"))  # 排序：等級匹配加分
+    RANKING_WEIGHT_TERRAIN: float = float(os.getenv("RANKING_WEIGHT_TERRAIN", "5"))  # 排序：地形匹配加分
+    # 排序：品質分數（0-1）的權重
+    RANKING_WEIGHT_QUALITY: float = float(os.getenv("RANKING_WEIGHT_QUALITY", "3"))
+    # 排序：症狀成功率（0-1）的權重
+    RANKING_WEIGHT_SYMPTOM: float = float(os.getenv("RANKING_WEIGHT_SYMPTOM", "4"))
+    # 排序分數表重算間隔，0 表示只在暖機時計算
+    RANKING_REFRESH_SECONDS: float = float(os.getenv("RANKING_REFRESH_SECONDS", "300"))
+    FEEDBACK_BULK_MAX_ITEMS: int = int(os.getenv("FEEDBACK_BULK_MAX_ITEMS", "1000"))  # 批次回饋端點單次最多筆數
+    # 回饋寫入只追加事件日誌，由背景程序物化
+    FEEDBACK_EVENT_LOG_ENABLED: bool = (
+        os.getenv("FEEDBACK_EVENT_LOG_ENABLED", "False").lower() == "true"
+    )
+    # 每次物化的最多事件數
+    FEEDBACK_EVENT_BATCH_SIZE: int = int(os.getenv("FEEDBACK_EVENT_BATCH_SIZE", "500"))
+    # 物化間隔，0 表示不啟動背景物化
+    FEEDBACK_EVENT_MATERIALIZE_SECONDS: float = float(
+        os.getenv("FEEDBACK_EVENT_MATERIALIZE_SECONDS", "2")
+    )
+    # 增量匯出的水位落後秒數：只匯出更早修改的列，讓較晚提交的交易在下次匯出時補上
+    EXPORT_WATERMARK_LAG_SECONDS: float = float(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "300"))
     
     # 應用程式設定
     MAX_TIPS_PER_CARD: int = 3  # 練習卡要點數量上限
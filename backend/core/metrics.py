@@ -0,0 +1,268 @@
+"""
+延遲指標 (API-208)
+
+輕量的進程內計時與 Prometheus 文字格式輸出（不依賴 prometheus_client）：
+- timed(stage)：計時上下文管理器 / 裝飾器，記錄推薦流程各階段耗時
+  （症狀識別、映射查詢、篩選、排序、RAG 向量化、向量查詢、工作階段提交）
+- MetricsMiddleware：ASGI 中間件，依路由模板記錄整個請求的耗時，並依狀態碼計數請求
+- 每個序列同時保留固定分桶直方圖與最近 METRICS_SAMPLE_WINDOW 筆樣本，
+  由樣本計算 p50 / p95 / p99
+- 請求耗時超過 MAX_RESPONSE_TIME_P95 時累加 SLO 違反計數
+
+/metrics 端點輸出 render_prometheus() 的結果
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import deque
+from contextlib import ContextDecorator
+import math
+import threading
+import time
+from .config import settings
+
+# 直方圖分桶上限（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+STAGE_METRIC = "turnfix_stage_duration_seconds"
+REQUEST_METRIC = "turnfix_http_request_duration_seconds"
+SLO_BREACH_METRIC = "turnfix_http_slo_breaches_total"
+REQUEST_COUNT_METRIC = "turnfix_http_requests_total"
+
+
+def quantile(sorted_samples: List[float], q: float) -> float:
+    """最近秩法分位數；樣本須已排序"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+class Histogram:
+    """單一序列的分桶計數、總和與最近樣本"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, window: Optional[int] = None):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window or settings.METRICS_SAMPLE_WINDOW)
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.samples.append(seconds)
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        return {q: quantile(ordered, q) for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """指標登錄表（執行緒安全）"""
+
+    def __init__(self, slo_seconds: Optional[float] = None, window: Optional[int] = None):
+        self.slo_seconds = settings.MAX_RESPONSE_TIME_P95 if slo_seconds is None else slo_seconds
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (指標名稱, 標籤) -> Histogram
+            self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+            self._slo_breaches: Dict[Tuple[Tuple[str, str], ...], int] = {}
+            # (method, route, status) 標籤 -> 請求數；狀態碼只作計數標籤，不拆分耗時分位數
+            self._request_counts: Dict[Tuple[Tuple[str, str], ...], int] = {}
+
+    def observe(self, metric: str, seconds: float, **labels: str):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(window=self.window)
+            histogram.observe(seconds)
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.observe(STAGE_METRIC, seconds, stage=stage)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        self.observe(REQUEST_METRIC, seconds, method=method, route=route)
+        labels = (("method", method), ("route", route))
+        counted = labels + (("status", str(status)),)
+        with self._lock:
+            self._request_counts[counted] = self._request_counts.get(counted, 0) + 1
+            if seconds > self.slo_seconds:
+                self._slo_breaches[labels] = self._slo_breaches.get(labels, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各序列的次數、總和與分位數（供測試與管理介面使用）"""
+        with self._lock:
+            series = {}
+            for (metric, labels), histogram in self._histograms.items():
+                series.setdefault(metric, {})[",".join(v for _, v in labels)] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    **{f"p{int(q * 100)}": value for q, value in histogram.quantiles().items()}
+                }
+            breaches = {",".join(v for _, v in labels): count
+                        for labels, count in self._slo_breaches.items()}
+            requests = {",".join(v for _, v in labels): count
+                        for labels, count in self._request_counts.items()}
+        return {"series": series, "requests": requests, "slo_breaches": breaches,
+                "slo_seconds": self.slo_seconds}
+
+    def render_prometheus(self) -> str:
+        """輸出 Prometheus 文字格式"""
+        lines: List[str] = []
+        with self._lock:
+            by_metric: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], Histogram]]] = {}
+            for (metric, labels), histogram in sorted(self._histograms.items()):
+                by_metric.setdefault(metric, []).append((labels, histogram))
+
+            for metric, series in by_metric.items():
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = _labels(labels, le=_number(bound))
+                        lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{metric}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+                    lines.append(f"{metric}_sum{_labels(labels)} {_number(histogram.sum)}")
+                    lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+
+                # 分位數以獨立的 gauge 輸出，與直方圖名稱不衝突
+                lines.append(f"# TYPE {metric}_quantile gauge")
+                for labels, histogram in series:
+                    for q, value in histogram.quantiles().items():
+                        quantile_labels = _labels(labels, quantile=_number(q))
+                        lines.append(f"{metric}_quantile{quantile_labels} {_number(value)}")
+
+            lines.append(f"# TYPE {REQUEST_COUNT_METRIC} counter")
+            for labels, count in sorted(self._request_counts.items()):
+                lines.append(f"{REQUEST_COUNT_METRIC}{_labels(labels)} {count}")
+
+            lines.append(f"# TYPE {SLO_BREACH_METRIC} counter")
+            for labels, count in sorted(self._slo_breaches.items()):
+                lines.append(f"{SLO_BREACH_METRIC}{_labels(labels)} {count}")
+
+        lines.append("# TYPE turnfix_slo_target_seconds gauge")
+        lines.append(f"turnfix_slo_target_seconds {_number(self.slo_seconds)}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+# 進程共用的指標登錄表
+metrics = MetricsRegistry()
+
+
+class timed(ContextDecorator):
+    """
+    記錄一個階段的耗時
+
+    用法：
+        with timed("vector_query"):
+            ...
+
+        @timed("ranking")
+        def rank_cards(...):
+            ...
+    """
+
+    def __init__(self, stage: str, registry: Optional[MetricsRegistry] = None):
+        self.stage = stage
+        self.registry = registry
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if settings.METRICS_ENABLED:
+            (self.registry or metrics).observe_stage(self.stage, time.perf_counter() - self._start)
+        return False
+
+    def _recreate_cm(self):
+        # 裝飾器在多執行緒下被同時呼叫，每次呼叫使用獨立的計時器
+        return timed(self.stage, self.registry)
+
+
+def instrument_session_commits(session_factory, registry: Optional[MetricsRegistry] = None):
+    """記錄工作階段提交（含 flush）的耗時，階段名稱為 session_commit"""
+    from sqlalchemy import event
+
+    @event.listens_for(session_factory, "before_commit")
+    def _before_commit(session):
+        session.info["_commit_started"] = time.perf_counter()
+
+    @event.listens_for(session_factory, "after_commit")
+    def _after_commit(session):
+        started = session.info.pop("_commit_started", None)
+        if started is not None and settings.METRICS_ENABLED:
+            (registry or metrics).observe_stage("session_commit", time.perf_counter() - started)
+
+    @event.listens_for(session_factory, "after_rollback")
+    def _after_rollback(session):
+        session.info.pop("_commit_started", None)
+
+
+class MetricsMiddleware:
+    """
+    ASGI 中間件：記錄每個 HTTP 請求從進入到回應送完的耗時
+
+    以路由模板（如 /api/v1/symptoms/{symptom_id}）為標籤，避免路徑參數造成序列爆量
+    """
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            (self.registry or metrics).observe_request(
+                scope.get("method", ""), route_template(scope), status["code"],
+                time.perf_counter() - start
+            )
+
+
+def route_template(scope) -> str:
+    """找出符合請求的路由模板；找不到時返回 unmatched"""
+    from starlette.routing import Match
+
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
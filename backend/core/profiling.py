@@ -0,0 +1,189 @@
+"""
+請求範圍的取樣剖析 (API-209)
+
+預設關閉。啟用後以下請求會被剖析：
+- 依 PROFILING_SAMPLE_RATE 隨機抽樣的請求
+- 帶有 X-TurnFix-Profile: 1 標頭的請求
+
+剖析期間由背景執行緒每 PROFILING_INTERVAL_MS 毫秒讀取一次各執行緒的呼叫堆疊
+（sys._current_frames，不掛 sys.setprofile，對被剖析的程式碼幾乎沒有額外開銷），
+結果以 collapsed stack 格式（flamegraph.pl / speedscope 可直接讀取）寫入 PROFILING_DIR，
+只保留最新的 PROFILING_MAX_CAPTURES 個檔案
+
+同步端點在執行緒池中執行，因此取樣涵蓋所有執行緒；每一行以執行緒名稱為根節點
+同一時間只剖析一個請求，其餘被選中的請求直接略過
+"""
+from typing import Any, Dict, List, Optional
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import random
+import re
+import sys
+import threading
+import time
+import logging
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-turnfix-profile"
+CAPTURE_SUFFIX = ".collapsed"
+
+# 視為閒置的最上層框架（等待鎖、佇列或 I/O 事件），不計入取樣
+IDLE_FRAMES = {"threading:wait", "threading:_wait_for_tstate_lock", "queue:get", "selectors:select"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", Path(code.co_filename).stem)
+    return f"{module}:{code.co_name}"
+
+
+class StackSampler:
+    """背景執行緒定時讀取各執行緒堆疊，累計 collapsed stack 次數"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = (settings.PROFILING_INTERVAL_MS / 1000) if interval is None else interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample_once(self):
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            if _frame_label(frame) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample_once()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="turnfix-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingState:
+    """執行期開關（管理端點可調整，不需重新部署）"""
+
+    def __init__(self):
+        self.enabled = settings.PROFILING_ENABLED
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.directory = Path(settings.PROFILING_DIR)
+        self.max_captures = settings.PROFILING_MAX_CAPTURES
+        self._busy = threading.Lock()
+
+    def should_profile(self, headers: List) -> bool:
+        if not self.enabled:
+            return False
+        if any(name == PROFILE_HEADER and value in (b"1", b"true") for name, value in headers):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def settings_snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "directory": str(self.directory),
+            "max_captures": self.max_captures
+        }
+
+    def save(self, sampler: StackSampler, method: str, path: str, status: int,
+             duration: float) -> Path:
+        """寫入剖析結果並刪除超出保留數量的舊檔案"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+        name = (f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{method}_{slug}"
+                f"_{status}_{int(duration * 1000)}ms{CAPTURE_SUFFIX}")
+        target = self.directory / name
+        target.write_text(sampler.collapsed(), encoding="utf-8")
+
+        captures = sorted(self.directory.glob(f"*{CAPTURE_SUFFIX}"))
+        for old in captures[:max(0, len(captures) - self.max_captures)]:
+            old.unlink(missing_ok=True)
+        return target
+
+    def list_captures(self) -> List[Dict[str, Any]]:
+        """列出剖析結果（新到舊）"""
+        if not self.directory.exists():
+            return []
+        captures = []
+        for path in sorted(self.directory.glob(f"*{CAPTURE_SUFFIX}"), reverse=True):
+            stat = path.stat()
+            captures.append({
+                "name": path.name,
+                "size_bytes": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+        return captures
+
+    def read_capture(self, name: str) -> Optional[str]:
+        # 只接受目錄內的檔名，避免路徑穿越
+        if Path(name).name != name or not name.endswith(CAPTURE_SUFFIX):
+            return None
+        path = self.directory / name
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+
+profiling_state = ProfilingState()
+
+
+class ProfilingMiddleware:
+    """ASGI 中間件：對被選中的請求啟動取樣剖析"""
+
+    def __init__(self, app, state: Optional[ProfilingState] = None):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        state = self.state or profiling_state
+        if scope["type"] != "http" or not state.should_profile(scope.get("headers", [])):
+            await self.app(scope, receive, send)
+            return
+
+        if not state._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        sampler = StackSampler()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            state._busy.release()
+            try:
+                path = state.save(sampler, scope.get("method", ""), scope.get("path", ""),
+                                  status["code"], time.perf_counter() - start)
+                logger.info(f"已儲存剖析結果: {path}（{sampler.samples} 次取樣）")
+            except OSError as e:
+                # 降級策略：寫入失敗不影響請求本身
+                logger.error(f"儲存剖析結果失敗: {e}")
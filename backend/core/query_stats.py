@@ -0,0 +1,152 @@
+"""
+SQL 查詢計數與慢查詢日誌 (API-210)
+
+在 SQLAlchemy Engine 的 before_cursor_execute / after_cursor_execute 事件上計時：
+- QueryStatsMiddleware：每個請求累計查詢次數與資料庫總耗時，DEBUG 模式下以
+  X-DB-Query-Count / X-DB-Time-Ms 回應標頭輸出，方便在瀏覽器或 curl 直接看到 N+1
+- 單一語句超過 SLOW_QUERY_THRESHOLD_MS 時連同參數寫入警告日誌
+- capture_queries()：進程範圍的查詢收集（測試與基準測試用，不依賴請求上下文）
+
+監聽掛在 Engine 類別上，測試自建的引擎同樣會被計數
+"""
+from typing import Any, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = b"x-db-query-count"
+QUERY_TIME_HEADER = b"x-db-time-ms"
+# 慢查詢日誌中參數的最大長度（批次寫入的參數可能有數萬組）
+MAX_LOGGED_PARAMS_CHARS = 1000
+
+
+class QueryStats:
+    """一段期間內的查詢次數、總耗時與語句"""
+
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.keep_statements = keep_statements
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            if self.keep_statements:
+                self.statements.append(statement)
+
+    @property
+    def total_ms(self) -> float:
+        return round(self.total_seconds * 1000, 2)
+
+
+# 目前請求的統計（同步端點在執行緒池中執行時會複製上下文，物件本身共用）
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+# capture_queries() 開啟中的收集器
+_collectors: List[QueryStats] = []
+_collectors_lock = threading.Lock()
+_installed = False
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("_query_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    if _collectors:
+        with _collectors_lock:
+            for collector in _collectors:
+                collector.record(statement, seconds)
+
+    if seconds * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        if executemany:
+            params = f"{len(parameters)} 組，第一組 {parameters[0]!r}" if parameters else "[]"
+        else:
+            params = repr(parameters)
+        if len(params) > MAX_LOGGED_PARAMS_CHARS:
+            params = params[:MAX_LOGGED_PARAMS_CHARS] + "..."
+        logger.warning(f"慢查詢 {seconds * 1000:.1f} ms: {statement} | 參數: {params}")
+
+
+def install_query_instrumentation():
+    """在 Engine 類別上註冊計時監聽（重複呼叫無副作用）"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+@contextmanager
+def capture_queries(keep_statements: bool = True):
+    """
+    收集區塊內所有執行緒執行的查詢
+
+    用法：
+        with capture_queries() as stats:
+            client.get("/api/v1/user/favorite-cards")
+        assert stats.count <= 2
+    """
+    install_query_instrumentation()
+    stats = QueryStats(keep_statements=keep_statements)
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
+
+
+class QueryStatsMiddleware:
+    """ASGI 中間件：累計每個請求的查詢次數與資料庫耗時"""
+
+    def __init__(self, app, debug: Optional[bool] = None):
+        self.app = app
+        self.debug = settings.DEBUG if debug is None else debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.debug:
+                headers: List[Any] = list(message.get("headers", []))
+                headers.append((QUERY_COUNT_HEADER, str(stats.count).encode()))
+                headers.append((QUERY_TIME_HEADER, str(stats.total_ms).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            if stats.count:
+                logger.debug(f"{scope.get('method')} {scope.get('path')}: "
+                             f"{stats.count} 次查詢，{stats.total_ms} ms")
@@ -0,0 +1,167 @@
+"""
+啟動暖機與就緒狀態 (API-207)
+
+應用程式啟動時依序執行暖機步驟並記錄各元件的狀態與耗時：
+- embedding_model：建立 RAG 服務（載入嵌入模型、開啟 ChromaDB）
+- dummy_encode：執行一次向量化，觸發模型的延遲初始化
+- database：連線並執行 SELECT 1，偵測回饋表是否已分區
+- symptom_catalog：載入症狀目錄
+- ranking_scores：計算推薦排序用的品質分數與症狀成功率（API-212）
+- recommendations：以症狀同義詞走一遍推薦流程，預熱資料頁與查詢編譯快取
+
+暖機在啟動事件中執行，伺服器在暖機結束後才開始接受連線；/health 只表示進程存活，
+/ready 在關鍵步驟失敗時返回 503，滾動部署時負載平衡器不會把流量導向無法服務的工作進程。
+ranking_scores 與 recommendations 只是預熱（失敗時排序退回規則、首個請求較慢），
+失敗記為 degraded（降級策略），/ready 仍返回 200，並由背景重算或首個請求補上
+"""
+from typing import Any, Callable, Dict, Optional
+import threading
+import time
+import logging
+from sqlalchemy import text
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+WARMUP_STEPS = (
+    "embedding_model", "dummy_encode", "database", "symptom_catalog", "ranking_scores",
+    "recommendations",
+)
+
+# 失敗不影響服務能力的預熱步驟，失敗時記為 degraded 而非 failed
+OPTIONAL_STEPS = ("ranking_scores", "recommendations")
+
+# 可接受流量的元件狀態
+SERVING_STATUSES = ("ready", "skipped", "degraded")
+
+
+class Readiness:
+    """各元件就緒狀態（pending / ready / failed / degraded / skipped）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.components: Dict[str, Dict[str, Any]] = {
+                name: {"status": "pending"} for name in WARMUP_STEPS
+            }
+            self.started_at: Optional[float] = None
+            self.finished_at: Optional[float] = None
+
+    def run(self, name: str, step: Callable[[], Any]) -> bool:
+        """執行一個暖機步驟並記錄結果與耗時（OPTIONAL_STEPS 失敗時記為 degraded）"""
+        start = time.perf_counter()
+        try:
+            detail = step()
+            status = {"status": "ready"}
+            if detail is not None:
+                status["detail"] = detail
+        except Exception as e:
+            logger.error(f"暖機步驟 {name} 失敗: {e}")
+            status = {"status": "degraded" if name in OPTIONAL_STEPS else "failed", "error": str(e)}
+        status["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        with self._lock:
+            self.components[name] = status
+        return status["status"] == "ready"
+
+    def skip(self, name: str, reason: str):
+        with self._lock:
+            self.components[name] = {"status": "skipped", "reason": reason}
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(c["status"] in SERVING_STATUSES for c in self.components.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = None
+            if self.started_at is not None and self.finished_at is not None:
+                total = round((self.finished_at - self.started_at) * 1000, 1)
+            statuses = [c["status"] for c in self.components.values()]
+            if not all(status in SERVING_STATUSES for status in statuses):
+                overall = "not_ready"
+            else:
+                overall = "degraded" if "degraded" in statuses else "ready"
+            return {
+                "status": overall,
+                "warmup_duration_ms": total,
+                "components": {name: dict(status) for name, status in self.components.items()}
+            }
+
+
+readiness = Readiness()
+
+
+def _warm_recommendations(db, symptoms) -> Dict[str, int]:
+    """以每個症狀的第一個同義詞呼叫推薦流程"""
+    from ..services.simple_ski_tips import get_ski_tips
+
+    queries = 0
+    for symptom in symptoms[:settings.WARMUP_RECOMMENDATION_QUERIES]:
+        synonyms = symptom.synonyms if isinstance(symptom.synonyms, list) else []
+        get_ski_tips(db, synonyms[0] if synonyms else symptom.name)
+        queries += 1
+    return {"queries": queries}
+
+
+def run_warmup(state: Readiness = None) -> bool:
+    """
+    執行全部暖機步驟（同步，於啟動事件中在執行緒池執行）
+
+    Returns:
+        bool: 是否全部就緒
+    """
+    from ..database.base import SessionLocal
+    from ..database.repositories import SymptomRepository
+    from ..services.rag_service import init_rag_service, get_rag_service
+    from ..services.card_ranking import ranking_scores
+    from ..services.feedback_partitions import feedback_is_partitioned
+
+    state = state or readiness
+    state.reset()
+    state.started_at = time.perf_counter()
+
+    if settings.RAG_ENABLED:
+        if state.run("embedding_model", lambda: init_rag_service() and None):
+            state.run("dummy_encode", lambda: {
+                "dim": int(len(get_rag_service().embedding_model.encode(["暖機"])[0]))
+            })
+        else:
+            state.skip("dummy_encode", "嵌入模型載入失敗")
+    else:
+        state.skip("embedding_model", "RAG_ENABLED=false")
+        state.skip("dummy_encode", "RAG_ENABLED=false")
+
+    db = SessionLocal()
+    try:
+        def ping():
+            db.execute(text("SELECT 1"))
+            # 回饋表是否分區在此偵測並快取，最愛切換不必每次查詢
+            return {"feedback_partitioned": feedback_is_partitioned(db.get_bind())}
+
+        if state.run("database", ping):
+            # 分數表失敗時排序退回等級 / 地形規則，不影響後續步驟（背景定期重算時補上）
+            state.run("ranking_scores", lambda: ranking_scores.refresh(db).summary())
+            symptoms = []
+
+            def load_catalog():
+                symptoms.extend(SymptomRepository(db).get_all())
+                return {"symptoms": len(symptoms)}
+
+            if state.run("symptom_catalog", load_catalog):
+                state.run("recommendations", lambda: _warm_recommendations(db, symptoms))
+            else:
+                state.skip("recommendations", "症狀目錄載入失敗")
+        else:
+            state.skip("symptom_catalog", "資料庫無法連線")
+            state.skip("ranking_scores", "資料庫無法連線")
+            state.skip("recommendations", "資料庫無法連線")
+    finally:
+        db.close()
+
+    state.finished_at = time.perf_counter()
+    snapshot = state.snapshot()
+    logger.info(f"暖機完成: {snapshot['status']}，耗時 {snapshot['warmup_duration_ms']} ms")
+    return state.is_ready()
@@ -1,9 +1,12 @@
 """
 資料庫基礎配置
 """
+from datetime import datetime, timezone
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from ..core.config import settings
+from ..core.metrics import instrument_session_commits
+from ..core.query_stats import install_query_instrumentation
 
 # 創建資料庫引擎
 engine = create_engine(
@@ -12,12 +15,23 @@ engine = create_engine(
     connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
 )
 
+# 查詢計數與慢查詢日誌 (API-210)
+install_query_instrumentation()
+
 # 創建會話工廠
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 記錄提交耗時 (API-208)
+instrument_session_commits(SessionLocal)
 
 # 創建基礎類
 Base = declarative_base()
 
+
+def utcnow() -> datetime:
+    """不含時區的 UTC 時間（資料表的 DateTime 欄位不帶時區）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 def get_db():
     """
     獲取資料庫會話的依賴函數
@@ -3,6 +3,7 @@
 實現 Repository 模式以管理數據訪問邏輯
 """
 from typing import List, Optional
+from datetime import date, datetime
 from sqlalchemy.orm import Session
 import json
 from ..core.config import settings
@@ -103,6 +104,15 @@ class PracticeCardRepository:
         from ..models.practice_card import PracticeCard
         return self.db.query(PracticeCard).all()
 
+    def get_existing_ids(self, practice_card_ids) -> set:
+        """一次查詢返回存在的練習卡ID"""
+        from ..models.practice_card import PracticeCard
+        ids = set(practice_card_ids)
+        if not ids:
+            return set()
+        rows = self.db.query(PracticeCard.id).filter(PracticeCard.id.in_(ids)).all()
+        return {row[0] for row in rows}
+
     def create(self, practice_card):
         """創建練習卡"""
         from ..models.practice_card import PracticeCard
@@ -187,6 +197,15 @@ class SessionRepository:
         from ..models.session import Session as SessionModel
         return self.db.query(SessionModel).filter(SessionModel.id == session_id).first()
 
+    def get_symptom_ids(self, session_ids) -> dict:
+        """一次查詢返回存在的會話ID與其選定症狀ID（未選定為 None）"""
+        from ..models.session import Session as SessionModel
+        ids = set(session_ids)
+        if not ids:
+            return {}
+        return dict(self.db.query(SessionModel.id, SessionModel.chosen_symptom_id).filter(
+            SessionModel.id.in_(ids)).all())
+
     def create(self, session):
         """創建會話"""
         from ..models.session import Session as SessionModel
@@ -289,6 +308,67 @@ class SymptomPracticeMappingRepository:
         return self.delete_mapping(symptom_id, practice_id)
 
 
+# 時間區間分析支援的分桶粒度 (API-207.8)
+TIME_BUCKETS = ("hour", "day", "week")
+
+
+def time_window(column, start: Optional[datetime] = None, end: Optional[datetime] = None) -> list:
+    """[start, end) 時間區間條件，未提供的一端不限制"""
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return conditions
+
+
+def time_bucket(db: Session, column, bucket: str):
+    """
+    依資料庫方言把時間欄位截斷到 hour / day / week 起點（週以週一為起點）
+
+    PostgreSQL 使用 date_trunc，SQLite 使用 strftime / date 修飾符，其餘方言退回按日
+    """
+    from sqlalchemy import func
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return func.date_trunc(bucket, column)
+    if dialect == "sqlite" and bucket == "hour":
+        return func.strftime("%Y-%m-%dT%H:00:00", column)
+    if dialect == "sqlite" and bucket == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    return func.date(column)
+
+
+def bucket_label(value, bucket: str) -> str:
+    """分桶值統一為 ISO 字串（hour 含時間，day / week 只有日期）"""
+    if isinstance(value, datetime):
+        return value.isoformat() if bucket == "hour" else value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def bulk_insert(db: Session, model, rows: List[dict]) -> List[Optional[int]]:
+    """
+    以單一 INSERT 語句批次寫入（executemany），不提交，由呼叫端在同一交易中提交
+
+    方言支援 executemany RETURNING 時（PostgreSQL、SQLite 3.35+）依參數順序返回新ID，
+    否則返回 None 佔位。PostgreSQL 以多列 VALUES 分批送出；SQLite 無法保證多列 RETURNING 的順序，
+    SQLAlchemy 會在同一游標上逐列執行（行程內資料庫，沒有網路往返）
+
+    注意：繞過 ORM，不觸發 before_flush 的彙總表維護，呼叫端需自行更新彙總表
+    """
+    from sqlalchemy import insert
+    if not rows:
+        return []
+    table = model.__table__
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+        return [row[0] for row in result]
+    db.execute(insert(table), rows)
+    return [None] * len(rows)
+
+
 class PracticeCardFeedbackRepository:
     """練習卡回饋數據庫操作倉庫"""
     
@@ -303,6 +383,11 @@ class PracticeCardFeedbackRepository:
         self.db.refresh(feedback)
         return feedback
 
+    def bulk_create(self, rows: List[dict]) -> List[Optional[int]]:
+        """批次寫入練習卡回饋（單一語句，不提交），返回新ID"""
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        return bulk_insert(self.db, PracticeCardFeedback, rows)
+
     def get_by_session_and_practice(self, session_id: int, practice_id: int):
         """根據會話ID和練習卡ID獲取回饋"""
         from ..models.practice_card_feedback import PracticeCardFeedback
@@ -322,6 +407,184 @@ class PracticeCardFeedbackRepository:
             self.db.refresh(feedback)
         return feedback
 
+    def get_by_session_practice_pairs(self, pairs) -> dict:
+        """一次查詢載入多個（會話, 練習卡）的回饋，返回 {(session_id, practice_id): 回饋}"""
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from sqlalchemy import tuple_
+        pairs = list(pairs)
+        if not pairs:
+            return {}
+        rows = self.db.query(PracticeCardFeedback).filter(
+            tuple_(PracticeCardFeedback.session_id, PracticeCardFeedback.practice_id).in_(pairs)
+        ).all()
+        return {(row.session_id, row.practice_id): row for row in rows}
+
+    def supports_favorite_upsert(self) -> bool:
+        """
+        （會話, 練習卡）唯一約束存在且方言支援 ON CONFLICT 時使用 UPSERT
+
+        按月分區的資料表無法建立不含分區鍵的唯一約束，改走先查再寫的路徑；
+        是否分區以資料庫實際狀態為準（每個資料庫只查詢一次）
+        """
+        from ..services.feedback_partitions import feedback_is_partitioned
+        bind = self.db.get_bind()
+        return bind.dialect.name in ("postgresql", "sqlite") and not feedback_is_partitioned(bind)
+
+    def set_favorite(self, session_id: int, practice_id: int, is_favorite: bool) -> tuple:
+        """
+        設定（會話, 練習卡）回饋的最愛狀態，不存在時建立 rating=0 的回饋 (API-206.4)
+
+        以單一 INSERT ... ON CONFLICT DO UPDATE ... RETURNING 完成，並發請求不會建立重複列；
+        狀態確實改變時才更新並返回列，彙總表增量依「新增」或「切換」寫入；
+        狀態已相同時不寫入，另以一次查詢取得回饋ID
+
+        Returns:
+            tuple: (回饋ID, 最愛狀態)
+        """
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from ..models.feedback_rollup import apply_practice_delta, practice_contribution
+        from collections import Counter
+        from datetime import timezone
+        from sqlalchemy import literal_column
+
+        if not self.supports_favorite_upsert():
+            existing = self.get_by_session_and_practice(session_id, practice_id)
+            if existing:
+                updated = self.update(existing.id, is_favorite=is_favorite)
+            else:
+                updated = self.create(PracticeCardFeedback(
+                    session_id=session_id, practice_id=practice_id, rating=0,
+                    is_favorite=is_favorite))
+            return updated.id, updated.is_favorite
+
+        table = PracticeCardFeedback.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            # xmax = 0 表示本語句新增的列（衝突更新的列 xmax 為目前交易）
+            inserted = literal_column("xmax = 0")
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+            inserted = None
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        statement = insert(table).values(
+            session_id=session_id, practice_id=practice_id, rating=0, is_favorite=is_favorite,
+            created_at=now, updated_at=now
+        )
+        # ON CONFLICT DO UPDATE 不套用欄位的 onupdate，最後修改時間需明確寫入
+        statement = statement.on_conflict_do_update(
+            index_elements=["session_id", "practice_id"],
+            set_={
+                "is_favorite": statement.excluded.is_favorite,
+                "updated_at": statement.excluded.updated_at,
+            },
+            where=table.c.is_favorite.is_distinct_from(statement.excluded.is_favorite)
+        )
+        # SQLite 沒有 xmax：更新不會改動 created_at，等於本次寫入的時間即為新增
+        inserted = inserted if inserted is not None else (table.c.created_at == now)
+        row = self.db.execute(statement.returning(
+            table.c.id, table.c.rating, table.c.created_at, inserted.label("inserted")
+        )).first()
+
+        if row is None:
+            self.db.commit()
+            feedback_id = self.db.query(PracticeCardFeedback.id).filter(
+                PracticeCardFeedback.session_id == session_id,
+                PracticeCardFeedback.practice_id == practice_id
+            ).scalar()
+            return feedback_id, is_favorite
+
+        if settings.FEEDBACK_ROLLUP_ENABLED:
+            if row.inserted:
+                delta = practice_contribution(row.rating, is_favorite)
+            else:
+                delta = Counter(favorite_count=1 if is_favorite else -1)
+            apply_practice_delta(self.db, session_id, practice_id, row.created_at, delta)
+        self.db.commit()
+        return row.id, is_favorite
+
+    def upsert(self, session_id: int, practice_id: int, rating: Optional[int] = None,
+               feedback_text: Optional[str] = None, is_favorite: Optional[bool] = None):
+        """
+        寫入（會話, 練習卡）的回饋：不存在時新增，已存在時依 merge_feedback 合併 (API-206.4)
+
+        先以 INSERT ... ON CONFLICT DO NOTHING RETURNING 嘗試新增（並發請求不會建立重複列），
+        衝突時鎖定既有列後經由 ORM 合併，彙總表增量由 flush 時的監聽器維護
+
+        Returns:
+            PracticeCardFeedback: 寫入後的回饋
+        """
+        from ..models.practice_card_feedback import PracticeCardFeedback, merge_feedback
+        from ..models.feedback_rollup import apply_practice_delta, practice_contribution
+        from datetime import timezone
+
+        if self.supports_favorite_upsert():
+            table = PracticeCardFeedback.__table__
+            if self.db.get_bind().dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            row = self.db.execute(insert(table).values(
+                session_id=session_id, practice_id=practice_id, rating=rating or 0,
+                feedback_text=feedback_text, is_favorite=bool(is_favorite), created_at=now
+            ).on_conflict_do_nothing(
+                index_elements=["session_id", "practice_id"]
+            ).returning(table.c.id)).first()
+            if row is not None:
+                if settings.FEEDBACK_ROLLUP_ENABLED:
+                    apply_practice_delta(self.db, session_id, practice_id, now,
+                                         practice_contribution(rating or 0, bool(is_favorite)))
+                self.db.commit()
+                return self.db.get(PracticeCardFeedback, row.id)
+
+        existing = self.db.query(PracticeCardFeedback).filter(
+            PracticeCardFeedback.session_id == session_id,
+            PracticeCardFeedback.practice_id == practice_id
+        ).with_for_update().first()
+        if existing is None:
+            return self.create(PracticeCardFeedback(
+                session_id=session_id, practice_id=practice_id, rating=rating or 0,
+                feedback_text=feedback_text, is_favorite=bool(is_favorite)))
+        merge_feedback(existing, rating, feedback_text, is_favorite)
+        self.db.commit()
+        self.db.refresh(existing)
+        return existing
+
+    def unset_favorite(self, session_id: int, practice_id: int) -> Optional[int]:
+        """
+        取消（會話, 練習卡）回饋的最愛 (API-206.4)
+
+        以單一 UPDATE ... RETURNING 完成，只更新目前為最愛的列
+
+        Returns:
+            Optional[int]: 被取消最愛的回饋ID；不存在或本來就不是最愛時為 None
+        """
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from ..models.feedback_rollup import apply_practice_delta
+        from collections import Counter
+
+        if not self.supports_favorite_upsert():
+            existing = self.get_by_session_and_practice(session_id, practice_id)
+            if not existing or not existing.is_favorite:
+                return None
+            return self.update(existing.id, is_favorite=False).id
+
+        table = PracticeCardFeedback.__table__
+        row = self.db.execute(
+            table.update().where(
+                table.c.session_id == session_id,
+                table.c.practice_id == practice_id,
+                table.c.is_favorite == True
+            ).values(is_favorite=False).returning(table.c.id, table.c.created_at)
+        ).first()
+        if row is not None and settings.FEEDBACK_ROLLUP_ENABLED:
+            apply_practice_delta(self.db, session_id, practice_id, row.created_at,
+                                 Counter(favorite_count=-1))
+        self.db.commit()
+        return row.id if row is not None else None
+
     def get_by_practice_card(self, practice_id: int):
         """獲取指定練習卡的所有回饋"""
         from ..models.practice_card_feedback import PracticeCardFeedback
@@ -330,11 +593,12 @@ class PracticeCardFeedbackRepository:
         ).all()
 
     def get_average_rating(self, practice_id: int) -> float:
-        """獲取練習卡的平均評分"""
+        """獲取練習卡的平均評分（只計 1-5 星，不含僅加入最愛的 rating=0 紀錄）"""
         from ..models.practice_card_feedback import PracticeCardFeedback
         from sqlalchemy import func
         result = self.db.query(func.avg(PracticeCardFeedback.rating)).filter(
-            PracticeCardFeedback.practice_id == practice_id
+            PracticeCardFeedback.practice_id == practice_id,
+            PracticeCardFeedback.rating.between(1, 5)
         ).scalar()
         return result if result is not None else 0.0
 
@@ -343,6 +607,93 @@ class PracticeCardFeedbackRepository:
         from ..models.practice_card_feedback import PracticeCardFeedback
         return self.db.query(PracticeCardFeedback).all()
 
+    def get_summary_stats(self, practice_id: Optional[int] = None,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None) -> dict:
+        """
+        練習卡回饋彙總（資料庫端 GROUP BY rating，一次往返）
+
+        Args:
+            practice_id: 只統計該練習卡；None 表示全部
+            start / end: 只統計 [start, end) 期間建立的回饋
+
+        Returns:
+            dict: rating_distribution（1-5 星）、rating_count（全部回饋）、rated_count（1-5 星）、
+                rating_sum、favorite_count
+        """
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from sqlalchemy import func, case
+        query = self.db.query(
+            PracticeCardFeedback.rating,
+            func.count(),
+            func.sum(case((PracticeCardFeedback.is_favorite == True, 1), else_=0))
+        )
+        if practice_id is not None:
+            query = query.filter(PracticeCardFeedback.practice_id == practice_id)
+        query = query.filter(*time_window(PracticeCardFeedback.created_at, start, end))
+
+        stats = {"rating_distribution": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0},
+                 "rating_count": 0, "rated_count": 0, "rating_sum": 0, "favorite_count": 0}
+        for rating, count, favorites in query.group_by(PracticeCardFeedback.rating).all():
+            if rating in stats["rating_distribution"]:
+                stats["rating_distribution"][rating] = count
+                stats["rated_count"] += count
+            stats["rating_count"] += count
+            stats["rating_sum"] += (rating or 0) * count
+            stats["favorite_count"] += favorites or 0
+        return stats
+
+    def get_rating_histograms(self) -> list:
+        """
+        所有練習卡的星數直方圖（一次 GROUP BY practice_id, rating）
+
+        Returns:
+            list: (practice_id, 1-5 星各自筆數 tuple, 全部回饋筆數, 最愛筆數)，依 practice_id 排序
+        """
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from sqlalchemy import func, case
+        rows = self.db.query(
+            PracticeCardFeedback.practice_id,
+            PracticeCardFeedback.rating,
+            func.count(),
+            func.sum(case((PracticeCardFeedback.is_favorite == True, 1), else_=0))
+        ).group_by(PracticeCardFeedback.practice_id, PracticeCardFeedback.rating).order_by(
+            PracticeCardFeedback.practice_id
+        ).all()
+
+        histograms = {}
+        for practice_id, rating, count, favorites in rows:
+            entry = histograms.setdefault(practice_id, [[0] * 5, 0, 0])
+            if rating is not None and 1 <= rating <= 5:
+                entry[0][rating - 1] = count
+            entry[1] += count
+            entry[2] += favorites or 0
+        return [(practice_id, tuple(hist), total, favorites)
+                for practice_id, (hist, total, favorites) in histograms.items()]
+
+    def get_symptom_success_counts(self) -> list:
+        """
+        各症狀下各練習卡的高分（4-5 星）筆數與 1-5 星評分筆數（一次 GROUP BY）
+
+        症狀取會話選定的 chosen_symptom_id，未選定時為 0（與彙總表相同）
+
+        Returns:
+            list: (symptom_id, practice_id, 高分筆數, 評分筆數)
+        """
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from ..models.session import Session as SessionModel
+        from sqlalchemy import func, case
+        symptom_id = func.coalesce(SessionModel.chosen_symptom_id, 0)
+        rows = self.db.query(
+            symptom_id,
+            PracticeCardFeedback.practice_id,
+            func.sum(case((PracticeCardFeedback.rating >= 4, 1), else_=0)),
+            func.sum(case((rated_only(PracticeCardFeedback.rating), 1), else_=0))
+        ).join(SessionModel, PracticeCardFeedback.session_id == SessionModel.id).group_by(
+            symptom_id, PracticeCardFeedback.practice_id
+        ).all()
+        return [(symptom, practice_id, success or 0, rated or 0)
+                for symptom, practice_id, success, rated in rows if rated]
+
 
 class SessionFeedbackRepository:
     """會話回饋數據庫操作倉庫"""
@@ -358,6 +709,11 @@ class SessionFeedbackRepository:
         self.db.refresh(feedback)
         return feedback
 
+    def bulk_create(self, rows: List[dict]) -> List[Optional[int]]:
+        """批次寫入會話回饋（單一語句，不提交），返回新ID"""
+        from ..models.session_feedback import SessionFeedback
+        return bulk_insert(self.db, SessionFeedback, rows)
+
     def get_by_session(self, session_id: int):
         """根據會話ID獲取回饋"""
         from ..models.session_feedback import SessionFeedback
@@ -379,4 +735,524 @@ class SessionFeedbackRepository:
     def get_all(self):
         """獲取所有會話回饋"""
         from ..models.session_feedback import SessionFeedback
-        return self.db.query(SessionFeedback).all()
\ No newline at end of file
+        return self.db.query(SessionFeedback).all()
+
+    def get_summary_stats(self, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None) -> dict:
+        """
+        會話回饋彙總（資料庫端 GROUP BY rating, feedback_type，一次往返）
+
+        Args:
+            start / end: 只統計 [start, end) 期間建立的回饋
+
+        Returns:
+            dict: rating_distribution、feedback_type_distribution、total_count
+        """
+        from ..models.session_feedback import SessionFeedback
+        from sqlalchemy import func
+        rows = self.db.query(
+            SessionFeedback.rating,
+            SessionFeedback.feedback_type,
+            func.count()
+        ).filter(
+            *time_window(SessionFeedback.created_at, start, end)
+        ).group_by(SessionFeedback.rating, SessionFeedback.feedback_type).all()
+
+        stats = {
+            "rating_distribution": {"not_applicable": 0, "partially_applicable": 0,
+                                    "applicable": 0},
+            "feedback_type_distribution": {"immediate": 0, "delayed": 0},
+            "total_count": 0
+        }
+        for rating, feedback_type, count in rows:
+            if rating in stats["rating_distribution"]:
+                stats["rating_distribution"][rating] += count
+            if feedback_type in stats["feedback_type_distribution"]:
+                stats["feedback_type_distribution"][feedback_type] += count
+            stats["total_count"] += count
+        return stats
+
+
+class FeedbackRollupRepository:
+    """回饋彙總表讀取倉庫 (API-207.7)，回傳格式與原始表的 get_summary_stats 相同"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_practice_summary(self, practice_id: Optional[int] = None,
+                             symptom_id: Optional[int] = None,
+                             start_day: Optional[date] = None,
+                             end_day: Optional[date] = None) -> dict:
+        """
+        練習卡回饋彙總（加總彙總列，一次往返）
+
+        Args:
+            practice_id: 只統計該練習卡；None 表示全部
+            symptom_id: 只統計選定該症狀的會話；None 表示全部
+            start_day / end_day: 只統計 [start_day, end_day) 的日彙總列
+        """
+        from ..models.feedback_rollup import PracticeCardFeedbackRollup as Rollup
+        from sqlalchemy import func
+        query = self.db.query(
+            func.sum(Rollup.rating_1), func.sum(Rollup.rating_2), func.sum(Rollup.rating_3),
+            func.sum(Rollup.rating_4), func.sum(Rollup.rating_5),
+            func.sum(Rollup.rating_count), func.sum(Rollup.rated_count),
+            func.sum(Rollup.rating_sum), func.sum(Rollup.favorite_count)
+        )
+        if practice_id is not None:
+            query = query.filter(Rollup.practice_id == practice_id)
+        if symptom_id is not None:
+            query = query.filter(Rollup.symptom_id == symptom_id)
+        query = query.filter(*time_window(Rollup.day, start_day, end_day))
+
+        row = [value or 0 for value in query.one()]
+        return {
+            "rating_distribution": {star: row[star - 1] for star in range(1, 6)},
+            "rating_count": row[5],
+            "rated_count": row[6],
+            "rating_sum": row[7],
+            "favorite_count": row[8]
+        }
+
+    def get_session_summary(self, symptom_id: Optional[int] = None,
+                            start_day: Optional[date] = None,
+                            end_day: Optional[date] = None) -> dict:
+        """會話回饋彙總（加總彙總列，一次往返），start_day / end_day 同 get_practice_summary"""
+        from ..models.feedback_rollup import SessionFeedbackRollup as Rollup
+        from sqlalchemy import func
+        query = self.db.query(
+            func.sum(Rollup.not_applicable), func.sum(Rollup.partially_applicable),
+            func.sum(Rollup.applicable),
+            func.sum(Rollup.immediate), func.sum(Rollup.delayed), func.sum(Rollup.total_count)
+        )
+        if symptom_id is not None:
+            query = query.filter(Rollup.symptom_id == symptom_id)
+        query = query.filter(*time_window(Rollup.day, start_day, end_day))
+
+        not_applicable, partially_applicable, applicable, immediate, delayed, total_count = (
+            value or 0 for value in query.one()
+        )
+        return {
+            "rating_distribution": {"not_applicable": not_applicable,
+                                    "partially_applicable": partially_applicable,
+                                    "applicable": applicable},
+            "feedback_type_distribution": {"immediate": immediate, "delayed": delayed},
+            "total_count": total_count
+        }
+
+    def get_rating_histograms(self) -> list:
+        """所有練習卡的星數直方圖（加總彙總列，一次往返），格式同 PracticeCardFeedbackRepository.get_rating_histograms"""
+        from ..models.feedback_rollup import PracticeCardFeedbackRollup as Rollup
+        from sqlalchemy import func
+        rows = self.db.query(
+            Rollup.practice_id,
+            func.sum(Rollup.rating_1), func.sum(Rollup.rating_2), func.sum(Rollup.rating_3),
+            func.sum(Rollup.rating_4), func.sum(Rollup.rating_5),
+            func.sum(Rollup.rating_count), func.sum(Rollup.favorite_count)
+        ).group_by(Rollup.practice_id).order_by(Rollup.practice_id).all()
+        return [(practice_id, tuple(value or 0 for value in stars), total or 0, favorites or 0)
+                for practice_id, *stars, total, favorites in rows]
+
+    def get_symptom_success_counts(self) -> list:
+        """各症狀下各練習卡的高分與評分筆數（加總彙總列），格式同 PracticeCardFeedbackRepository.get_symptom_success_counts"""
+        from ..models.feedback_rollup import PracticeCardFeedbackRollup as Rollup
+        from sqlalchemy import func
+        rows = self.db.query(
+            Rollup.symptom_id,
+            Rollup.practice_id,
+            func.sum(Rollup.rating_4 + Rollup.rating_5),
+            func.sum(Rollup.rated_count)
+        ).group_by(Rollup.symptom_id, Rollup.practice_id).all()
+        return [(symptom_id, practice_id, success or 0, rated or 0)
+                for symptom_id, practice_id, success, rated in rows if rated]
+
+
+class FeedbackEventRepository:
+    """回饋事件日誌倉庫 (API-204.7)：寫入端只追加，物化端依序取出、寫入後刪除"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def append(self, events: List[tuple]) -> List[Optional[int]]:
+        """追加 (種類, 內容) 事件（單一 INSERT 語句）並提交，返回事件ID"""
+        from ..models.feedback_event import FeedbackEvent
+        ids = bulk_insert(self.db, FeedbackEvent, [
+            {"kind": kind, "payload": json.dumps(payload, ensure_ascii=False, default=str)}
+            for kind, payload in events
+        ])
+        self.db.commit()
+        return ids
+
+    def claim_pending(self, limit: int) -> list:
+        """
+        領取最多 limit 筆最早的事件：在目前交易中刪除並返回（不提交）
+
+        以單一 DELETE ... RETURNING 領取，刪除成功的列才屬於本交易，並發的物化程序不會領到同一事件；
+        呼叫端把物化結果與刪除一併提交，失敗回滾時事件恢復為待處理。
+        PostgreSQL 另以 SKIP LOCKED 讓並發的物化程序領取不同批次而不互相等待；
+        SQLite 的寫入由資料庫鎖序列化，後到的物化程序等待或以 database is locked 失敗後重試
+        """
+        from ..models.feedback_event import FeedbackEvent
+        from sqlalchemy import delete, select
+        table = FeedbackEvent.__table__
+        oldest = (select(table.c.id).order_by(table.c.id).limit(limit)
+                  .with_for_update(skip_locked=True))
+        statement = delete(table).where(table.c.id.in_(oldest.scalar_subquery()))
+        columns = (table.c.id, table.c.kind, table.c.payload, table.c.created_at)
+
+        if self.db.get_bind().dialect.delete_returning:
+            events = self.db.execute(statement.returning(*columns)).all()
+            return sorted(events, key=lambda event: event.id)
+
+        # 不支援 DELETE ... RETURNING：先讀取再刪除，刪除筆數不符表示已被其他物化程序領取
+        events = self.db.execute(select(*columns).order_by(table.c.id).limit(limit)).all()
+        if not events:
+            return []
+        event_ids = [event.id for event in events]
+        deleted = self.db.execute(delete(table).where(table.c.id.in_(event_ids)))
+        if deleted.rowcount != len(events):
+            self.db.rollback()
+            return []
+        return events
+
+    def count_pending(self) -> int:
+        """尚未物化的事件數"""
+        from ..models.feedback_event import FeedbackEvent
+        return self.db.query(FeedbackEvent).count()
+
+
+# 會話等級欄位對應的用戶段落 (API-207.4)
+LEVEL_SEGMENTS = {"初級": "beginner", "中級": "intermediate", "高級": "advanced"}
+
+
+def rated_only(rating_column):
+    """1-5 星的評分（rating=0 為僅加入最愛，不計入平均）"""
+    return rating_column.between(1, 5)
+
+
+def _card_stats(practice_id: int, card_name: str, feedback_count: int, rated_count: int,
+                rating_sum: int, favorite_count: int, high_rating_count: int) -> dict:
+    """
+    把一列分組計數轉為練習卡統計
+
+    平均星數與有效性分數只以 1-5 星的評分為分母，最愛率以全部回饋為分母
+    """
+    feedback_count = feedback_count or 0
+    rated_count = rated_count or 0
+    favorite_count = favorite_count or 0
+    high_rating_count = high_rating_count or 0
+    return {
+        "practice_id": practice_id,
+        "card_name": card_name,
+        "avg_rating": round((rating_sum or 0) / rated_count, 2) if rated_count else 0.0,
+        "rating_count": rated_count,
+        "feedback_count": feedback_count,
+        "favorite_count": favorite_count,
+        "favorite_rate": round(favorite_count / feedback_count, 2) if feedback_count else 0.0,
+        "effectiveness_score": round(high_rating_count / rated_count, 2) if rated_count else 0.0
+    }
+
+
+class FeedbackAnalyticsRepository:
+    """
+    回饋分析查詢層 (API-207.2 ~ API-207.4)
+
+    每個分析端點的數字由一次分組查詢（症狀端點為兩次：症狀層一分布、映射練習卡層二統計）
+    在資料庫端算出，不逐張卡片或逐項指標分別查詢
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_practice_card_analysis(self, practice_id: int, start: Optional[datetime] = None,
+                                   end: Optional[datetime] = None) -> Optional[dict]:
+        """
+        單張練習卡的回饋分析：練習卡 LEFT JOIN 回饋，依星數分組（一次往返）
+
+        start / end 限制回饋建立時間 [start, end)，條件放在 JOIN 上，區間內沒有回饋時仍返回練習卡資訊
+
+        Returns:
+            Optional[dict]: card_info、rating_distribution 與計數；練習卡不存在時返回 None
+        """
+        from ..models.practice_card import PracticeCard
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from sqlalchemy import func, case, and_
+        rows = self.db.query(
+            PracticeCard.id,
+            PracticeCard.name,
+            PracticeCardFeedback.rating,
+            func.count(PracticeCardFeedback.id),
+            func.sum(case((PracticeCardFeedback.is_favorite == True, 1), else_=0))
+        ).outerjoin(
+            PracticeCardFeedback,
+            and_(PracticeCardFeedback.practice_id == PracticeCard.id,
+                 *time_window(PracticeCardFeedback.created_at, start, end))
+        ).filter(
+            PracticeCard.id == practice_id
+        ).group_by(PracticeCard.id, PracticeCard.name, PracticeCardFeedback.rating).all()
+
+        if not rows:
+            return None
+
+        rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+        feedback_count = rating_sum = favorite_count = 0
+        for _, _, rating, count, favorites in rows:
+            if rating in rating_distribution:
+                rating_distribution[rating] = count
+                rating_sum += rating * count
+            feedback_count += count
+            favorite_count += favorites or 0
+
+        stats = _card_stats(rows[0][0], rows[0][1], feedback_count,
+                            sum(rating_distribution.values()), rating_sum,
+                            favorite_count, rating_distribution[4] + rating_distribution[5])
+        return {
+            "card_info": {"id": stats["practice_id"], "name": stats["card_name"],
+                          "avg_rating": stats["avg_rating"], "rating_count": stats["rating_count"]},
+            "rating_distribution": rating_distribution,
+            "average_rating": stats["avg_rating"],
+            "rating_count": stats["rating_count"],
+            "feedback_count": feedback_count,
+            "favorite_count": favorite_count,
+            "favorite_rate": stats["favorite_rate"]
+        }
+
+    def get_symptom_analysis(self, symptom_id: int, start: Optional[datetime] = None,
+                             end: Optional[datetime] = None) -> Optional[dict]:
+        """
+        單個症狀的推薦有效性
+
+        1. 症狀 LEFT JOIN 會話 LEFT JOIN 會話回饋，依層一評分分組
+        2. 映射 JOIN 練習卡 LEFT JOIN（練習卡回饋 JOIN 選定此症狀的會話），依練習卡分組
+
+        start / end 限制兩層回饋的建立時間 [start, end)
+
+        Returns:
+            Optional[dict]: symptom_info、session_feedback_distribution、related_cards_analysis、
+                high_performers、low_performers；症狀不存在時返回 None
+        """
+        from ..models.symptom import Symptom
+        from ..models.session import Session as SkiSession
+        from ..models.session_feedback import SessionFeedback
+        from ..models.practice_card import PracticeCard
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from ..models.symptom_practice_mapping import SymptomPracticeMapping
+        from sqlalchemy import func, case, and_
+        from sqlalchemy.orm import aliased
+
+        session_rows = self.db.query(
+            Symptom.id,
+            Symptom.name,
+            Symptom.category,
+            SessionFeedback.rating,
+            func.count(SessionFeedback.id)
+        ).outerjoin(
+            SkiSession, SkiSession.chosen_symptom_id == Symptom.id
+        ).outerjoin(
+            SessionFeedback,
+            and_(SessionFeedback.session_id == SkiSession.id,
+                 *time_window(SessionFeedback.created_at, start, end))
+        ).filter(
+            Symptom.id == symptom_id
+        ).group_by(Symptom.id, Symptom.name, Symptom.category, SessionFeedback.rating).all()
+
+        if not session_rows:
+            return None
+
+        session_feedback_distribution = {"not_applicable": 0, "partially_applicable": 0,
+                                         "applicable": 0}
+        for _, _, _, rating, count in session_rows:
+            if rating in session_feedback_distribution:
+                session_feedback_distribution[rating] += count
+
+        # 只計入選定此症狀的會話中留下的練習卡回饋
+        symptom_session = aliased(SkiSession)
+        feedback = (
+            self.db.query(PracticeCardFeedback)
+            .join(symptom_session, symptom_session.id == PracticeCardFeedback.session_id)
+            .filter(symptom_session.chosen_symptom_id == symptom_id,
+                    *time_window(PracticeCardFeedback.created_at, start, end))
+            .subquery()
+        )
+        card_rows = self.db.query(
+            SymptomPracticeMapping.practice_id,
+            PracticeCard.name,
+            func.count(feedback.c.id),
+            func.sum(case((rated_only(feedback.c.rating), 1), else_=0)),
+            func.sum(case((rated_only(feedback.c.rating), feedback.c.rating), else_=0)),
+            func.sum(case((feedback.c.is_favorite == True, 1), else_=0)),
+            func.sum(case((feedback.c.rating >= 4, 1), else_=0))
+        ).join(
+            PracticeCard, PracticeCard.id == SymptomPracticeMapping.practice_id
+        ).outerjoin(
+            feedback, feedback.c.practice_id == SymptomPracticeMapping.practice_id
+        ).filter(
+            SymptomPracticeMapping.symptom_id == symptom_id
+        ).group_by(
+            SymptomPracticeMapping.practice_id, PracticeCard.name, SymptomPracticeMapping.order
+        ).order_by(SymptomPracticeMapping.order).all()
+
+        related_cards = [_card_stats(*row) for row in card_rows]
+        rated_cards = [card for card in related_cards if card["rating_count"] > 0]
+        symptom_id_value, name, category = session_rows[0][:3]
+        return {
+            "symptom_info": {"id": symptom_id_value, "name": name, "category": category},
+            "session_feedback_distribution": session_feedback_distribution,
+            "related_cards_analysis": related_cards,
+            # 高表現：平均 4★+ 且最愛率 > 50%；低表現：平均 < 2★ 或最愛率 < 10%
+            "high_performers": [card for card in rated_cards
+                                if card["avg_rating"] >= 4 and card["favorite_rate"] > 0.5],
+            "low_performers": [card for card in rated_cards
+                               if card["avg_rating"] < 2 or card["favorite_rate"] < 0.1]
+        }
+
+    def get_user_preference_analysis(self, limit: int = 20, segment_top_cards: int = 5,
+                                     start: Optional[datetime] = None,
+                                     end: Optional[datetime] = None) -> dict:
+        """
+        整體用戶偏好：回饋 JOIN 練習卡 LEFT JOIN 會話，依 (練習卡, 會話等級) 分組（一次往返），
+        再於記憶體中合併出各卡總計與各等級段落
+
+        Args:
+            limit: 最高評分 / 最常最愛清單的卡片數
+            segment_top_cards: 每個用戶段落列出的卡片數
+            start / end: 只統計 [start, end) 期間建立的回饋
+
+        Returns:
+            dict: top_rated_cards、most_favorited_cards、user_segment_analysis
+        """
+        from ..models.practice_card import PracticeCard
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from ..models.session import Session as SkiSession
+        from sqlalchemy import func, case
+        rows = self.db.query(
+            PracticeCardFeedback.practice_id,
+            PracticeCard.name,
+            SkiSession.level_slot,
+            func.count(PracticeCardFeedback.id),
+            func.sum(case((rated_only(PracticeCardFeedback.rating), 1), else_=0)),
+            func.sum(case((rated_only(PracticeCardFeedback.rating), PracticeCardFeedback.rating),
+                          else_=0)),
+            func.sum(case((PracticeCardFeedback.is_favorite == True, 1), else_=0)),
+            func.sum(case((PracticeCardFeedback.rating >= 4, 1), else_=0))
+        ).join(
+            PracticeCard, PracticeCard.id == PracticeCardFeedback.practice_id
+        ).outerjoin(
+            SkiSession, SkiSession.id == PracticeCardFeedback.session_id
+        ).filter(
+            *time_window(PracticeCardFeedback.created_at, start, end)
+        ).group_by(
+            PracticeCardFeedback.practice_id, PracticeCard.name, SkiSession.level_slot
+        ).all()
+
+        # (practice_id, card_name) ->
+        #     [feedback_count, rated_count, rating_sum, favorite_count, high_rating_count]
+        card_totals = {}
+        segment_cards = {segment: {} for segment in LEVEL_SEGMENTS.values()}
+        for practice_id, name, level, *values in rows:
+            counts = tuple(value or 0 for value in values)
+            totals = card_totals.setdefault((practice_id, name), [0, 0, 0, 0, 0])
+            for i, value in enumerate(counts):
+                totals[i] += value
+            segment = LEVEL_SEGMENTS.get(level)
+            if segment:
+                segment_cards[segment][(practice_id, name)] = counts
+
+        cards = [_card_stats(practice_id, name, *totals)
+                 for (practice_id, name), totals in card_totals.items()]
+        top_rated = sorted(cards, key=lambda c: (c["avg_rating"], c["rating_count"]),
+                           reverse=True)[:limit]
+        most_favorited = sorted([c for c in cards if c["favorite_count"] > 0],
+                                key=lambda c: (c["favorite_count"], c["avg_rating"]),
+                                reverse=True)[:limit]
+
+        user_segment_analysis = {}
+        for segment, segment_rows in segment_cards.items():
+            feedback_count, rated_count, rating_sum, favorite_count, _ = (
+                sum(column) for column in zip((0, 0, 0, 0, 0), *segment_rows.values())
+            )
+            segment_card_stats = [_card_stats(practice_id, name, *counts)
+                                  for (practice_id, name), counts in segment_rows.items()]
+            user_segment_analysis[segment] = {
+                "avg_rating": round(rating_sum / rated_count, 2) if rated_count else 0.0,
+                "favorite_rate": (round(favorite_count / feedback_count, 2)
+                                  if feedback_count else 0.0),
+                "rating_count": rated_count,
+                "top_cards": sorted(segment_card_stats,
+                                    key=lambda c: (c["avg_rating"], c["rating_count"]),
+                                    reverse=True)[:segment_top_cards]
+            }
+
+        return {
+            "top_rated_cards": top_rated,
+            "most_favorited_cards": most_favorited,
+            "user_segment_analysis": user_segment_analysis
+        }
+
+    def get_practice_trend(self, bucket: str, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None,
+                           practice_id: Optional[int] = None,
+                           symptom_id: Optional[int] = None) -> List[dict]:
+        """
+        練習卡回饋按時間分桶的趨勢（一次往返，走 created_at / (practice_id, created_at) 索引）
+
+        Returns:
+            List[dict]: 依時間排序的 bucket、rating_count、avg_rating、favorite_count
+        """
+        from ..models.practice_card_feedback import PracticeCardFeedback
+        from ..models.session import Session as SkiSession
+        from sqlalchemy import func, case
+        bucket_start = time_bucket(self.db, PracticeCardFeedback.created_at, bucket)
+        query = self.db.query(
+            bucket_start,
+            func.sum(case((rated_only(PracticeCardFeedback.rating), 1), else_=0)),
+            func.sum(case((rated_only(PracticeCardFeedback.rating), PracticeCardFeedback.rating),
+                          else_=0)),
+            func.sum(case((PracticeCardFeedback.is_favorite == True, 1), else_=0))
+        ).filter(*time_window(PracticeCardFeedback.created_at, start, end))
+        if practice_id is not None:
+            query = query.filter(PracticeCardFeedback.practice_id == practice_id)
+        if symptom_id is not None:
+            query = query.join(SkiSession, SkiSession.id == PracticeCardFeedback.session_id).filter(
+                SkiSession.chosen_symptom_id == symptom_id)
+
+        return [
+            {
+                "bucket": bucket_label(value, bucket),
+                "rating_count": count or 0,
+                "avg_rating": round((rating_sum or 0) / count, 2) if count else 0.0,
+                "favorite_count": favorites or 0
+            }
+            for value, count, rating_sum, favorites
+            in query.group_by(bucket_start).order_by(bucket_start).all()
+        ]
+
+    def get_session_trend(self, bucket: str, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None,
+                          symptom_id: Optional[int] = None) -> List[dict]:
+        """
+        會話回饋按時間分桶的層一評分分布（一次往返）
+
+        Returns:
+            List[dict]: 依時間排序的 bucket、total_count 與各評分計數
+        """
+        from ..models.session_feedback import SessionFeedback
+        from ..models.session import Session as SkiSession
+        from sqlalchemy import func, case
+        ratings = ("not_applicable", "partially_applicable", "applicable")
+        bucket_start = time_bucket(self.db, SessionFeedback.created_at, bucket)
+        query = self.db.query(
+            bucket_start,
+            func.count(SessionFeedback.id),
+            *[func.sum(case((SessionFeedback.rating == rating, 1), else_=0)) for rating in ratings]
+        ).filter(*time_window(SessionFeedback.created_at, start, end))
+        if symptom_id is not None:
+            query = query.join(SkiSession, SkiSession.id == SessionFeedback.session_id).filter(
+                SkiSession.chosen_symptom_id == symptom_id)
+
+        return [
+            {"bucket": bucket_label(value, bucket), "total_count": count,
+             **{rating: rating_count or 0 for rating, rating_count in zip(ratings, rating_counts)}}
+            for value, count, *rating_counts
+            in query.group_by(bucket_start).order_by(bucket_start).all()
+        ]
@@ -11,8 +11,19 @@ TurnFix 後端主應用程式
 遵循 Linus 的"好品味"原則
 """
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from .api.v1.router import router as v1_router
+from .core.config import settings
+from .core.metrics import metrics, MetricsMiddleware
+from .core.profiling import ProfilingMiddleware
+from .core.query_stats import QueryStatsMiddleware
+from .core.readiness import readiness, run_warmup, WARMUP_STEPS
+from .services.card_ranking import ranking_scores
+from .services.feedback_events import feedback_materializer
+from .services.llm_client import close_llm_client
+from .services.rag_service import shutdown_rag_service
 
 app = FastAPI(
     title="TurnFix API",
@@ -29,6 +40,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 請求耗時指標中間件 (API-208)
+app.add_middleware(MetricsMiddleware)
+
+# 每個請求的查詢次數與資料庫耗時，DEBUG 模式下輸出為回應標頭 (API-210)
+app.add_middleware(QueryStatsMiddleware)
+
+# 取樣剖析中間件，預設關閉 (API-209)
+app.add_middleware(ProfilingMiddleware)
+
 # 包含 API 路由
 app.include_router(v1_router, prefix="/api/v1")
 
@@ -40,14 +60,38 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """就緒檢查：關鍵暖機步驟失敗時返回 503（預熱步驟失敗為 degraded，仍返回 200），並列出各元件狀態與耗時"""
+    snapshot = readiness.snapshot()
+    return JSONResponse(snapshot, status_code=503 if snapshot["status"] == "not_ready" else 200)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 格式的各階段與請求耗時（直方圖、p50/p95/p99、SLO 違反次數）"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # 確保應用程式啟動時初始化必要的組件
 @app.on_event("startup")
 async def startup_event():
     # 在這裡可以初始化資料庫連接、AI 模型等
-    pass
+    # 暖機在執行緒池中進行（載入模型、預熱資料庫與推薦流程），完成後伺服器才開始接受連線；
+    # 關鍵步驟失敗時 /ready 返回 503，負載平衡器不會把流量導向此工作進程
+    if settings.WARMUP_ENABLED:
+        await run_in_threadpool(run_warmup)
+    else:
+        for name in WARMUP_STEPS:
+            readiness.skip(name, "WARMUP_ENABLED=false")
+    # 推薦排序分數表定期在背景重算並整張替換（API-212）
+    ranking_scores.start()
+    # 回饋事件日誌的背景物化（API-204.7，FEEDBACK_EVENT_LOG_ENABLED 時）
+    feedback_materializer.start()
 
 # 確保應用程式關閉時清理資源
 @app.on_event("shutdown")
 async def shutdown_event():
     # 在這裡可以清理資料庫連接、AI 模型等
-    pass
\ No newline at end of file
+    ranking_scores.stop()
+    feedback_materializer.stop()
+    shutdown_rag_service()
+    close_llm_client()
\ No newline at end of file
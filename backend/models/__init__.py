@@ -11,6 +11,8 @@ from . import session
 from . import symptom_practice_mapping
 from . import practice_card_feedback
 from . import session_feedback
+from . import feedback_rollup
+from . import feedback_event
 
 __all__ = [
     "symptom",
@@ -18,5 +20,7 @@ __all__ = [
     "session",
     "symptom_practice_mapping",
     "practice_card_feedback",
-    "session_feedback"
+    "session_feedback",
+    "feedback_rollup",
+    "feedback_event"
 ]
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""
+回饋事件日誌模型 (API-204.7)
+
+啟用 FEEDBACK_EVENT_LOG_ENABLED 時，回饋寫入只追加到窄表 feedback_events（僅主鍵，沒有其他索引），
+由背景物化程序分批寫入 practice_card_feedback、session_feedback 與彙總表；
+物化完成的事件與寫入結果在同一交易中刪除，資料表中只留待處理事件
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from ..database.base import Base
+
+# 事件種類，對應 bulk_create_feedback 的兩個輸入清單
+EVENT_KINDS = ("session_feedback", "practice_card_feedback")
+
+
+class FeedbackEvent(Base):
+    __tablename__ = "feedback_events"
+
+    id = Column(Integer, primary_key=True, info={"note": "遞增序號，物化時依此排序"})
+    kind = Column(String(32), nullable=False,
+                  info={"note": "session_feedback | practice_card_feedback"})
+    payload = Column(Text, nullable=False, info={"note": "回饋內容（JSON 字串）"})
+    created_at = Column(DateTime, default=func.now(), info={"note": "追加時間，回饋未帶 created_at 時作為回饋時間"})
+
+    def __repr__(self):
+        return f"<FeedbackEvent(id={self.id}, kind={self.kind})>"
+
@@ -0,0 +1,272 @@
+"""
+回饋彙總模型 (API-207.7)
+
+按 (練習卡, 症狀, 日期) 與 (症狀, 日期) 預先彙總的回饋計數，分析端點只需讀取少量列
+
+寫入任何 PracticeCardFeedback / SessionFeedback（新增、修改評分或最愛、刪除）時，
+在同一次 flush、同一個交易內以增量更新對應的彙總列，因此彙總與原始資料永遠一致；
+既有資料由 20251029100004 遷移回填；關閉過 FEEDBACK_ROLLUP_ENABLED 後請以
+python -m backend.services.feedback_rollup rebuild 重新計算
+"""
+from typing import Any, Dict, Optional, Tuple
+from collections import Counter, defaultdict
+from datetime import date, datetime, timezone
+from sqlalchemy import Column, Integer, Date, event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from ..core.config import settings
+from ..database.base import Base
+
+# 練習卡沒有對應症狀（會話未選定症狀）時使用的症狀ID
+UNKNOWN_SYMPTOM_ID = 0
+
+SESSION_RATINGS = ("not_applicable", "partially_applicable", "applicable")
+SESSION_FEEDBACK_TYPES = ("immediate", "delayed")
+
+
+class PracticeCardFeedbackRollup(Base):
+    __tablename__ = "practice_card_feedback_rollup"
+
+    practice_id = Column(Integer, primary_key=True, info={"note": "練習卡ID"})
+    symptom_id = Column(Integer, primary_key=True, info={"note": "會話選定的症狀ID，未知為 0"})
+    day = Column(Date, primary_key=True, info={"note": "回饋建立日期"})
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0, info={"note": "回饋筆數（含未評分）"})
+    rated_count = Column(Integer, nullable=False, default=0, info={"note": "1-5 星的評分筆數"})
+    rating_sum = Column(Integer, nullable=False, default=0, info={"note": "評分總和"})
+    favorite_count = Column(Integer, nullable=False, default=0, info={"note": "最愛筆數"})
+
+    def __repr__(self):
+        return (f"<PracticeCardFeedbackRollup(practice_id={self.practice_id}, "
+                f"symptom_id={self.symptom_id}, day={self.day})>")
+
+
+class SessionFeedbackRollup(Base):
+    __tablename__ = "session_feedback_rollup"
+
+    symptom_id = Column(Integer, primary_key=True, info={"note": "會話選定的症狀ID，未知為 0"})
+    day = Column(Date, primary_key=True, info={"note": "回饋建立日期"})
+    not_applicable = Column(Integer, nullable=False, default=0)
+    partially_applicable = Column(Integer, nullable=False, default=0)
+    applicable = Column(Integer, nullable=False, default=0)
+    immediate = Column(Integer, nullable=False, default=0)
+    delayed = Column(Integer, nullable=False, default=0)
+    total_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SessionFeedbackRollup(symptom_id={self.symptom_id}, day={self.day})>"
+
+
+PRACTICE_COUNTERS = ("rating_1", "rating_2", "rating_3", "rating_4", "rating_5",
+                     "rating_count", "rated_count", "rating_sum", "favorite_count")
+SESSION_COUNTERS = SESSION_RATINGS + SESSION_FEEDBACK_TYPES + ("total_count",)
+
+
+def practice_contribution(rating: Optional[int], is_favorite: Optional[bool]) -> Counter:
+    """一筆練習卡回饋對彙總列的貢獻"""
+    contribution = Counter(rating_count=1, rating_sum=rating or 0)
+    if rating is not None and 1 <= rating <= 5:
+        contribution[f"rating_{rating}"] = 1
+        contribution["rated_count"] = 1
+    if is_favorite:
+        contribution["favorite_count"] = 1
+    return contribution
+
+
+def session_contribution(rating: Optional[str], feedback_type: Optional[str]) -> Counter:
+    """一筆會話回饋對彙總列的貢獻"""
+    contribution = Counter(total_count=1)
+    if rating in SESSION_RATINGS:
+        contribution[rating] = 1
+    if feedback_type in SESSION_FEEDBACK_TYPES:
+        contribution[feedback_type] = 1
+    return contribution
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _day(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return _utcnow().date()
+
+
+def _old_value(state, key: str):
+    """屬性在本次 flush 前的值"""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(state.object, key)
+
+
+def _symptom_id(session: OrmSession, session_id: Optional[int], cache: Dict[int, int]) -> int:
+    from .session import Session as SkiSession
+
+    if session_id is None:
+        return UNKNOWN_SYMPTOM_ID
+    if session_id not in cache:
+        with session.no_autoflush:
+            ski_session = session.get(SkiSession, session_id)
+        chosen = ski_session.chosen_symptom_id if ski_session else None
+        cache[session_id] = chosen or UNKNOWN_SYMPTOM_ID
+    return cache[session_id]
+
+
+def _upsert_statement(session: OrmSession, table, key_columns: Tuple[str, ...], counters):
+    """PostgreSQL / SQLite 的累加 UPSERT 語句；其他方言返回 None"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={name: table.c[name] + statement.excluded[name] for name in counters}
+    )
+
+
+def apply_deltas(session: OrmSession, model, deltas: Dict[Tuple, Counter],
+                 key_columns: Tuple[str, ...]):
+    """
+    把增量加到彙總列（不存在則建立）
+
+    PostgreSQL / SQLite 以單一 INSERT ... ON CONFLICT DO UPDATE 語句批次執行（executemany），
+    其餘方言逐列先更新、沒有更新到再新增
+    """
+    table = model.__table__
+    counters = [column.name for column in table.columns if column.name not in key_columns]
+    rows = []
+    for key, delta in deltas.items():
+        if not any(delta.values()):
+            continue
+        values = dict(zip(key_columns, key))
+        values.update({name: delta.get(name, 0) for name in counters})
+        rows.append(values)
+    if not rows:
+        return
+
+    statement = _upsert_statement(session, table, key_columns, counters)
+    if statement is not None:
+        session.execute(statement, rows)
+        return
+
+    for values in rows:
+        condition = [table.c[name] == values[name] for name in key_columns]
+        increments = {name: table.c[name] + values[name] for name in counters}
+        updated = session.execute(table.update().where(*condition).values(increments))
+        if updated.rowcount == 0:
+            session.execute(table.insert().values(**values))
+
+
+def apply_practice_delta(session: OrmSession, session_id: int, practice_id: int,
+                         created_at: Any, delta: Counter):
+    """
+    單筆練習卡回饋的彙總增量（供繞過 ORM 的單列寫入使用，例如最愛 UPSERT）
+
+    PostgreSQL / SQLite 的選定症狀以子查詢帶入同一個 UPSERT 語句，不需先讀取會話
+    """
+    from sqlalchemy import func, select
+    from .session import Session as SkiSession
+
+    key_columns = ("practice_id", "symptom_id", "day")
+    table = PracticeCardFeedbackRollup.__table__
+    counters = [column.name for column in table.columns if column.name not in key_columns]
+    statement = _upsert_statement(session, table, key_columns, counters)
+    if statement is None:
+        symptom_id = _symptom_id(session, session_id, {})
+        deltas = {(practice_id, symptom_id, _day(created_at)): delta}
+        apply_deltas(session, PracticeCardFeedbackRollup, deltas, key_columns)
+        return
+
+    symptom_id = func.coalesce(
+        select(SkiSession.chosen_symptom_id).where(SkiSession.id == session_id).scalar_subquery(),
+        UNKNOWN_SYMPTOM_ID
+    )
+    session.execute(statement.values(
+        practice_id=practice_id, symptom_id=symptom_id, day=_day(created_at),
+        **{name: delta.get(name, 0) for name in counters}
+    ))
+
+
+def collect_deltas(session: OrmSession) -> Tuple[Dict[Tuple, Counter], Dict[Tuple, Counter]]:
+    """從本次 flush 的新增、修改、刪除物件計算彙總增量"""
+    from .practice_card_feedback import PracticeCardFeedback
+    from .session_feedback import SessionFeedback
+
+    practice_deltas: Dict[Tuple, Counter] = defaultdict(Counter)
+    session_deltas: Dict[Tuple, Counter] = defaultdict(Counter)
+    symptom_cache: Dict[int, int] = {}
+
+    def practice_key(session_id, practice_id, created_at):
+        return (practice_id, _symptom_id(session, session_id, symptom_cache), _day(created_at))
+
+    def session_key(session_id, created_at):
+        return (_symptom_id(session, session_id, symptom_cache), _day(created_at))
+
+    for obj in session.new:
+        if isinstance(obj, (PracticeCardFeedback, SessionFeedback)) and obj.created_at is None:
+            # 明確寫入建立時間，彙總日期與原始資料一致
+            obj.created_at = _utcnow()
+        if isinstance(obj, PracticeCardFeedback):
+            practice_deltas[practice_key(obj.session_id, obj.practice_id, obj.created_at)].update(
+                practice_contribution(obj.rating, obj.is_favorite))
+        elif isinstance(obj, SessionFeedback):
+            session_deltas[session_key(obj.session_id, obj.created_at)].update(
+                session_contribution(obj.rating, obj.feedback_type))
+
+    for obj in session.dirty:
+        if not isinstance(obj, (PracticeCardFeedback, SessionFeedback)):
+            continue
+        if not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        if isinstance(obj, PracticeCardFeedback):
+            old_key = practice_key(_old_value(state, "session_id"),
+                                   _old_value(state, "practice_id"),
+                                   _old_value(state, "created_at"))
+            practice_deltas[old_key].subtract(
+                practice_contribution(_old_value(state, "rating"),
+                                      _old_value(state, "is_favorite")))
+            practice_deltas[practice_key(obj.session_id, obj.practice_id, obj.created_at)].update(
+                practice_contribution(obj.rating, obj.is_favorite))
+        else:
+            old_key = session_key(_old_value(state, "session_id"), _old_value(state, "created_at"))
+            session_deltas[old_key].subtract(
+                session_contribution(_old_value(state, "rating"),
+                                     _old_value(state, "feedback_type")))
+            session_deltas[session_key(obj.session_id, obj.created_at)].update(
+                session_contribution(obj.rating, obj.feedback_type))
+
+    for obj in session.deleted:
+        if isinstance(obj, PracticeCardFeedback):
+            practice_deltas[practice_key(obj.session_id, obj.practice_id, obj.created_at)].subtract(
+                practice_contribution(obj.rating, obj.is_favorite))
+        elif isinstance(obj, SessionFeedback):
+            session_deltas[session_key(obj.session_id, obj.created_at)].subtract(
+                session_contribution(obj.rating, obj.feedback_type))
+
+    return practice_deltas, session_deltas
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _maintain_feedback_rollups(session, flush_context, instances):
+    if not settings.FEEDBACK_ROLLUP_ENABLED:
+        return
+    practice_deltas, session_deltas = collect_deltas(session)
+    if practice_deltas:
+        apply_deltas(session, PracticeCardFeedbackRollup, practice_deltas,
+                     ("practice_id", "symptom_id", "day"))
+    if session_deltas:
+        apply_deltas(session, SessionFeedbackRollup, session_deltas, ("symptom_id", "day"))
@@ -1,12 +1,28 @@
 """
 練習卡回饋模型
 """
-from sqlalchemy import Column, Integer, ForeignKey, String, Text, Boolean, DateTime, func
+from typing import Optional
+from sqlalchemy import (
+    Column, Integer, ForeignKey, String, Text, Boolean, DateTime, Index, UniqueConstraint, func
+)
 from sqlalchemy.orm import relationship
-from ..database.base import Base
+from ..database.base import Base, utcnow
 
 class PracticeCardFeedback(Base):
     __tablename__ = "practice_card_feedback"
+    __table_args__ = (
+        # 回饋彙總的分組查詢只需掃描索引 (API-207.1)
+        Index("ix_practice_card_feedback_rating_favorite", "rating", "is_favorite"),
+        Index("ix_practice_card_feedback_practice_rating", "practice_id", "rating", "is_favorite"),
+        # 時間區間分析只掃描相關日期範圍 (API-207.8)
+        Index("ix_practice_card_feedback_created_at", "created_at"),
+        Index("ix_practice_card_feedback_practice_created_at", "practice_id", "created_at"),
+        # 增量匯出以最後修改時間為水位 (API-207.6)
+        Index("ix_practice_card_feedback_updated_at", "updated_at"),
+        # 每個會話對每張練習卡只有一筆回饋，最愛切換以 INSERT ... ON CONFLICT 一次完成 (API-206.4)
+        UniqueConstraint("session_id", "practice_id",
+                         name="uq_practice_card_feedback_session_practice"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, info={"note": "必須 > 0"})
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False, info={"note": "來自哪個會話，必須 > 0"})
@@ -15,10 +31,31 @@ class PracticeCardFeedback(Base):
     feedback_text = Column(Text, nullable=True, info={"note": "自由文字回饋（可選）"})
     is_favorite = Column(Boolean, default=False, info={"note": "是否加入最愛清單（預設 false），可獨立於星數設定"})
     created_at = Column(DateTime, default=func.now(), info={"note": "建立時間"})
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow,
+                        info={"note": "最後修改時間（新增、最愛切換與合併時更新），增量匯出的水位"})
 
     # 關係
     session = relationship("Session", back_populates="practice_card_feedback")
     practice_card = relationship("PracticeCard")
 
     def __repr__(self):
-        return f"<PracticeCardFeedback(id={self.id}, session_id={self.session_id}, practice_id={self.practice_id}, rating={self.rating})>"
\ No newline at end of file
+        return (f"<PracticeCardFeedback(id={self.id}, session_id={self.session_id}, "
+                f"practice_id={self.practice_id}, rating={self.rating})>")
+
+
+def merge_feedback(feedback: PracticeCardFeedback, rating: Optional[int] = None,
+                   feedback_text: Optional[str] = None,
+                   is_favorite: Optional[bool] = None) -> PracticeCardFeedback:
+    """
+    把同一（會話, 練習卡）的新回饋合併進既有回饋 (API-206.4)
+
+    只覆寫客戶端實際送出的欄位：最愛不會被取消（取消最愛走 DELETE 端點）、
+    僅加入最愛的 rating=0 不覆蓋既有星數、未帶文字時保留原文字
+    """
+    if rating is not None and (rating > 0 or not feedback.rating):
+        feedback.rating = rating
+    if feedback_text is not None:
+        feedback.feedback_text = feedback_text
+    if is_favorite:
+        feedback.is_favorite = True
+    return feedback
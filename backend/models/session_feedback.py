@@ -1,12 +1,19 @@
 """
 會話回饋模型
 """
-from sqlalchemy import Column, Integer, ForeignKey, String, Text, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, String, Text, DateTime, Index, func
 from sqlalchemy.orm import relationship
-from ..database.base import Base
+from ..database.base import Base, utcnow
 
 class SessionFeedback(Base):
     __tablename__ = "session_feedback"
+    __table_args__ = (
+        # 回饋彙總的分組查詢只需掃描索引 (API-207.1)
+        Index("ix_session_feedback_rating_type", "rating", "feedback_type"),
+        Index("ix_session_feedback_created_at", "created_at"),
+        # 增量匯出以最後修改時間為水位 (API-207.6)
+        Index("ix_session_feedback_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, info={"note": "必須 > 0"})
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False, info={"note": "對應的會話，必須 > 0"})
@@ -14,6 +21,8 @@ class SessionFeedback(Base):
     feedback_text = Column(Text, nullable=True, info={"note": "自由文字回饋（可選）"})
     feedback_type = Column(String(20), nullable=True, info={"note": "回饋類型，值域：immediate (即時) / delayed (延遲)"})
     created_at = Column(DateTime, default=func.now(), info={"note": "建立時間"})
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow,
+                        info={"note": "最後修改時間，增量匯出的水位"})
 
     # 關係
     session = relationship("Session", back_populates="session_feedback")
@@ -0,0 +1,208 @@
+"""
+練習卡品質評分 (API-211)
+
+一次讀出所有練習卡的星數直方圖（彙總表啟用時加總彙總列，否則在原始表分組計數），
+以 NumPy 陣列一次向量化算出：
+- 貝氏平滑平均：(C·m + Σ星數) / (C + n)，m 為全體平均、C 為先驗權重，評分少的卡片向全體平均收斂
+- 平均星數的信賴區間：mean ± z·s/√n（截在 1-5 星之間，少於 2 筆時為整個區間）
+- 最愛率的 Wilson 下界：最愛數少的卡片不會因 1/1 而排在前面
+
+rating=0（僅加入最愛）不計入任何星數統計，只計入最愛率的分母
+
+結果為不可變的 CardQualityTable，帶遞增的版本號；CardQualityScorer 在 TTL 內重用同一張表，
+過期時重新計算並整張替換，所有卡片的排名都來自同一次計算
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+import logging
+import threading
+import time
+import numpy as np
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..database.repositories import FeedbackRollupRepository, PracticeCardFeedbackRepository
+
+logger = logging.getLogger(__name__)
+
+STARS = np.arange(1, 6, dtype=np.float64)
+# 沒有任何評分時的先驗平均（中間值 3 星）
+NEUTRAL_RATING = 3.0
+
+
+def wilson_lower_bound(successes: np.ndarray, totals: np.ndarray, z: float) -> np.ndarray:
+    """比例的 Wilson 分數區間下界（totals 為 0 時為 0）"""
+    n = np.maximum(totals, 1)
+    p = successes / n
+    z2 = z * z
+    centre = p + z2 / (2 * n)
+    margin = z * np.sqrt(p * (1 - p) / n + z2 / (4 * n * n))
+    return np.where(totals > 0, (centre - margin) / (1 + z2 / n), 0.0)
+
+
+def score_histograms(histograms: np.ndarray, feedback_counts: np.ndarray,
+                     favorite_counts: np.ndarray, prior_weight: float, z: float) -> Dict[str, Any]:
+    """
+    向量化計算所有練習卡的品質指標
+
+    Args:
+        histograms: (卡片數, 5) 的 1-5 星筆數
+        feedback_counts: 每張卡的全部回饋筆數（含 rating=0）
+        favorite_counts: 每張卡的最愛筆數
+        prior_weight: 貝氏平滑的先驗筆數 C
+        z: 信賴區間與 Wilson 下界的 z 值
+
+    Returns:
+        Dict[str, Any]: 各指標陣列與全體平均 prior_mean
+    """
+    histograms = np.asarray(histograms, dtype=np.float64).reshape(-1, 5)
+    rated = histograms.sum(axis=1)
+    rating_sum = histograms @ STARS
+    square_sum = histograms @ (STARS * STARS)
+
+    prior_mean = float(rating_sum.sum() / rated.sum()) if rated.sum() > 0 else NEUTRAL_RATING
+    safe_rated = np.maximum(rated, 1)
+    mean = np.where(rated > 0, rating_sum / safe_rated, np.nan)
+    bayesian = (prior_weight * prior_mean + rating_sum) / (prior_weight + rated)
+
+    # 樣本標準差（n-1）；少於 2 筆無法估計，區間取整個 1-5 星
+    deviation_sum = square_sum - rating_sum * rating_sum / safe_rated
+    variance = np.where(rated > 1, deviation_sum / np.maximum(rated - 1, 1), 0.0)
+    margin = z * np.sqrt(np.maximum(variance, 0.0) / safe_rated)
+    ci_low = np.where(rated > 1, np.clip(mean - margin, 1.0, 5.0), 1.0)
+    ci_high = np.where(rated > 1, np.clip(mean + margin, 1.0, 5.0), 5.0)
+
+    feedback_counts = np.asarray(feedback_counts, dtype=np.float64)
+    favorite_counts = np.asarray(favorite_counts, dtype=np.float64)
+    favorite_rate = np.where(feedback_counts > 0,
+                             favorite_counts / np.maximum(feedback_counts, 1), 0.0)
+
+    return {
+        "prior_mean": prior_mean,
+        "rated_count": rated.astype(np.int64),
+        "mean_rating": mean,
+        "bayesian_rating": bayesian,
+        "rating_ci_low": ci_low,
+        "rating_ci_high": ci_high,
+        "favorite_rate": favorite_rate,
+        "favorite_lower_bound": wilson_lower_bound(favorite_counts, feedback_counts, z),
+        # 0-1 的品質分數：貝氏平均換算到 1-5 星區間內的位置
+        "quality": (bayesian - 1.0) / 4.0,
+    }
+
+
+class CardQualityTable:
+    """一次計算得到的全部練習卡品質分數（建立後不再修改）"""
+
+    def __init__(self, version: int, practice_ids: np.ndarray, histograms: np.ndarray,
+                 feedback_counts: np.ndarray, favorite_counts: np.ndarray,
+                 prior_weight: float, z: float):
+        self.version = version
+        self.computed_at = datetime.now(timezone.utc)
+        self.practice_ids = np.asarray(practice_ids, dtype=np.int64)
+        self.feedback_counts = np.asarray(feedback_counts, dtype=np.int64)
+        self.favorite_counts = np.asarray(favorite_counts, dtype=np.int64)
+        self.prior_weight = prior_weight
+        self.scores = score_histograms(histograms, feedback_counts, favorite_counts,
+                                       prior_weight, z)
+        self.prior_mean = self.scores["prior_mean"]
+        self._index = {int(practice_id): i for i, practice_id in enumerate(self.practice_ids)}
+
+    def __len__(self):
+        return len(self.practice_ids)
+
+    def __contains__(self, practice_id: int) -> bool:
+        return practice_id in self._index
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        mean = self.scores["mean_rating"][i]
+        return {
+            "practice_id": int(self.practice_ids[i]),
+            "rating_count": int(self.scores["rated_count"][i]),
+            "feedback_count": int(self.feedback_counts[i]),
+            "favorite_count": int(self.favorite_counts[i]),
+            "mean_rating": None if np.isnan(mean) else round(float(mean), 3),
+            "bayesian_rating": round(float(self.scores["bayesian_rating"][i]), 3),
+            "rating_ci": [round(float(self.scores["rating_ci_low"][i]), 3),
+                          round(float(self.scores["rating_ci_high"][i]), 3)],
+            "favorite_rate": round(float(self.scores["favorite_rate"][i]), 3),
+            "favorite_lower_bound": round(float(self.scores["favorite_lower_bound"][i]), 3),
+            "quality": round(float(self.scores["quality"][i]), 4),
+        }
+
+    def get(self, practice_id: int) -> Optional[Dict[str, Any]]:
+        """單張卡片的品質指標；沒有任何回饋時返回 None（呼叫端使用 prior_mean）"""
+        i = self._index.get(practice_id)
+        return None if i is None else self._row(i)
+
+    def quality_of(self, practice_id: int) -> float:
+        """品質分數；沒有回饋的卡片取全體平均對應的分數"""
+        i = self._index.get(practice_id)
+        if i is None:
+            return (self.prior_mean - 1.0) / 4.0
+        return float(self.scores["quality"][i])
+
+    def ranking(self, limit: Optional[int] = None, min_ratings: int = 0) -> List[Dict[str, Any]]:
+        """依貝氏平均（同分再依最愛率下界）排序的卡片"""
+        order = np.lexsort((-self.scores["favorite_lower_bound"], -self.scores["bayesian_rating"]))
+        if min_ratings:
+            order = order[self.scores["rated_count"][order] >= min_ratings]
+        if limit is not None:
+            order = order[:limit]
+        return [self._row(int(i)) for i in order]
+
+
+def load_quality_table(db: Session, version: int, prior_weight: Optional[float] = None,
+                       z: Optional[float] = None) -> CardQualityTable:
+    """一次查詢讀出所有卡片的直方圖並建立品質表"""
+    if settings.FEEDBACK_ROLLUP_ENABLED:
+        rows = FeedbackRollupRepository(db).get_rating_histograms()
+    else:
+        rows = PracticeCardFeedbackRepository(db).get_rating_histograms()
+
+    practice_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    histograms = np.array([row[1] for row in rows], dtype=np.float64).reshape(-1, 5)
+    feedback_counts = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+    favorite_counts = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+    return CardQualityTable(
+        version, practice_ids, histograms, feedback_counts, favorite_counts,
+        settings.CARD_QUALITY_PRIOR_WEIGHT if prior_weight is None else prior_weight,
+        settings.CARD_QUALITY_CONFIDENCE_Z if z is None else z
+    )
+
+
+class CardQualityScorer:
+    """帶版本號的品質表快取：TTL 內直接返回同一張表，過期時重算並整張替換"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = settings.CARD_QUALITY_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._table: Optional[CardQualityTable] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def table(self) -> Optional[CardQualityTable]:
+        """目前的品質表（尚未計算時為 None），不觸發查詢"""
+        return self._table
+
+    def get(self, db: Session) -> CardQualityTable:
+        table = self._table
+        if table is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return table
+        return self.refresh(db)
+
+    def refresh(self, db: Session) -> CardQualityTable:
+        with self._lock:
+            self._version += 1
+            started = time.perf_counter()
+            table = load_quality_table(db, self._version)
+            self._table, self._loaded_at = table, time.monotonic()
+        logger.info(f"練習卡品質表 v{table.version}: {len(table)} 張卡片，"
+                    f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        return table
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+
+card_quality = CardQualityScorer()
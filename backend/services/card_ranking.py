@@ -0,0 +1,174 @@
+"""
+推薦排序分數表 (API-212)
+
+rank_cards 除了等級 / 地形匹配外，加入兩項由回饋算出的分數：
+- 品質分數：練習卡品質表（API-211）的貝氏平滑平均換算為 0-1
+- 症狀成功率：在該症狀的會話中此卡得到 4-5 星的比例，向此卡整體的高分比例平滑
+  （此卡整體再向全體平滑），樣本少的組合不會因一兩筆評分大幅浮動
+
+分數表在暖機與背景執行緒中定期重算，建好後以單一參照整張替換；
+排序時只讀目前的表（字典查找），請求路徑上不查詢資料庫，排序成本維持 O(卡片數)。
+表尚未載入時兩項分數皆為 0，排序退回原本的等級 / 地形規則（降級策略）
+"""
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timezone
+import logging
+import threading
+import time
+import numpy as np
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..database.repositories import FeedbackRollupRepository, PracticeCardFeedbackRepository
+from .card_quality import card_quality
+
+logger = logging.getLogger(__name__)
+
+# 沒有任何評分時的高分比例先驗
+NEUTRAL_SUCCESS_RATE = 0.5
+
+
+class RankingScores:
+    """一次計算得到的排序分數（建立後不再修改）"""
+
+    def __init__(self, version: int, quality: Dict[int, float], default_quality: float,
+                 card_success: Dict[int, float], symptom_success: Dict[Tuple[int, int], float],
+                 default_success: float):
+        self.version = version
+        self.computed_at = datetime.now(timezone.utc)
+        self.quality = quality
+        self.default_quality = default_quality
+        self.card_success = card_success
+        self.symptom_success = symptom_success
+        self.default_success = default_success
+
+    def quality_of(self, practice_id: int) -> float:
+        return self.quality.get(practice_id, self.default_quality)
+
+    def success_of(self, symptom_id: Optional[int], practice_id: int) -> float:
+        """症狀專屬成功率；沒有該組合的評分時取此卡整體，再沒有則取全體"""
+        if symptom_id is not None:
+            rate = self.symptom_success.get((symptom_id, practice_id))
+            if rate is not None:
+                return rate
+        return self.card_success.get(practice_id, self.default_success)
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "version": self.version,
+            "computed_at": self.computed_at.isoformat(),
+            "cards": len(self.quality),
+            "symptom_pairs": len(self.symptom_success),
+        }
+
+
+def smooth_success(symptom_ids: np.ndarray, practice_ids: np.ndarray, successes: np.ndarray,
+                   rated: np.ndarray, prior_weight: float):
+    """
+    階層式平滑的高分比例（向量化）
+
+    全體比例 → 每張卡的比例（向全體平滑）→ 每個症狀 × 卡片的比例（向該卡平滑）
+
+    Returns:
+        (全體比例, {practice_id: 比例}, {(symptom_id, practice_id): 比例})
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    rated = np.asarray(rated, dtype=np.float64)
+    total_rated = rated.sum()
+    global_rate = float(successes.sum() / total_rated) if total_rated > 0 else NEUTRAL_SUCCESS_RATE
+
+    cards, inverse = np.unique(np.asarray(practice_ids, dtype=np.int64), return_inverse=True)
+    card_successes = np.bincount(inverse, weights=successes, minlength=len(cards))
+    card_rated = np.bincount(inverse, weights=rated, minlength=len(cards))
+    card_rate = (prior_weight * global_rate + card_successes) / (prior_weight + card_rated)
+    pair_rate = (prior_weight * card_rate[inverse] + successes) / (prior_weight + rated)
+
+    card_success = {int(practice_id): float(rate) for practice_id, rate in zip(cards, card_rate)}
+    symptom_success = {
+        (int(symptom_id), int(practice_id)): float(rate)
+        for symptom_id, practice_id, rate in zip(symptom_ids, practice_ids, pair_rate)
+    }
+    return global_rate, card_success, symptom_success
+
+
+def load_ranking_scores(db: Session, version: int) -> RankingScores:
+    """重算品質表並讀出症狀成功率（兩次分組查詢），建立新的分數表"""
+    table = card_quality.refresh(db)
+    if settings.FEEDBACK_ROLLUP_ENABLED:
+        rows = FeedbackRollupRepository(db).get_symptom_success_counts()
+    else:
+        rows = PracticeCardFeedbackRepository(db).get_symptom_success_counts()
+
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    global_rate, card_success, symptom_success = smooth_success(
+        columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3],
+        settings.CARD_QUALITY_PRIOR_WEIGHT
+    )
+    quality = {int(practice_id): float(score)
+               for practice_id, score in zip(table.practice_ids, table.scores["quality"])}
+    default_quality = (table.prior_mean - 1.0) / 4.0
+    return RankingScores(version, quality, default_quality, card_success, symptom_success,
+                         global_rate)
+
+
+class RankingScoreStore:
+    """目前的排序分數表；重算在鎖內進行，完成後整張替換參照，讀取端不需加鎖"""
+
+    def __init__(self):
+        self._scores: Optional[RankingScores] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def current(self) -> Optional[RankingScores]:
+        return self._scores
+
+    def refresh(self, db: Session) -> RankingScores:
+        with self._lock:
+            self._version += 1
+            started = time.perf_counter()
+            scores = load_ranking_scores(db, self._version)
+            self._scores = scores
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"排序分數表 v{scores.version}: {len(scores.quality)} 張卡片、"
+                    f"{len(scores.symptom_success)} 組症狀，{elapsed_ms:.1f} ms")
+        return scores
+
+    def refresh_with_new_session(self) -> Optional[RankingScores]:
+        """背景執行緒使用：自行開關資料庫會話，失敗時保留舊表（降級策略）"""
+        from ..database.base import SessionLocal
+        db = SessionLocal()
+        try:
+            return self.refresh(db)
+        except Exception as e:
+            logger.error(f"重算排序分數表時出錯: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.refresh_with_new_session()
+
+    def start(self, interval: Optional[float] = None):
+        """啟動定期重算（RANKING_REFRESH_SECONDS <= 0 時不啟動）"""
+        interval = settings.RANKING_REFRESH_SECONDS if interval is None else interval
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name="turnfix-ranking-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def clear(self):
+        self._scores = None
+
+
+ranking_scores = RankingScoreStore()
@@ -0,0 +1,189 @@
+"""
+上下文打包 (RAG-254.4)
+
+在 token 預算內組裝提示詞上下文，取代按字元截斷：
+- 依區段優先順序（使用者輸入、Slot、知識）依序放入，區段與片段都不會被切開
+- 知識片段先以嵌入相似度去除近似重複，再依「分數 / token 數」貪婪填入
+- 回報預算使用量與被捨棄的片段
+"""
+from typing import Any, Dict, List, Optional
+import re
+import numpy as np
+from ..core.config import settings
+
+# 區段預設優先順序（數字越小越先放入）
+DEFAULT_SECTION_PRIORITIES = {
+    "user_input": 0,
+    "slots": 1,
+    "knowledge": 2
+}
+
+# CJK 字元各算 1 個 token；拉丁字母與數字約 4 個字元 1 個 token；其他符號各算 1 個
+_CJK_PATTERN = re.compile(r"[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef\u3000-\u303f]")
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+_SYMBOL_PATTERN = re.compile(r"[^\sA-Za-z0-9\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef\u3000-\u303f]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 數
+
+    不依賴特定 tokenizer，對中文為主的多語內容誤差在一成左右，足以做預算控制
+    """
+    if not text:
+        return 0
+    words = sum(-(-len(word) // 4) for word in _WORD_PATTERN.findall(text))
+    return len(_CJK_PATTERN.findall(text)) + words + len(_SYMBOL_PATTERN.findall(text))
+
+
+def fragment_text(fragment: Dict[str, Any]) -> str:
+    """取出片段文本（相容 similarity_search 的 text 與 search_knowledge 的 content）"""
+    return fragment.get("text") or fragment.get("content") or ""
+
+
+def fragment_score(fragment: Dict[str, Any], rank: int) -> float:
+    """片段分數：優先使用 score / similarity，其次 1 - distance，都沒有時依排名遞減"""
+    if fragment.get("score") is not None:
+        return float(fragment["score"])
+    if fragment.get("similarity") is not None:
+        return float(fragment["similarity"])
+    if fragment.get("distance") is not None:
+        return 1.0 - float(fragment["distance"])
+    return 1.0 / (rank + 1)
+
+
+def _drop_near_duplicates(candidates: List[Dict[str, Any]],
+                          threshold: float) -> List[Dict[str, Any]]:
+    """依分數由高到低保留片段，與已保留片段的餘弦相似度達門檻者視為重複"""
+    kept, kept_vectors = [], []
+    for candidate in sorted(candidates, key=lambda c: -c["score"]):
+        embedding = candidate["fragment"].get("embedding")
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm > 0 else vector
+            if kept_vectors and float(np.max(np.stack(kept_vectors) @ vector)) >= threshold:
+                candidate["dropped"] = "duplicate"
+                continue
+            kept_vectors.append(vector)
+        kept.append(candidate)
+    return kept
+
+
+def pack_context(
+    fragments: List[Dict[str, Any]],
+    user_input: str,
+    slot_info: Optional[Dict[str, Any]] = None,
+    token_budget: Optional[int] = None,
+    section_priorities: Optional[Dict[str, int]] = None,
+    dedup_threshold: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    在 token 預算內打包上下文
+
+    Args:
+        fragments: 依相關度排序的知識片段（可含 score/similarity/distance 與 embedding）
+        user_input: 使用者輸入
+        slot_info: Slot 資訊
+        token_budget: token 預算（預設 settings.CONTEXT_TOKEN_BUDGET）
+        section_priorities: 區段優先順序，鍵為 user_input / slots / knowledge
+        dedup_threshold: 近似重複的餘弦相似度門檻（預設 settings.CONTEXT_DEDUP_THRESHOLD）
+
+    Returns:
+        Dict[str, Any]: context（組裝後的上下文）、tokens_used、token_budget、
+                        included_ids、dropped_duplicates、dropped_over_budget
+    """
+    token_budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    if dedup_threshold is None:
+        dedup_threshold = settings.CONTEXT_DEDUP_THRESHOLD
+    priorities = dict(DEFAULT_SECTION_PRIORITIES, **(section_priorities or {}))
+
+    remaining = token_budget
+    sections: Dict[str, str] = {}
+    included_ids: List[str] = []
+    dropped_duplicates: List[str] = []
+    dropped_over_budget: List[str] = []
+    # 區段之間以空行分隔
+    separator_tokens = estimate_tokens("\n\n")
+
+    for section in sorted(priorities, key=priorities.get):
+        if section == "user_input" and user_input:
+            text = f"使用者輸入: {user_input}"
+            cost = estimate_tokens(text) + separator_tokens
+            if cost <= remaining:
+                sections[section] = text
+                remaining -= cost
+
+        elif section == "slots" and slot_info:
+            # Slot 逐項放入，放不下的項目略過
+            header = "Slot資訊: "
+            parts = []
+            cost = estimate_tokens(header) + separator_tokens
+            for key, value in slot_info.items():
+                if not value:
+                    continue
+                part = f"{key}: {value}"
+                part_cost = estimate_tokens(part) + 1
+                if cost + part_cost <= remaining:
+                    parts.append(part)
+                    cost += part_cost
+            if parts:
+                sections[section] = header + ", ".join(parts)
+                remaining -= cost
+
+        elif section == "knowledge" and fragments:
+            header = "相關知識:"
+            header_cost = estimate_tokens(header) + separator_tokens
+            if header_cost >= remaining:
+                dropped_over_budget.extend(str(f.get("id", i)) for i, f in enumerate(fragments))
+                continue
+
+            candidates = []
+            for rank, fragment in enumerate(fragments):
+                text = fragment_text(fragment).strip()
+                if not text:
+                    continue
+                candidates.append({
+                    "rank": rank,
+                    "id": str(fragment.get("id", rank)),
+                    "fragment": fragment,
+                    "text": text,
+                    # 「知識片段 N: 」前綴與換行也計入成本
+                    "tokens": estimate_tokens(text) + 6,
+                    "score": fragment_score(fragment, rank)
+                })
+
+            kept = _drop_near_duplicates(candidates, dedup_threshold)
+            dropped_duplicates.extend(c["id"] for c in candidates
+                                      if c.get("dropped") == "duplicate")
+
+            # 依分數密度貪婪填入；放不下的片段跳過，繼續嘗試較短的片段
+            budget = remaining - header_cost
+            chosen = []
+            for candidate in sorted(kept, key=lambda c: (-c["score"] / c["tokens"], c["rank"])):
+                if candidate["tokens"] <= budget:
+                    chosen.append(candidate)
+                    budget -= candidate["tokens"]
+                else:
+                    dropped_over_budget.append(candidate["id"])
+
+            if chosen:
+                # 輸出時恢復原始排名順序
+                chosen.sort(key=lambda c: c["rank"])
+                lines = [f"知識片段 {i + 1}: {c['text']}" for i, c in enumerate(chosen)]
+                sections[section] = header + "\n" + "\n".join(lines)
+                included_ids.extend(c["id"] for c in chosen)
+                remaining = budget
+
+    # 輸出順序固定為使用者輸入、Slot、知識，優先順序只影響預算分配
+    ordered = [sections[name] for name in DEFAULT_SECTION_PRIORITIES if name in sections]
+    context = "\n\n".join(ordered)
+
+    return {
+        "context": context,
+        "tokens_used": estimate_tokens(context),
+        "token_budget": token_budget,
+        "included_ids": included_ids,
+        "dropped_duplicates": dropped_duplicates,
+        "dropped_over_budget": dropped_over_budget
+    }
@@ -0,0 +1,112 @@
+"""
+多進程向量化 (TOOL-105.8)
+
+離線導入時將文本切片分給 N 個工作進程，每個進程只載入一次模型，
+結果依原始順序合併；每個進程的 torch 執行緒數設為 CPU 核心數 / N，避免超額訂閱
+
+只用於 CLI 等離線導入，API 服務不使用
+"""
+from typing import Any, Callable, List, Optional
+import os
+import logging
+import multiprocessing
+import numpy as np
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 每個工作進程平均分到的切片數，切得更細讓較快的進程多做一些
+CHUNKS_PER_WORKER = 4
+
+# 工作進程內的模型（每個進程載入一次）
+_worker_model = None
+
+
+def load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _init_worker(model_loader: Callable[[str], Any], model_name: str, threads: int):
+    """工作進程初始化：先限制執行緒數再載入模型"""
+    global _worker_model
+    # 必須在導入 torch 之前設定，否則 OpenMP/MKL 已按全部核心建立執行緒池
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = model_loader(model_name)
+
+
+def _encode_chunk(args):
+    texts, batch_size = args
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class EmbeddingPool:
+    """
+    多進程嵌入模型
+
+    提供與 SentenceTransformer.encode 相同的介面，可直接作為 embedding_model 傳入導入流程；
+    進程池在第一次 encode 時才啟動，嵌入儲存全部命中時不會載入任何模型
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        model_name: Optional[str] = None,
+        threads_per_worker: Optional[int] = None,
+        model_loader: Callable[[str], Any] = load_sentence_transformer
+    ):
+        if workers < 1:
+            raise ValueError("workers 必須大於等於 1")
+        self.workers = workers
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.model_loader = model_loader
+        self._pool = None
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            # spawn：避免 fork 繼承父進程已初始化的 torch 執行緒狀態
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_loader, self.model_name, self.threads_per_worker)
+            )
+            logger.info(f"啟動 {self.workers} 個向量化進程，每個進程 {self.threads_per_worker} 個執行緒")
+        return self._pool
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        向量化文本（依輸入順序返回）
+
+        Args:
+            texts: 文本列表
+            batch_size: 各進程內模型的批次大小
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        chunk_size = max(batch_size, -(-len(texts) // (self.workers * CHUNKS_PER_WORKER)))
+        chunks = [(texts[start:start + chunk_size], batch_size)
+                  for start in range(0, len(texts), chunk_size)]
+        # imap 保持切片順序
+        return np.concatenate(list(self._ensure_pool().imap(_encode_chunk, chunks)))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,311 @@
+"""
+嵌入向量持久化儲存 (RAG-252.6)
+
+以 (嵌入模型, content_hash) 為鍵保存已計算的嵌入向量：
+- vectors.f32：附加寫入的 float32 原始資料，讀取時以 memmap 開啟
+- index.sqlite：content_hash -> 列號，以及已提交的列數（meta.rows）
+
+所有導入與重建路徑在呼叫模型前先查詢此儲存，
+調整 HNSW 參數或重建集合時不需重新向量化
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Any
+import os
+import re
+import sqlite3
+import logging
+import threading
+import numpy as np
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """
+    嵌入向量儲存
+
+    寫入順序為「先附加向量並 fsync，再於同一交易提交索引與列數」，
+    中途中斷只會在檔尾留下未提交的位元組，下次開啟或寫入時截斷；
+    連線可跨執行緒共用，所有讀寫以鎖串行化
+    """
+
+    def __init__(self, model_name: Optional[str] = None, path: Optional[str] = None):
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        root = path or settings.EMBEDDING_STORE_PATH
+        # 每個模型一個子目錄，模型名稱中的路徑字元換成底線
+        self.directory = os.path.join(root, re.sub(r"[^\w.-]+", "_", self.model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"),
+                                     check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(content_hash TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        self.dim: Optional[int] = self._meta_int("dim")
+        self._mmap: Optional[np.memmap] = None
+        self._recover()
+
+    def _meta_int(self, key: str) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else None
+
+    def _recover(self):
+        """開啟時把向量檔截斷到已提交的列數，丟棄上次中斷留下的未提交位元組"""
+        if self.dim is None:
+            return
+        rows = self._meta_int("rows")
+        if rows is None:
+            # 舊版儲存未記錄列數，以檔案大小為準
+            rows = self._file_rows()
+            with self._conn:
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('rows', ?)", (str(rows),))
+        expected = rows * 4 * self.dim
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if size > expected:
+            logger.warning(f"嵌入向量檔有 {size - expected} 位元組未提交，截斷至 {rows} 列")
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(expected)
+        elif size < expected:
+            logger.error(f"嵌入向量檔只有 {size} 位元組，少於已提交的 {rows} 列")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _row_count(self) -> int:
+        """已提交的列數（meta.rows），不含檔尾未提交的位元組"""
+        return self._meta_int("rows") or 0
+
+    def _file_rows(self) -> int:
+        """向量檔實際容納的列數（含未提交的孤兒列）"""
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def _vectors(self) -> Optional[np.memmap]:
+        """以 memmap 開啟向量檔，檔案成長後重新映射"""
+        rows = self._row_count()
+        if rows == 0:
+            return None
+        if self._mmap is None or self._mmap.shape[0] != rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                   shape=(rows, self.dim))
+        return self._mmap
+
+    def _positions(self, hashes: Iterable[str]) -> Dict[str, int]:
+        """只查索引：已儲存的 content_hash -> 向量檔列號（不讀取向量）"""
+        positions = {}
+        unique = list(dict.fromkeys(hashes))
+        # SQLite 參數數量有上限，分段查詢
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for content_hash, row in self._conn.execute(
+                    "SELECT content_hash, row FROM embeddings "
+                    f"WHERE content_hash IN ({placeholders})", chunk
+                ):
+                    positions[content_hash] = row
+        return positions
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        批量查詢嵌入向量
+
+        Returns:
+            Dict[str, np.ndarray]: 命中的 content_hash -> 向量
+        """
+        with self._lock:
+            positions = self._positions(hashes)
+            vectors = self._vectors()
+            if not positions or vectors is None:
+                return {}
+            return {content_hash: np.array(vectors[row])
+                    for content_hash, row in positions.items()}
+
+    def put_many(self, hashes: List[str], embeddings: Any):
+        """批量寫入嵌入向量（已存在的 content_hash 略過）"""
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[np.newaxis, :]
+        if len(hashes) != matrix.shape[0]:
+            raise ValueError("hashes 與 embeddings 數量不一致")
+        if not hashes:
+            return
+
+        with self._lock:
+            dim = self.dim or matrix.shape[1]
+            if matrix.shape[1] != dim:
+                raise ValueError(f"向量維度 {matrix.shape[1]} 與儲存的維度 {dim} 不一致")
+
+            # 已儲存者與本批中重複出現者都只保留第一次
+            seen = set(self._positions(hashes))
+            keep = []
+            for i, content_hash in enumerate(hashes):
+                if content_hash not in seen:
+                    seen.add(content_hash)
+                    keep.append(i)
+            if not keep:
+                return
+
+            first_row = self._row_count()
+            with open(self.vectors_path, "ab") as f:
+                # 先截掉先前失敗寫入留下的位元組，確保新列緊接在已提交的列之後
+                f.truncate(first_row * 4 * dim)
+                f.write(matrix[keep].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # 索引、列數與維度在同一交易提交；提交失敗時檔尾的新列視為未提交
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (content_hash, row) VALUES (?, ?)",
+                    [(hashes[i], first_row + offset) for offset, i in enumerate(keep)]
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("dim", str(dim)), ("rows", str(first_row + len(keep)))]
+                )
+            self.dim = dim
+
+    def compact(self, live_hashes: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        壓縮儲存 (RAG-252.6)
+
+        重寫向量檔，只保留索引引用的列；提供 live_hashes 時再移除不在其中的項目
+
+        Returns:
+            Dict[str, int]: 壓縮前後的列數
+        """
+        with self._lock:
+            return self._compact(live_hashes)
+
+    def _compact(self, live_hashes: Optional[Iterable[str]]) -> Dict[str, int]:
+        rows_before = self._file_rows()
+        entries = self._conn.execute(
+            "SELECT content_hash, row FROM embeddings ORDER BY row"
+        ).fetchall()
+        if live_hashes is not None:
+            live = set(live_hashes)
+            entries = [(content_hash, row) for content_hash, row in entries if content_hash in live]
+
+        vectors = self._vectors()
+        tmp_path = f"{self.vectors_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            # 分段複製，記憶體用量與儲存大小無關
+            for start in range(0, len(entries), 4096):
+                rows = [row for _, row in entries[start:start + 4096]]
+                f.write(np.ascontiguousarray(vectors[rows]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._mmap = None
+        with self._conn:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.executemany(
+                "INSERT INTO embeddings (content_hash, row) VALUES (?, ?)",
+                [(content_hash, new_row) for new_row, (content_hash, _) in enumerate(entries)]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rows', ?)",
+                               (str(len(entries)),))
+            os.replace(tmp_path, self.vectors_path)
+        self._conn.execute("VACUUM")
+
+        logger.info(f"嵌入儲存壓縮完成: {rows_before} -> {len(entries)} 列")
+        return {"rows_before": rows_before, "rows_after": len(entries)}
+
+    def close(self):
+        with self._lock:
+            self._mmap = None
+            self._conn.close()
+
+
+class CachedEncoder:
+    """
+    帶快取的向量化器
+
+    先查嵌入儲存，只對未命中的文本呼叫模型；
+    模型以 model_loader 延遲載入，全部命中時完全不載入模型
+    """
+
+    def __init__(self, store: EmbeddingStore, model=None,
+                 model_loader: Optional[Callable[[], Any]] = None):
+        self.store = store
+        self._model = model
+        self._model_loader = model_loader
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._model_loader()
+        return self._model
+
+    def encode(self, texts: List[str], hashes: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        取得與 texts 對齊的嵌入向量矩陣
+
+        Args:
+            texts: 文本列表
+            hashes: 與 texts 對齊的 content_hash
+            batch_size: 模型向量化批次大小
+        """
+        cached = self.store.get_many(hashes)
+        missing = [i for i, content_hash in enumerate(hashes) if content_hash not in cached]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            fresh = self.model.encode([texts[i] for i in missing], batch_size=batch_size)
+            fresh = np.asarray(fresh, dtype=np.float32)
+            self.store.put_many([hashes[i] for i in missing], fresh)
+            for offset, i in enumerate(missing):
+                cached[hashes[i]] = fresh[offset]
+
+        if not texts:
+            return np.empty((0, self.store.dim or 0), dtype=np.float32)
+        return np.stack([cached[content_hash] for content_hash in hashes])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='嵌入向量儲存管理 (RAG-252.6)')
+    parser.add_argument('command', choices=['stats', 'compact'], help='stats: 顯示統計；compact: 壓縮儲存')
+    parser.add_argument('--path', help='儲存目錄（預設 EMBEDDING_STORE_PATH）')
+    parser.add_argument('--model', help='嵌入模型名稱（預設 EMBEDDING_MODEL）')
+    parser.add_argument('--prune', action='store_true',
+                        help='壓縮時一併移除知識片段集合中已不存在的內容')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = EmbeddingStore(model_name=args.model, path=args.path)
+    if args.command == 'stats':
+        print(f"模型: {store.model_name}")
+        print(f"索引項目: {len(store)}，向量檔列數: {store._row_count()}，維度: {store.dim}")
+        return
+
+    live_hashes = None
+    if args.prune:
+        from .knowledge_import_service import (
+            get_knowledge_collection,
+            iter_collection_content_hashes
+        )
+        live_hashes = set(iter_collection_content_hashes(get_knowledge_collection()))
+
+    result = store.compact(live_hashes)
+    print(f"壓縮完成: {result['rows_before']} -> {result['rows_after']} 列")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+回饋事件日誌與背景物化 (API-204.7)
+
+啟用 FEEDBACK_EVENT_LOG_ENABLED 時，回饋端點只把請求內容追加到 feedback_events
+（一個 INSERT、沒有次要索引與彙總維護），寫入延遲與主表的索引數量無關；
+背景物化程序以 DELETE ... RETURNING 領取一批事件（刪除與領取是同一個語句），
+以 bulk_create_feedback 寫入回饋主表與彙總表後一併提交，不依賴ID順序等於提交順序
+
+限制：
+- 「每個事件只物化一次」依賴領取與寫入在同一資料庫交易中提交；交易回滾時事件恢復待處理
+- SQLite 沒有 SKIP LOCKED，多個進程（uvicorn --workers、管理端 materialize=true）同時物化時
+  由資料庫寫入鎖序列化，後到者可能以 database is locked 失敗，事件留待下次重試
+- PostgreSQL 多個物化程序並發時各自領取不同批次，同一（會話, 練習卡）分屬兩批的事件
+  不保證依事件順序套用（星數與文字以較晚提交者為準；最愛只增不減，不受影響）
+
+驗證延後到物化時進行，未通過驗證的事件記錄警告後略過（同樣刪除）；
+最愛切換（API-206.4）需要立即返回回饋ID，維持同步 UPSERT
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import json
+import logging
+import threading
+import time
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..database.repositories import FeedbackEventRepository
+from ..models.feedback_event import EVENT_KINDS
+from .feedback_service import bulk_create_feedback
+
+logger = logging.getLogger(__name__)
+
+
+def append_feedback_events(db: Session, kind: str,
+                           payloads: List[Dict[str, Any]]) -> List[Optional[int]]:
+    """追加同一種類的回饋事件，返回事件ID"""
+    if kind not in EVENT_KINDS:
+        raise ValueError(f"未知的回饋事件種類: {kind}")
+    return FeedbackEventRepository(db).append([(kind, payload) for payload in payloads])
+
+
+def _event_item(event) -> Dict[str, Any]:
+    """事件內容轉回 bulk_create_feedback 的輸入項目，未帶回饋時間時以追加時間為準"""
+    item = json.loads(event.payload)
+    created_at = item.get("created_at")
+    item["created_at"] = datetime.fromisoformat(created_at) if created_at else event.created_at
+    return item
+
+
+def _merge_items(previous: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    合併同一（會話, 練習卡）的兩個事件，語意同 merge_feedback：
+
+    最愛只增不減、rating=0 不覆蓋星數、未帶文字時沿用前一個；回饋時間取較早的事件
+    """
+    merged = dict(previous)
+    if item["rating"] > 0 or not previous["rating"]:
+        merged["rating"] = item["rating"]
+    if item.get("feedback_text") is not None:
+        merged["feedback_text"] = item["feedback_text"]
+    if item.get("is_favorite"):
+        merged["is_favorite"] = True
+    return merged
+
+
+def materialize_feedback_events(db: Session, batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    物化一批事件（最多 batch_size 筆，預設 FEEDBACK_EVENT_BATCH_SIZE）
+
+    同一批中對同一（會話, 練習卡）的多個事件先以 _merge_items 合併，與依序逐筆寫入的結果相同；
+    領取（刪除）事件與寫入結果在同一交易中提交，失敗時回滾，事件留待下次重試
+
+    Returns:
+        Dict[str, Any]: 本批事件數與寫入筆數
+    """
+    repo = FeedbackEventRepository(db)
+    events = repo.claim_pending(batch_size or settings.FEEDBACK_EVENT_BATCH_SIZE)
+    if not events:
+        db.commit()
+        return {"events": 0}
+
+    session_items, session_event_ids = [], []
+    practice_items: Dict[tuple, Dict[str, Any]] = {}
+    practice_event_ids: Dict[tuple, int] = {}
+    for event in events:
+        item = _event_item(event)
+        if event.kind == "session_feedback":
+            session_items.append(item)
+            session_event_ids.append(event.id)
+        elif event.kind == "practice_card_feedback":
+            pair = (item["session_id"], item["practice_id"])
+            previous = practice_items.get(pair)
+            practice_items[pair] = item if previous is None else _merge_items(previous, item)
+            practice_event_ids[pair] = event.id
+        else:
+            logger.warning(f"略過未知種類的回饋事件 {event.id}: {event.kind}")
+
+    try:
+        result = bulk_create_feedback(db, session_items, list(practice_items.values()),
+                                      commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for event_id, row in zip(session_event_ids + list(practice_event_ids.values()),
+                             result["session_feedback"] + result["practice_card_feedback"]):
+        if row["status"] == "error":
+            logger.warning(f"回饋事件 {event_id} 未通過驗證，已略過: {row['message']}")
+    return {
+        "events": len(events),
+        "created": result["created"],
+        "updated": result["updated"],
+        "failed": result["failed"]
+    }
+
+
+def get_event_log_status(db: Session) -> Dict[str, Any]:
+    """事件日誌狀態：尚未物化的事件數（物化延遲）"""
+    return {
+        "enabled": settings.FEEDBACK_EVENT_LOG_ENABLED,
+        "pending": FeedbackEventRepository(db).count_pending()
+    }
+
+
+class FeedbackMaterializer:
+    """背景物化程序：每隔 FEEDBACK_EVENT_MATERIALIZE_SECONDS 把待處理事件全部物化"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def drain(self, db: Session) -> int:
+        """連續物化直到沒有待處理事件，返回物化的事件數"""
+        total = 0
+        with self._lock:
+            started = time.perf_counter()
+            while True:
+                batch = materialize_feedback_events(db)
+                total += batch["events"]
+                if batch["events"] < settings.FEEDBACK_EVENT_BATCH_SIZE:
+                    break
+        if total:
+            logger.info(f"物化回饋事件 {total} 筆，{(time.perf_counter() - started) * 1000:.1f} ms")
+        return total
+
+    def drain_with_new_session(self) -> int:
+        """背景執行緒使用：自行開關資料庫會話，失敗時保留事件待下次重試（降級策略）"""
+        from ..database.base import SessionLocal
+        db = SessionLocal()
+        try:
+            return self.drain(db)
+        except Exception as e:
+            logger.error(f"物化回饋事件時出錯: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.drain_with_new_session()
+
+    def start(self, interval: Optional[float] = None):
+        """啟動背景物化（未啟用事件日誌或間隔 <= 0 時不啟動）"""
+        interval = settings.FEEDBACK_EVENT_MATERIALIZE_SECONDS if interval is None else interval
+        if (not settings.FEEDBACK_EVENT_LOG_ENABLED or interval <= 0
+                or (self._thread is not None and self._thread.is_alive())):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name="turnfix-feedback-materializer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止背景物化，並把剩餘事件物化完畢"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.drain_with_new_session()
+
+
+feedback_materializer = FeedbackMaterializer()
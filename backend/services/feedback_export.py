@@ -0,0 +1,250 @@
+"""
+回饋資料列式匯出 (API-207.6)
+
+把 sessions、session_feedback、practice_card_feedback 匯出為 Parquet 或 Arrow IPC 檔案供離線分析：
+- 以伺服器端游標（stream_results）逐批讀取，每批寫成一個 row group / record batch，
+  記憶體用量與批次大小成正比，與資料表大小無關
+- 回饋表的增量匯出以 updated_at（最後修改時間，有索引）為水位：回饋列會被原地更新
+  （最愛切換、合併），且並發寫入的主鍵不依提交順序遞增，以主鍵為水位會永久漏掉這些列。
+  每次只匯出 since < updated_at <= 現在 - EXPORT_WATERMARK_LAG_SECONDS 的列，並以該上界為新水位，
+  在落後區間內提交的寫入留到下次匯出；超過落後秒數才提交的交易仍可能漏掉
+- sessions 沒有修改時間，只支援完整快照（增量匯出時仍整表匯出）
+- 同一列更新後會在之後的增量檔案中再次出現，下游以 id 去重並保留 updated_at 最新者
+- 目錄中的 manifest.json 記錄各表最後匯出的水位
+
+需要 pyarrow（未安裝時匯出會提示安裝）
+
+用法：
+    python -m backend.services.feedback_export --output ./exports
+    python -m backend.services.feedback_export --output ./exports --incremental
+    python -m backend.services.feedback_export --output ./exports --format arrow \
+        --tables practice_card_feedback
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import os
+from sqlalchemy import JSON, Boolean, Date, DateTime, Float, Integer, Table, select
+from sqlalchemy.engine import Engine
+from ..core.config import settings
+from ..database.base import utcnow
+from ..models.session import Session as SkiSession
+from ..models.session_feedback import SessionFeedback
+from ..models.practice_card_feedback import PracticeCardFeedback
+
+logger = logging.getLogger(__name__)
+
+EXPORT_TABLES: Dict[str, Table] = {
+    "sessions": SkiSession.__table__,
+    "session_feedback": SessionFeedback.__table__,
+    "practice_card_feedback": PracticeCardFeedback.__table__,
+}
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+MANIFEST_FILE = "manifest.json"
+DEFAULT_BATCH_SIZE = 50000
+# 支援增量匯出的資料表與其水位欄位；不在此列者只支援完整快照
+WATERMARK_COLUMNS = {"session_feedback": "updated_at", "practice_card_feedback": "updated_at"}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError as e:
+        raise RuntimeError("列式匯出需要 pyarrow，請執行 pip install pyarrow") from e
+
+
+def arrow_schema(table: Table):
+    """依欄位型別建立 Arrow schema（JSON 欄位序列化為字串）"""
+    pa = _require_pyarrow()
+    fields = []
+    for column in table.columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        nullable = column.nullable or not column.primary_key
+        fields.append(pa.field(column.name, arrow_type, nullable=nullable))
+    return pa.schema(fields)
+
+
+def supports_incremental(table_name: str) -> bool:
+    return table_name in WATERMARK_COLUMNS
+
+
+def iter_column_batches(engine: Engine, table: Table, since: Optional[datetime] = None,
+                        until: Optional[datetime] = None,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, List[Any]]]:
+    """
+    以伺服器端游標逐批讀取，每批轉為 {欄位: 值列表} 的列式結構
+
+    有水位欄位的資料表依 (水位欄位, id) 排序，其餘依主鍵排序
+
+    Args:
+        since: 只讀取水位欄位大於此值的列；None 表示不限
+        until: 只讀取水位欄位小於等於此值的列；None 表示不限
+    """
+    json_columns = {column.name for column in table.columns if isinstance(column.type, JSON)}
+    watermark_name = WATERMARK_COLUMNS.get(table.name)
+    if watermark_name is None:
+        if since is not None or until is not None:
+            raise ValueError(f"{table.name} 沒有修改時間，只支援完整快照")
+        statement = select(table).order_by(table.c.id)
+    else:
+        watermark_column = table.c[watermark_name]
+        statement = select(table).order_by(watermark_column, table.c.id)
+        if since is not None:
+            statement = statement.where(watermark_column > since)
+        if until is not None:
+            statement = statement.where(watermark_column <= until)
+
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=batch_size
+        ).execute(statement)
+        names = list(result.keys())
+        for rows in result.partitions(batch_size):
+            columns = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+            for name in json_columns:
+                columns[name] = [None if value is None else json.dumps(value, ensure_ascii=False)
+                                 for value in columns[name]]
+            yield columns
+
+
+def export_table(engine: Engine, table_name: str, path: str, fmt: str = "parquet",
+                 since: Optional[datetime] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 lag_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    匯出單一資料表，每批寫成一個 row group（Parquet）或 record batch（Arrow IPC）
+
+    有水位欄位的資料表只匯出修改時間在 (since, 現在 - lag_seconds] 的列（預設 EXPORT_WATERMARK_LAG_SECONDS），
+    尚在落後區間內的列留到下次匯出
+
+    Returns:
+        Dict[str, Any]: table、path、rows、watermark（下次增量匯出的 since；只支援完整快照的資料表為 None）
+    """
+    pa = _require_pyarrow()
+    table = EXPORT_TABLES[table_name]
+    schema = arrow_schema(table)
+
+    until = watermark = None
+    if supports_incremental(table_name):
+        lag = settings.EXPORT_WATERMARK_LAG_SECONDS if lag_seconds is None else lag_seconds
+        until = utcnow() - timedelta(seconds=lag)
+        watermark = max(since, until) if since is not None else until
+    elif since is not None:
+        raise ValueError(f"{table_name} 沒有修改時間，只支援完整快照")
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+        write = writer.write_table
+    elif fmt == "arrow":
+        sink = pa.OSFile(path, "wb")
+        writer = pa.ipc.new_file(sink, schema)
+        write = writer.write_table
+    else:
+        raise ValueError(f"不支援的匯出格式: {fmt}")
+
+    rows = 0
+    try:
+        for columns in iter_column_batches(engine, table, since, until, batch_size):
+            write(pa.Table.from_pydict(columns, schema=schema))
+            rows += len(columns["id"])
+    finally:
+        writer.close()
+        if fmt == "arrow":
+            sink.close()
+
+    logger.info(f"已匯出 {table_name}: {rows} 列 -> {path}")
+    return {"table": table_name, "path": path, "rows": rows, "watermark": watermark}
+
+
+def _parse_watermark(value: Any) -> Optional[datetime]:
+    """manifest 中的水位；舊版以主鍵為水位的整數無法換算，視為沒有水位（重新完整匯出）"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if value is not None:
+        logger.warning(f"忽略舊版的主鍵水位 {value}，重新完整匯出")
+    return None
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"watermarks": {}, "exports": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def export_all(engine: Engine, directory: str, fmt: str = "parquet",
+               tables: Optional[List[str]] = None, incremental: bool = False,
+               batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    匯出多個資料表到目錄並更新 manifest.json
+
+    每次匯出的檔名帶時間戳記，增量匯出產生新檔案而不覆寫舊檔；
+    只支援完整快照的資料表（sessions）在增量匯出時仍整表匯出
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    results = []
+    for table_name in tables or list(EXPORT_TABLES):
+        since = None
+        if incremental and supports_incremental(table_name):
+            since = _parse_watermark(manifest["watermarks"].get(table_name))
+        path = os.path.join(directory, f"{table_name}-{stamp}{EXPORT_FORMATS[fmt]}")
+        result = export_table(engine, table_name, path, fmt, since, batch_size)
+        if result["rows"] == 0 and incremental:
+            os.remove(path)
+            result["path"] = None
+        result["since"] = since
+        results.append(result)
+        watermark = result["watermark"].isoformat() if result["watermark"] else None
+        manifest["watermarks"][table_name] = watermark
+        if result["path"]:
+            manifest["exports"].append({
+                "file": os.path.basename(path), "table": table_name, "rows": result["rows"],
+                "since": since.isoformat() if since else None, "watermark": watermark
+            })
+
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return results
+
+
+def main():
+    import argparse
+    from ..database.base import engine
+
+    parser = argparse.ArgumentParser(description='回饋資料列式匯出 (API-207.6)')
+    parser.add_argument('--output', '-o', required=True, help='匯出目錄')
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='parquet', help='檔案格式')
+    parser.add_argument('--tables', nargs='*', choices=list(EXPORT_TABLES), help='只匯出指定資料表')
+    parser.add_argument('--incremental', action='store_true',
+                        help='從 manifest.json 的水位接續匯出（sessions 仍整表匯出）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='每批（row group）列數')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    results = export_all(engine, args.output, args.format, args.tables,
+                         args.incremental, args.batch_size)
+    for result in results:
+        print(f"{result['table']}: {result['rows']} 列，水位 {result['watermark']}"
+              + (f" -> {result['path']}" if result['path'] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+回饋表按月分區 (API-207.8)
+
+PostgreSQL 專用、選擇性啟用（FEEDBACK_PARTITIONING=True 時由 20251029100005 遷移轉換）：
+practice_card_feedback 與 session_feedback 改為以 created_at 做 RANGE 宣告式分區，每月一個分區，
+另有 DEFAULT 分區接住超出已建範圍或 created_at 為空的資料。按期間查詢只掃描相關月份；
+過期月份可直接 DETACH（保留為獨立資料表供歸檔）或 DROP，不需要逐列刪除
+
+其他資料庫不分區，時間區間查詢由 created_at 索引支援
+
+用法：
+    python -m backend.services.feedback_partitions ensure --months-ahead 3
+    python -m backend.services.feedback_partitions list
+    python -m backend.services.feedback_partitions prune --before 2025-01 [--drop]
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+from datetime import date
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("practice_card_feedback", "session_feedback")
+
+# 各資料庫的回饋表是否已分區（以連線 URL 區分），只在啟動或首次使用時查詢一次
+_partitioned_databases: Dict[str, bool] = {}
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+             "WHERE c.relname = :table"),
+        {"table": table}
+    ).first() is not None
+
+
+def feedback_is_partitioned(bind) -> bool:
+    """
+    practice_card_feedback 是否已按月分區（決定最愛切換能否使用 ON CONFLICT）
+
+    分區由遷移依當時設定轉換，與執行期的 FEEDBACK_PARTITIONING 無關，因此以資料庫實際狀態為準；
+    結果依資料庫快取，非 PostgreSQL 恆為 False
+    """
+    engine = getattr(bind, "engine", bind)
+    if engine.dialect.name != "postgresql":
+        return False
+    key = str(engine.url)
+    if key not in _partitioned_databases:
+        with engine.connect() as connection:
+            _partitioned_databases[key] = is_partitioned(connection, "practice_card_feedback")
+    return _partitioned_databases[key]
+
+
+def list_partitions(connection: Connection, table: str) -> List[Tuple[str, Optional[date]]]:
+    """已掛載的分區名稱與月份（DEFAULT 分區月份為 None）"""
+    rows = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table ORDER BY child.relname"
+    ), {"table": table}).all()
+    partitions = []
+    prefix = f"{table}_p"
+    for (name,) in rows:
+        suffix = name[len(prefix):] if name.startswith(prefix) else ""
+        month = None
+        if len(suffix) == 6 and suffix.isdigit():
+            month = date(int(suffix[:4]), int(suffix[4:6]), 1)
+        partitions.append((name, month))
+    return partitions
+
+
+def ensure_month_partitions(connection: Connection, table: str, first_month: date,
+                            last_month: date) -> List[str]:
+    """
+    建立 [first_month, last_month] 每月的分區（已存在則略過）
+
+    注意：DEFAULT 分區中若已有落在新月份範圍的資料，PostgreSQL 會拒絕建立該分區，
+    請提前以 ensure 建立未來月份
+    """
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        name = partition_name(table, month)
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(connection: Connection, table: str,
+                           indexes: Sequence[Tuple[str, Sequence[str]]], months_ahead: int = 3):
+    """
+    把既有資料表轉為按月分區（在遷移的交易中執行）
+
+    主鍵改為 (id, created_at)（分區表的唯一約束必須包含分區鍵），id 序列沿用；
+    分區範圍涵蓋既有資料的最早月份到目前月份之後 months_ahead 個月
+
+    Args:
+        indexes: 要在分區父表重建的 (索引名稱, 欄位) 清單，由呼叫的遷移固定列出，
+            不讀取目前的模型定義（模型日後新增的索引由其後的遷移建立）
+    """
+    if is_partitioned(connection, table):
+        return
+    legacy = f"{table}_unpartitioned"
+    first, _ = connection.execute(
+        text(f"SELECT MIN(created_at), MAX(created_at) FROM {table}")
+    ).one()
+    today = month_start(date.today())
+    first_month = month_start(first.date()) if first else today
+
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    connection.execute(text(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (created_at)"
+    ))
+    connection.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)"))
+    connection.execute(text(
+        f"ALTER TABLE {table} ADD FOREIGN KEY (session_id) REFERENCES sessions (id)"
+    ))
+    if table == "practice_card_feedback":
+        connection.execute(text(
+            f"ALTER TABLE {table} ADD FOREIGN KEY (practice_id) REFERENCES practice_cards (id)"
+        ))
+    connection.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+    ensure_month_partitions(connection, table, first_month, add_months(today, months_ahead))
+
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+    # 序列改由新表擁有，刪除舊表時不會一併刪除
+    connection.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+    connection.execute(text(f"DROP TABLE {legacy}"))
+
+    # 舊表的索引隨之刪除，在分區父表重建（自動套用到每個分區）
+    for name, columns in indexes:
+        connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+    logger.info(f"{table} 已轉為按月分區（{first_month:%Y-%m} 起）")
+
+
+def detach_partitions_before(connection: Connection, table: str, cutoff: date,
+                             drop: bool = False) -> List[str]:
+    """
+    卸離 cutoff 月份之前的分區
+
+    Args:
+        drop: True 時直接刪除；False 時保留為獨立資料表（可 pg_dump 後歸檔）
+    """
+    detached = []
+    for name, month in list_partitions(connection, table):
+        if month is None or month >= month_start(cutoff):
+            continue
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        if drop:
+            connection.execute(text(f"DROP TABLE {name}"))
+        detached.append(name)
+    return detached
+
+
+def main():
+    import argparse
+    from datetime import datetime
+    from ..database.base import engine
+
+    parser = argparse.ArgumentParser(description='回饋表按月分區維護 (API-207.8)')
+    parser.add_argument('command', choices=['ensure', 'list', 'prune'],
+                        help='ensure: 建立未來月份分區；list: 列出分區；prune: 卸離舊分區')
+    parser.add_argument('--months-ahead', type=int, default=3, help='ensure 預先建立的未來月份數')
+    parser.add_argument('--before', help='prune 卸離此月份（YYYY-MM）之前的分區')
+    parser.add_argument('--drop', action='store_true', help='prune 時直接刪除而非保留為獨立資料表')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if engine.dialect.name != "postgresql":
+        parser.error("按月分區只支援 PostgreSQL")
+
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(connection, table):
+                print(f"{table}: 尚未分區（設定 FEEDBACK_PARTITIONING=True 後執行 alembic upgrade）")
+                continue
+            if args.command == 'ensure':
+                today = month_start(date.today())
+                created = ensure_month_partitions(connection, table, today,
+                                                  add_months(today, args.months_ahead))
+                print(f"{table}: 已確認 {len(created)} 個分區")
+            elif args.command == 'list':
+                for name, month in list_partitions(connection, table):
+                    label = f"{month:%Y-%m}" if month else "DEFAULT"
+                    print(f"{table}: {name} ({label})")
+            else:
+                if not args.before:
+                    parser.error("prune 需要 --before YYYY-MM")
+                cutoff = datetime.strptime(args.before, "%Y-%m").date()
+                detached = detach_partitions_before(connection, table, cutoff, drop=args.drop)
+                print(f"{table}: {'刪除' if args.drop else '卸離'} {len(detached)} 個分區 {detached}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+回饋彙總表維護 (API-207.7)
+
+寫入回饋時的增量更新見 backend.models.feedback_rollup；此處提供由原始表整批重算：
+- 關閉 FEEDBACK_ROLLUP_ENABLED 期間寫入的回饋（既有資料已由 20251029100004 遷移回填）
+- 繞過 ORM 的批次匯入（例如 benchmarks/generate_catalog.py）
+- verify 發現與原始表不一致時
+
+用法：
+    python -m backend.services.feedback_rollup rebuild
+    python -m backend.services.feedback_rollup verify
+"""
+from typing import Dict
+import logging
+from sqlalchemy import func, case, insert, delete
+from sqlalchemy.orm import Session
+from ..database.repositories import (
+    FeedbackRollupRepository,
+    PracticeCardFeedbackRepository,
+    SessionFeedbackRepository
+)
+from ..models.feedback_rollup import (
+    PracticeCardFeedbackRollup,
+    SessionFeedbackRollup,
+    UNKNOWN_SYMPTOM_ID,
+    SESSION_RATINGS,
+    SESSION_FEEDBACK_TYPES
+)
+from ..models.practice_card_feedback import PracticeCardFeedback
+from ..models.session_feedback import SessionFeedback
+from ..models.session import Session as SkiSession
+
+logger = logging.getLogger(__name__)
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def rebuild_rollups(db: Session) -> Dict[str, int]:
+    """
+    清空並由原始回饋表重算兩張彙總表（單一交易，INSERT ... SELECT ... GROUP BY 在資料庫端完成）
+
+    Returns:
+        Dict[str, int]: 各彙總表重建後的列數
+    """
+    symptom_id = func.coalesce(SkiSession.chosen_symptom_id, UNKNOWN_SYMPTOM_ID)
+
+    practice_day = func.date(
+        func.coalesce(PracticeCardFeedback.created_at, func.current_timestamp())
+    )
+    rating = PracticeCardFeedback.rating
+    practice_select = (
+        db.query(
+            PracticeCardFeedback.practice_id,
+            symptom_id,
+            practice_day,
+            *[_count_if(rating == star) for star in range(1, 6)],
+            func.count(),
+            _count_if(rating.between(1, 5)),
+            func.coalesce(func.sum(rating), 0),
+            _count_if(PracticeCardFeedback.is_favorite == True)
+        )
+        .outerjoin(SkiSession, SkiSession.id == PracticeCardFeedback.session_id)
+        .group_by(PracticeCardFeedback.practice_id, symptom_id, practice_day)
+        .statement
+    )
+
+    session_day = func.date(func.coalesce(SessionFeedback.created_at, func.current_timestamp()))
+    session_select = (
+        db.query(
+            symptom_id,
+            session_day,
+            *[_count_if(SessionFeedback.rating == value) for value in SESSION_RATINGS],
+            *[_count_if(SessionFeedback.feedback_type == value)
+              for value in SESSION_FEEDBACK_TYPES],
+            func.count()
+        )
+        .outerjoin(SkiSession, SkiSession.id == SessionFeedback.session_id)
+        .group_by(symptom_id, session_day)
+        .statement
+    )
+
+    try:
+        db.execute(delete(PracticeCardFeedbackRollup))
+        db.execute(delete(SessionFeedbackRollup))
+        db.execute(insert(PracticeCardFeedbackRollup).from_select(
+            ["practice_id", "symptom_id", "day",
+             "rating_1", "rating_2", "rating_3", "rating_4", "rating_5",
+             "rating_count", "rated_count", "rating_sum", "favorite_count"],
+            practice_select
+        ))
+        db.execute(insert(SessionFeedbackRollup).from_select(
+            ["symptom_id", "day", *SESSION_RATINGS, *SESSION_FEEDBACK_TYPES, "total_count"],
+            session_select
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"重建回饋彙總表時出錯: {e}")
+        raise
+
+    result = {
+        "practice_card_feedback_rollup":
+            db.query(func.count()).select_from(PracticeCardFeedbackRollup).scalar(),
+        "session_feedback_rollup":
+            db.query(func.count()).select_from(SessionFeedbackRollup).scalar()
+    }
+    logger.info(f"回饋彙總表已重建: {result}")
+    return result
+
+
+def verify_rollups(db: Session) -> Dict[str, bool]:
+    """比對彙總表與原始表的全域統計"""
+    rollup_repo = FeedbackRollupRepository(db)
+    practice_raw = PracticeCardFeedbackRepository(db).get_summary_stats()
+    practice_rollup = rollup_repo.get_practice_summary()
+    session_raw = SessionFeedbackRepository(db).get_summary_stats()
+    return {
+        "practice_card_feedback": all(practice_rollup[key] == practice_raw[key]
+                                      for key in practice_raw),
+        "session_feedback": rollup_repo.get_session_summary() == session_raw
+    }
+
+
+def main():
+    import argparse
+    from ..database.base import SessionLocal
+
+    parser = argparse.ArgumentParser(description='回饋彙總表維護 (API-207.7)')
+    parser.add_argument('command', choices=['rebuild', 'verify'],
+                        help='rebuild: 由原始表重算；verify: 比對彙總表與原始表')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    db = SessionLocal()
+    try:
+        if args.command == 'rebuild':
+            result = rebuild_rollups(db)
+            print(f"重建完成: 練習卡彙總 {result['practice_card_feedback_rollup']} 列，"
+                  f"會話彙總 {result['session_feedback_rollup']} 列")
+            return
+
+        result = verify_rollups(db)
+        for name, consistent in result.items():
+            print(f"{name}: {'一致' if consistent else '不一致，請執行 rebuild'}")
+        if not all(result.values()):
+            raise SystemExit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,31 @@
 1. Session 層級 - 整個問題推薦流程的效果評價
 2. PracticeCard 層級 - 單個練習卡的品質評價
 """
-from typing import List, Dict, Optional, Tuple
+from typing import Any, List, Dict, Optional, Tuple
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..database.repositories import (
     SessionFeedbackRepository,
-    PracticeCardFeedbackRepository
+    PracticeCardFeedbackRepository,
+    FeedbackRollupRepository,
+    PracticeCardRepository,
+    SessionRepository
 )
+from ..models.feedback_rollup import (
+    PracticeCardFeedbackRollup,
+    SessionFeedbackRollup,
+    SESSION_RATINGS,
+    SESSION_FEEDBACK_TYPES,
+    UNKNOWN_SYMPTOM_ID,
+    apply_deltas,
+    practice_contribution,
+    session_contribution
+)
+from .card_quality import card_quality
 from ..models.session_feedback import SessionFeedback
-from ..models.practice_card_feedback import PracticeCardFeedback
+from ..models.practice_card_feedback import PracticeCardFeedback, merge_feedback
 import logging
 
 logger = logging.getLogger(__name__)
@@ -81,21 +98,19 @@ def create_practice_card_feedback(
         is_favorite: 是否加入最愛清單（預設 false），可獨立於星數設定
         
     Returns:
-        PracticeCardFeedback: 創建的練習卡回饋記錄
+        PracticeCardFeedback: 創建（或合併後）的練習卡回饋記錄
     """
     try:
         feedback_repo = PracticeCardFeedbackRepository(db)
         
-        # 創建練習卡回饋記錄
-        feedback = PracticeCardFeedback(
-            session_id=session_id,
-            practice_id=practice_id,
+        # 每個（會話, 練習卡）只有一筆回饋：已存在（例如先加入最愛）時合併評分與文字 (API-206.4)
+        created_feedback = feedback_repo.upsert(
+            session_id,
+            practice_id,
             rating=rating,
             feedback_text=feedback_text,
             is_favorite=is_favorite
         )
-        
-        created_feedback = feedback_repo.create(feedback)
         logger.info(f"成功創建練習卡回饋: session_id={session_id}, practice_id={practice_id}, rating={rating}")
         
         return created_feedback
@@ -135,6 +150,166 @@ def toggle_practice_card_favorite(
         logger.error(f"更新練習卡最愛狀態時出錯: {e}")
         raise
 
+def _as_utc_naive(value: Optional[datetime], now: datetime) -> datetime:
+    """客戶端時間轉為 UTC（無時區資訊視為 UTC），未提供時使用伺服器時間"""
+    if value is None:
+        return now
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bulk_create_feedback(
+    db: Session,
+    session_items: List[Dict[str, Any]],
+    practice_items: List[Dict[str, Any]],
+    commit: bool = True
+) -> Dict[str, Any]:
+    """
+    批次建立回饋 (API-204.6)
+
+    行動端在滑雪日結束後同步離線累積的（延遲）回饋：
+    1. 逐筆驗證值域，會話與練習卡是否存在各以一次 IN 查詢確認
+    2. 通過驗證的項目每個資料表以一個 INSERT 語句（executemany）寫入；
+       已有回饋的（會話, 練習卡）改為合併進該筆（一次查詢載入，只覆寫客戶端送出的欄位）
+    3. 彙總表增量一併寫入，整批在同一交易中提交
+
+    未通過驗證的項目不寫入，其餘照常寫入；寫入失敗時整批回滾
+
+    Args:
+        db: 資料庫會話
+        session_items: 會話回饋（session_id、rating、feedback_text、feedback_type、created_at）
+        practice_items: 練習卡回饋（session_id、practice_id、rating、feedback_text、is_favorite、created_at）
+        commit: 是否提交；事件物化（API-204.7）傳入 False，與游標推進在同一交易中提交
+
+    Returns:
+        Dict[str, Any]: 各資料表依輸入順序的逐筆結果（status、id 或 message）與寫入筆數
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    symptom_ids = SessionRepository(db).get_symptom_ids(
+        [item["session_id"] for item in session_items]
+        + [item["session_id"] for item in practice_items]
+    )
+    practice_ids = PracticeCardRepository(db).get_existing_ids(
+        item["practice_id"] for item in practice_items
+    )
+
+    session_results, session_rows = [], []
+    for item in session_items:
+        if item["session_id"] not in symptom_ids:
+            session_results.append({"status": "error", "message": "會話不存在"})
+        elif item["rating"] not in SESSION_RATINGS:
+            session_results.append({"status": "error",
+                                    "message": f"評分必須為 {', '.join(SESSION_RATINGS)}"})
+        elif item.get("feedback_type", "immediate") not in SESSION_FEEDBACK_TYPES:
+            session_results.append({"status": "error",
+                                    "message": f"回饋類型必須為 {', '.join(SESSION_FEEDBACK_TYPES)}"})
+        else:
+            session_results.append({"status": "success"})
+            session_rows.append({
+                "session_id": item["session_id"],
+                "rating": item["rating"],
+                "feedback_text": item.get("feedback_text"),
+                "feedback_type": item.get("feedback_type", "immediate"),
+                "created_at": _as_utc_naive(item.get("created_at"), now)
+            })
+
+    practice_results, practice_rows, seen_pairs = [], [], set()
+    for item in practice_items:
+        pair = (item["session_id"], item["practice_id"])
+        if item["session_id"] not in symptom_ids:
+            practice_results.append({"status": "error", "message": "會話不存在"})
+        elif item["practice_id"] not in practice_ids:
+            practice_results.append({"status": "error", "message": "練習卡不存在"})
+        elif not 0 <= item["rating"] <= 5:
+            practice_results.append({"status": "error", "message": "星數必須為 1-5（0 表示僅加入最愛）"})
+        elif pair in seen_pairs:
+            practice_results.append({"status": "error", "message": "同一批次中重複的會話與練習卡"})
+        else:
+            seen_pairs.add(pair)
+            practice_results.append({"status": "success"})
+            practice_rows.append({
+                "session_id": item["session_id"],
+                "practice_id": item["practice_id"],
+                "rating": item["rating"],
+                "feedback_text": item.get("feedback_text"),
+                "is_favorite": bool(item.get("is_favorite", False)),
+                "created_at": _as_utc_naive(item.get("created_at"), now)
+            })
+
+    # 每個（會話, 練習卡）只有一筆回饋 (API-206.4)：已存在的改為合併進該筆（例如先加入最愛、之後才評分），
+    # 最愛不被取消、rating=0 不覆蓋既有星數；經由 ORM 更新，彙總表由 flush 時的增量維護
+    practice_repo = PracticeCardFeedbackRepository(db)
+    existing = practice_repo.get_by_session_practice_pairs(seen_pairs)
+    new_rows, updated = [], {}
+    for row in practice_rows:
+        feedback = existing.get((row["session_id"], row["practice_id"]))
+        if feedback is None:
+            new_rows.append(row)
+            continue
+        merge_feedback(feedback, row["rating"], row["feedback_text"], row["is_favorite"])
+        updated[(row["session_id"], row["practice_id"])] = feedback.id
+
+    try:
+        session_ids = SessionFeedbackRepository(db).bulk_create(session_rows)
+        inserted_ids = iter(practice_repo.bulk_create(new_rows))
+
+        # 批次寫入繞過 ORM，彙總表增量在此以同樣的鍵（練習卡、選定症狀、日期）累加
+        if settings.FEEDBACK_ROLLUP_ENABLED:
+            practice_deltas: Dict[Tuple, Counter] = defaultdict(Counter)
+            for row in new_rows:
+                key = (row["practice_id"], symptom_ids[row["session_id"]] or UNKNOWN_SYMPTOM_ID,
+                       row["created_at"].date())
+                practice_deltas[key].update(
+                    practice_contribution(row["rating"], row["is_favorite"])
+                )
+            session_deltas: Dict[Tuple, Counter] = defaultdict(Counter)
+            for row in session_rows:
+                key = (symptom_ids[row["session_id"]] or UNKNOWN_SYMPTOM_ID,
+                       row["created_at"].date())
+                session_deltas[key].update(
+                    session_contribution(row["rating"], row["feedback_type"])
+                )
+            apply_deltas(db, PracticeCardFeedbackRollup, practice_deltas,
+                         ("practice_id", "symptom_id", "day"))
+            apply_deltas(db, SessionFeedbackRollup, session_deltas, ("symptom_id", "day"))
+
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"批次建立回饋時出錯: {e}")
+        raise
+
+    # 逐筆結果依輸入順序，新增的項目依序對應 INSERT 返回的ID
+    session_ids = iter(session_ids)
+    for index, result in enumerate(session_results):
+        session_results[index] = {"index": index, **result}
+        if result["status"] == "success":
+            session_results[index]["id"] = next(session_ids)
+    rows = iter(practice_rows)
+    for index, result in enumerate(practice_results):
+        practice_results[index] = {"index": index, **result}
+        if result["status"] == "success":
+            row = next(rows)
+            pair = (row["session_id"], row["practice_id"])
+            if pair in updated:
+                practice_results[index].update(id=updated[pair], updated=True)
+            else:
+                practice_results[index]["id"] = next(inserted_ids)
+
+    logger.info(f"批次建立回饋: 會話 {len(session_rows)}/{len(session_items)}，"
+                f"練習卡 新增 {len(new_rows)}、更新 {len(updated)}/{len(practice_items)}")
+    return {
+        "created": {"session_feedback": len(session_rows), "practice_card_feedback": len(new_rows)},
+        "updated": {"practice_card_feedback": len(updated)},
+        "failed": len(session_items) - len(session_rows) + len(practice_items) - len(practice_rows),
+        "session_feedback": session_results,
+        "practice_card_feedback": practice_results
+    }
+
 def get_session_feedback_stats(db: Session) -> Dict[str, any]:
     """
     獲取會話回饋統計 (API-207.1 部分)
@@ -145,20 +320,15 @@ def get_session_feedback_stats(db: Session) -> Dict[str, any]:
         Dict: 會話回饋統計
     """
     try:
-        feedback_repo = SessionFeedbackRepository(db)
-        all_feedback = feedback_repo.get_all()
-        
-        # 計算評分分布
-        rating_distribution = {"not_applicable": 0, "partially_applicable": 0, "applicable": 0}
-        feedback_type_distribution = {"immediate": 0, "delayed": 0}
-        
-        for feedback in all_feedback:
-            if feedback.rating in rating_distribution:
-                rating_distribution[feedback.rating] += 1
-            if feedback.feedback_type in feedback_type_distribution:
-                feedback_type_distribution[feedback.feedback_type] += 1
+        # 評分與類型分布讀取彙總表；未啟用時由原始表分組計數
+        if settings.FEEDBACK_ROLLUP_ENABLED:
+            stats = FeedbackRollupRepository(db).get_session_summary()
+        else:
+            stats = SessionFeedbackRepository(db).get_summary_stats()
+        rating_distribution = stats["rating_distribution"]
+        feedback_type_distribution = stats["feedback_type_distribution"]
                 
-        total_count = len(all_feedback)
+        total_count = stats["total_count"]
         feedback_completion_rate = 1.0 if total_count > 0 else 0.0
         
         return {
@@ -191,29 +361,36 @@ def get_practice_card_feedback_stats(db: Session, practice_id: int) -> Dict[str,
         Dict: 練習卡回饋統計
     """
     try:
-        feedback_repo = PracticeCardFeedbackRepository(db)
-        all_feedback = feedback_repo.get_by_practice_card(practice_id)
-        
-        # 計算星數分布
-        rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        favorite_count = 0
-        
-        for feedback in all_feedback:
-            if feedback.rating in rating_distribution:
-                rating_distribution[feedback.rating] += 1
-            if feedback.is_favorite:
-                favorite_count += 1
+        # 星數分布與最愛數讀取彙總表；未啟用時由原始表分組計數
+        if settings.FEEDBACK_ROLLUP_ENABLED:
+            stats = FeedbackRollupRepository(db).get_practice_summary(practice_id)
+        else:
+            stats = PracticeCardFeedbackRepository(db).get_summary_stats(practice_id)
+        rating_distribution = stats["rating_distribution"]
+        favorite_count = stats["favorite_count"]
                 
-        total_count = len(all_feedback)
-        average_rating = sum(f.rating for f in all_feedback) / total_count if total_count > 0 else 0
+        total_count = stats["rating_count"]
+        rated_count = stats["rated_count"]
+        # 平均只計 1-5 星（rating=0 為僅加入最愛），最愛率以全部回饋為分母
+        average_rating = stats["rating_sum"] / rated_count if rated_count > 0 else 0
         favorite_rate = favorite_count / total_count if total_count > 0 else 0
+
+        # 貝氏平滑平均、信賴區間與最愛率下界取自品質表（API-211），所有卡片共用同一次計算
+        table = card_quality.get(db)
+        quality = table.get(practice_id)
         
         return {
             "rating_distribution": rating_distribution,
             "average_rating": round(average_rating, 2),
-            "rating_count": total_count,
+            "rating_count": rated_count,
+            "feedback_count": total_count,
             "favorite_count": favorite_count,
-            "favorite_rate": round(favorite_rate, 2)
+            "favorite_rate": round(favorite_rate, 2),
+            "bayesian_rating": (quality["bayesian_rating"] if quality
+                                else round(table.prior_mean, 3)),
+            "rating_ci": quality["rating_ci"] if quality else [1.0, 5.0],
+            "favorite_rate_lower_bound": quality["favorite_lower_bound"] if quality else 0.0,
+            "quality_version": table.version
         }
         
     except Exception as e:
@@ -222,6 +399,11 @@ def get_practice_card_feedback_stats(db: Session, practice_id: int) -> Dict[str,
             "rating_distribution": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0},
             "average_rating": 0.0,
             "rating_count": 0,
+            "feedback_count": 0,
             "favorite_count": 0,
-            "favorite_rate": 0.0
+            "favorite_rate": 0.0,
+            "bayesian_rating": None,
+            "rating_ci": [1.0, 5.0],
+            "favorite_rate_lower_bound": 0.0,
+            "quality_version": None
         }
\ No newline at end of file
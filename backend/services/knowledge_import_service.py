@@ -10,73 +10,247 @@ import os
 import json
 import time
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
 from ..core.config import settings
+from .vector_store import VectorStore, compute_content_hash, source_fragment_id
+from .embedding_store import EmbeddingStore, CachedEncoder
+from .embedding_pool import EmbeddingPool
 
-def convert_to_vector_format(snippets: List[Dict[str, Any]]) -> Dict[str, Any]:
+# 串流讀取 JSON 時每次讀入的字元數
+JSON_STREAM_CHUNK_SIZE = 65536
+
+
+def load_embedding_model():
+    """
+    載入嵌入模型
+
+    延遲導入 sentence_transformers，僅在真正需要向量化時才付出載入成本
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(settings.EMBEDDING_MODEL)
+
+
+def _get_chroma_client():
+    import chromadb
+    from chromadb.config import Settings
+
+    return chromadb.Client(Settings(
+        persist_directory=settings.VECTOR_DB_PATH,
+        anonymized_telemetry=False
+    ))
+
+
+def get_knowledge_collection():
+    """獲取或創建知識片段集合"""
+    client = _get_chroma_client()
+    
+    try:
+        return client.get_collection("knowledge_fragments")
+    except:
+        # 如果集合不存在，創建一個新的
+        return client.create_collection(
+            "knowledge_fragments",
+            metadata={"hnsw:space": "cosine"}
+        )
+
+
+def recreate_knowledge_collection(index_params: Dict[str, Any] = None):
+    """
+    刪除並以新的索引參數重建知識片段集合
+
+    Args:
+        index_params: 額外的 HNSW 參數，例如 {"hnsw:M": 32, "hnsw:construction_ef": 200}
+    """
+    client = _get_chroma_client()
+    try:
+        client.delete_collection("knowledge_fragments")
+    except Exception:
+        pass
+    return client.create_collection(
+        "knowledge_fragments",
+        metadata={"hnsw:space": "cosine", **(index_params or {})}
+    )
+
+
+def iter_collection_content_hashes(collection, page_size: int = 1000) -> Iterator[str]:
+    """分頁讀取集合中所有片段的 content_hash"""
+    offset = 0
+    while True:
+        page = collection.get(include=['metadatas'], limit=page_size, offset=offset)
+        if not page['ids']:
+            return
+        for metadata in page['metadatas']:
+            if metadata and metadata.get('content_hash'):
+                yield metadata['content_hash']
+        offset += len(page['ids'])
+
+
+def build_fragment_record(
+    snippet: Dict[str, Any],
+    source: str,
+    position: int
+) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    將單一知識片段轉為 (ID, 文本, 元數據)
+
+    同時支援審核後的知識片段格式與 RAG 知識片段格式（含 text/metadata 欄位）；
+    元數據附帶 content_hash。缺少ID時以來源與位置生成穩定ID並記入元數據，
+    內容修改後以同一ID覆寫，不會在集合中留下舊內容的片段
+
+    Args:
+        snippet: 知識片段
+        source: 來源名稱（導入檔案名稱）
+        position: 片段在來源中的位置
+
+    Returns:
+        Optional[Tuple[str, str, Dict[str, Any]]]: 文本為空時返回 None
+    """
+    if 'text' in snippet:
+        text = (snippet.get('text') or '').strip()
+        if not text:
+            return None
+        metadata = dict(snippet.get('metadata') or {})
+        metadata['content_hash'] = compute_content_hash(text)
+        metadata['last_updated'] = datetime.now().isoformat()
+        return _fragment_id(snippet, metadata, source, position), text, metadata
+
+    # 組合文本內容以進行向量化
+    text_parts = [
+        snippet.get('symptom', ''),
+        ' '.join(snippet.get('practice_tips', [])),
+        ' '.join(snippet.get('pitfalls', [])),
+        snippet.get('dosage', ''),
+        snippet.get('source_snippet', '')
+    ]
+    combined_text = ' '.join(text_parts).strip()
+    if not combined_text:
+        return None
+
+    metadata = {
+        'symptom': snippet.get('symptom', ''),
+        'practice_tips': json.dumps(snippet.get('practice_tips', []), ensure_ascii=False),
+        'pitfalls': json.dumps(snippet.get('pitfalls', []), ensure_ascii=False),
+        'dosage': snippet.get('dosage', ''),
+        'source_snippet': snippet.get('source_snippet', ''),
+        'source_file': snippet.get('source_file', ''),
+        'snippet_id': snippet.get('id', ''),
+        'review_status': snippet.get('review_status', ''),
+        'confidence': snippet.get('confidence', 0.0),
+        'content_hash': compute_content_hash(combined_text),
+        'last_updated': datetime.now().isoformat()
+    }
+    return _fragment_id(snippet, metadata, source, position), combined_text, metadata
+
+
+def _fragment_id(snippet: Dict[str, Any], metadata: Dict[str, Any], source: str,
+                 position: int) -> str:
+    if snippet.get('id'):
+        return str(snippet['id'])
+    metadata['fragment_source'] = source
+    metadata['fragment_position'] = position
+    return source_fragment_id(source, position)
+
+
+def prune_source_fragments(vector_store: VectorStore, source: str, count: int) -> int:
+    """
+    刪除來源中位置超出 count 的無ID片段
+
+    來源縮短（刪除片段）後，尾端位置的舊片段不會再被覆寫，導入完成後由此清除
+
+    Returns:
+        int: 刪除的片段數
+    """
+    stale = vector_store.source_fragment_ids(source, count)
+    if stale:
+        vector_store.delete(stale)
+        logging.info(f"已刪除來源 {source} 中 {len(stale)} 個不再存在的片段")
+    return len(stale)
+
+
+def select_changed_records(
+    vector_store: VectorStore,
+    records: List[Tuple[str, str, Dict[str, Any]]]
+) -> Tuple[List[Tuple[str, str, Dict[str, Any]]], int]:
+    """
+    篩選需要重新向量化的片段 (TOOL-105.6)
+
+    同一批內重複的ID只保留最後一筆；集合中已存在且 content_hash 相同的片段略過
+
+    Returns:
+        Tuple[List, int]: (需要寫入的片段, 略過的數量)
+    """
+    unique = {}
+    for record in records:
+        unique[record[0]] = record
+
+    existing = vector_store.get_content_hashes(list(unique))
+    changed = [
+        record for fid, record in unique.items()
+        if existing.get(fid) != record[2]['content_hash']
+    ]
+    return changed, len(records) - len(changed)
+
+
+def convert_to_vector_format(
+    snippets: List[Dict[str, Any]],
+    vector_store: VectorStore = None,
+    embedding_store: EmbeddingStore = None,
+    embedding_model=None,
+    source: str = '',
+    positions: Optional[List[int]] = None
+) -> Dict[str, Any]:
     """
     將審核後的知識片段轉換為向量格式 (TOOL-105.1)
     
     Args:
         snippets: 審核後的知識片段列表
+        vector_store: 提供時略過集合中內容未變的片段，只向量化新增或修改者
+        embedding_store: 嵌入儲存（預設 EMBEDDING_STORE_PATH），命中者不呼叫模型
+        embedding_model: 嵌入模型或 EmbeddingPool（預設在未命中時載入 settings.EMBEDDING_MODEL）
+        source: 來源名稱，缺少ID的片段以來源與位置生成ID
+        positions: 各片段在來源中的位置（預設為在 snippets 中的索引）
         
     Returns:
-        Dict[str, Any]: 轉換後的向量格式數據
+        Dict[str, Any]: 轉換後的向量格式數據（skipped_ids 為內容未變而略過的片段）
     """
     try:
-        # 初始化嵌入模型
-        embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        
-        # 準備文本進行向量化
-        texts = []
-        metadatas = []
-        ids = []
-        
-        for snippet in snippets:
-            # 組合文本內容以進行向量化
-            text_parts = [
-                snippet.get('symptom', ''),
-                ' '.join(snippet.get('practice_tips', [])),
-                ' '.join(snippet.get('pitfalls', [])),
-                snippet.get('dosage', ''),
-                snippet.get('source_snippet', '')
-            ]
-            combined_text = ' '.join(text_parts).strip()
-            
-            if combined_text:  # 確保文本不為空
-                texts.append(combined_text)
-                
-                # 創建元數據
-                metadata = {
-                    'symptom': snippet.get('symptom', ''),
-                    'practice_tips': json.dumps(snippet.get('practice_tips', []), ensure_ascii=False),
-                    'pitfalls': json.dumps(snippet.get('pitfalls', []), ensure_ascii=False),
-                    'dosage': snippet.get('dosage', ''),
-                    'source_snippet': snippet.get('source_snippet', ''),
-                    'source_file': snippet.get('source_file', ''),
-                    'snippet_id': snippet.get('id', ''),
-                    'review_status': snippet.get('review_status', ''),
-                    'confidence': snippet.get('confidence', 0.0),
-                    'last_updated': datetime.now().isoformat()
-                }
-                metadatas.append(metadata)
-                
-                # 生成唯一ID
-                snippet_id = snippet.get('id', f"snippet_{len(ids)+1}")
-                ids.append(str(snippet_id))
-        
-        # 生成嵌入向量
-        embeddings = embedding_model.encode(texts).tolist()
+        records = []
+        positions = positions if positions is not None else range(len(snippets))
+        for position, snippet in zip(positions, snippets):
+            record = build_fragment_record(snippet, source, position)
+            if record:  # 確保文本不為空
+                records.append(record)
+        
+        skipped_ids = []
+        if vector_store is not None:
+            changed, _ = select_changed_records(vector_store, records)
+            changed_ids = {record[0] for record in changed}
+            skipped_ids = sorted({record[0] for record in records} - changed_ids)
+            records = changed
+        
+        ids = [record[0] for record in records]
+        texts = [record[1] for record in records]
+        metadatas = [record[2] for record in records]
+        
+        # 生成嵌入向量（先查嵌入儲存；保持 NumPy 陣列，交給 VectorStore 處理）
+        embeddings = None
+        if texts:
+            if embedding_store is None:
+                embedding_store = EmbeddingStore()
+            encoder = CachedEncoder(embedding_store, embedding_model, load_embedding_model)
+            embeddings = encoder.encode(
+                texts,
+                [metadata['content_hash'] for metadata in metadatas],
+                batch_size=settings.IMPORT_BATCH_SIZE
+            )
         
         return {
             'embeddings': embeddings,
             'documents': texts,
             'metadatas': metadatas,
-            'ids': ids
+            'ids': ids,
+            'skipped_ids': skipped_ids
         }
         
     except Exception as e:
@@ -84,40 +258,34 @@ def convert_to_vector_format(snippets: List[Dict[str, Any]]) -> Dict[str, Any]:
         raise
 
 
-def import_to_chromadb(vector_data: Dict[str, Any]) -> bool:
+def import_to_chromadb(vector_data: Dict[str, Any], vector_store: VectorStore = None) -> bool:
     """
     批量導入到 ChromaDB (TOOL-105.2)
     
+    以 upsert 寫入，重複導入同一批片段不會碰撞或產生重複
+    
     Args:
         vector_data: 向量格式數據
+        vector_store: 向量儲存（預設使用知識片段集合）
         
     Returns:
         bool: 是否導入成功
     """
     try:
-        # 初始化向量數據庫
-        client = chromadb.Client(Settings(
-            persist_directory=settings.VECTOR_DB_PATH,
-            anonymized_telemetry=False
-        ))
+        if not vector_data['ids']:
+            return True
         
         # 獲取或創建集合
-        try:
-            collection = client.get_collection("knowledge_fragments")
-        except:
-            # 如果集合不存在，創建一個新的
-            collection = client.create_collection(
-                "knowledge_fragments",
-                metadata={"hnsw:space": "cosine"}
-            )
+        vector_store = vector_store or VectorStore(get_knowledge_collection())
         
-        # 批量添加到集合
-        collection.add(
+        # 批量寫入集合
+        vector_store.upsert(
+            ids=vector_data['ids'],
             embeddings=vector_data['embeddings'],
             documents=vector_data['documents'],
-            metadatas=vector_data['metadatas'],
-            ids=vector_data['ids']
+            metadatas=vector_data['metadatas']
         )
+        vector_store.save()
         
         logging.info(f"成功導入 {len(vector_data['ids'])} 個知識片段到 ChromaDB")
         return True
@@ -138,14 +306,8 @@ def validate_import_success(ids: List[str]) -> Dict[str, Any]:
         Dict[str, Any]: 驗證結果
     """
     try:
-        # 初始化向量數據庫
-        client = chromadb.Client(Settings(
-            persist_directory=settings.VECTOR_DB_PATH,
-            anonymized_telemetry=False
-        ))
-        
         # 獲取集合
-        collection = client.get_collection("knowledge_fragments")
+        collection = get_knowledge_collection()
         
         # 檢查指定ID的文檔是否都存在
         results = collection.get(ids=ids, include=['metadatas'])
@@ -201,13 +363,265 @@ def generate_import_report(import_results: Dict[str, Any], validation_results: D
     return report
 
 
-def import_approved_knowledge_snippets(file_path: str, report_path: str = None) -> Dict[str, Any]:
+def iter_knowledge_fragments(file_path: str,
+                             chunk_size: int = JSON_STREAM_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    逐筆讀取知識片段 (TOOL-105.5)
+
+    不會一次把整個檔案載入記憶體：
+    - .jsonl：每行一個片段
+    - .json：頂層陣列，或物件中的 knowledge_snippets 陣列
+
+    Args:
+        file_path: 來源檔案路徑
+        chunk_size: 讀取 JSON 時每次讀入的字元數
+
+    Yields:
+        Dict[str, Any]: 知識片段
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if file_path.endswith('.jsonl'):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+
+        yield from _iter_json_array(f, 'knowledge_snippets', chunk_size)
+
+
+def _iter_json_array(f, key: str, chunk_size: int) -> Iterator[Any]:
+    """以 raw_decode 逐一解析 JSON 陣列元素，緩衝區只保留尚未解析的部分"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer += chunk
+        return True
+
+    # 定位陣列起點：頂層 '[' 或 "key": [
+    pos = -1
+    while pos < 0:
+        stripped = buffer.lstrip()
+        if stripped.startswith('['):
+            pos = len(buffer) - len(stripped) + 1
+            break
+        key_pos = buffer.find(f'"{key}"')
+        if key_pos >= 0:
+            bracket = buffer.find('[', key_pos)
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+        if not fill():
+            return
+    buffer = buffer[pos:]
+
+    while True:
+        stripped = buffer.lstrip().lstrip(',').lstrip()
+        if not stripped:
+            if not fill():
+                raise ValueError("JSON 陣列未正常結束")
+            continue
+        buffer = stripped
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # 元素尚未讀完整，繼續讀入
+            if not fill():
+                raise
+            continue
+        buffer = buffer[end:]
+        yield item
+
+
+def load_import_checkpoint(checkpoint_path: str, source: str) -> Dict[str, Any]:
+    """
+    讀取導入檢查點
+
+    檢查點對應的來源檔案不同時視為無檢查點
+    """
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('source') == os.path.abspath(source):
+            return checkpoint
+        logging.warning(f"檢查點來源不符，忽略: {checkpoint_path}")
+    return {'source': os.path.abspath(source), 'processed': 0, 'imported': 0}
+
+
+def save_import_checkpoint(checkpoint_path: str, checkpoint: Dict[str, Any]):
+    """原子寫入檢查點（先寫暫存檔再替換）"""
+    checkpoint['updated_at'] = datetime.now().isoformat()
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def stream_import_knowledge(
+    file_path: str,
+    batch_size: int = None,
+    checkpoint_path: str = None,
+    resume: bool = True,
+    embedding_model=None,
+    vector_store: VectorStore = None,
+    embedding_store: EmbeddingStore = None
+) -> Dict[str, Any]:
+    """
+    串流分批導入知識片段 (TOOL-105.5)
+
+    逐筆讀取來源、每批向量化後立即 upsert，並在每批完成後寫入檢查點；
+    中途失敗時以相同參數重跑即可從最後完成的批次繼續。量化索引在結束時保存一次。
+    缺少ID的片段以檔案名稱與在檔案中的位置為ID，完成後刪除位置超出檔案長度的舊片段
+
+    Args:
+        file_path: 來源檔案（.json 或 .jsonl）
+        batch_size: 每批向量化與寫入的片段數
+        checkpoint_path: 檢查點檔案路徑，None 表示不記錄
+        resume: 是否從既有檢查點繼續
+        embedding_model: 嵌入模型（預設在嵌入儲存未命中時才載入 settings.EMBEDDING_MODEL）
+        vector_store: 向量儲存（預設使用知識片段集合）
+        embedding_store: 嵌入儲存（預設 EMBEDDING_STORE_PATH）
+
+    Returns:
+        Dict[str, Any]: 導入結果，含 fragments_per_sec 與嵌入儲存命中數
+    """
+    start_time = time.time()
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+
+    if checkpoint_path and resume:
+        checkpoint = load_import_checkpoint(checkpoint_path, file_path)
+    else:
+        checkpoint = {'source': os.path.abspath(file_path), 'processed': 0, 'imported': 0}
+    skip = checkpoint['processed']
+    if skip:
+        logging.info(f"從檢查點繼續: 已處理 {skip} 個片段")
+
+    if embedding_store is None:
+        embedding_store = EmbeddingStore()
+    encoder = CachedEncoder(embedding_store, embedding_model, load_embedding_model)
+    vector_store = vector_store or VectorStore(get_knowledge_collection())
+    source = os.path.basename(file_path)
+
+    imported_this_run = 0
+    skipped_this_run = 0
+    batch_records = []
+    position = -1
+
+    def flush():
+        nonlocal imported_this_run, skipped_this_run
+        changed, skipped = select_changed_records(vector_store, batch_records)
+        skipped_this_run += skipped
+        if changed:
+            texts = [record[1] for record in changed]
+            embeddings = encoder.encode(texts, [record[2]['content_hash'] for record in changed],
+                                        batch_size=batch_size)
+            vector_store.upsert(
+                ids=[record[0] for record in changed],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=[record[2] for record in changed]
+            )
+            imported_this_run += len(changed)
+            checkpoint['imported'] += len(changed)
+        # 只有寫入成功後才推進檢查點
+        checkpoint['processed'] = position + 1
+        if checkpoint_path:
+            save_import_checkpoint(checkpoint_path, checkpoint)
+
+        elapsed = time.time() - start_time
+        rate = imported_this_run / elapsed if elapsed > 0 else 0.0
+        logging.info(f"已處理 {checkpoint['processed']} 個片段，導入 {checkpoint['imported']} 個，"
+                     f"略過未變更 {skipped_this_run} 個，{rate:.1f} 片段/秒")
+        batch_records.clear()
+
+    pending = 0
+    try:
+        for position, snippet in enumerate(iter_knowledge_fragments(file_path)):
+            if position < skip:
+                continue
+            pending += 1
+
+            # 有審核狀態的片段只導入已批准者
+            if snippet.get('review_status', 'approved') == 'approved':
+                record = build_fragment_record(snippet, source, position)
+                if record:
+                    batch_records.append(record)
+
+            if pending >= batch_size:
+                flush()
+                pending = 0
+
+        if pending:
+            flush()
+        prune_source_fragments(vector_store, source, checkpoint['processed'])
+    finally:
+        # 量化索引每次保存都重寫整份編碼，只在結束（含中途失敗）時保存一次；
+        # 未保存即中止時，下次查詢發現與集合片段數不一致會由集合重建
+        vector_store.save()
+
+    duration = time.time() - start_time
+    return {
+        'success': True,
+        'imported_count': imported_this_run,
+        'skipped_count': skipped_this_run,
+        'total_imported': checkpoint['imported'],
+        'processed_count': checkpoint['processed'],
+        'duration': duration,
+        'fragments_per_sec': imported_this_run / duration if duration > 0 else 0.0,
+        'embedding_cache_hits': encoder.hits,
+        'embedding_cache_misses': encoder.misses
+    }
+
+
+def rebuild_knowledge_index(
+    file_path: str,
+    index_params: Dict[str, Any] = None,
+    batch_size: int = None,
+    embedding_store: EmbeddingStore = None,
+    embedding_model=None
+) -> Dict[str, Any]:
+    """
+    以新的索引參數重建知識片段集合 (TOOL-105.7)
+
+    嵌入向量全部來自嵌入儲存，只有儲存中沒有的片段才會載入模型計算
+
+    Args:
+        file_path: 來源檔案（.json 或 .jsonl）
+        index_params: HNSW 參數
+        batch_size: 每批寫入的片段數
+        embedding_store: 嵌入儲存（預設 EMBEDDING_STORE_PATH）
+        embedding_model: 嵌入模型或 EmbeddingPool
+    """
+    vector_store = VectorStore(recreate_knowledge_collection(index_params))
+    vector_store.reset_index()
+    return stream_import_knowledge(
+        file_path,
+        batch_size=batch_size,
+        resume=False,
+        vector_store=vector_store,
+        embedding_store=embedding_store,
+        embedding_model=embedding_model
+    )
+
+
+def import_approved_knowledge_snippets(file_path: str, report_path: str = None,
+                                       workers: int = None) -> Dict[str, Any]:
     """
     導入已批准的知識片段主函數
     
     Args:
         file_path: 包含審核後知識片段的JSON文件路徑
         report_path: 可選的報告文件路徑
+        workers: 向量化進程數（預設 settings.EMBEDDING_WORKERS，大於 1 時啟用多進程）
         
     Returns:
         Dict[str, Any]: 匯入過程結果
@@ -219,11 +633,13 @@ def import_approved_knowledge_snippets(file_path: str, report_path: str = None)
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        # 過濾出已批准的片段
-        approved_snippets = [
-            snippet for snippet in data.get('knowledge_snippets', [])
+        # 過濾出已批准的片段（保留在檔案中的位置，與串流導入的片段ID一致）
+        snippets = data.get('knowledge_snippets', [])
+        positions = [
+            position for position, snippet in enumerate(snippets)
             if snippet.get('review_status') == 'approved'
         ]
+        approved_snippets = [snippets[position] for position in positions]
         
         if not approved_snippets:
             logging.info("沒有找到已批准的知識片段")
@@ -234,20 +650,30 @@ def import_approved_knowledge_snippets(file_path: str, report_path: str = None)
                 'duration': time.time() - start_time
             }
         
-        # 轉換為向量格式
-        vector_data = convert_to_vector_format(approved_snippets)
+        # 轉換為向量格式（內容未變的片段不重新向量化）
+        vector_store = VectorStore(get_knowledge_collection())
+        source = os.path.basename(file_path)
+        with create_embedding_pool(workers) as pool:
+            vector_data = convert_to_vector_format(approved_snippets, vector_store,
+                                                   embedding_model=pool,
+                                                   source=source, positions=positions)
         
         # 導入到ChromaDB
-        import_success = import_to_chromadb(vector_data)
+        import_success = import_to_chromadb(vector_data, vector_store)
+        if import_success:
+            prune_source_fragments(vector_store, source, len(snippets))
         
         import_result = {
             'success': import_success,
-            'imported_count': len(vector_data['ids'])
+            'imported_count': len(vector_data['ids']),
+            'skipped_count': len(vector_data['skipped_ids'])
         }
         
-        # 驗證導入結果
+        # 驗證導入結果（包含略過的片段，確認它們仍存在）
         if import_success:
-            validation_result = validate_import_success(vector_data['ids'])
+            validation_result = validate_import_success(
+                vector_data['ids'] + vector_data['skipped_ids']
+            )
         else:
             validation_result = {
                 'success': False,
@@ -267,6 +693,7 @@ def import_approved_knowledge_snippets(file_path: str, report_path: str = None)
         final_result = {
             'success': import_result['success'] and validation_result['success'],
             'imported_count': import_result['imported_count'],
+            'skipped_count': import_result['skipped_count'],
             'duration': total_duration,
             'report_path': report_path
         }
@@ -284,22 +711,80 @@ def import_approved_knowledge_snippets(file_path: str, report_path: str = None)
         }
 
 
+def create_embedding_pool(workers: int = None):
+    """
+    依進程數建立向量化進程池
+
+    Returns:
+        EmbeddingPool 或 nullcontext(None)（單進程時），皆可用於 with 敘述
+    """
+    from contextlib import nullcontext
+
+    workers = settings.EMBEDDING_WORKERS if workers is None else workers
+    if workers > 1:
+        return EmbeddingPool(workers)
+    return nullcontext(None)
+
+
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='知識庫導入工具 (TOOL-105)')
     parser.add_argument('--input', '-i', required=True, help='包含審核後知識片段的JSON文件路徑')
     parser.add_argument('--report', '-r', help='導出報告文件路徑')
+    parser.add_argument('--stream', action='store_true', help='串流分批導入（支援 .json / .jsonl，可中斷續傳）')
+    parser.add_argument('--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+                        help='每批向量化與寫入的片段數')
+    parser.add_argument('--checkpoint', help='檢查點文件路徑（串流模式）')
+    parser.add_argument('--no-resume', action='store_true', help='忽略既有檢查點，從頭導入')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='刪除並重建集合，嵌入向量從嵌入儲存讀取，不重新計算')
+    parser.add_argument('--hnsw-m', type=int, help='重建時的 hnsw:M')
+    parser.add_argument('--hnsw-construction-ef', type=int, help='重建時的 hnsw:construction_ef')
+    parser.add_argument('--workers', type=int, default=settings.EMBEDDING_WORKERS,
+                        help='向量化進程數（大於 1 時以多進程分片向量化）')
     
     args = parser.parse_args()
     
     # 設置日誌
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     
-    result = import_approved_knowledge_snippets(args.input, args.report)
+    if args.rebuild:
+        index_params = {}
+        if args.hnsw_m:
+            index_params['hnsw:M'] = args.hnsw_m
+        if args.hnsw_construction_ef:
+            index_params['hnsw:construction_ef'] = args.hnsw_construction_ef
+        try:
+            with create_embedding_pool(args.workers) as pool:
+                result = rebuild_knowledge_index(args.input, index_params,
+                                                 batch_size=args.batch_size,
+                                                 embedding_model=pool)
+        except Exception as e:
+            logging.error(f"重建知識片段集合時出錯: {e}")
+            result = {'success': False, 'error': str(e)}
+    elif args.stream:
+        try:
+            with create_embedding_pool(args.workers) as pool:
+                result = stream_import_knowledge(
+                    args.input,
+                    batch_size=args.batch_size,
+                    checkpoint_path=args.checkpoint,
+                    resume=not args.no_resume,
+                    embedding_model=pool
+                )
+        except Exception as e:
+            logging.error(f"串流導入知識片段時出錯: {e}")
+            result = {'success': False, 'error': str(e)}
+    else:
+        result = import_approved_knowledge_snippets(args.input, args.report, args.workers)
     
     if result['success']:
-        print(f"導入成功: {result['imported_count']} 個知識片段已導入，耗時 {result['duration']:.2f} 秒")
+        message = (f"導入成功: {result['imported_count']} 個知識片段已導入，"
+                   f"{result.get('skipped_count', 0)} 個未變更略過，耗時 {result['duration']:.2f} 秒")
+        if 'fragments_per_sec' in result:
+            message += f"（{result['fragments_per_sec']:.1f} 片段/秒）"
+        print(message)
     else:
         print(f"導入失敗: {result.get('error', '未知錯誤')}")
 
@@ -0,0 +1,349 @@
+"""
+LLM 客戶端 (RAG-255.5)
+
+與供應商無關的 LLM 呼叫層，採用 OpenAI 相容的 /v1/chat/completions 協定
+（vLLM、Ollama、TGI 及多數託管服務皆支援）：
+- 持久 HTTP 連線池，整個進程共用一個客戶端
+- 每次呼叫可個別設定逾時
+- 併發上限：超過上限時最多等待 LLM_QUEUE_TIMEOUT 秒，不會無限期佔住工作執行緒
+- 串流輸出 token（context manager，離開時釋放併發名額）
+- 連線錯誤、429、5xx 以指數退避加隨機抖動重試
+
+未設定 LLM_API_BASE 或 AI_PROVIDER=stub 時改用進程內的確定性樁服務（見 llm_stub）
+"""
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
+import asyncio
+import json
+import random
+import threading
+import time
+import logging
+import httpx
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 可重試的 HTTP 狀態碼
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# 退避時間上限（秒）
+MAX_BACKOFF_SECONDS = 8.0
+
+Messages = Union[str, List[Dict[str, str]]]
+
+
+class LLMError(Exception):
+    """LLM 呼叫失敗（重試用盡、併發已滿或回應格式錯誤）"""
+
+
+def build_messages(messages: Messages, system: Optional[str] = None) -> List[Dict[str, str]]:
+    """將字串提示詞或訊息列表統一為訊息列表"""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    if system:
+        messages = [{"role": "system", "content": system}] + list(messages)
+    return list(messages)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None, base: float = 0.25) -> float:
+    """
+    重試等待時間：指數退避加完全抖動（0 到上限之間均勻隨機）
+
+    伺服器給了 Retry-After 時以它為下限
+    """
+    delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, base * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), MAX_BACKOFF_SECONDS))
+        except ValueError:
+            pass
+    return delay
+
+
+def parse_response(response: httpx.Response) -> str:
+    """解析非串流回應；200 但內容不是 JSON（如代理回傳的 HTML 錯誤頁）同樣視為 LLMError"""
+    try:
+        data = response.json()
+    except ValueError as e:
+        raise LLMError(f"LLM 回應不是有效的 JSON: {e}") from e
+    return parse_completion(data)
+
+
+def parse_completion(data: Dict[str, Any]) -> str:
+    try:
+        return data["choices"][0]["message"]["content"] or ""
+    except (KeyError, IndexError, TypeError) as e:
+        raise LLMError(f"LLM 回應格式錯誤: {e}")
+
+
+def parse_stream_line(line: str) -> Optional[str]:
+    """
+    解析一行 SSE 串流
+
+    Returns:
+        Optional[str]: 文字增量；非資料行或結束標記返回 None
+    """
+    if not line.startswith("data:"):
+        return None
+    payload = line[len("data:"):].strip()
+    if not payload or payload == "[DONE]":
+        return None
+    try:
+        return json.loads(payload)["choices"][0].get("delta", {}).get("content")
+    except (ValueError, KeyError, IndexError) as e:
+        raise LLMError(f"LLM 串流格式錯誤: {e}")
+
+
+class _LLMClientBase:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        queue_timeout: Optional[float] = None
+    ):
+        self.base_url = (base_url or settings.LLM_API_BASE or "http://llm-stub").rstrip("/")
+        self.model = model or settings.LLM_MODEL
+        self.timeout = timeout or settings.LLM_TIMEOUT
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.queue_timeout = settings.LLM_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        api_key = api_key or settings.LLM_API_KEY
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "headers": self.headers,
+            "timeout": httpx.Timeout(self.timeout, connect=settings.LLM_CONNECT_TIMEOUT),
+            # 連線數與併發上限一致，呼叫數再多也不會耗盡 socket
+            "limits": httpx.Limits(max_connections=self.max_concurrency,
+                                   max_keepalive_connections=self.max_concurrency)
+        }
+
+    def _payload(self, messages: Messages, system: Optional[str], stream: bool,
+                 params: Dict[str, Any]):
+        return {
+            "model": self.model,
+            "messages": build_messages(messages, system),
+            "stream": stream,
+            **params
+        }
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(error, httpx.TransportError)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[str]:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.headers.get("Retry-After")
+        return None
+
+
+class LLMClient(_LLMClientBase):
+    """
+    同步 LLM 客戶端（執行緒安全）
+
+    供同步端點與服務函數使用；httpx.Client 的連線池在執行緒間共用
+    """
+
+    def __init__(self, *args, transport: Optional[httpx.BaseTransport] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = httpx.Client(transport=transport, **self._client_options())
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise LLMError(f"LLM 併發已達上限 {self.max_concurrency}，等待 {self.queue_timeout} 秒後放棄")
+
+    def complete(self, messages: Messages, system: Optional[str] = None,
+                 timeout: Optional[float] = None, **params) -> str:
+        """
+        取得完整回應
+
+        Args:
+            messages: 提示詞字串或訊息列表
+            system: 系統提示詞
+            timeout: 本次呼叫的逾時秒數（預設 LLM_TIMEOUT）
+            **params: 其他生成參數（temperature、max_tokens 等）
+        """
+        payload = self._payload(messages, system, False, params)
+        self._acquire()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = self._client.post("/v1/chat/completions", json=payload,
+                                                 timeout=timeout or self.timeout)
+                    response.raise_for_status()
+                    return parse_response(response)
+                except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                    if not self._should_retry(attempt, e):
+                        raise LLMError(f"LLM 呼叫失敗: {e}") from e
+                    delay = backoff_delay(attempt, self._retry_after(e))
+                    logger.warning(f"LLM 呼叫失敗，{delay:.2f} 秒後重試（第 {attempt + 1} 次）: {e}")
+                    time.sleep(delay)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def stream(self, messages: Messages, system: Optional[str] = None,
+               timeout: Optional[float] = None, **params) -> Iterator[Iterator[str]]:
+        """
+        串流取得回應的文字增量
+
+        以 context manager 使用：`with client.stream(...) as tokens:`；
+        離開 with 區塊時關閉串流並釋放併發名額，即使呼叫端提前中斷迭代也不會佔住名額。
+        只有在尚未輸出任何 token 前失敗才會重試，避免重複輸出
+        """
+        payload = self._payload(messages, system, True, params)
+        self._acquire()
+        tokens = self._iter_stream(payload, timeout)
+        try:
+            yield tokens
+        finally:
+            tokens.close()
+            self._slots.release()
+
+    def _iter_stream(self, payload: Dict[str, Any], timeout: Optional[float]) -> Iterator[str]:
+        for attempt in range(self.max_retries + 1):
+            emitted = False
+            try:
+                with self._client.stream("POST", "/v1/chat/completions", json=payload,
+                                         timeout=timeout or self.timeout) as response:
+                    if response.status_code >= 400:
+                        response.read()
+                        response.raise_for_status()
+                    for line in response.iter_lines():
+                        delta = parse_stream_line(line)
+                        if delta:
+                            emitted = True
+                            yield delta
+                return
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if emitted or not self._should_retry(attempt, e):
+                    raise LLMError(f"LLM 串流失敗: {e}") from e
+                delay = backoff_delay(attempt, self._retry_after(e))
+                logger.warning(f"LLM 串流失敗，{delay:.2f} 秒後重試（第 {attempt + 1} 次）: {e}")
+                time.sleep(delay)
+
+    def close(self):
+        self._client.close()
+
+
+class AsyncLLMClient(_LLMClientBase):
+    """
+    非同步 LLM 客戶端
+
+    供 async 端點使用，等待 LLM 時不佔用事件迴圈
+    """
+
+    def __init__(self, *args, transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = httpx.AsyncClient(transport=transport, **self._client_options())
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMError(f"LLM 併發已達上限 {self.max_concurrency}，等待 {self.queue_timeout} 秒後放棄")
+
+    async def complete(self, messages: Messages, system: Optional[str] = None,
+                       timeout: Optional[float] = None, **params) -> str:
+        """取得完整回應（參數同 LLMClient.complete）"""
+        payload = self._payload(messages, system, False, params)
+        await self._acquire()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._client.post("/v1/chat/completions", json=payload,
+                                                       timeout=timeout or self.timeout)
+                    response.raise_for_status()
+                    return parse_response(response)
+                except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                    if not self._should_retry(attempt, e):
+                        raise LLMError(f"LLM 呼叫失敗: {e}") from e
+                    delay = backoff_delay(attempt, self._retry_after(e))
+                    logger.warning(f"LLM 呼叫失敗，{delay:.2f} 秒後重試（第 {attempt + 1} 次）: {e}")
+                    await asyncio.sleep(delay)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def stream(self, messages: Messages, system: Optional[str] = None,
+                     timeout: Optional[float] = None,
+                     **params) -> AsyncIterator[AsyncIterator[str]]:
+        """串流取得回應的文字增量（用法同 LLMClient.stream：`async with client.stream(...) as tokens:`）"""
+        payload = self._payload(messages, system, True, params)
+        await self._acquire()
+        tokens = self._iter_stream(payload, timeout)
+        try:
+            yield tokens
+        finally:
+            await tokens.aclose()
+            self._slots.release()
+
+    async def _iter_stream(self, payload: Dict[str, Any],
+                           timeout: Optional[float]) -> AsyncIterator[str]:
+        for attempt in range(self.max_retries + 1):
+            emitted = False
+            try:
+                async with self._client.stream("POST", "/v1/chat/completions", json=payload,
+                                               timeout=timeout or self.timeout) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        delta = parse_stream_line(line)
+                        if delta:
+                            emitted = True
+                            yield delta
+                return
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if emitted or not self._should_retry(attempt, e):
+                    raise LLMError(f"LLM 串流失敗: {e}") from e
+                delay = backoff_delay(attempt, self._retry_after(e))
+                logger.warning(f"LLM 串流失敗，{delay:.2f} 秒後重試（第 {attempt + 1} 次）: {e}")
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def uses_stub() -> bool:
+    """未設定 LLM 服務位址或明確指定 stub 時使用本地樁服務"""
+    return settings.AI_PROVIDER == "stub" or not settings.LLM_API_BASE
+
+
+def get_llm_client() -> LLMClient:
+    """取得進程共用的 LLM 客戶端（首次呼叫時建立）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                transport = None
+                if uses_stub():
+                    from .llm_stub import stub_transport
+                    transport = stub_transport()
+                _client = LLMClient(transport=transport)
+    return _client
+
+
+def close_llm_client():
+    """關閉共用客戶端並釋放連線池"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,140 @@
+"""
+LLM 樁服務 (RAG-255.6)
+
+確定性的本地 OpenAI 相容服務，供測試與基準測試使用：
+相同的訊息永遠得到相同的回應，不需網路或 GPU
+
+- stub_transport()：進程內 httpx 傳輸層，不開啟任何 socket
+- create_stub_app()：FastAPI 應用，可獨立啟動模擬真實網路延遲
+
+用法：
+    python -m backend.services.llm_stub --port 8001 --latency-ms 300
+"""
+from typing import Any, Dict, List
+import hashlib
+import json
+import re
+import httpx
+
+# 系統提示詞以「任務: <名稱>」開頭時回傳該任務的固定格式內容
+TASK_PATTERN = re.compile(r"^任務:\s*(\w+)")
+
+# 串流時每個片段的字元數
+STREAM_CHUNK_CHARS = 8
+
+STUB_TASK_REPLIES = {
+    "practice_card": json.dumps({
+        "goal": "完成外腳承重再過中立",
+        "tips": ["視線外緣", "外腳 70–80%", "中立後換刃"],
+        "pitfalls": "避免提前壓內腳",
+        "dosage": "藍線 6 次/趟 ×3 趟",
+        "self_check": ["是否在換刃前感到外腳壓力峰值？"]
+    }, ensure_ascii=False),
+    "symptom_identification": "重心太後",
+    "followup_questions": json.dumps([
+        {"question": "請問您目前的滑雪等級是？(初級/中級/高級)", "type": "level"},
+        {"question": "您通常在哪種地形滑行？(綠線/藍線/黑線)", "type": "terrain"}
+    ], ensure_ascii=False)
+}
+
+
+def stub_reply(messages: List[Dict[str, str]]) -> str:
+    """依訊息內容產生確定性的回應"""
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    match = TASK_PATTERN.match(system)
+    if match and match.group(1) in STUB_TASK_REPLIES:
+        return STUB_TASK_REPLIES[match.group(1)]
+
+    prompt = "\n".join(m.get("content", "") for m in messages)
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+    return f"stub 回應 {digest}"
+
+
+def completion_body(payload: Dict[str, Any]) -> Dict[str, Any]:
+    content = stub_reply(payload.get("messages", []))
+    return {
+        "id": "stub-completion",
+        "object": "chat.completion",
+        "model": payload.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }]
+    }
+
+
+def stream_events(payload: Dict[str, Any]) -> List[str]:
+    """將回應切成 SSE 事件"""
+    content = stub_reply(payload.get("messages", []))
+    events = []
+    for start in range(0, len(content), STREAM_CHUNK_CHARS):
+        delta = {"content": content[start:start + STREAM_CHUNK_CHARS]}
+        chunk = {"choices": [{"index": 0, "delta": delta}]}
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return events
+
+
+def handle_stub_request(request: httpx.Request) -> httpx.Response:
+    if request.url.path != "/v1/chat/completions":
+        return httpx.Response(404, json={"error": "not found"})
+    payload = json.loads(request.content or b"{}")
+    if payload.get("stream"):
+        body = "".join(stream_events(payload)).encode("utf-8")
+        return httpx.Response(200, content=body, headers={"Content-Type": "text/event-stream"})
+    return httpx.Response(200, json=completion_body(payload))
+
+
+def stub_transport() -> httpx.MockTransport:
+    """進程內樁傳輸層（同步與非同步客戶端皆可使用）"""
+    return httpx.MockTransport(handle_stub_request)
+
+
+def create_stub_app(latency_ms: int = 0):
+    """
+    建立可獨立運行的樁服務
+
+    Args:
+        latency_ms: 每個請求的模擬延遲（毫秒），串流時平均分攤到各片段
+    """
+    import asyncio
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI(title="TurnFix LLM Stub")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        if not payload.get("stream"):
+            await asyncio.sleep(latency_ms / 1000)
+            return completion_body(payload)
+
+        events = stream_events(payload)
+
+        async def generate():
+            for event in events:
+                await asyncio.sleep(latency_ms / 1000 / len(events))
+                yield event
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='LLM 樁服務 (RAG-255.6)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=int, default=0, help='每個請求的模擬延遲（毫秒）')
+    args = parser.parse_args()
+
+    uvicorn.run(create_stub_app(args.latency_ms), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
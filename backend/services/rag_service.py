@@ -7,10 +7,16 @@ from typing import List, Dict, Optional, Tuple, Any
 from sqlalchemy.orm import Session
 import json
 import logging
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+import threading
 from ..core.config import settings
+from ..core.metrics import timed
+from .vector_store import VectorStore, compute_content_hash
+from .knowledge_import_service import select_changed_records, load_embedding_model
+from .embedding_store import EmbeddingStore, CachedEncoder
+from .embedding_pool import EmbeddingPool
+from .context_packer import pack_context, estimate_tokens
+from .llm_client import get_llm_client, uses_stub, LLMError
+from .semantic_cache import practice_card_cache
 from ..models.symptom import Symptom
 from ..models.practice_card import PracticeCard
 from ..database.repositories import (
@@ -29,8 +35,11 @@ class RAGService:
     """
     
     def __init__(self):
+        import chromadb
+        from chromadb.config import Settings
+        
         # 初始化嵌入模型
-        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        self.embedding_model = load_embedding_model()
         
         # 初始化向量數據庫
         self.client = chromadb.Client(Settings(
@@ -47,6 +56,9 @@ class RAGService:
                 "knowledge_fragments",
                 metadata={"hnsw:space": "cosine"}
             )
+        
+        self.vector_store = VectorStore(self.collection)
+        self.encoder = CachedEncoder(EmbeddingStore(), self.embedding_model)
     
     def add_knowledge_fragment(self, fragment_id: str, content: str, metadata: Dict[str, Any] = None):
         """
@@ -58,16 +70,27 @@ class RAGService:
             metadata: 元數據
         """
         try:
-            # 生成嵌入向量
-            embedding = self.embedding_model.encode([content])[0].tolist()
+            metadata = dict(metadata or {})
+            metadata['content_hash'] = compute_content_hash(content)
+            
+            # 內容未變時不重新向量化
+            stored_hash = self.vector_store.get_content_hashes([fragment_id]).get(fragment_id)
+            if stored_hash == metadata['content_hash']:
+                logger.info(f"知識片段內容未變更，略過: {fragment_id}")
+                return
             
-            # 添加到集合中
-            self.collection.add(
-                embeddings=[embedding],
+            # 生成嵌入向量（先查嵌入儲存）
+            embeddings = self.encoder.encode([content], [metadata['content_hash']])
+            
+            # 寫入集合（已存在時覆寫）
+            self.vector_store.upsert(
+                ids=[fragment_id],
+                embeddings=embeddings,
                 documents=[content],
-                metadatas=[metadata or {}],
-                ids=[fragment_id]
+                metadatas=[metadata]
             )
+            # 量化索引不在每次新增時整份重寫，關閉服務時保存一次（shutdown_rag_service）；
+            # 未保存即中止時，下次查詢發現與集合片段數不一致會由集合重建
             
             logger.info(f"成功添加知識片段: {fragment_id}")
         except Exception as e:
@@ -87,21 +110,23 @@ class RAGService:
         """
         try:
             # 生成查詢的嵌入向量
-            query_embedding = self.embedding_model.encode([query])[0].tolist()
+            with timed("rag_encode"):
+                query_embedding = self.embedding_model.encode([query])[0]
             
             # 搜索相關片段
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results
-            )
+            with timed("vector_query"):
+                results = self.vector_store.query(query_embedding, n_results=n_results,
+                                                  include_embeddings=True)
             
-            # 格式化結果
+            # 格式化結果（附帶向量，供上下文打包去除近似重複）
             formatted_results = []
             for i in range(len(results['documents'][0])):
                 formatted_results.append({
+                    'id': results['ids'][0][i],
                     'content': results['documents'][0][i],
                     'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i]
+                    'distance': results['distances'][0][i],
+                    'embedding': results['embeddings'][0][i]
                 })
             
             logger.info(f"成功搜索知識片段: {len(formatted_results)} 結果")
@@ -116,15 +141,19 @@ class RAGService:
         self, 
         user_input: str, 
         symptom: Symptom, 
-        relevant_knowledge: List[Dict[str, Any]]
+        relevant_knowledge: List[Dict[str, Any]],
+        slot_info: Dict[str, Any] = None
     ) -> Optional[PracticeCard]:
         """
         根據檢索到的知識和用戶輸入生成練習卡 (RAG-255)
         
+        組裝後的上下文向量化後交給語意快取，相似情境直接重用先前的生成結果
+        
         Args:
             user_input: 使用者輸入
             symptom: 識別的症狀
             relevant_knowledge: 相關知識片段
+            slot_info: Slot資訊（level、terrain 等）
             
         Returns:
             Optional[PracticeCard]: 生成的練習卡
@@ -133,21 +162,28 @@ class RAGService:
             if not relevant_knowledge:
                 return None
             
-            # 從知識片段中提取信息來創建練習卡
-            first_knowledge = relevant_knowledge[0]
-            content = first_knowledge['content']
+            context = assemble_context(relevant_knowledge, user_input, slot_info)
+            prompt = generate_prompt_template(context, user_input)
+            # 只有語意快取啟用時才需要上下文向量，停用時省下一次向量化
+            context_embedding = None
+            if settings.SEMANTIC_CACHE_ENABLED:
+                context_embedding = self.embedding_model.encode([context])[0]
+            content = generate_practice_card_content(
+                prompt,
+                symptom=symptom.name,
+                slot_info=slot_info,
+                context_embedding=context_embedding
+            )
             
-            # 在簡化實現中，我們直接從知識內容創建一個示例練習卡
-            # 實際實現中，這些內容會由LLM生成
             practice_card = PracticeCard(
                 name=f"針對{symptom.name}的練習",
-                goal=f"改善{symptom.name}問題",
-                tips=["進行適當練習", "保持正確姿勢", "注意動作要點"],
-                pitfalls="避免常見錯誤",
-                dosage="建議次數/時長",
+                goal=content.get("goal", f"改善{symptom.name}問題"),
+                tips=content.get("tips", []),
+                pitfalls=content.get("pitfalls", ""),
+                dosage=content.get("dosage", ""),
                 level=["初級", "中級"],  # 預設等級
                 terrain=["綠線", "藍線"],  # 預設地形
-                self_check=["檢查練習效果"],
+                self_check=content.get("self_check", []),
                 card_type="技術"
             )
             
@@ -182,8 +218,48 @@ class RAGService:
             # 降級策略：返回空列表
             return []
 
-# 創建全局RAG服務實例
-rag_service = RAGService()
+# 全局RAG服務實例：延遲建立，導入本模組不會載入模型或開啟 ChromaDB
+_rag_service: Optional[RAGService] = None
+_rag_service_lock = threading.Lock()
+
+def get_rag_service() -> RAGService:
+    """
+    取得全局RAG服務實例（首次呼叫時建立）
+    
+    RAG_ENABLED=false 的進程（例如只提供管理功能）不會載入模型，呼叫時拋出 RuntimeError
+    """
+    global _rag_service
+    if _rag_service is None:
+        if not settings.RAG_ENABLED:
+            raise RuntimeError("RAG 服務已停用（RAG_ENABLED=false）")
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService()
+                logger.info("RAG 服務已初始化")
+    return _rag_service
+
+def init_rag_service() -> Optional[RAGService]:
+    """
+    應用程式啟動時呼叫：RAG_ENABLED 時預先建立服務，避免第一個請求承擔模型載入成本
+    """
+    if not settings.RAG_ENABLED:
+        logger.info("RAG_ENABLED=false，不載入嵌入模型")
+        return None
+    return get_rag_service()
+
+def shutdown_rag_service():
+    """應用程式關閉時呼叫：釋放模型與向量資料庫連線"""
+    global _rag_service
+    with _rag_service_lock:
+        if _rag_service is not None:
+            _rag_service.vector_store.save()
+            _rag_service = None
+
+def __getattr__(name: str):
+    # 相容舊的 `from .rag_service import rag_service`
+    if name == "rag_service":
+        return get_rag_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def preprocess_coach_responses(text: str) -> str:
     """
@@ -301,6 +377,8 @@ def create_vector_database_structure():
     建立知識片段存儲結構（text、metadata、source、timestamps）
     """
     try:
+        import chromadb
+        
         # 配置 ChromaDB 持久化存儲 (RAG-252.1)
         client = chromadb.PersistentClient(path=settings.VECTOR_DB_PATH)
         
@@ -317,7 +395,7 @@ def create_vector_database_structure():
         logger.error(f"建立向量資料庫結構時出錯: {e}")
         raise
 
-def import_knowledge_fragments(fragments: List[Dict[str, Any]]):
+def import_knowledge_fragments(fragments: List[Dict[str, Any]], workers: int = None):
     """
     知識導入腳本 (RAG-252.3)
     
@@ -337,40 +415,58 @@ def import_knowledge_fragments(fragments: List[Dict[str, Any]]):
             }
           }
         ]
+        workers: 向量化進程數（預設 settings.EMBEDDING_WORKERS，大於 1 時啟用多進程，僅限離線導入）
     """
+    workers = settings.EMBEDDING_WORKERS if workers is None else workers
+    pool = EmbeddingPool(workers) if workers > 1 else None
     try:
         # 創建向量資料庫結構
         collection = create_vector_database_structure()
         
-        # 初始化嵌入模型
-        embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        
-        # 批量處理知識片段
-        fragment_ids = []
-        texts = []
-        metadatas = []
-        
-        for fragment in fragments:
-            fragment_ids.append(fragment["id"])
-            texts.append(fragment["text"])
-            metadatas.append(fragment["metadata"])
-        
-        # 生成嵌入向量
-        embeddings = embedding_model.encode(texts).tolist()
-        
-        # 批量導入到向量資料庫
-        collection.add(
-            embeddings=embeddings,
-            documents=texts,
-            metadatas=metadatas,
-            ids=fragment_ids
-        )
+        # 嵌入模型只在嵌入儲存未命中時才載入
+        encoder = CachedEncoder(EmbeddingStore(), pool, model_loader=load_embedding_model)
+        
+        vector_store = VectorStore(collection)
+        batch_size = settings.IMPORT_BATCH_SIZE
+        imported_count = 0
         
-        logger.info(f"成功導入 {len(fragments)} 個知識片段")
+        # 分批向量化並導入，避免一次編碼全部文本
+        for start in range(0, len(fragments), batch_size):
+            records = [
+                (fragment["id"], fragment["text"],
+                 dict(fragment["metadata"], content_hash=compute_content_hash(fragment["text"])))
+                for fragment in fragments[start:start + batch_size]
+            ]
+            
+            # 只重新向量化新增或內容有變的片段
+            changed, _ = select_changed_records(vector_store, records)
+            if not changed:
+                continue
+            texts = [record[1] for record in changed]
+            
+            # 生成嵌入向量（先查嵌入儲存）
+            embeddings = encoder.encode(texts, [record[2]['content_hash'] for record in changed],
+                                        batch_size=batch_size)
+            
+            # 批量寫入向量資料庫（已存在時覆寫）
+            vector_store.upsert(
+                ids=[record[0] for record in changed],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=[record[2] for record in changed]
+            )
+            imported_count += len(changed)
+        
+        vector_store.save()
+        
+        logger.info(f"成功導入 {imported_count} 個知識片段，{len(fragments) - imported_count} 個未變更略過")
         
     except Exception as e:
         logger.error(f"導入知識片段時出錯: {e}")
         raise
+    finally:
+        if pool is not None:
+            pool.close()
 
 def similarity_search(query: str, k: int = 5) -> List[Dict[str, Any]]:
     """
@@ -389,26 +485,22 @@ def similarity_search(query: str, k: int = 5) -> List[Dict[str, Any]]:
         # 創建向量資料庫結構
         collection = create_vector_database_structure()
         
-        # 初始化嵌入模型
-        embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        
-        # 生成查詢向量
-        query_embedding = embedding_model.encode([query]).tolist()[0]
+        # 生成查詢向量（使用全局服務已載入的模型）
+        query_embedding = get_rag_service().embedding_model.encode([query])[0]
         
         # 執行相似度搜尋
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=k
-        )
+        results = VectorStore(collection).query(query_embedding, n_results=k,
+                                                include_embeddings=True)
         
-        # 格式化結果
+        # 格式化結果（附帶向量，供上下文打包去除近似重複）
         formatted_results = []
         for i in range(len(results['documents'][0])):
             formatted_results.append({
                 "id": results['ids'][0][i],
                 "text": results['documents'][0][i],
                 "metadata": results['metadatas'][0][i],
-                "similarity": 1 - results['distances'][0][i]  # 轉換為相似度分數
+                "similarity": 1 - results['distances'][0][i],  # 轉換為相似度分數
+                "embedding": results['embeddings'][0][i]
             })
         
         logger.info(f"成功執行相似度搜尋: {len(formatted_results)} 結果")
@@ -512,98 +604,158 @@ def generate_prompt_template(context: str, query: str) -> str:
 
 def assemble_context(rag_results: List[Dict[str, Any]], 
                     user_input: str, 
-                    slot_info: Dict[str, Any]) -> str:
+                    slot_info: Dict[str, Any],
+                    token_budget: int = None) -> str:
     """
     上下文組裝邏輯 (RAG-254.2)
     
-    將 RAG 檢索結果、使用者輸入、Slot 資訊組合
+    將 RAG 檢索結果、使用者輸入、Slot 資訊在 token 預算內組合；
+    知識片段去除近似重複後依分數密度取捨，不會被切成半段
     
     Args:
-        rag_results: RAG檢索結果
+        rag_results: RAG檢索結果（依相關度排序）
         user_input: 使用者輸入
         slot_info: Slot資訊
+        token_budget: token 預算（預設 settings.CONTEXT_TOKEN_BUDGET）
         
     Returns:
         str: 組裝後的上下文
     """
-    context_parts = []
-    
-    # 添加使用者輸入
-    context_parts.append(f"使用者輸入: {user_input}")
+    packed = pack_context(rag_results or [], user_input, slot_info, token_budget)
     
-    # 添加Slot資訊
-    if slot_info:
-        slot_parts = []
-        for key, value in slot_info.items():
-            if value:
-                slot_parts.append(f"{key}: {value}")
-        if slot_parts:
-            context_parts.append(f"Slot資訊: {', '.join(slot_parts)}")
+    logger.info(f"上下文打包: 使用 {packed['tokens_used']}/{packed['token_budget']} tokens，"
+                f"放入 {len(packed['included_ids'])} 個片段，"
+                f"去除重複 {len(packed['dropped_duplicates'])} 個，"
+                f"超出預算 {len(packed['dropped_over_budget'])} 個")
     
-    # 添加RAG檢索結果
-    if rag_results:
-        knowledge_parts = []
-        for i, result in enumerate(rag_results):
-            knowledge_parts.append(f"知識片段 {i+1}: {result['text']}")
-        if knowledge_parts:
-            context_parts.append(f"相關知識:\n{'\n'.join(knowledge_parts)}")
-    
-    return '\n\n'.join(context_parts)
+    return packed['context']
+
+TRUNCATION_SUFFIX = "\n... (內容已截斷)"
+
+
+def _truncate_line(line: str, budget: int) -> str:
+    """把單行截到 budget 個 token 以內（二分搜尋最長前綴）"""
+    low, high = 0, len(line)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(line[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return line[:low]
+
 
 def optimize_prompt_length(prompt: str, max_length: int = 2048) -> str:
     """
     提示詞優化機制 (RAG-254.3)
     
-    長度控制、關鍵資訊優先級
+    長度控制、關鍵資訊優先級。上下文應先以 assemble_context 在 token 預算內打包，
+    此函數只作為最後防線：超長時從尾端整行移除（含截斷標記仍在 max_length 內）；
+    第一行本身就超過預算時才在行中間截斷
     
     Args:
         prompt: 原始提示詞
-        max_length: 最大長度限制
+        max_length: 最大 token 數
         
     Returns:
         str: 優化後的提示詞
     """
-    if len(prompt) <= max_length:
+    if estimate_tokens(prompt) <= max_length:
         return prompt
     
-    # 簡化實現：截斷提示詞
-    # 實際實現中會使用更智能的摘要或關鍵資訊提取
-    return prompt[:max_length] + "... (內容已截斷)"
+    # 換行不計 token，整段的估算等於各行之和，逐行累加即可
+    budget = max(max_length - estimate_tokens(TRUNCATION_SUFFIX), 0)
+    kept, used = [], 0
+    for line in prompt.split('\n'):
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            if not kept:
+                kept.append(_truncate_line(line, budget))
+            break
+        kept.append(line)
+        used += cost
+    return '\n'.join(kept) + TRUNCATION_SUFFIX
+
+# 各任務的系統提示詞；以「任務: <名稱>」開頭，樁服務據此回傳對應格式
+PRACTICE_CARD_SYSTEM_PROMPT = (
+    "任務: practice_card\n"
+    "你是滑雪教練。根據上下文生成一張練習卡，只輸出 JSON 物件，"
+    "欄位為 goal、tips（陣列）、pitfalls、dosage、self_check（陣列）。"
+)
+SYMPTOM_IDENTIFICATION_SYSTEM_PROMPT = (
+    "任務: symptom_identification\n"
+    "根據使用者描述與知識片段判斷最可能的滑雪症狀，只輸出症狀名稱。"
+)
+FOLLOWUP_QUESTIONS_SYSTEM_PROMPT = (
+    "任務: followup_questions\n"
+    "判斷資訊是否足夠；不足時生成追問，只輸出 JSON 陣列，元素含 question 與 type。"
+)
+
+# LLM 不可用時的降級內容
+DEFAULT_PRACTICE_CARD_CONTENT = {
+    "goal": "完成外腳承重再過中立",
+    "tips": ["視線外緣", "外腳 70–80%", "中立後換刃"],
+    "pitfalls": "避免提前壓內腳",
+    "dosage": "藍線 6 次/趟 ×3 趟",
+    "self_check": ["是否在換刃前感到外腳壓力峰值？"]
+}
+DEFAULT_SYMPTOM = "重心太後"
+DEFAULT_FOLLOWUP_QUESTIONS = [
+    {"question": "請問您目前的滑雪等級是？(初級/中級/高級)", "type": "level"},
+    {"question": "您通常在哪種地形滑行？(綠線/藍線/黑線)", "type": "terrain"}
+]
 
 def configure_llm_api():
     """
     選擇並配置 LLM API (RAG-255.1)
     
-    如 OpenAI、Hugging Face、本地模型
+    如 OpenAI、Hugging Face、本地模型；初始化進程共用的 LLM 客戶端（連線池）
     """
-    # 簡化實現：返回配置信息
-    # 實際實現中會初始化LLM客戶端
+    client = get_llm_client()
     return {
-        "provider": settings.AI_PROVIDER,
-        "model": settings.EMBEDDING_MODEL
+        "provider": "stub" if uses_stub() else settings.AI_PROVIDER,
+        "model": client.model,
+        "base_url": client.base_url,
+        "timeout": client.timeout,
+        "max_concurrency": client.max_concurrency
     }
 
-def generate_practice_card_content(prompt: str) -> Dict[str, Any]:
+def generate_practice_card_content(prompt: str,
+                                   symptom: str = None,
+                                   slot_info: Dict[str, Any] = None,
+                                   context_embedding: Any = None) -> Dict[str, Any]:
     """
     練習卡內容生成 (RAG-255.2)
     
-    生成 goal、tips、pitfalls、dosage、self_check
+    生成 goal、tips、pitfalls、dosage、self_check；
+    提供症狀與上下文向量時先查語意快取，成功生成的結果寫回快取
     
     Args:
         prompt: 提示詞
+        symptom: 症狀名稱
+        slot_info: Slot資訊
+        context_embedding: 組裝後上下文的嵌入向量
         
     Returns:
         Dict[str, Any]: 生成的練習卡內容
     """
-    # 簡化實現：模擬LLM生成結果
-    # 實際實現中會調用LLM API
-    return {
-        "goal": "完成外腳承重再過中立",
-        "tips": ["視線外緣", "外腳 70–80%", "中立後換刃"],
-        "pitfalls": "避免提前壓內腳",
-        "dosage": "藍線 6 次/趟 ×3 趟",
-        "self_check": ["是否在換刃前感到外腳壓力峰值？"]
-    }
+    use_cache = settings.SEMANTIC_CACHE_ENABLED and symptom and context_embedding is not None
+    if use_cache:
+        cached = practice_card_cache.get(context_embedding, symptom, slot_info)
+        if cached is not None:
+            return cached
+    
+    try:
+        content = json.loads(get_llm_client().complete(prompt, system=PRACTICE_CARD_SYSTEM_PROMPT))
+        if not isinstance(content, dict) or "goal" not in content:
+            raise ValueError("缺少 goal 欄位")
+        if use_cache:
+            practice_card_cache.put(context_embedding, symptom, slot_info, content)
+        return content
+    except (LLMError, ValueError) as e:
+        logger.error(f"生成練習卡內容時出錯: {e}")
+        # 降級策略：返回預設練習卡內容
+        return dict(DEFAULT_PRACTICE_CARD_CONTENT)
 
 def assist_symptom_identification(prompt: str) -> str:
     """
@@ -617,9 +769,14 @@ def assist_symptom_identification(prompt: str) -> str:
     Returns:
         str: 識別的症狀名稱
     """
-    # 簡化實現：模擬LLM生成結果
-    # 實際實現中會調用LLM API
-    return "重心太後"
+    try:
+        symptom = get_llm_client().complete(prompt, system=SYMPTOM_IDENTIFICATION_SYSTEM_PROMPT)
+        symptom = symptom.strip()
+        return symptom or DEFAULT_SYMPTOM
+    except LLMError as e:
+        logger.error(f"症狀辨識輔助時出錯: {e}")
+        # 降級策略：返回預設症狀
+        return DEFAULT_SYMPTOM
 
 def generate_followup_questions(prompt: str) -> List[Dict[str, str]]:
     """
@@ -633,12 +790,16 @@ def generate_followup_questions(prompt: str) -> List[Dict[str, str]]:
     Returns:
         List[Dict[str, str]]: 追問問題列表
     """
-    # 簡化實現：模擬LLM生成結果
-    # 實際實現中會調用LLM API
-    return [
-        {"question": "請問您目前的滑雪等級是？(初級/中級/高級)", "type": "level"},
-        {"question": "您通常在哪種地形滑行？(綠線/藍線/黑線)", "type": "terrain"}
-    ]
+    try:
+        reply = get_llm_client().complete(prompt, system=FOLLOWUP_QUESTIONS_SYSTEM_PROMPT)
+        questions = json.loads(reply)
+        if not isinstance(questions, list):
+            raise ValueError("追問結果不是陣列")
+        return questions
+    except (LLMError, ValueError) as e:
+        logger.error(f"生成追問問題時出錯: {e}")
+        # 降級策略：返回預設追問
+        return [dict(q) for q in DEFAULT_FOLLOWUP_QUESTIONS]
 
 # 兼容性接口 - 保持與舊版API的兼容性
 def process_rag_request(user_input: str, **kwargs) -> Dict[str, Any]:
@@ -652,7 +813,7 @@ def process_rag_request(user_input: str, **kwargs) -> Dict[str, Any]:
     style = kwargs.get('style')
     
     # 使用RAG服務處理請求
-    rag_results = rag_service.process_user_input(user_input)
+    rag_results = get_rag_service().process_user_input(user_input)
     
     return {
         "status": "success",
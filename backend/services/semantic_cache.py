@@ -0,0 +1,159 @@
+"""
+語意快取 (RAG-255.7)
+
+快取練習卡生成結果：以組裝後上下文的嵌入向量為鍵，
+症狀與 Slot 完全相同、且餘弦相似度達門檻時直接返回先前的生成結果
+
+- TTL：過期項目在查詢時略過並移除
+- 容量上限：超過時淘汰最久未命中的項目
+- 可依症狀清除（管理者調整症狀或練習卡內容後使用）
+"""
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import copy
+import json
+import threading
+import time
+import numpy as np
+from ..core.config import settings
+
+
+# (症狀, Slot 鍵)
+BucketKey = Tuple[str, str]
+
+
+def slot_key(slot_info: Optional[Dict[str, Any]]) -> str:
+    """Slot 正規化為鍵：忽略空值，鍵排序"""
+    if not slot_info:
+        return "{}"
+    filled = {k: v for k, v in sorted(slot_info.items()) if v}
+    return json.dumps(filled, ensure_ascii=False, sort_keys=True)
+
+
+class SemanticCache:
+    """
+    練習卡生成結果的語意快取（執行緒安全）
+
+    項目依 (症狀, Slot) 分桶，查詢只比對同一桶內的向量
+    """
+
+    def __init__(self, threshold: Optional[float] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        if threshold is None:
+            threshold = settings.SEMANTIC_CACHE_THRESHOLD
+        if ttl_seconds is None:
+            ttl_seconds = settings.SEMANTIC_CACHE_TTL_SECONDS
+        if max_entries is None:
+            max_entries = settings.SEMANTIC_CACHE_MAX_ENTRIES
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 項目ID -> (桶鍵, 向量, 結果, 寫入時間)；順序即最近使用順序
+        self._entries: "OrderedDict[int, Tuple[BucketKey, np.ndarray, Any, float]]" = OrderedDict()
+        self._buckets: Dict[BucketKey, Dict[int, np.ndarray]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, entry_id: int):
+        bucket_key = self._entries.pop(entry_id)[0]
+        bucket = self._buckets[bucket_key]
+        bucket.pop(entry_id, None)
+        if not bucket:
+            del self._buckets[bucket_key]
+
+    def get(self, embedding: Any, symptom: str,
+            slot_info: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """
+        查詢快取
+
+        Returns:
+            Optional[Any]: 命中時返回生成結果的副本，否則 None
+        """
+        query = self._normalize(embedding)
+        bucket_key = (symptom, slot_key(slot_info))
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket:
+                expired = [eid for eid in bucket if now - self._entries[eid][3] > self.ttl_seconds]
+                for entry_id in expired:
+                    self._remove(entry_id)
+                bucket = self._buckets.get(bucket_key)
+
+            if bucket:
+                entry_ids = list(bucket)
+                scores = np.stack([bucket[eid] for eid in entry_ids]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id = entry_ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return copy.deepcopy(self._entries[entry_id][2])
+
+            self.misses += 1
+            return None
+
+    def put(self, embedding: Any, symptom: str, slot_info: Optional[Dict[str, Any]], value: Any):
+        """寫入快取，超過容量時淘汰最久未使用的項目"""
+        vector = self._normalize(embedding)
+        bucket_key = (symptom, slot_key(slot_info))
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket_key, vector, copy.deepcopy(value), time.monotonic())
+            self._buckets.setdefault(bucket_key, {})[entry_id] = vector
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def purge(self, symptom: Optional[str] = None) -> int:
+        """
+        清除快取
+
+        Args:
+            symptom: 只清除該症狀的項目；None 表示全部清除
+
+        Returns:
+            int: 清除的項目數
+        """
+        with self._lock:
+            if symptom is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._buckets.clear()
+                return count
+
+            entry_ids = [eid for eid, entry in self._entries.items() if entry[0][0] == symptom]
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            return len(entry_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+
+# 進程共用的練習卡生成快取
+practice_card_cache = SemanticCache()
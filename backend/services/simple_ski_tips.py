@@ -10,6 +10,7 @@
 from typing import Dict, List, Optional, Any
 from sqlalchemy.orm import Session
 from ..core.config import settings
+from ..core.metrics import timed
 from ..models.symptom import Symptom
 from ..models.practice_card import PracticeCard
 from ..database.repositories import (
@@ -17,6 +18,7 @@ from ..database.repositories import (
     PracticeCardRepository,
     SymptomPracticeMappingRepository
 )
+from .card_ranking import RankingScores, ranking_scores
 import json
 import logging
 
@@ -40,13 +42,14 @@ def get_ski_tips(db: Session, user_input: str, level: Optional[str] = None,
         recognized_symptom = identify_symptom(symptom_repo, user_input)
         
         # 2. 根據症狀ID獲取相關練習卡
-        practice_cards = mapping_repo.get_practice_cards_by_symptom(recognized_symptom.id)
+        with timed("mapping_fetch"):
+            practice_cards = mapping_repo.get_practice_cards_by_symptom(recognized_symptom.id)
         
         # 3. 根據用戶條件進一步篩選
         filtered_cards = filter_cards_by_conditions(db, practice_cards, level, terrain, style)
         
         # 4. 排序並返回前3-5張
-        ranked_cards = rank_cards(filtered_cards, level, terrain)
+        ranked_cards = rank_cards(filtered_cards, level, terrain, symptom_id=recognized_symptom.id)
         
         # 5. 限制返回數量
         result_count = min(settings.MAX_PRACTICE_CARDS, 
@@ -59,6 +62,7 @@ def get_ski_tips(db: Session, user_input: str, level: Optional[str] = None,
         return [card_to_dict(card) for card in get_default_tips(db)]
 
 
+@timed("symptom_identification")
 def identify_symptom(symptom_repo: SymptomRepository, input_text: str) -> Symptom:
     """
     識別症狀 - 簡單實現，可擴展為更複雜的AI模型
@@ -93,6 +97,7 @@ def identify_symptom(symptom_repo: SymptomRepository, input_text: str) -> Sympto
 # 不需要filter_cards_by_symptom函數了，因為我們使用SymptomPracticeMappingRepository
 
 
+@timed("filtering")
 def filter_cards_by_conditions(
     db: Session,
     practice_cards: List[PracticeCard], 
@@ -128,10 +133,20 @@ def filter_cards_by_conditions(
     return filtered_cards if filtered_cards else practice_cards
 
 
-def rank_cards(cards: List[PracticeCard], level: Optional[str], terrain: Optional[str]) -> List[PracticeCard]:
+@timed("ranking")
+def rank_cards(cards: List[PracticeCard], level: Optional[str], terrain: Optional[str],
+               symptom_id: Optional[int] = None,
+               scores: Optional[RankingScores] = None) -> List[PracticeCard]:
     """
     根據條件對練習卡進行排序
+
+    除等級 / 地形匹配外，加上預先算好的品質分數與症狀成功率（API-212），
+    只讀記憶體中的分數表，不查詢資料庫；分數表尚未載入時只依等級 / 地形排序
     """
+    scores = scores if scores is not None else ranking_scores.current
+    quality_weight = settings.RANKING_WEIGHT_QUALITY
+    symptom_weight = settings.RANKING_WEIGHT_SYMPTOM
+
     def sort_key(card):
         score = 0
         
@@ -141,16 +156,19 @@ def rank_cards(cards: List[PracticeCard], level: Optional[str], terrain: Optiona
         
         # 根據等級匹配加分
         if level and card_level and level in card_level:
-            score += 10
+            score += settings.RANKING_WEIGHT_LEVEL
             
         # 根據地形匹配加分
         if terrain and card_terrain and terrain in card_terrain:
-            score += 5
-            
-        # 根據卡片ID作為最後排序標準
-        score += card.id * 0.01
-        
-        return -score  # 降序排序
+            score += settings.RANKING_WEIGHT_TERRAIN
+
+        # 回饋分數：品質（0-1）與此症狀下的高分比例（0-1）
+        if scores is not None:
+            score += quality_weight * scores.quality_of(card.id)
+            score += symptom_weight * scores.success_of(symptom_id, card.id)
+
+        # 分數降序；卡片ID只在同分時決定先後，不計入分數
+        return -score, card.id
     
     return sorted(cards, key=sort_key)
 
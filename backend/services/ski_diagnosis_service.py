@@ -14,7 +14,7 @@ from ..database.repositories import (
     SessionRepository,
     SymptomPracticeMappingRepository
 )
-from .rag_service import RAGService
+from .rag_service import get_rag_service
 from ..core.config import settings
 import logging
 
@@ -32,7 +32,17 @@ class SkiDiagnosisService:
         self.practice_repo = PracticeCardRepository(db)
         self.session_repo = SessionRepository(db)
         self.mapping_repo = SymptomPracticeMappingRepository(db)
-        self.rag_service = RAGService()
+    
+    @property
+    def rag_service(self):
+        """共用的全局RAG服務（不再每個請求各自載入模型）"""
+        return get_rag_service()
+    
+    def search_knowledge(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+        """RAG 檢索；RAG_ENABLED=false 時返回空列表"""
+        if not settings.RAG_ENABLED:
+            return []
+        return self.rag_service.search_knowledge(query, n_results=n_results)
     
     def diagnose_and_recommend(
         self, 
@@ -103,7 +113,7 @@ class SkiDiagnosisService:
             return symptom
         
         # 使用RAG服務搜索相似知識
-        knowledge_fragments = self.rag_service.search_knowledge(input_text, n_results=1)
+        knowledge_fragments = self.search_knowledge(input_text, n_results=1)
         
         if knowledge_fragments:
             # 從知識片段中識別出可能的症狀
@@ -165,7 +175,7 @@ class SkiDiagnosisService:
         # 如果沒有找到相關練習卡，嘗試RAG檢索
         if not practice_cards:
             # 使用RAG服務檢索相關知識，並生成練習卡
-            knowledge_fragments = self.rag_service.search_knowledge(symptom.name)
+            knowledge_fragments = self.search_knowledge(symptom.name)
             
             # 在簡化實現中，我們不生成新的練習卡，而是返回默認的
             # 在實際實現中，會根據知識片段生成新的練習卡
@@ -0,0 +1,595 @@
+"""
+向量儲存封裝 (RAG-252.4)
+
+包裝 ChromaDB 集合，統一以 NumPy 陣列作為嵌入向量的輸入輸出格式，
+並提供可選的純量量化索引（int8 每向量 scale 或 float16）：
+粗排使用量化向量，前幾名候選再以 float32 原始向量精確重排
+"""
+from typing import List, Dict, Optional, Tuple, Any
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+import weakref
+import logging
+import numpy as np
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+SCORING_BLOCK_ROWS = 16384
+
+
+def normalize_fragment_text(text: str) -> str:
+    """
+    正規化片段文本：NFKC（全形轉半形）、合併空白、去除首尾空白
+
+    只影響雜湊計算，存入集合的文件仍是原文
+    """
+    normalized = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", normalized).strip()
+
+
+def compute_content_hash(text: str, model_name: Optional[str] = None) -> str:
+    """
+    計算片段內容雜湊 (RAG-252.5)
+
+    以正規化文本加上嵌入模型名稱計算 SHA-256；
+    文本或模型任一改變都會得到不同雜湊，表示需要重新向量化
+
+    Args:
+        text: 片段文本
+        model_name: 嵌入模型名稱，預設為 settings.EMBEDDING_MODEL
+
+    Returns:
+        str: 十六進位雜湊字串
+    """
+    model_name = model_name if model_name is not None else settings.EMBEDDING_MODEL
+    payload = f"{model_name}\n{normalize_fragment_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def source_fragment_id(source: str, position: int) -> str:
+    """
+    為缺少ID的片段生成穩定ID：來源名稱 + 在來源中的位置
+
+    不同來源的 snippet_{n} 不會碰撞；內容修改時ID不變，由 upsert 覆寫舊片段，
+    content_hash 只用於判斷是否需要重新向量化
+    """
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    return f"snippet_{digest[:12]}_{position}"
+
+
+def normalize_embeddings(embeddings: Any) -> np.ndarray:
+    """
+    將嵌入向量轉為 float32 二維陣列並做 L2 正規化
+
+    正規化後內積即為餘弦相似度，與集合的 hnsw:space=cosine 一致
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    int8 對稱量化，每個向量各自一個 scale
+
+    Args:
+        embeddings: float32 向量矩陣 (n, dim)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (int8 編碼, float32 scale)
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """還原 int8 編碼為 float32 近似向量"""
+    return codes.astype(np.float32) * scales[:, np.newaxis]
+
+
+class QuantizedIndex:
+    """
+    量化向量索引
+
+    常駐記憶體的只有量化編碼（int8 約為 float32 的 1/4），以倍增容量的緩衝區追加，批次新增為均攤 O(1)；
+    float32 原始向量只存在磁碟上的原始檔（逐列追加或就地覆寫），以 memmap 方式只在重排時讀取候選列
+    """
+
+    def __init__(self, mode: str = "int8", keep_full_precision: bool = True,
+                 full_path: Optional[str] = None):
+        if mode not in ("float16", "int8"):
+            raise ValueError(f"不支援的量化模式: {mode}")
+        self.mode = mode
+        self.keep_full_precision = keep_full_precision
+        self.ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._full_map: Optional[np.memmap] = None
+        self.full_path = full_path
+        if keep_full_precision and full_path is None:
+            # 未指定位置時寫入暫存檔，索引釋放時刪除
+            fd, self.full_path = tempfile.mkstemp(suffix=".f32")
+            os.close(fd)
+            weakref.finalize(self, _remove_file, self.full_path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        return self._codes[:len(self.ids)] if self._codes is not None else None
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self._scales[:len(self.ids)] if self._scales is not None else None
+
+    @property
+    def full(self) -> Optional[np.memmap]:
+        """磁碟上的 float32 原始向量（唯讀 memmap，列數與 ids 相同）"""
+        if not self.keep_full_precision or not self.ids:
+            return None
+        rows = len(self.ids)
+        if self._full_map is None or self._full_map.shape[0] != rows:
+            self._full_map = np.memmap(self.full_path, dtype=np.float32, mode="r",
+                                       shape=(rows, self._codes.shape[1]))
+        return self._full_map
+
+    def _encode(self, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.mode == "int8":
+            return quantize_int8(matrix)
+        return matrix.astype(np.float16), None
+
+    def _reserve(self, rows: int, codes: np.ndarray, scales: Optional[np.ndarray]):
+        """確保緩衝區容量至少 rows 列，不足時倍增"""
+        if self._codes is None:
+            self._codes = np.empty((rows, codes.shape[1]), dtype=codes.dtype)
+            self._scales = np.empty(rows, dtype=np.float32) if scales is not None else None
+            return
+        capacity = self._codes.shape[0]
+        if capacity >= rows:
+            return
+        capacity = max(rows, capacity * 2)
+        grown = np.empty((capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+        grown[:len(self.ids)] = self._codes[:len(self.ids)]
+        self._codes = grown
+        if self._scales is not None:
+            grown_scales = np.empty(capacity, dtype=np.float32)
+            grown_scales[:len(self.ids)] = self._scales[:len(self.ids)]
+            self._scales = grown_scales
+
+    def _write_full(self, positions: List[int], matrix: np.ndarray):
+        """覆寫磁碟上既有列的原始向量"""
+        row_bytes = matrix.shape[1] * 4
+        with open(self.full_path, "r+b") as f:
+            for position, row in zip(positions, matrix):
+                f.seek(position * row_bytes)
+                f.write(row.tobytes())
+        self._full_map = None
+
+    def _append_full(self, matrix: np.ndarray):
+        """在磁碟原始檔尾端追加原始向量"""
+        with open(self.full_path, "r+b" if os.path.exists(self.full_path) else "w+b") as f:
+            f.seek(len(self.ids) * matrix.shape[1] * 4)
+            f.write(np.ascontiguousarray(matrix).tobytes())
+            f.truncate()
+        self._full_map = None
+
+    def upsert(self, ids: List[str], embeddings: Any):
+        """
+        新增或覆寫向量
+
+        Args:
+            ids: 片段ID列表
+            embeddings: 與 ids 對齊的向量矩陣
+        """
+        matrix = normalize_embeddings(embeddings)
+        if len(ids) != matrix.shape[0]:
+            raise ValueError("ids 與 embeddings 數量不一致")
+
+        codes, scales = self._encode(matrix)
+
+        # 已存在的ID直接覆寫該列，其餘附加到尾端（同一批內重複的ID以最後一個為準）
+        existing, new_rows, batch_positions = [], [], {}
+        for i, fid in enumerate(ids):
+            if fid in self._positions:
+                existing.append((i, self._positions[fid]))
+            elif fid in batch_positions:
+                new_rows[batch_positions[fid]] = i
+            else:
+                batch_positions[fid] = len(new_rows)
+                new_rows.append(i)
+
+        if existing:
+            src, dst = zip(*existing)
+            src, dst = list(src), list(dst)
+            self._codes[dst] = codes[src]
+            if scales is not None:
+                self._scales[dst] = scales[src]
+            if self.keep_full_precision:
+                self._write_full(dst, matrix[src])
+
+        if new_rows:
+            start = len(self.ids)
+            self._reserve(start + len(new_rows), codes, scales)
+            self._codes[start:start + len(new_rows)] = codes[new_rows]
+            if scales is not None:
+                self._scales[start:start + len(new_rows)] = scales[new_rows]
+            if self.keep_full_precision:
+                self._append_full(matrix[new_rows])
+            for i in new_rows:
+                self._positions[ids[i]] = len(self.ids)
+                self.ids.append(ids[i])
+
+    def approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """以量化向量計算近似餘弦相似度"""
+        codes = self.codes
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        # 分塊轉型計算，暫存的 float32 區塊大小固定，不隨索引成長
+        for start in range(0, len(self.ids), SCORING_BLOCK_ROWS):
+            block = codes[start:start + SCORING_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + len(block)] = block @ query
+        if self.mode == "int8":
+            # 編碼內積再乘回每向量 scale，不需還原整個矩陣
+            scores *= self.scales
+        return scores
+
+    def search(self, query_embedding: Any, k: int = 5,
+               rescore_candidates: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        相似度搜尋
+
+        Args:
+            query_embedding: 查詢向量
+            k: 返回結果數量
+            rescore_candidates: 以 float32 重排的候選數量，0 表示不重排
+
+        Returns:
+            List[Tuple[str, float]]: (片段ID, 餘弦相似度)，依相似度降序
+        """
+        if not self.ids or k <= 0:
+            return []
+
+        query = normalize_embeddings(query_embedding)[0]
+        if rescore_candidates is None:
+            rescore_candidates = settings.QUANTIZATION_RESCORE_CANDIDATES
+
+        scores = self.approximate_scores(query)
+        n_candidates = min(len(self.ids), max(k, rescore_candidates))
+        candidates = _top_k(scores, n_candidates)
+
+        full = self.full
+        if full is not None and rescore_candidates > 0:
+            # 精確重排：只讀取候選列，memmap 下不會載入整個矩陣
+            rows = np.sort(candidates)
+            exact = np.asarray(full[rows], dtype=np.float32) @ query
+            order = np.argsort(-exact)[:k]
+            return [(self.ids[rows[i]], float(exact[i])) for i in order]
+
+        return [(self.ids[i], float(scores[i])) for i in candidates[:k]]
+
+    def get_vectors(self, ids: List[str]) -> np.ndarray:
+        """取出指定ID的向量（有 float32 原始向量時使用原始向量，否則還原量化值）"""
+        rows = [self._positions[fid] for fid in ids]
+        full = self.full
+        if full is not None:
+            return np.asarray(full[rows], dtype=np.float32)
+        if self.mode == "int8":
+            return dequantize_int8(self._codes[rows], self._scales[rows])
+        return self._codes[rows].astype(np.float32)
+
+    def nbytes(self) -> Dict[str, int]:
+        """回報常駐記憶體（含緩衝區預留容量）與磁碟上原始向量的位元組數"""
+        resident = 0
+        if self._codes is not None:
+            resident += self._codes.nbytes
+        if self._scales is not None:
+            resident += self._scales.nbytes
+        return {
+            "resident": resident,
+            "full_precision": len(self.ids) * self._codes.shape[1] * 4
+            if self.keep_full_precision and self._codes is not None else 0
+        }
+
+    def save(self, directory: str, name: str):
+        """
+        持久化索引（先寫暫存檔再替換，避免中途失敗留下半份檔案）
+
+        原始向量寫入時已在磁碟上，此處只在原始檔不在目標位置時複製一次
+        """
+        if self._codes is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f"{name}.{self.mode}")
+
+        arrays = {"codes": self.codes}
+        if self._scales is not None:
+            arrays["scales"] = self.scales
+        for key, array in arrays.items():
+            tmp_path = f"{prefix}.{key}.tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, f"{prefix}.{key}.npy")
+
+        full_path = f"{prefix}.full.f32"
+        if (self.keep_full_precision
+                and os.path.abspath(self.full_path) != os.path.abspath(full_path)):
+            shutil.copyfile(self.full_path, f"{full_path}.tmp")
+            os.replace(f"{full_path}.tmp", full_path)
+            self.full_path = full_path
+            self._full_map = None
+
+        tmp_path = f"{prefix}.ids.tmp.json"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.ids, f, ensure_ascii=False)
+        os.replace(tmp_path, f"{prefix}.ids.json")
+
+    @classmethod
+    def load(cls, directory: str, name: str, mode: str = "int8") -> Optional["QuantizedIndex"]:
+        """載入索引，量化編碼讀入記憶體，float32 向量以 memmap 開啟"""
+        prefix = os.path.join(directory, f"{name}.{mode}")
+        if not os.path.exists(f"{prefix}.ids.json"):
+            return None
+
+        full_path = f"{prefix}.full.f32"
+        if not os.path.exists(full_path) and os.path.exists(f"{prefix}.full.npy"):
+            # 舊版以 .npy 保存原始向量，轉為可追加的原始檔
+            np.load(f"{prefix}.full.npy", mmap_mode="r").astype(np.float32).tofile(full_path)
+        keep_full_precision = os.path.exists(full_path)
+
+        index = cls(mode, keep_full_precision=keep_full_precision,
+                    full_path=full_path if keep_full_precision else None)
+        with open(f"{prefix}.ids.json", "r", encoding="utf-8") as f:
+            index.ids = json.load(f)
+        index._positions = {fid: i for i, fid in enumerate(index.ids)}
+        index._codes = np.load(f"{prefix}.codes.npy")
+        if os.path.exists(f"{prefix}.scales.npy"):
+            index._scales = np.load(f"{prefix}.scales.npy")
+        if keep_full_precision:
+            expected = len(index.ids) * index._codes.shape[1] * 4
+            size = os.path.getsize(full_path)
+            if size > expected:
+                # 上次保存後追加、尚未記入 ids 的列捨棄
+                os.truncate(full_path, expected)
+            elif size < expected:
+                logger.warning(f"量化索引原始向量不完整（{size} < {expected} 位元組），停用精確重排")
+                index.keep_full_precision = False
+        return index
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """取分數最高的 k 個位置（降序）"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class VectorStore:
+    """
+    向量儲存 (RAG-252.4)
+
+    ChromaDB 集合仍是文件與元數據的主要存放處；
+    啟用量化時，查詢改走常駐記憶體的量化索引，再回集合取文件與元數據。
+    量化索引只是集合的衍生資料：片段數與集合不一致或命中已不存在的片段時，由集合重建。
+    片段數只在開啟後第一次查詢、刪除片段後，以及每 INDEX_DRIFT_CHECK_SECONDS 秒比對一次，
+    不會每次查詢都呼叫 collection.count()
+    """
+
+    def __init__(self, collection, quantization: Optional[str] = None,
+                 index_dir: Optional[str] = None):
+        self.collection = collection
+        self.quantization = quantization or settings.EMBEDDING_QUANTIZATION
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"不支援的量化模式: {self.quantization}")
+        self.index_dir = index_dir or os.path.join(settings.VECTOR_DB_PATH, "quantized")
+        self._dirty = False
+        self._rebuild_lock = threading.Lock()
+        # 載入的索引可能在程序停止期間與集合分歧，第一次查詢時先比對
+        self._stale = True
+        self._drift_checked_at = 0.0
+
+        self.index: Optional[QuantizedIndex] = None
+        if self.quantization != "none":
+            self.index = (QuantizedIndex.load(self.index_dir, collection.name, self.quantization)
+                          or QuantizedIndex(self.quantization))
+
+    def add(self, ids: List[str], embeddings: Any, documents: List[str],
+            metadatas: List[Dict[str, Any]]):
+        """新增向量（ID已存在時由 ChromaDB 拋出錯誤）"""
+        self.collection.add(
+            embeddings=_to_chroma(embeddings),
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
+        )
+        if self.index is not None:
+            self.index.upsert(ids, embeddings)
+            self._dirty = True
+
+    def upsert(self, ids: List[str], embeddings: Any, documents: List[str],
+               metadatas: List[Dict[str, Any]]):
+        """新增或覆寫向量"""
+        self.collection.upsert(
+            embeddings=_to_chroma(embeddings),
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
+        )
+        if self.index is not None:
+            self.index.upsert(ids, embeddings)
+            self._dirty = True
+
+    def delete(self, ids: List[str]):
+        """刪除片段；量化索引不支援移除，標記為待比對，下次查詢時重建"""
+        if not ids:
+            return
+        self.collection.delete(ids=ids)
+        self._stale = True
+
+    def _check_drift(self):
+        """索引標記為待比對或距上次比對超過間隔時，比對片段數，不一致則重建"""
+        now = time.monotonic()
+        if not self._stale and now - self._drift_checked_at < settings.INDEX_DRIFT_CHECK_SECONDS:
+            return
+        self._stale = False
+        self._drift_checked_at = now
+        if len(self.index) != self.collection.count():
+            self.rebuild_index(reason="片段數與集合不一致")
+
+    def source_fragment_ids(self, source: str, from_position: int = 0) -> List[str]:
+        """查詢來源中位置不小於 from_position 的無ID片段（來源縮短後用於清除尾端舊片段）"""
+        existing = self.collection.get(
+            where={"$and": [{"fragment_source": source},
+                            {"fragment_position": {"$gte": from_position}}]},
+            include=[]
+        )
+        return list(existing["ids"])
+
+    def get_content_hashes(self, ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        查詢既有片段的內容雜湊
+
+        Returns:
+            Dict[str, Optional[str]]: 片段ID -> content_hash（僅包含已存在的片段）
+        """
+        if not ids:
+            return {}
+        existing = self.collection.get(ids=ids, include=["metadatas"])
+        return {
+            fid: (meta or {}).get("content_hash")
+            for fid, meta in zip(existing["ids"], existing["metadatas"])
+        }
+
+    def _query_collection(self, query_embedding: Any, n_results: int,
+                          include_embeddings: bool) -> Dict[str, List[List[Any]]]:
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        return self.collection.query(
+            query_embeddings=_to_chroma(normalize_embeddings(query_embedding)),
+            n_results=n_results,
+            include=include
+        )
+
+    def query(self, query_embedding: Any, n_results: int = 5,
+              include_embeddings: bool = False) -> Dict[str, List[List[Any]]]:
+        """
+        相似度查詢
+
+        量化索引與集合的片段數不一致（例如其他程序寫入集合、或上次寫入後未保存索引）時先重建，
+        片段數依 _check_drift 的間隔比對；
+        命中已不存在於集合的片段時重建索引，本次改由集合查詢（降級策略）
+
+        Args:
+            query_embedding: 查詢向量
+            n_results: 返回結果數量
+            include_embeddings: 是否一併返回命中片段的向量（供上下文打包去重）
+
+        Returns:
+            Dict: 與 collection.query 相同的結構（ids/documents/metadatas/distances[/embeddings]）
+        """
+        if self.index is not None:
+            self._check_drift()
+        index = self.index
+        if index is None or len(index) == 0:
+            return self._query_collection(query_embedding, n_results, include_embeddings)
+
+        hits = index.search(query_embedding, n_results)
+        hit_ids = [fid for fid, _ in hits]
+        fetched = self.collection.get(ids=hit_ids, include=["documents", "metadatas"])
+        by_id = {
+            fid: (doc, meta)
+            for fid, doc, meta in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+        }
+        if len(by_id) < len(hit_ids):
+            self.rebuild_index(reason="命中已不存在的片段")
+            return self._query_collection(query_embedding, n_results, include_embeddings)
+
+        ids, documents, metadatas, distances = [], [], [], []
+        for fid, similarity in hits:
+            doc, meta = by_id[fid]
+            ids.append(fid)
+            documents.append(doc)
+            metadatas.append(meta)
+            distances.append(1 - similarity)
+
+        results = {"ids": [ids], "documents": [documents], "metadatas": [metadatas],
+                   "distances": [distances]}
+        if include_embeddings:
+            results["embeddings"] = [index.get_vectors(ids)]
+        return results
+
+    def rebuild_index(self, page_size: int = 5000, reason: Optional[str] = None):
+        """
+        由 ChromaDB 集合分頁讀取向量重建量化索引並保存，完成後整個替換
+
+        Args:
+            page_size: 每頁讀取的片段數
+            reason: 偵測到索引與集合不一致而重建時的原因（記為警告）；主動重建不需提供
+        """
+        if self.index is None:
+            return
+        with self._rebuild_lock:
+            index = QuantizedIndex(self.quantization)
+            offset = 0
+            while True:
+                page = self.collection.get(include=["embeddings"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                index.upsert(page["ids"], page["embeddings"])
+                offset += len(page["ids"])
+            message = f"已由集合重建量化索引: {len(self.index)} -> {len(index)} 個片段"
+            if reason:
+                logger.warning(f"量化索引{reason}，{message}")
+            else:
+                logger.info(message)
+            self.index = index
+            self._dirty = True
+            self.save()
+
+    def reset_index(self):
+        """清空量化索引（集合重建時使用，避免保留已刪除的片段）"""
+        if self.index is not None:
+            self.index = QuantizedIndex(self.quantization)
+            self._dirty = True
+
+    def save(self):
+        """
+        持久化量化索引（未啟用量化或自上次保存後沒有寫入時不做任何事）
+
+        會重寫整份量化編碼，批次寫入應在全部完成後呼叫一次，不要每批呼叫
+        """
+        if self.index is not None and self._dirty:
+            self.index.save(self.index_dir, self.collection.name)
+            self._dirty = False
+
+
+def _to_chroma(embeddings: Any) -> List[List[float]]:
+    """
+    轉為 ChromaDB 接受的格式
+
+    chromadb 0.4 的驗證只接受 list，這是整條管線唯一轉成 Python list 的地方
+    """
+    return np.asarray(embeddings, dtype=np.float32).tolist()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+大型合成資料產生器
+
+把生產規模形狀的資料寫入 SQLite / PostgreSQL 資料庫（以及選擇性地寫入向量庫），
+讓本機與 CI 可以重現大資料量下的行為：
+- 症狀同義詞與練習卡的熱門程度服從 Zipf 分佈（少數症狀與練習卡佔大部分流量）
+- 會話輸入以隨機中文口語句型組成
+- 回饋可達數百萬筆，created_at 分散在最近 --days 天，星數依練習卡的潛在品質產生，
+  並包含少量 rating=0 的純最愛紀錄（與最愛切換端點寫入的資料一致）
+- 依資料庫方言選擇最快的批次寫入方式：PostgreSQL 使用 COPY，其餘使用 executemany
+
+資料以 --chunk-size 為單位分批產生與寫入，記憶體用量與總筆數無關
+
+用法：
+    python benchmarks/generate_catalog.py --database-url sqlite:///./scale.db --feedback 2000000
+    python benchmarks/generate_catalog.py --database-url postgresql://localhost/turnfix_scale \\
+        --symptoms 500 --cards 20000 --sessions 500000 --feedback 5000000 --drop
+    python benchmarks/generate_catalog.py --database-url sqlite:///./scale.db \\
+        --knowledge 50000 --import-vectors
+"""
+from typing import Any, Dict, Iterator, List, Sequence
+from datetime import datetime, timedelta
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+import numpy as np
+
+# 添加項目根目錄到 Python 路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session as OrmSession
+from backend.database.base import Base
+from backend.models.symptom import Symptom
+from backend.models.practice_card import PracticeCard
+from backend.models.symptom_practice_mapping import SymptomPracticeMapping
+from backend.models.session import Session as SkiSession
+from backend.models.session_feedback import SessionFeedback
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.models.feedback_rollup import PracticeCardFeedbackRollup, SessionFeedbackRollup
+from backend.services.feedback_rollup import rebuild_rollups
+from benchmarks.synthetic_catalog import (
+    BODY_PARTS, PROBLEMS, SITUATIONS, DRILLS, LEVELS, TERRAINS, STYLES, CATEGORIES, CARD_TYPES,
+    SESSION_RATINGS
+)
+
+# 會話輸入的口語句型
+PHRASINGS = [
+    "{situation}{part}{problem}",
+    "{situation}會{part}{problem}",
+    "我{situation}{part}總是{problem}",
+    "最近{situation}好像{part}{problem}",
+    "教練說我{part}{problem}，{situation}特別明顯",
+    "{situation}{part}{problem}怎麼辦",
+    "{part}{problem}，{situation}很容易摔",
+    "請問{situation}{part}{problem}要怎麼練",
+]
+
+TABLES = [
+    Symptom.__table__,
+    PracticeCard.__table__,
+    SymptomPracticeMapping.__table__,
+    SkiSession.__table__,
+    SessionFeedback.__table__,
+    PracticeCardFeedback.__table__,
+]
+
+
+def zipf_weights(n: int, exponent: float) -> np.ndarray:
+    """排名 1..n 的 Zipf 機率"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def phrase(rng: np.random.Generator, part: str, problem: str) -> str:
+    template = PHRASINGS[rng.integers(len(PHRASINGS))]
+    situation = SITUATIONS[rng.integers(len(SITUATIONS))]
+    return template.format(situation=situation, part=part, problem=problem)
+
+
+def pick(rng: np.random.Generator, values: Sequence[str], low: int, high: int) -> str:
+    """隨機取 low~high 個值並編碼為 JSON 字串（與模型的 hybrid 屬性儲存格式一致）"""
+    count = int(rng.integers(low, high + 1))
+    chosen = rng.choice(len(values), min(count, len(values)), replace=False)
+    return json.dumps([values[i] for i in chosen], ensure_ascii=False)
+
+
+class CatalogGenerator:
+    """依參數分批產生各資料表的列"""
+
+    def __init__(self, n_symptoms: int, n_cards: int, cards_per_symptom: int, n_sessions: int,
+                 n_feedback: int, days: int, zipf_exponent: float, seed: int, chunk_size: int):
+        self.n_symptoms = n_symptoms
+        self.n_cards = n_cards
+        self.cards_per_symptom = min(cards_per_symptom, n_cards)
+        self.n_sessions = n_sessions
+        self.n_feedback = n_feedback
+        self.days = days
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(seed)
+        self.end = datetime(2026, 1, 1)
+
+        # 症狀的部位與問題（同義詞與會話輸入共用）
+        self.symptom_terms = [
+            (BODY_PARTS[i % len(BODY_PARTS)], PROBLEMS[(i // len(BODY_PARTS)) % len(PROBLEMS)])
+            for i in range(n_symptoms)
+        ]
+        self.symptom_popularity = zipf_weights(n_symptoms, zipf_exponent)
+        self.card_popularity = zipf_weights(n_cards, zipf_exponent)
+        # 熱門排名與 ID 打散，避免熱門資料全部集中在小 ID
+        self.symptom_rank_to_id = self.rng.permutation(n_symptoms) + 1
+        self.card_rank_to_id = self.rng.permutation(n_cards) + 1
+        # 每張卡的潛在品質，決定星數分佈
+        self.card_quality = self.rng.beta(4, 2, n_cards)
+        # 每張卡一個會話排列 (offset + step * k) % n_sessions + 1（step 與 n_sessions 互質），
+        # 該卡第 k 筆回饋取排列中第 k 個會話，不需記住已用過的（會話, 練習卡）組合
+        self._pair_offset = self.rng.integers(0, n_sessions, n_cards + 1)
+        self._pair_step = self._coprime_steps(n_cards + 1)
+        self._pair_used = np.zeros(n_cards + 1, dtype=np.int64)
+
+    def _coprime_steps(self, size: int) -> np.ndarray:
+        steps = self.rng.integers(1, max(self.n_sessions, 2), size)
+        while True:
+            bad = np.gcd(steps, self.n_sessions) != 1
+            if not bad.any():
+                return steps
+            steps[bad] = self.rng.integers(1, max(self.n_sessions, 2), int(bad.sum()))
+
+    def _timestamps(self, size: int) -> List[datetime]:
+        offsets = self.rng.uniform(0, self.days * 86400, size)
+        return [self.end - timedelta(seconds=float(s)) for s in offsets]
+
+    def symptoms(self) -> Iterator[List[Dict[str, Any]]]:
+        rows = []
+        for i, (part, problem) in enumerate(self.symptom_terms):
+            synonyms = {f"{part}{problem}"}
+            for _ in range(int(self.rng.integers(3, 12))):
+                synonyms.add(phrase(self.rng, part, problem))
+            rows.append({
+                "id": i + 1,
+                "name": f"{part}{problem}-{i + 1}",
+                "synonyms": json.dumps(sorted(synonyms), ensure_ascii=False),
+                "level_scope": pick(self.rng, LEVELS, 1, 3),
+                "terrain_scope": pick(self.rng, TERRAINS, 1, 3),
+                "style_scope": pick(self.rng, STYLES, 1, 2),
+                "category": CATEGORIES[self.rng.integers(len(CATEGORIES))]
+            })
+        yield rows
+
+    def cards(self) -> Iterator[List[Dict[str, Any]]]:
+        for start in range(0, self.n_cards, self.chunk_size):
+            rows = []
+            for card_id in range(start + 1, min(self.n_cards, start + self.chunk_size) + 1):
+                drill = DRILLS[self.rng.integers(len(DRILLS))]
+                part = BODY_PARTS[self.rng.integers(len(BODY_PARTS))]
+                rows.append({
+                    "id": card_id,
+                    "name": f"{drill}練習 #{card_id}",
+                    "goal": f"{SITUATIONS[self.rng.integers(len(SITUATIONS))]}完成{drill}，保持{part}穩定",
+                    "tips": json.dumps([f"{part}放鬆", "先看出口", "節奏一致"], ensure_ascii=False),
+                    "pitfalls": f"避免{part}{PROBLEMS[self.rng.integers(len(PROBLEMS))]}",
+                    "dosage": (f"{TERRAINS[self.rng.integers(len(TERRAINS))]} "
+                               f"{self.rng.integers(4, 11)} 次/趟"),
+                    "level": pick(self.rng, LEVELS, 1, 2),
+                    "terrain": pick(self.rng, TERRAINS, 1, 3),
+                    "self_check": json.dumps([f"{part}是否穩定？"], ensure_ascii=False),
+                    "card_type": CARD_TYPES[self.rng.integers(len(CARD_TYPES))]
+                })
+            yield rows
+
+    def mappings(self) -> Iterator[List[Dict[str, Any]]]:
+        rows = []
+        for symptom_id in range(1, self.n_symptoms + 1):
+            ranks = self.rng.choice(self.n_cards, self.cards_per_symptom, replace=False,
+                                    p=self.card_popularity)
+            for order, rank in enumerate(ranks):
+                rows.append({"symptom_id": symptom_id,
+                             "practice_id": int(self.card_rank_to_id[rank]),
+                             "order": order})
+            if len(rows) >= self.chunk_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def sessions(self) -> Iterator[List[Dict[str, Any]]]:
+        for start in range(0, self.n_sessions, self.chunk_size):
+            size = min(self.chunk_size, self.n_sessions - start)
+            ranks = self.rng.choice(self.n_symptoms, size, p=self.symptom_popularity)
+            rows = []
+            for offset, rank in enumerate(ranks):
+                symptom_id = int(self.symptom_rank_to_id[rank])
+                part, problem = self.symptom_terms[symptom_id - 1]
+                rows.append({
+                    "id": start + offset + 1,
+                    "user_type": "教練" if self.rng.random() < 0.1 else "學員",
+                    "input_text": phrase(self.rng, part, problem),
+                    "level_slot": LEVELS[self.rng.integers(len(LEVELS))],
+                    "terrain_slot": TERRAINS[self.rng.integers(len(TERRAINS))],
+                    "style_slot": None,
+                    "chosen_symptom_id": symptom_id,
+                    "feedback_rating": None,
+                    "feedback_text": None
+                })
+            yield rows
+
+    def session_feedback(self) -> Iterator[List[Dict[str, Any]]]:
+        # 約六成會話留下整體回饋
+        for start in range(0, self.n_sessions, self.chunk_size):
+            size = min(self.chunk_size, self.n_sessions - start)
+            mask = self.rng.random(size) < 0.6
+            session_ids = np.nonzero(mask)[0] + start + 1
+            ratings = self.rng.choice(len(SESSION_RATINGS), len(session_ids), p=[0.15, 0.35, 0.5])
+            delayed = self.rng.random(len(session_ids)) < 0.3
+            created = self._timestamps(len(session_ids))
+            yield [{
+                "session_id": int(session_id),
+                "rating": SESSION_RATINGS[rating],
+                "feedback_text": None,
+                "feedback_type": "delayed" if is_delayed else "immediate",
+                "created_at": created_at,
+                "updated_at": created_at
+            } for session_id, rating, is_delayed, created_at
+                in zip(session_ids, ratings, delayed, created)]
+
+    def _unique_feedback_pairs(self, practice_ids: np.ndarray):
+        """
+        為每筆練習卡回饋分配會話，返回（會話ID, 保留遮罩）
+
+        取各卡會話排列中尚未使用的下一個位置，（會話, 練習卡）不會重複；
+        只需每張卡一個計數器，記憶體與回饋筆數無關。某卡的回饋數超過會話數時多出的捨棄
+        """
+        order = np.argsort(practice_ids, kind="stable")
+        sorted_ids = practice_ids[order]
+        # 本批中每筆是該卡的第幾筆
+        occurrence = np.empty(len(practice_ids), dtype=np.int64)
+        occurrence[order] = np.arange(len(practice_ids)) - np.searchsorted(sorted_ids, sorted_ids)
+        position = self._pair_used[practice_ids] + occurrence
+        self._pair_used += np.bincount(practice_ids, minlength=self.n_cards + 1)
+        session_ids = (self._pair_offset[practice_ids]
+                       + self._pair_step[practice_ids] * position) % self.n_sessions + 1
+        return session_ids, position < self.n_sessions
+
+    def card_feedback(self) -> Iterator[List[Dict[str, Any]]]:
+        for start in range(0, self.n_feedback, self.chunk_size):
+            size = min(self.chunk_size, self.n_feedback - start)
+            ranks = self.rng.choice(self.n_cards, size, p=self.card_popularity)
+            practice_ids = self.card_rank_to_id[ranks]
+            quality = self.card_quality[practice_ids - 1]
+            ratings = np.clip(np.rint(self.rng.normal(1 + 4 * quality, 0.9)), 1, 5).astype(int)
+            favorites = self.rng.random(size) < 0.05 + 0.25 * quality
+            # 最愛切換端點在沒有評分時寫入 rating=0
+            favorite_only = self.rng.random(size) < 0.02
+            ratings[favorite_only] = 0
+            favorites[favorite_only] = True
+            created = self._timestamps(size)
+            # 每個（會話, 練習卡）只有一筆回饋（唯一約束）：會話依各卡的排列依序分配，
+            # 熱門卡片的會話用盡時捨棄，實際筆數可能略少於 n_feedback
+            session_ids, keep = self._unique_feedback_pairs(practice_ids)
+            session_ids, practice_ids = session_ids[keep], practice_ids[keep]
+            ratings, favorites = ratings[keep], favorites[keep]
+            created = [created_at for created_at, kept in zip(created, keep) if kept]
+            yield [{
+                "session_id": int(session_id),
+                "practice_id": int(practice_id),
+                "rating": int(rating),
+                "feedback_text": None,
+                "is_favorite": bool(favorite),
+                "created_at": created_at,
+                "updated_at": created_at
+            } for session_id, practice_id, rating, favorite, created_at
+                in zip(session_ids, practice_ids, ratings, favorites, created)]
+
+    def knowledge(self, n_fragments: int) -> Iterator[Dict[str, Any]]:
+        """審核後知識片段格式（可交給 knowledge_import_service 導入）"""
+        for i in range(n_fragments):
+            rank = int(self.rng.choice(self.n_symptoms, p=self.symptom_popularity))
+            part, problem = self.symptom_terms[int(self.symptom_rank_to_id[rank]) - 1]
+            drill = DRILLS[self.rng.integers(len(DRILLS))]
+            yield {
+                "id": f"synthetic-{i + 1}",
+                "symptom": f"{part}{problem}",
+                "practice_tips": [
+                    f"{drill}時{part}保持穩定",
+                    f"{SITUATIONS[self.rng.integers(len(SITUATIONS))]}先看出口"
+                ],
+                "pitfalls": [f"避免{part}{PROBLEMS[self.rng.integers(len(PROBLEMS))]}"],
+                "dosage": (f"{TERRAINS[self.rng.integers(len(TERRAINS))]} "
+                           f"{self.rng.integers(4, 11)} 次/趟"),
+                "source_snippet": phrase(self.rng, part, problem),
+                "source_file": "synthetic",
+                "review_status": "approved",
+                "confidence": round(float(self.rng.uniform(0.6, 1.0)), 3)
+            }
+
+
+def _copy_rows(connection, table, rows: List[Dict[str, Any]]):
+    """PostgreSQL：以 COPY FROM STDIN 寫入（psycopg2）"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    quoted = ", ".join(f'"{c}"' for c in columns)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {table.name} ({quoted}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')', buffer
+        )
+    finally:
+        cursor.close()
+
+
+def bulk_insert(engine, table, chunks: Iterator[List[Dict[str, Any]]]) -> int:
+    """依方言選擇最快的寫入方式，每個分批一個交易"""
+    use_copy = engine.dialect.name == "postgresql"
+    total = 0
+    start = time.perf_counter()
+    for rows in chunks:
+        if not rows:
+            continue
+        with engine.begin() as connection:
+            if use_copy:
+                _copy_rows(connection, table, rows)
+            else:
+                connection.execute(table.insert(), rows)
+        total += len(rows)
+        elapsed = time.perf_counter() - start
+        print(f"  {table.name}: {total} 筆（{total / elapsed:,.0f} 筆/秒）", end="\r", flush=True)
+    print(f"  {table.name}: {total} 筆，耗時 {time.perf_counter() - start:.1f} 秒")
+    return total
+
+
+def reset_sequences(engine):
+    """COPY 寫入明確 ID 後，讓 PostgreSQL 的自增序列接續最大值"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for table in TABLES:
+            if "id" in table.c:
+                connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+                ))
+
+
+def create_engine_for_load(url: str):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    if engine.dialect.name == "sqlite":
+        # 批次寫入期間關閉同步與回滾日誌的落盤，寫入速度約快一個數量級
+        @event.listens_for(engine, "connect")
+        def _fast_sqlite(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA journal_mode=MEMORY")
+            cursor.close()
+    return engine
+
+
+def generate(engine, generator: CatalogGenerator, drop: bool = False) -> Dict[str, int]:
+    """建立資料表並依外鍵順序寫入全部資料"""
+    rollup_tables = [PracticeCardFeedbackRollup.__table__, SessionFeedbackRollup.__table__]
+    if drop:
+        Base.metadata.drop_all(bind=engine, tables=TABLES + rollup_tables)
+    Base.metadata.create_all(bind=engine, tables=TABLES + rollup_tables)
+
+    counts = {
+        "symptoms": bulk_insert(engine, Symptom.__table__, generator.symptoms()),
+        "practice_cards": bulk_insert(engine, PracticeCard.__table__, generator.cards()),
+        "symptom_practice_mapping": bulk_insert(engine, SymptomPracticeMapping.__table__,
+                                                generator.mappings()),
+        "sessions": bulk_insert(engine, SkiSession.__table__, generator.sessions()),
+        "session_feedback": bulk_insert(engine, SessionFeedback.__table__,
+                                        generator.session_feedback()),
+        "practice_card_feedback": bulk_insert(engine, PracticeCardFeedback.__table__,
+                                              generator.card_feedback()),
+    }
+    reset_sequences(engine)
+
+    # 批次寫入繞過 ORM，彙總表由原始表整批重算
+    db = OrmSession(bind=engine)
+    try:
+        counts.update(rebuild_rollups(db))
+    finally:
+        db.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='大型合成資料產生器')
+    parser.add_argument('--database-url', required=True,
+                        help='目標資料庫（sqlite:///... 或 postgresql://...）')
+    parser.add_argument('--symptoms', type=int, default=300, help='症狀數')
+    parser.add_argument('--cards', type=int, default=10000, help='練習卡數')
+    parser.add_argument('--cards-per-symptom', type=int, default=20, help='每個症狀映射的練習卡數')
+    parser.add_argument('--sessions', type=int, default=200000, help='會話數')
+    parser.add_argument('--feedback', type=int, default=1000000, help='練習卡回饋筆數')
+    parser.add_argument('--days', type=int, default=365, help='回饋時間分佈的天數')
+    parser.add_argument('--zipf', type=float, default=1.1, help='熱門程度的 Zipf 指數')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='每批產生與寫入的筆數')
+    parser.add_argument('--seed', type=int, default=42, help='隨機種子')
+    parser.add_argument('--drop', action='store_true', help='寫入前刪除既有資料表')
+    parser.add_argument('--knowledge', type=int, default=0, help='產生的知識片段數（寫成 JSONL）')
+    parser.add_argument('--knowledge-output', default='synthetic_knowledge.jsonl', help='知識片段輸出路徑')
+    parser.add_argument('--import-vectors', action='store_true', help='產生後導入向量庫（需要嵌入模型與 ChromaDB）')
+    args = parser.parse_args()
+
+    # 每個批次寫入都會超過慢查詢門檻
+    logging.getLogger("backend.core.query_stats").setLevel(logging.ERROR)
+
+    generator = CatalogGenerator(args.symptoms, args.cards, args.cards_per_symptom, args.sessions,
+                                 args.feedback, args.days, args.zipf, args.seed, args.chunk_size)
+    engine = create_engine_for_load(args.database_url)
+    write_mode = 'COPY' if engine.dialect.name == 'postgresql' else 'executemany'
+    print(f"寫入 {engine.dialect.name}（{write_mode}）")
+    counts = generate(engine, generator, drop=args.drop)
+    print(json.dumps(counts, ensure_ascii=False))
+
+    if args.knowledge:
+        with open(args.knowledge_output, 'w', encoding='utf-8') as f:
+            for fragment in generator.knowledge(args.knowledge):
+                f.write(json.dumps(fragment, ensure_ascii=False) + "\n")
+        print(f"知識片段: {args.knowledge} 筆 -> {args.knowledge_output}")
+
+        if args.import_vectors:
+            from backend.services.knowledge_import_service import stream_import_knowledge
+            result = stream_import_knowledge(args.knowledge_output)
+            print(f"向量庫導入: {result.get('imported_count', result)}")
+
+
+if __name__ == "__main__":
+    main()
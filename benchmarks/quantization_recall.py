@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+向量量化召回率基準測試
+
+以固定種子產生的合成嵌入向量，比較 float16 / int8（有無 float32 重排）
+相對於 float32 精確搜尋的 recall@k 與常駐記憶體用量
+
+用法：
+    python benchmarks/quantization_recall.py --size 50000 --dim 384 --output quant.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+# 添加項目根目錄到 Python 路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.vector_store import QuantizedIndex, normalize_embeddings
+
+
+def make_corpus(size: int, dim: int, n_queries: int, seed: int):
+    """產生帶群聚結構的向量（接近真實句向量的分佈）與擾動後的查詢"""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, size // 200)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, n_clusters, size)
+    corpus = centers[assignments] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    picks = rng.integers(0, size, n_queries)
+    queries = corpus[picks] + 0.4 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return normalize_embeddings(corpus), normalize_embeddings(queries)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int):
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run_variant(mode: str, rescore: int, corpus, queries, truth, k: int):
+    ids = [str(i) for i in range(len(corpus))]
+    index = QuantizedIndex(mode, keep_full_precision=rescore > 0)
+    index.upsert(ids, corpus)
+
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found = {int(fid) for fid, _ in index.search(query, k, rescore_candidates=rescore)}
+        hits += len(found & set(expected.tolist()))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "rescore_candidates": rescore,
+        f"recall@{k}": round(hits / truth.size, 4),
+        "resident_bytes": index.nbytes()["resident"],
+        "query_ms": round(elapsed / len(queries) * 1000, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='向量量化召回率基準測試')
+    parser.add_argument('--size', type=int, default=20000, help='向量數量')
+    parser.add_argument('--dim', type=int, default=384, help='向量維度')
+    parser.add_argument('--queries', type=int, default=200, help='查詢數量')
+    parser.add_argument('--k', type=int, default=10, help='recall@k')
+    parser.add_argument('--seed', type=int, default=42, help='隨機種子')
+    parser.add_argument('--output', '-o', help='輸出 JSON 結果路徑')
+    args = parser.parse_args()
+
+    corpus, queries = make_corpus(args.size, args.dim, args.queries, args.seed)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    results = {
+        "size": args.size,
+        "dim": args.dim,
+        "float32_bytes": corpus.nbytes,
+        "variants": [
+            run_variant("float16", 0, corpus, queries, truth, args.k),
+            run_variant("int8", 0, corpus, queries, truth, args.k),
+            run_variant("int8", 50, corpus, queries, truth, args.k),
+            run_variant("int8", 200, corpus, queries, truth, args.k),
+        ]
+    }
+
+    for variant in results["variants"]:
+        ratio = results["float32_bytes"] / variant["resident_bytes"]
+        print(f"{variant['mode']:>7} rescore={variant['rescore_candidates']:<4} "
+              f"recall@{args.k}={variant[f'recall@{args.k}']:.4f} "
+              f"記憶體縮減 {ratio:.2f}x  {variant['query_ms']} ms/查詢")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+推薦 API 基準測試
+
+在合成目錄（見 synthetic_catalog）上量測：
+- micro：identify_symptom、filter_cards_by_conditions、rank_cards、card_to_dict 的單次耗時
+- load：以進程內 ASGI 傳輸層（不經網路）並發呼叫 /ski-tips、/followup-needs、
+  /admin/feedback-analytics/summary，記錄吞吐量與 p50/p95/p99 延遲；
+  回應內容逐一驗證，狀態碼 200 但內容不符，或請求期間服務記錄了 ERROR（降級路徑吞掉例外）都計為錯誤
+
+結果寫成 JSON；提供 --baseline 時與基準結果比較，延遲變慢超過 --tolerance 即以結束碼 1 結束；
+load 測試有錯誤時同樣以結束碼 1 結束
+
+用法：
+    python benchmarks/recommendation_bench.py --symptoms 200 --cards 2000 -o before.json
+    python benchmarks/recommendation_bench.py --symptoms 200 --cards 2000 --baseline before.json
+    python benchmarks/recommendation_bench.py --suite load --concurrency 32 --requests 2000
+"""
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+# 添加項目根目錄到 Python 路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from backend.database.base import get_db
+from backend.database.repositories import SymptomRepository, SymptomPracticeMappingRepository
+from backend.services.simple_ski_tips import (
+    identify_symptom,
+    filter_cards_by_conditions,
+    rank_cards,
+    card_to_dict
+)
+from benchmarks.synthetic_catalog import (
+    build_catalog,
+    create_benchmark_db,
+    seed_database,
+    LEVELS,
+    TERRAINS
+)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """樣本（秒）轉為毫秒統計"""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": round(pick(0.5), 4),
+        "p95_ms": round(pick(0.95), 4),
+        "p99_ms": round(pick(0.99), 4)
+    }
+
+
+def time_calls(func: Callable[[], Any], iterations: int, warmup: int = 5) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+class CachedSymptomRepository:
+    """只回傳預先載入的症狀，讓 identify_symptom 的量測不含資料庫往返"""
+
+    def __init__(self, symptoms):
+        self.symptoms = symptoms
+
+    def get_all(self):
+        return self.symptoms
+
+
+def run_micro(SessionLocal, iterations: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        symptoms = SymptomRepository(db).get_all()
+        queries = [rng.choice(s.synonyms) for s in rng.sample(symptoms, min(50, len(symptoms)))]
+        cached_repo = CachedSymptomRepository(symptoms)
+        mapping_repo = SymptomPracticeMappingRepository(db)
+        cards = mapping_repo.get_practice_cards_by_symptom(symptoms[len(symptoms) // 2].id)
+        # 排序與轉換以較大的候選集量測，放大差異
+        all_cards = cards * max(1, 200 // max(1, len(cards)))
+        level, terrain = rng.choice(LEVELS), rng.choice(TERRAINS)
+        query_iter = iter(queries * (iterations // len(queries) + 2))
+
+        return {
+            "identify_symptom": time_calls(
+                lambda: identify_symptom(cached_repo, next(query_iter)), iterations),
+            "filter_cards_by_conditions": time_calls(
+                lambda: filter_cards_by_conditions(db, all_cards, level, terrain, None),
+                iterations),
+            "rank_cards": time_calls(lambda: rank_cards(all_cards, level, terrain), iterations),
+            "card_to_dict": time_calls(lambda: [card_to_dict(card) for card in cards], iterations)
+        }
+    finally:
+        db.close()
+
+
+def load_requests(symptom_queries: List[str],
+                  rng: random.Random) -> Dict[str, Callable[[], Dict[str, Any]]]:
+    """各端點的請求產生器"""
+    def ski_tips():
+        return {"method": "POST", "url": "/api/v1/ski-tips",
+                "params": {"input_text": rng.choice(symptom_queries), "level": rng.choice(LEVELS)}}
+
+    def followup_needs():
+        return {"method": "POST", "url": "/api/v1/followup-needs",
+                "json": {"input_text": rng.choice(symptom_queries)}}
+
+    def feedback_summary():
+        return {"method": "GET", "url": "/api/v1/admin/feedback-analytics/summary"}
+
+    return {"ski_tips": ski_tips, "followup_needs": followup_needs,
+            "feedback_summary": feedback_summary}
+
+
+def _validate_ski_tips(body: Dict[str, Any]) -> bool:
+    cards = body.get("recommended_cards")
+    return isinstance(cards, list) and body.get("count") == len(cards)
+
+
+def _validate_followup_needs(body: Dict[str, Any]) -> bool:
+    needs = body.get("followup_needs")
+    return (isinstance(needs, dict) and isinstance(needs.get("need_followup"), bool)
+            and 0.0 <= needs.get("confidence", -1) <= 1.0
+            and isinstance(needs.get("missing_slots"), list)
+            and isinstance(needs.get("questions"), list)
+            and (not needs["need_followup"] or bool(needs["questions"])))
+
+
+def _validate_feedback_summary(body: Dict[str, Any]) -> bool:
+    return (isinstance(body.get("rating_count"), int)
+            and isinstance(body.get("total_feedback_count"), int))
+
+
+# 各端點的回應內容檢查（狀態碼 200 不代表結果正確）
+RESPONSE_VALIDATORS: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+    "ski_tips": _validate_ski_tips,
+    "followup_needs": _validate_followup_needs,
+    "feedback_summary": _validate_feedback_summary
+}
+
+
+class ErrorLogCounter(logging.Handler):
+    """計算期間記錄的 ERROR（服務的降級路徑記錄錯誤後仍返回 200）"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+        self.first_message: Optional[str] = None
+
+    def emit(self, record: logging.LogRecord):
+        self.count += 1
+        if self.first_message is None:
+            self.first_message = record.getMessage()
+
+
+async def drive_endpoint(client: httpx.AsyncClient, make_request: Callable[[], Dict[str, Any]],
+                         total: int, concurrency: int,
+                         validate: Optional[Callable[[Dict[str, Any]], bool]] = None
+                         ) -> Dict[str, Any]:
+    """以固定並發數送出 total 個請求，狀態碼錯誤、內容驗證失敗與記錄的 ERROR 都計為錯誤"""
+    latencies: List[float] = []
+    errors = invalid = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors, invalid
+        for _ in remaining:
+            request = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                if response.status_code >= 400:
+                    errors += 1
+                else:
+                    body = response.json()
+                    failed = body.get("status", "success") != "success"
+                    if failed or (validate and not validate(body)):
+                        invalid += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    error_log = ErrorLogCounter()
+    logging.getLogger().addHandler(error_log)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        logging.getLogger().removeHandler(error_log)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        **summarize(latencies),
+        "errors": errors + invalid + error_log.count,
+        "invalid_responses": invalid,
+        "logged_errors": error_log.count,
+        "requests_per_second": round(total / elapsed, 2)
+    }
+    if error_log.first_message:
+        result["first_logged_error"] = error_log.first_message
+    return result
+
+
+def run_load(SessionLocal, symptom_queries: List[str], total: int, concurrency: int,
+             endpoints: Optional[List[str]], seed: int) -> Dict[str, Any]:
+    from backend.main import app
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    rng = random.Random(seed)
+    generators = load_requests(symptom_queries, rng)
+
+    async def run_all():
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_request in generators.items():
+                if endpoints and name not in endpoints:
+                    continue
+                # 暖機，避免首個請求的延遲計入
+                await drive_endpoint(client, make_request, min(20, total), 1)
+                results[name] = await drive_endpoint(client, make_request, total, concurrency,
+                                                     RESPONSE_VALIDATORS.get(name))
+        return results
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        return asyncio.run(run_all())
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    與基準結果比較 p50 / p95 延遲
+
+    Returns:
+        List[str]: 變慢超過容忍度的項目
+    """
+    regressions = []
+    for suite in ("micro", "load"):
+        for name, current in results.get(suite, {}).items():
+            previous = baseline.get(suite, {}).get(name)
+            if not previous:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                before, after = previous[metric], current[metric]
+                change = (after - before) / before if before else 0.0
+                marker = "退步" if change > tolerance else ("進步" if change < -tolerance else "持平")
+                print(f"{suite:>5} {name:<28} {metric:<7} {before:>10.4f} -> {after:>10.4f} ms "
+                      f"({change:+.1%}) {marker}")
+                if change > tolerance:
+                    regressions.append(f"{suite}.{name}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推薦 API 基準測試')
+    parser.add_argument('--suite', choices=['micro', 'load', 'all'], default='all', help='執行的測試組')
+    parser.add_argument('--symptoms', type=int, default=100, help='合成症狀數')
+    parser.add_argument('--cards', type=int, default=1000, help='合成練習卡數')
+    parser.add_argument('--cards-per-symptom', type=int, default=8, help='每個症狀映射的練習卡數')
+    parser.add_argument('--sessions', type=int, default=500, help='合成會話數（回饋分析資料量）')
+    parser.add_argument('--iterations', type=int, default=500, help='micro 測試每個函數的呼叫次數')
+    parser.add_argument('--requests', type=int, default=300, help='load 測試每個端點的請求數')
+    parser.add_argument('--concurrency', type=int, default=8, help='load 測試並發數')
+    parser.add_argument('--endpoints', nargs='*',
+                        help='只測試指定端點（ski_tips / followup_needs / feedback_summary）')
+    parser.add_argument('--database-url', help='使用既有資料庫（例如 generate_catalog 產生的大型資料），不寫入合成目錄')
+    parser.add_argument('--seed', type=int, default=42, help='隨機種子')
+    parser.add_argument('--output', '-o', help='輸出 JSON 結果路徑')
+    parser.add_argument('--baseline', help='基準結果 JSON，比較後延遲退步即以結束碼 1 結束')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='允許的延遲退步比例')
+    args = parser.parse_args()
+
+    # 大量請求時慢查詢日誌會淹沒輸出
+    logging.getLogger("backend.core.query_stats").setLevel(logging.ERROR)
+
+    SessionLocal = create_benchmark_db(args.database_url)
+    if args.database_url is None:
+        catalog = build_catalog(args.symptoms, args.cards, args.cards_per_symptom, args.sessions,
+                                seed=args.seed)
+        seed_database(SessionLocal(), catalog)
+    db = SessionLocal()
+    symptom_queries = [synonym for symptom in SymptomRepository(db).get_all()
+                       for synonym in symptom.synonyms]
+    db.close()
+
+    results: Dict[str, Any] = {
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()}
+    }
+    if args.suite in ("micro", "all"):
+        results["micro"] = run_micro(SessionLocal, args.iterations, args.seed)
+        for name, stats in results["micro"].items():
+            print(f"micro {name:<28} p50 {stats['p50_ms']:.4f} ms  p95 {stats['p95_ms']:.4f} ms")
+    if args.suite in ("load", "all"):
+        results["load"] = run_load(SessionLocal, symptom_queries, args.requests, args.concurrency,
+                                   args.endpoints, args.seed)
+        for name, stats in results["load"].items():
+            print(f"load  {name:<28} {stats['requests_per_second']:>8} req/s  "
+                  f"p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms  "
+                  f"p99 {stats['p99_ms']:.2f} ms  錯誤 {stats['errors']}")
+            if stats.get("first_logged_error"):
+                print(f"load  {name:<28} 服務記錄的錯誤: {stats['first_logged_error']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failed = [name for name, stats in results.get("load", {}).items() if stats["errors"]]
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"延遲退步: {', '.join(regressions)}")
+            sys.exit(1)
+    if failed:
+        print(f"回應錯誤: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
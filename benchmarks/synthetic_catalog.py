@@ -0,0 +1,163 @@
+"""
+合成練習卡目錄
+
+以固定種子產生 N 個症狀、M 張練習卡、症狀↔練習卡映射與回饋資料，
+供基準測試重現相同的資料形狀（同一組參數永遠得到同一份資料）
+
+用法：
+    from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+    SessionLocal = create_benchmark_db()
+    catalog = build_catalog(n_symptoms=200, n_cards=2000, seed=42)
+    seed_database(SessionLocal(), catalog)
+"""
+from typing import Any, Dict, List, Optional
+import os
+import random
+import sys
+
+# 添加項目根目錄到 Python 路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.database.base import Base
+from backend.models.symptom import Symptom
+from backend.models.practice_card import PracticeCard
+from backend.models.symptom_practice_mapping import SymptomPracticeMapping
+from backend.models.session import Session as SkiSession
+from backend.models.session_feedback import SessionFeedback
+from backend.models.practice_card_feedback import PracticeCardFeedback
+
+LEVELS = ["初級", "中級", "高級"]
+TERRAINS = ["綠線", "藍線", "黑線", "粉雪", "蘑菇"]
+STYLES = ["平花", "Park", "刻滑", "自由滑"]
+CATEGORIES = ["技術", "裝備"]
+CARD_TYPES = ["drill", "tip", "concept"]
+SESSION_RATINGS = ["not_applicable", "partially_applicable", "applicable"]
+
+BODY_PARTS = ["重心", "膝蓋", "上半身", "肩膀", "視線", "手臂", "腳踝", "髖部", "外腳", "內腳"]
+PROBLEMS = ["太後", "太前", "僵硬", "不穩", "晃動", "過度旋轉", "壓不住", "卡住", "太早", "太晚"]
+SITUATIONS = ["轉彎時", "換刃時", "入彎", "出彎", "加速時", "陡坡上", "煞車時", "連續彎"]
+DRILLS = ["外腳承重", "中立站姿", "視線外緣", "提前換刃", "刻滑橫移", "落葉飄", "跳躍換刃", "壓膝轉彎"]
+
+
+def make_synonyms(rng: random.Random, part: str, problem: str, count: int) -> List[str]:
+    """以情境、部位與問題的組合產生口語同義詞"""
+    synonyms = {f"{part}{problem}"}
+    while len(synonyms) < count:
+        situation = rng.choice(SITUATIONS)
+        synonyms.add(rng.choice([
+            f"{situation}{part}{problem}",
+            f"{situation}會{part}{problem}",
+            f"{part}總是{problem}",
+        ]))
+    return sorted(synonyms)
+
+
+def build_catalog(n_symptoms: int = 100, n_cards: int = 1000, cards_per_symptom: int = 8,
+                  n_sessions: int = 500, feedback_per_session: int = 3,
+                  seed: int = 42) -> Dict[str, List[Any]]:
+    """
+    產生合成目錄（ORM 物件，尚未寫入資料庫）
+
+    Returns:
+        Dict[str, List[Any]]: symptoms / cards / mappings / sessions /
+                              session_feedback / card_feedback
+    """
+    rng = random.Random(seed)
+
+    symptoms = []
+    for i in range(n_symptoms):
+        part = BODY_PARTS[i % len(BODY_PARTS)]
+        problem = PROBLEMS[(i // len(BODY_PARTS)) % len(PROBLEMS)]
+        symptoms.append(Symptom(
+            id=i + 1,
+            name=f"{part}{problem}-{i + 1}",
+            category=rng.choice(CATEGORIES),
+            synonyms=make_synonyms(rng, part, problem, rng.randint(2, 6)),
+            level_scope=rng.sample(LEVELS, rng.randint(1, len(LEVELS))),
+            terrain_scope=rng.sample(TERRAINS, rng.randint(1, 3)),
+            style_scope=rng.sample(STYLES, rng.randint(1, 2))
+        ))
+
+    cards = []
+    for i in range(n_cards):
+        drill = rng.choice(DRILLS)
+        cards.append(PracticeCard(
+            id=i + 1,
+            name=f"{drill}練習 #{i + 1}",
+            goal=(f"在{rng.choice(TERRAINS)}完成{drill}，"
+                  f"{rng.choice(SITUATIONS)}保持{rng.choice(BODY_PARTS)}穩定"),
+            tips=[f"{rng.choice(BODY_PARTS)}放鬆", f"{rng.choice(SITUATIONS)}先看出口", "節奏一致"],
+            pitfalls=f"避免{rng.choice(BODY_PARTS)}{rng.choice(PROBLEMS)}",
+            dosage=f"{rng.choice(TERRAINS)} {rng.randint(4, 10)} 次/趟 ×{rng.randint(2, 4)} 趟",
+            level=rng.sample(LEVELS, rng.randint(1, 2)),
+            terrain=rng.sample(TERRAINS, rng.randint(1, 3)),
+            self_check=[f"{rng.choice(BODY_PARTS)}是否{rng.choice(PROBLEMS)}？"],
+            card_type=rng.choice(CARD_TYPES)
+        ))
+
+    mappings = []
+    per_symptom = min(cards_per_symptom, n_cards)
+    for symptom in symptoms:
+        for order, card_id in enumerate(rng.sample(range(1, n_cards + 1), per_symptom)):
+            mappings.append(SymptomPracticeMapping(symptom_id=symptom.id, practice_id=card_id,
+                                                   order=order))
+
+    sessions, session_feedback, card_feedback = [], [], []
+    for i in range(n_sessions):
+        symptom = rng.choice(symptoms)
+        sessions.append(SkiSession(
+            id=i + 1,
+            user_type=rng.choice(["學員", "教練"]),
+            input_text=rng.choice(symptom.synonyms),
+            level_slot=rng.choice(LEVELS),
+            terrain_slot=rng.choice(TERRAINS),
+            chosen_symptom_id=symptom.id
+        ))
+        session_feedback.append(SessionFeedback(
+            session_id=i + 1,
+            rating=rng.choice(SESSION_RATINGS),
+            feedback_type=rng.choice(["immediate", "delayed"])
+        ))
+        for card_id in rng.sample(range(1, n_cards + 1), min(feedback_per_session, n_cards)):
+            card_feedback.append(PracticeCardFeedback(
+                session_id=i + 1,
+                practice_id=card_id,
+                rating=rng.randint(1, 5),
+                is_favorite=rng.random() < 0.2
+            ))
+
+    return {
+        "symptoms": symptoms,
+        "cards": cards,
+        "mappings": mappings,
+        "sessions": sessions,
+        "session_feedback": session_feedback,
+        "card_feedback": card_feedback
+    }
+
+
+def create_benchmark_db(url: Optional[str] = None) -> sessionmaker:
+    """建立基準測試用資料庫（預設為進程內共用的 SQLite 記憶體資料庫）"""
+    if url is None:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                               poolclass=StaticPool)
+    else:
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        engine = create_engine(url, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_database(db, catalog: Dict[str, List[Any]]):
+    """依外鍵順序寫入目錄（完成後關閉會話）"""
+    try:
+        for key in ("symptoms", "cards", "sessions", "mappings", "session_feedback",
+                    "card_feedback"):
+            db.add_all(catalog[key])
+            db.flush()
+        db.commit()
+    finally:
+        db.close()
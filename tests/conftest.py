@@ -0,0 +1,27 @@
+"""
+共用測試夾具
+"""
+from contextlib import contextmanager
+import pytest
+from backend.core.query_stats import capture_queries
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    斷言區塊內的 SQL 查詢次數不超過上限，防止 N+1 回歸 (API-210)
+
+    用法：
+        def test_favorites(client, assert_max_queries):
+            with assert_max_queries(2):
+                client.get("/api/v1/user/favorite-cards")
+    """
+    @contextmanager
+    def _assert_max_queries(limit: int):
+        with capture_queries() as stats:
+            yield stats
+        assert stats.count <= limit, (
+            f"執行了 {stats.count} 次查詢，上限 {limit}:\n" + "\n".join(stats.statements)
+        )
+
+    return _assert_max_queries
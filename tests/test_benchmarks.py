@@ -0,0 +1,104 @@
+"""
+基準測試工具的冒煙測試
+"""
+import asyncio
+import logging
+import httpx
+from backend.models.symptom import Symptom
+from benchmarks.recommendation_bench import (
+    RESPONSE_VALIDATORS,
+    compare,
+    drive_endpoint,
+    run_load,
+    run_micro
+)
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+def test_catalog_is_reproducible():
+    first = build_catalog(n_symptoms=10, n_cards=30, n_sessions=5, seed=7)
+    second = build_catalog(n_symptoms=10, n_cards=30, n_sessions=5, seed=7)
+
+    assert [s.synonyms for s in first["symptoms"]] == [s.synonyms for s in second["symptoms"]]
+    assert len(first["mappings"]) == 10 * 8
+    assert len(first["card_feedback"]) == 5 * 3
+
+
+def test_micro_suite_runs_on_seeded_catalog():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=10, n_cards=30, n_sessions=5))
+
+    results = run_micro(SessionLocal, iterations=5, seed=1)
+    assert set(results) == {"identify_symptom", "filter_cards_by_conditions", "rank_cards",
+                            "card_to_dict"}
+    assert all(stats["count"] == 5 for stats in results.values())
+
+
+def test_load_suite_validates_response_bodies():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=10, n_cards=30, n_sessions=5))
+    db = SessionLocal()
+    queries = [synonym for symptom in db.query(Symptom).all() for synonym in symptom.synonyms]
+    db.close()
+
+    results = run_load(SessionLocal, queries, total=10, concurrency=2, endpoints=None, seed=1)
+    assert {name: stats["errors"] for name, stats in results.items()} == {
+        "ski_tips": 0, "followup_needs": 0, "feedback_summary": 0
+    }
+
+
+def test_drive_endpoint_counts_invalid_bodies_and_logged_errors():
+    async def handler(request):
+        logging.getLogger("backend.services.example").error("降級")
+        return httpx.Response(200, json={"status": "success", "followup_needs": {}})
+
+    async def drive():
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive_endpoint(client, lambda: {"method": "GET", "url": "/"}, 3, 1,
+                                        RESPONSE_VALIDATORS["followup_needs"])
+
+    stats = asyncio.run(drive())
+    assert (stats["invalid_responses"], stats["logged_errors"], stats["errors"]) == (3, 3, 6)
+
+
+def test_compare_flags_latency_regressions():
+    baseline = {"micro": {"rank_cards": {"p50_ms": 1.0, "p95_ms": 2.0}}}
+    current = {"micro": {"rank_cards": {"p50_ms": 1.05, "p95_ms": 3.0}}}
+
+    assert compare(current, baseline, tolerance=0.10) == ["micro.rank_cards.p95_ms"]
+
+
+def test_generator_fills_schema_with_zipfian_feedback():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import StaticPool
+    from benchmarks.generate_catalog import CatalogGenerator, generate
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    generator = CatalogGenerator(n_symptoms=20, n_cards=50, cards_per_symptom=5, n_sessions=2000,
+                                 n_feedback=2000, days=30, zipf_exponent=1.1, seed=3,
+                                 chunk_size=500)
+    counts = generate(engine, generator)
+
+    assert counts["practice_card_feedback"] == 2000
+    with engine.connect() as connection:
+        top_card_share = connection.execute(text(
+            "SELECT MAX(c) * 1.0 / SUM(c) FROM "
+            "(SELECT COUNT(*) AS c FROM practice_card_feedback GROUP BY practice_id)"
+        )).scalar()
+    # 均勻分佈時單張卡約佔 2%，Zipf 分佈下最熱門的卡遠高於此
+    assert top_card_share > 0.1
+
+
+def test_generator_feedback_pairs_are_unique_when_sessions_run_out():
+    from benchmarks.generate_catalog import CatalogGenerator
+
+    generator = CatalogGenerator(n_symptoms=5, n_cards=8, cards_per_symptom=3, n_sessions=12,
+                                 n_feedback=300, days=5, zipf_exponent=1.1, seed=1, chunk_size=37)
+    pairs = [(row["session_id"], row["practice_id"])
+             for chunk in generator.card_feedback() for row in chunk]
+
+    # 熱門卡片的會話用盡後捨棄，其餘組合不重複且會話ID在範圍內
+    assert len(pairs) == len(set(pairs)) <= 8 * 12
+    assert {session_id for session_id, _ in pairs} <= set(range(1, 13))
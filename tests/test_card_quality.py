@@ -0,0 +1,84 @@
+"""
+練習卡品質評分測試 (API-211)
+"""
+import math
+import numpy as np
+import pytest
+from backend.database.repositories import FeedbackRollupRepository, PracticeCardFeedbackRepository
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.services.card_quality import CardQualityScorer, score_histograms, wilson_lower_bound
+from backend.services.feedback_service import (
+    create_practice_card_feedback,
+    get_practice_card_feedback_stats,
+)
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+@pytest.fixture
+def db():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=4, n_cards=12, n_sessions=30, seed=11))
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_vectorized_scores_match_manual_formulas():
+    histograms = np.array([[0, 0, 0, 1, 3], [2, 0, 0, 0, 0], [0, 0, 0, 0, 0]])
+    feedback_counts = np.array([5, 2, 1])
+    favorite_counts = np.array([4, 0, 1])
+
+    scores = score_histograms(histograms, feedback_counts, favorite_counts, prior_weight=2, z=1.96)
+
+    ratings = [4, 5, 5, 5]
+    prior_mean = (sum(ratings) + 2) / 6
+    assert scores["prior_mean"] == pytest.approx(prior_mean)
+    assert scores["bayesian_rating"][0] == pytest.approx((2 * prior_mean + sum(ratings)) / (2 + 4))
+    # 沒有評分的卡片等於全體平均
+    assert scores["bayesian_rating"][2] == pytest.approx(prior_mean)
+
+    mean = sum(ratings) / 4
+    sd = math.sqrt(sum((r - mean) ** 2 for r in ratings) / 3)
+    assert scores["rating_ci_low"][0] == pytest.approx(mean - 1.96 * sd / 2)
+    assert scores["rating_ci_high"][0] == 5.0
+    assert (scores["rating_ci_low"][2], scores["rating_ci_high"][2]) == (1.0, 5.0)
+
+    p, n, z = 4 / 5, 5, 1.96
+    spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    expected = (p + z * z / (2 * n) - spread) / (1 + z * z / n)
+    assert scores["favorite_lower_bound"][0] == pytest.approx(expected)
+    assert wilson_lower_bound(np.array([1]), np.array([1]), z)[0] < 0.25
+
+
+def test_favorite_only_rows_do_not_drag_average(db):
+    # 每個（會話, 練習卡）只有一筆回饋，取尚未回饋練習卡 2 的會話
+    rated = {row.session_id for row in db.query(PracticeCardFeedback).filter_by(practice_id=2)}
+    sessions = [session_id for session_id in range(1, 31) if session_id not in rated][:4]
+    create_practice_card_feedback(db, session_id=sessions[0], practice_id=2, rating=5)
+    for session_id in sessions[1:]:
+        PracticeCardFeedbackRepository(db).set_favorite(session_id, 2, True)
+
+    raw = PracticeCardFeedbackRepository(db).get_summary_stats(2)
+    stats = get_practice_card_feedback_stats(db, 2)
+
+    assert stats["average_rating"] == round(raw["rating_sum"] / raw["rated_count"], 2)
+    assert stats["rating_count"] == raw["rated_count"]
+    assert stats["feedback_count"] == raw["rating_count"]
+    assert stats["feedback_count"] - stats["rating_count"] >= 3
+    rollup_histograms = FeedbackRollupRepository(db).get_rating_histograms()
+    assert rollup_histograms == PracticeCardFeedbackRepository(db).get_rating_histograms()
+
+
+def test_scorer_caches_and_bumps_version(db):
+    scorer = CardQualityScorer(ttl_seconds=3600)
+    first = scorer.get(db)
+    assert scorer.get(db) is first
+
+    create_practice_card_feedback(db, session_id=1, practice_id=1, rating=5)
+    second = scorer.refresh(db)
+
+    assert second.version == first.version + 1
+    ranking = second.ranking()
+    assert len(ranking) == len(second)
+    ratings = [row["bayesian_rating"] for row in ranking]
+    assert ratings == sorted(ratings, reverse=True)
@@ -0,0 +1,75 @@
+"""
+推薦排序分數表測試 (API-212)
+"""
+import pytest
+from backend.models.practice_card import PracticeCard
+from backend.services.card_ranking import RankingScores, RankingScoreStore, smooth_success
+from backend.services.feedback_service import create_practice_card_feedback
+from backend.services.simple_ski_tips import rank_cards
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+def make_card(card_id, level=None, terrain=None):
+    return PracticeCard(id=card_id, name=f"卡片{card_id}", goal="目標", level=level or [],
+                        terrain=terrain or [], card_type="技術")
+
+
+def ranked_ids(cards, level, terrain, **kwargs):
+    return [card.id for card in rank_cards(cards, level, terrain, **kwargs)]
+
+
+def test_hierarchical_success_smoothing():
+    # 卡片 1：症狀 1 下 3/4 高分、症狀 2 下 0/1；卡片 2：症狀 1 下 1/1
+    global_rate, card_success, symptom_success = smooth_success(
+        [1, 2, 1], [1, 1, 2], [3, 0, 1], [4, 1, 1], prior_weight=2
+    )
+
+    assert global_rate == pytest.approx(4 / 6)
+    card_rate = (2 * global_rate + 3) / (2 + 5)
+    assert card_success[1] == pytest.approx(card_rate)
+    assert symptom_success[(1, 1)] == pytest.approx((2 * card_rate + 3) / (2 + 4))
+    assert symptom_success[(2, 1)] < card_success[1] < symptom_success[(1, 1)]
+
+
+def test_rank_cards_uses_scores_and_falls_back_without_them():
+    cards = [make_card(1, ["初級"]), make_card(2, ["初級"]), make_card(3)]
+    scores = RankingScores(1, quality={1: 0.9, 2: 0.7}, default_quality=0.5,
+                           card_success={1: 0.5, 2: 0.5}, symptom_success={(7, 2): 0.95},
+                           default_success=0.5)
+
+    # 沒有分數表時只依等級匹配，同分依 id
+    empty = RankingScores(0, {}, 0, {}, {}, 0)
+    assert ranked_ids(cards, "初級", None, scores=empty) == [1, 2, 3]
+    # 一般情況品質高的卡片在前；症狀 7 下卡片 2 成功率高而超前
+    assert ranked_ids(cards, "初級", None, scores=scores) == [1, 2, 3]
+    assert ranked_ids(cards, "初級", None, symptom_id=7, scores=scores) == [2, 1, 3]
+
+
+def test_card_id_only_breaks_ties():
+    scores = RankingScores(1, quality={201: 1.0, 1000: 0.0}, default_quality=0.5,
+                           card_success={201: 1.0, 1000: 0.0}, symptom_success={},
+                           default_success=0.5)
+    cards = [make_card(1000), make_card(201)]
+    assert ranked_ids(cards, None, None, scores=scores) == [201, 1000]
+
+
+def test_store_refresh_swaps_table_and_ranking_needs_no_queries(assert_max_queries):
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=4, n_cards=12, n_sessions=20, seed=13))
+    db = SessionLocal()
+    try:
+        store = RankingScoreStore()
+        first = store.refresh(db)
+        feedback = create_practice_card_feedback(db, session_id=1, practice_id=5, rating=5)
+        symptom_id = feedback.session.chosen_symptom_id
+        second = store.refresh(db)
+
+        assert store.current is second and second.version == first.version + 1
+        assert second.success_of(symptom_id, 5) > first.success_of(symptom_id, 5)
+
+        cards = [make_card(card_id) for card_id in range(1, 13)]
+        with assert_max_queries(0):
+            ranked = rank_cards(cards, None, None, symptom_id=symptom_id, scores=store.current)
+        assert len(ranked) == 12
+    finally:
+        db.close()
@@ -0,0 +1,80 @@
+"""
+上下文打包測試 (RAG-254.4)
+"""
+from backend.services.context_packer import pack_context, estimate_tokens
+from backend.services.rag_service import optimize_prompt_length
+
+
+def fragment(fid, text, similarity, embedding=None):
+    result = {"id": fid, "text": text, "similarity": similarity}
+    if embedding is not None:
+        result["embedding"] = embedding
+    return result
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("外腳承重") == 4
+    assert estimate_tokens("carving") == 2
+    assert estimate_tokens("") == 0
+
+
+def test_fragments_are_never_cut():
+    fragments = [fragment(f"f{i}", "外腳承重再過中立" * 10, 0.9 - i * 0.1) for i in range(5)]
+    packed = pack_context(fragments, "轉彎時重心太後", {"level": "中級"}, token_budget=200)
+
+    assert packed["tokens_used"] <= 200
+    assert 0 < len(packed["included_ids"]) < 5
+    for line in packed["context"].split("\n"):
+        if line.startswith("知識片段"):
+            assert line.endswith("外腳承重再過中立")
+
+
+def test_near_duplicates_dropped_keeping_higher_score():
+    fragments = [
+        fragment("a", "視線看向外緣", 0.7, [1.0, 0.0, 0.0]),
+        fragment("b", "視線看向外側", 0.9, [0.99, 0.01, 0.0]),
+        fragment("c", "外腳承重", 0.8, [0.0, 1.0, 0.0]),
+    ]
+    packed = pack_context(fragments, "入彎晚", None, token_budget=500, dedup_threshold=0.95)
+
+    assert packed["dropped_duplicates"] == ["a"]
+    assert packed["included_ids"] == ["b", "c"]
+
+
+def test_greedy_by_score_per_token_prefers_dense_fragments():
+    long_text = "長" * 120
+    fragments = [
+        fragment("long", long_text, 0.9),
+        fragment("short1", "外腳 70–80%", 0.6),
+        fragment("short2", "中立後換刃", 0.6),
+    ]
+    packed = pack_context(fragments, "問題", None, token_budget=80)
+
+    assert set(packed["included_ids"]) == {"short1", "short2"}
+    assert packed["dropped_over_budget"] == ["long"]
+
+
+def test_section_priorities_decide_what_survives_small_budget():
+    fragments = [fragment("k", "重心放在外腳", 0.9)]
+    user_first = pack_context(fragments, "我的問題", None, token_budget=18)
+    knowledge_first = pack_context(fragments, "我的問題", None, token_budget=18,
+                                   section_priorities={"knowledge": 0, "user_input": 1})
+
+    assert user_first["context"].startswith("使用者輸入")
+    assert knowledge_first["included_ids"] == ["k"]
+    assert "使用者輸入" not in knowledge_first["context"]
+
+
+def test_optimize_prompt_length_cuts_at_line_boundary():
+    prompt = "\n".join(f"知識片段 {i}: 外腳承重再過中立" for i in range(20))
+    optimized = optimize_prompt_length(prompt, max_length=60)
+
+    assert estimate_tokens(optimized) <= 60
+    assert all(line.endswith("中立") for line in optimized.split("\n")[:-1])
+
+
+def test_optimize_prompt_length_truncates_single_long_line():
+    optimized = optimize_prompt_length("外腳承重" * 100 + "\n第二行", max_length=50)
+
+    assert estimate_tokens(optimized) <= 50
+    assert optimized.startswith("外腳承重") and optimized.endswith("(內容已截斷)")
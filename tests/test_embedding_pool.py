@@ -0,0 +1,37 @@
+"""
+多進程向量化測試
+"""
+import numpy as np
+from backend.services.embedding_pool import EmbeddingPool
+
+
+class HashModel:
+    """以文本內容生成固定向量，並記錄所在進程的執行緒設定"""
+
+    def encode(self, texts, batch_size=32):
+        import os
+        threads = float(os.environ.get("OMP_NUM_THREADS", 0))
+        return np.array([[len(t), sum(map(ord, t)) % 97, threads] for t in texts], dtype=np.float32)
+
+
+def load_hash_model(model_name):
+    return HashModel()
+
+
+def test_pool_preserves_input_order():
+    texts = [f"片段{i}" * (i % 7 + 1) for i in range(103)]
+    pool = EmbeddingPool(2, model_name="fake", threads_per_worker=1, model_loader=load_hash_model)
+    with pool:
+        result = pool.encode(texts, batch_size=8)
+
+    expected = HashModel().encode(texts)[:, :2]
+    np.testing.assert_array_equal(result[:, :2], expected)
+    # 工作進程在載入模型前已限制執行緒數
+    assert set(result[:, 2]) == {1.0}
+
+
+def test_pool_starts_lazily():
+    pool = EmbeddingPool(2, model_name="fake", model_loader=load_hash_model)
+    assert pool.encode([]).shape[0] == 0
+    assert pool._pool is None
+    pool.close()
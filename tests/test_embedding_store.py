@@ -0,0 +1,121 @@
+"""
+嵌入向量持久化儲存測試
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from backend.services.embedding_store import EmbeddingStore, CachedEncoder
+
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32):
+        self.encoded.extend(texts)
+        return np.array([[len(t), 2.0, 3.0, 4.0] for t in texts], dtype=np.float32)
+
+
+def test_put_and_get_survive_reopen(tmp_path):
+    store = EmbeddingStore("m", path=str(tmp_path))
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    store.put_many(["a", "b", "c"], vectors)
+    store.close()
+
+    reopened = EmbeddingStore("m", path=str(tmp_path))
+    found = reopened.get_many(["c", "a", "missing"])
+    assert set(found) == {"a", "c"}
+    np.testing.assert_array_equal(found["c"], vectors[2])
+    assert len(reopened) == 3
+
+
+def test_models_do_not_share_entries(tmp_path):
+    EmbeddingStore("model/one", path=str(tmp_path)).put_many(["a"], np.ones((1, 4)))
+    assert EmbeddingStore("model/two", path=str(tmp_path)).get_many(["a"]) == {}
+
+
+def test_existing_hash_is_not_appended_twice(tmp_path, monkeypatch):
+    store = EmbeddingStore("m", path=str(tmp_path))
+    store.put_many(["a"], np.ones((1, 4)))
+    # 判斷是否已存在只查索引，不讀取向量
+    monkeypatch.setattr(store, "_vectors", lambda: pytest.fail("put_many 不應讀取向量"))
+    store.put_many(["a", "b", "b"], np.ones((3, 4)))
+    assert store._row_count() == 2
+
+
+def test_dimension_mismatch_raises(tmp_path):
+    store = EmbeddingStore("m", path=str(tmp_path))
+    store.put_many(["a"], np.ones((1, 4)))
+    with pytest.raises(ValueError):
+        store.put_many(["b"], np.ones((1, 8)))
+
+
+def test_compact_drops_orphans_and_dead_entries(tmp_path):
+    store = EmbeddingStore("m", path=str(tmp_path))
+    vectors = np.arange(16, dtype=np.float32).reshape(4, 4)
+    store.put_many(["a", "b", "c", "d"], vectors)
+    # 模擬寫入向量後、提交索引前中斷留下的孤兒列
+    with open(store.vectors_path, "ab") as f:
+        f.write(np.zeros((1, 4), dtype=np.float32).tobytes())
+
+    result = store.compact(live_hashes=["b", "d"])
+
+    assert result == {"rows_before": 5, "rows_after": 2}
+    found = store.get_many(["a", "b", "d"])
+    assert set(found) == {"b", "d"}
+    np.testing.assert_array_equal(found["d"], vectors[3])
+
+
+def test_uncommitted_tail_is_truncated_on_reopen(tmp_path):
+    store = EmbeddingStore("m", path=str(tmp_path))
+    store.put_many(["a", "b"], np.ones((2, 4)))
+    # 模擬附加向量後、提交索引前中斷：檔尾多出半列與一整列未提交的資料
+    with open(store.vectors_path, "ab") as f:
+        f.write(np.full((1, 6), 9, dtype=np.float32).tobytes())
+    store.close()
+
+    reopened = EmbeddingStore("m", path=str(tmp_path))
+    assert reopened._file_rows() == reopened._row_count() == 2
+    reopened.put_many(["c"], np.full((1, 4), 3, dtype=np.float32))
+    np.testing.assert_array_equal(reopened.get_many(["c"])["c"], np.full(4, 3))
+    np.testing.assert_array_equal(reopened.get_many(["b"])["b"], np.ones(4))
+
+
+def test_store_is_shared_across_threads(tmp_path):
+    store = EmbeddingStore("m", path=str(tmp_path))
+
+    def put(worker):
+        hashes = [f"{worker}-{i}" for i in range(20)]
+        store.put_many(hashes, np.full((20, 4), worker, dtype=np.float32))
+        return store.get_many(hashes)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(put, range(8)))
+
+    assert len(store) == store._row_count() == 160
+    for worker, found in enumerate(results):
+        assert all((vector == worker).all() for vector in found.values())
+
+
+def test_cached_encoder_only_encodes_misses_and_loads_model_lazily(tmp_path):
+    store = EmbeddingStore("m", path=str(tmp_path))
+    model = CountingModel()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return model
+
+    encoder = CachedEncoder(store, model_loader=loader)
+    first = encoder.encode(["甲", "乙乙"], ["h1", "h2"])
+    second = encoder.encode(["甲", "乙乙"], ["h1", "h2"])
+
+    np.testing.assert_array_equal(first, second)
+    assert model.encoded == ["甲", "乙乙"]
+    assert loads == [1]
+
+    # 全部命中時不載入模型
+    cold = CachedEncoder(EmbeddingStore("m", path=str(tmp_path)), model_loader=loader)
+    cold.encode(["乙乙"], ["h2"])
+    assert loads == [1]
+    assert cold.hits == 1 and cold.misses == 0
@@ -0,0 +1,110 @@
+"""
+最愛切換 UPSERT 測試 (API-206.4)
+"""
+import pytest
+from fastapi.testclient import TestClient
+from backend.database.base import get_db
+from backend.main import app
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.services.feedback_rollup import verify_rollups
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+@pytest.fixture
+def session_factory():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=4, n_cards=10, n_sessions=5, seed=19))
+
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield SessionLocal
+    app.dependency_overrides.pop(get_db, None)
+
+
+def unrated_card(SessionLocal, session_id):
+    db = SessionLocal()
+    try:
+        rows = db.query(PracticeCardFeedback).filter_by(session_id=session_id)
+        rated = {row.practice_id for row in rows}
+    finally:
+        db.close()
+    return min(set(range(1, 11)) - rated)
+
+
+def test_toggle_is_one_upsert_and_keeps_rollups(session_factory, assert_max_queries):
+    client = TestClient(app)
+    card = unrated_card(session_factory, 1)
+    url = f"/api/v1/user/favorite-cards/{card}"
+
+    # 新增：回饋 UPSERT + 彙總 UPSERT
+    with assert_max_queries(2):
+        added = client.post(url, json={"is_favorite": True, "session_id": 1}).json()
+    # 狀態相同：UPSERT 不更新任何列，另查一次ID
+    with assert_max_queries(2):
+        again = client.post(url, json={"is_favorite": True, "session_id": 1}).json()
+    # DELETE 端點只有一個 Body 參數（不內嵌），請求主體即為會話ID
+    with assert_max_queries(2):
+        removed = client.request("DELETE", url, json=1).json()
+
+    assert added["feedback"]["is_favorite"] is True
+    assert again["feedback"]["id"] == added["feedback"]["id"]
+    assert removed["feedback"] == {"id": added["feedback"]["id"], "is_favorite": False}
+    assert client.request("DELETE", url, json=1).json()["message"] == "練習卡不在最愛清單中"
+
+    db = session_factory()
+    try:
+        rows = db.query(PracticeCardFeedback).filter_by(session_id=1, practice_id=card).all()
+        assert [(row.rating, row.is_favorite) for row in rows] == [(0, False)]
+        assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+    finally:
+        db.close()
+
+
+def test_toggle_on_rated_feedback_only_flips_favorite(session_factory):
+    db = session_factory()
+    feedback = db.query(PracticeCardFeedback).filter_by(session_id=2, is_favorite=False).first()
+    feedback_id, rating = feedback.id, feedback.rating
+    db.close()
+
+    data = TestClient(app).post(f"/api/v1/user/favorite-cards/{feedback.practice_id}",
+                                json={"is_favorite": True, "session_id": 2}).json()
+
+    db = session_factory()
+    try:
+        updated = db.get(PracticeCardFeedback, feedback_id)
+        assert data["feedback"]["id"] == feedback_id
+        assert (updated.rating, updated.is_favorite) == (rating, True)
+        assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+    finally:
+        db.close()
+
+
+def test_rating_after_favorite_updates_the_same_row(session_factory):
+    client = TestClient(app)
+    card = unrated_card(session_factory, 3)
+    favorite = client.post(f"/api/v1/user/favorite-cards/{card}",
+                           json={"is_favorite": True, "session_id": 3}).json()
+
+    rated = client.post("/api/v1/practice-card-feedback",
+                        json={"session_id": 3, "practice_id": card, "rating": 4,
+                              "feedback_text": "有用"}).json()
+    # 再次只加入最愛（rating=0）不覆蓋星數
+    client.post("/api/v1/practice-card-feedback",
+                json={"session_id": 3, "practice_id": card, "rating": 0})
+
+    assert rated["feedback"]["id"] == favorite["feedback"]["id"]
+    assert (rated["feedback"]["rating"], rated["feedback"]["is_favorite"]) == (4, True)
+    db = session_factory()
+    try:
+        rows = db.query(PracticeCardFeedback).filter_by(session_id=3, practice_id=card).all()
+        stored = [(row.rating, row.feedback_text, row.is_favorite) for row in rows]
+        assert stored == [(4, "有用", True)]
+        assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+    finally:
+        db.close()
@@ -0,0 +1,123 @@
+"""
+回饋分析查詢測試
+"""
+import pytest
+from fastapi.testclient import TestClient
+from backend.database.base import get_db
+from backend.database.repositories import PracticeCardFeedbackRepository, SessionFeedbackRepository
+from backend.main import app
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.models.session_feedback import SessionFeedback
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+@pytest.fixture(scope="module")
+def SessionLocal():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=10, n_cards=40, n_sessions=60, seed=11))
+    return SessionLocal
+
+
+@pytest.fixture
+def db(SessionLocal):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(SessionLocal):
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_practice_card_summary_matches_raw_rows(db):
+    rows = db.query(PracticeCardFeedback).all()
+    stats = PracticeCardFeedbackRepository(db).get_summary_stats()
+
+    assert stats["rating_count"] == len(rows)
+    assert stats["rating_sum"] == sum(r.rating for r in rows)
+    assert stats["favorite_count"] == sum(1 for r in rows if r.is_favorite)
+    assert stats["rating_distribution"][5] == sum(1 for r in rows if r.rating == 5)
+
+    practice_id = rows[0].practice_id
+    per_card = PracticeCardFeedbackRepository(db).get_summary_stats(practice_id)
+    assert per_card["rating_count"] == sum(1 for r in rows if r.practice_id == practice_id)
+
+
+def test_session_summary_matches_raw_rows(db):
+    rows = db.query(SessionFeedback).all()
+    stats = SessionFeedbackRepository(db).get_summary_stats()
+
+    assert stats["total_count"] == len(rows)
+    applicable = sum(1 for r in rows if r.rating == "applicable")
+    delayed = sum(1 for r in rows if r.feedback_type == "delayed")
+    assert stats["rating_distribution"]["applicable"] == applicable
+    assert stats["feedback_type_distribution"]["delayed"] == delayed
+
+
+def test_summary_endpoint_runs_one_query_per_table(client, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.get("/api/v1/admin/feedback-analytics/summary")
+
+    data = response.json()
+    assert data["status"] == "success"
+    assert data["rating_count"] == 60 * 3
+    assert sum(data["rating_distribution"].values()) == data["rating_count"]
+
+
+def test_practice_card_analysis_in_one_query(client, db, assert_max_queries):
+    rows = db.query(PracticeCardFeedback).all()
+    practice_id = rows[0].practice_id
+    card_rows = [r for r in rows if r.practice_id == practice_id]
+
+    with assert_max_queries(1):
+        response = client.get(f"/api/v1/admin/feedback-analytics/practice-cards/{practice_id}")
+
+    data = response.json()
+    assert data["status"] == "success"
+    assert data["card_info"]["id"] == practice_id
+    assert data["rating_count"] == len(card_rows)
+    assert data["favorite_count"] == sum(1 for r in card_rows if r.is_favorite)
+    missing = client.get("/api/v1/admin/feedback-analytics/practice-cards/9999")
+    assert missing.json()["status"] == "error"
+
+
+def test_symptom_analysis_counts_only_sessions_of_that_symptom(client, db, assert_max_queries):
+    from backend.models.session import Session as SkiSession
+    from backend.models.symptom_practice_mapping import SymptomPracticeMapping
+
+    symptom_id = db.query(SkiSession.chosen_symptom_id).first()[0]
+    mapped = {m.practice_id
+              for m in db.query(SymptomPracticeMapping).filter_by(symptom_id=symptom_id)}
+    expected = sum(1 for r in db.query(PracticeCardFeedback).all()
+                   if r.session.chosen_symptom_id == symptom_id and r.practice_id in mapped)
+
+    with assert_max_queries(2):
+        response = client.get(f"/api/v1/admin/feedback-analytics/symptoms/{symptom_id}")
+
+    data = response.json()
+    assert data["symptom_info"]["id"] == symptom_id
+    assert {c["practice_id"] for c in data["related_cards_analysis"]} == mapped
+    assert sum(c["rating_count"] for c in data["related_cards_analysis"]) == expected
+    assert sum(data["session_feedback_distribution"].values()) == db.query(SessionFeedback).join(
+        SkiSession).filter(SkiSession.chosen_symptom_id == symptom_id).count()
+
+
+def test_user_preferences_in_one_query(client, assert_max_queries):
+    with assert_max_queries(1):
+        response = client.get("/api/v1/admin/feedback-analytics/user-preferences")
+
+    data = response.json()
+    assert data["status"] == "success"
+    ratings = [c["avg_rating"] for c in data["top_rated_cards"]]
+    assert ratings == sorted(ratings, reverse=True) and len(ratings) <= 20
+    assert set(data["user_segment_analysis"]) == {"beginner", "intermediate", "advanced"}
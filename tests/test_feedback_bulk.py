@@ -0,0 +1,115 @@
+"""
+批次回饋端點測試 (API-204.6)
+"""
+import pytest
+from fastapi.testclient import TestClient
+from backend.database.base import get_db
+from backend.main import app
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.services.feedback_rollup import verify_rollups
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+@pytest.fixture
+def session_factory():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=4, n_cards=10, n_sessions=10, seed=17))
+
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield SessionLocal
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_bulk_insert_reports_per_item_results(session_factory, assert_max_queries):
+    db = session_factory()
+    rated = {row.practice_id for row in db.query(PracticeCardFeedback).filter_by(session_id=1)}
+    existing = db.query(PracticeCardFeedback).filter_by(session_id=2).first()
+    new_card = min(set(range(1, 11)) - rated)
+    db.close()
+
+    client = TestClient(app)
+    payload = {
+        "session_feedback": [
+            {"session_id": 1, "rating": "applicable", "created_at": "2025-12-20T16:00:00+08:00"},
+            {"session_id": 9999, "rating": "applicable"},
+            {"session_id": 2, "rating": "great"},
+        ],
+        "practice_card_feedback": [
+            {"session_id": 1, "practice_id": new_card, "rating": 5, "is_favorite": True},
+            {"session_id": 1, "practice_id": 9999, "rating": 4},
+            {"session_id": 2, "practice_id": existing.practice_id, "rating": 1},
+            {"session_id": 2, "practice_id": 4, "rating": 7},
+            {"session_id": 1, "practice_id": new_card, "rating": 4},
+        ]
+    }
+
+    # 存在性檢查 2 次 + 載入既有回饋 1 次 + 每表 1 次 INSERT + 每個彙總表 1 次 UPSERT
+    # + 既有回饋的 ORM 更新（UPDATE、會話症狀、彙總 UPSERT）
+    with assert_max_queries(10):
+        data = client.post("/api/v1/feedback/bulk", json=payload).json()
+
+    assert data["status"] == "success"
+    assert data["created"] == {"session_feedback": 1, "practice_card_feedback": 1}
+    assert data["updated"] == {"practice_card_feedback": 1}
+    assert data["failed"] == 5
+    assert [row["status"] for row in data["session_feedback"]] == ["success", "error", "error"]
+    assert [row["status"] for row in data["practice_card_feedback"]] == [
+        "success", "error", "success", "error", "error"]
+    assert data["practice_card_feedback"][2] == {
+        "index": 2, "status": "success", "id": existing.id, "updated": True}
+
+    db = session_factory()
+    try:
+        created = db.get(PracticeCardFeedback, data["practice_card_feedback"][0]["id"])
+        assert (created.practice_id, created.rating, created.is_favorite) == (new_card, 5, True)
+        assert db.get(PracticeCardFeedback, existing.id).rating == 1
+        assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+    finally:
+        db.close()
+
+
+def test_bulk_rejects_oversized_batches(session_factory, monkeypatch):
+    from backend.core.config import settings
+    monkeypatch.setattr(settings, "FEEDBACK_BULK_MAX_ITEMS", 1)
+    response = TestClient(app).post("/api/v1/feedback/bulk", json={
+        "session_feedback": [{"session_id": 1, "rating": "applicable"}] * 2
+    })
+    assert response.json()["status"] == "error"
+
+
+def test_bulk_merges_into_existing_feedback(session_factory):
+    db = session_factory()
+    rated = db.query(PracticeCardFeedback).filter(PracticeCardFeedback.session_id == 4,
+                                                  PracticeCardFeedback.rating > 0).first()
+    rated_id, rating = rated.id, rated.rating
+    existing = {row.practice_id for row in db.query(PracticeCardFeedback).filter_by(session_id=4)}
+    card = min(set(range(1, 11)) - existing)
+    db.close()
+
+    client = TestClient(app)
+    favorite_id = client.post(f"/api/v1/user/favorite-cards/{card}",
+                              json={"is_favorite": True, "session_id": 4}).json()["feedback"]["id"]
+    data = client.post("/api/v1/feedback/bulk", json={"practice_card_feedback": [
+        # 離線評分不帶最愛欄位：不取消最愛
+        {"session_id": 4, "practice_id": card, "rating": 4},
+        # 僅加入最愛（rating=0）：保留既有星數
+        {"session_id": 4, "practice_id": rated.practice_id, "rating": 0, "is_favorite": True},
+    ]}).json()
+
+    assert data["updated"] == {"practice_card_feedback": 2}
+    db = session_factory()
+    try:
+        favorite = db.get(PracticeCardFeedback, favorite_id)
+        rated = db.get(PracticeCardFeedback, rated_id)
+        assert (favorite.rating, favorite.is_favorite) == (4, True)
+        assert (rated.rating, rated.is_favorite) == (rating, True)
+        assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+    finally:
+        db.close()
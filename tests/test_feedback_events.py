@@ -0,0 +1,136 @@
+"""
+回饋事件日誌與背景物化測試 (API-204.7)
+"""
+import pytest
+from fastapi.testclient import TestClient
+from backend.core.config import settings
+from backend.database.base import get_db
+from backend.main import app
+from backend.models.feedback_event import FeedbackEvent
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.models.session_feedback import SessionFeedback
+from backend.services.feedback_events import get_event_log_status, materialize_feedback_events
+from backend.services.feedback_rollup import verify_rollups
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    monkeypatch.setattr(settings, "FEEDBACK_EVENT_LOG_ENABLED", True)
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=4, n_cards=10, n_sessions=10, seed=23))
+
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield SessionLocal
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_writes_only_append_until_materialized(session_factory, assert_max_queries):
+    db = session_factory()
+    rated = {row.practice_id for row in db.query(PracticeCardFeedback).filter_by(session_id=3)}
+    card = min(set(range(1, 11)) - rated)
+    feedback_counts = (db.query(SessionFeedback).count(), db.query(PracticeCardFeedback).count())
+    db.close()
+
+    client = TestClient(app)
+    # 追加事件只需一個 INSERT
+    with assert_max_queries(1):
+        accepted = client.post("/api/v1/session-feedback",
+                               json={"session_id": 3, "rating": "applicable"}).json()
+    client.post("/api/v1/practice-card-feedback",
+                json={"session_id": 3, "practice_id": card, "rating": 2, "feedback_text": "太難"})
+    bulk = client.post("/api/v1/feedback/bulk", json={"practice_card_feedback": [
+        {"session_id": 3, "practice_id": card, "rating": 5, "is_favorite": True},
+        {"session_id": 3, "practice_id": 9999, "rating": 4},
+    ]}).json()
+
+    assert accepted["status"] == "accepted"
+    assert bulk["status"] == "accepted" and len(bulk["practice_card_feedback"]) == 2
+
+    db = session_factory()
+    try:
+        counts = (db.query(SessionFeedback).count(), db.query(PracticeCardFeedback).count())
+        assert counts == feedback_counts
+        assert get_event_log_status(db)["pending"] == 4
+
+        result = materialize_feedback_events(db, batch_size=3)
+        assert result["events"] == 3
+        assert result["created"] == {"session_feedback": 1, "practice_card_feedback": 1}
+        result = materialize_feedback_events(db)
+        assert (result["events"], result["failed"]) == (1, 1)
+        assert materialize_feedback_events(db)["events"] == 0
+
+        created = db.query(PracticeCardFeedback).filter_by(session_id=3, practice_id=card).one()
+        assert (created.rating, created.is_favorite, created.feedback_text) == (5, True, "太難")
+        assert db.query(SessionFeedback).count() == feedback_counts[0] + 1
+        assert get_event_log_status(db)["pending"] == 0
+        assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+    finally:
+        db.close()
+
+
+def test_late_commits_are_materialized_and_keep_favorites(session_factory):
+    db = session_factory()
+    existing = {row.practice_id for row in db.query(PracticeCardFeedback).filter_by(session_id=5)}
+    card = min(set(range(1, 11)) - existing)
+    db.close()
+
+    client = TestClient(app)
+    client.post(f"/api/v1/user/favorite-cards/{card}", json={"is_favorite": True, "session_id": 5})
+    for rating in (3, 0):
+        client.post("/api/v1/practice-card-feedback",
+                    json={"session_id": 5, "practice_id": card, "rating": rating})
+
+    db = session_factory()
+    try:
+        assert materialize_feedback_events(db)["events"] == 2
+        # 較小的序列ID在較大的ID物化之後才提交（並發追加）仍會被物化
+        db.add(FeedbackEvent(id=1, kind="session_feedback",
+                             payload='{"session_id": 5, "rating": "applicable", '
+                                     '"feedback_type": "immediate"}'))
+        db.commit()
+        assert materialize_feedback_events(db)["created"]["session_feedback"] == 1
+
+        feedback = db.query(PracticeCardFeedback).filter_by(session_id=5, practice_id=card).one()
+        assert (feedback.rating, feedback.is_favorite) == (3, True)
+        assert get_event_log_status(db)["pending"] == 0
+        assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+    finally:
+        db.close()
+
+
+def test_concurrent_claims_never_share_events(tmp_path):
+    """兩個物化程序同時領取：刪除即領取，後到者等不到鎖就失敗，提交後也領不到同一事件"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import sessionmaker
+    from backend.database.base import Base
+    from backend.database.repositories import FeedbackEventRepository
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}", connect_args={"timeout": 0.1})
+    Base.metadata.create_all(engine, tables=[FeedbackEvent.__table__])
+    SessionLocal = sessionmaker(bind=engine)
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        events = [("session_feedback", {"session_id": i}) for i in range(3)]
+        FeedbackEventRepository(first).append(events)
+
+        claimed = FeedbackEventRepository(first).claim_pending(10)
+        assert [event.id for event in claimed] == [1, 2, 3]
+        with pytest.raises(OperationalError):
+            FeedbackEventRepository(second).claim_pending(10)
+        second.rollback()
+
+        first.commit()
+        assert FeedbackEventRepository(second).claim_pending(10) == []
+    finally:
+        first.close()
+        second.close()
+        engine.dispose()
@@ -0,0 +1,89 @@
+"""
+回饋資料列式匯出測試 (API-207.6)
+"""
+import pytest
+from fastapi.testclient import TestClient
+from backend.core.config import settings
+from backend.database.base import get_db, utcnow
+from backend.database.repositories import PracticeCardFeedbackRepository
+from backend.main import app
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.services.feedback_export import EXPORT_TABLES, export_all, iter_column_batches
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+@pytest.fixture(scope="module")
+def SessionLocal():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=5, n_cards=20, n_sessions=25, seed=9))
+    return SessionLocal
+
+
+def test_batches_are_columnar_and_ordered_by_modification_time(SessionLocal):
+    engine = SessionLocal.kw["bind"]
+    table = EXPORT_TABLES["practice_card_feedback"]
+
+    batches = list(iter_column_batches(engine, table, batch_size=20))
+    assert [len(batch["id"]) for batch in batches] == [20, 20, 20, 15]
+    assert set(batches[0]) == {column.name for column in table.columns}
+    modified = [value for batch in batches for value in batch["updated_at"]]
+    assert modified == sorted(modified)
+
+    # sessions 沒有修改時間，只支援完整快照
+    with pytest.raises(ValueError):
+        list(iter_column_batches(engine, EXPORT_TABLES["sessions"], since=utcnow()))
+
+
+def test_rows_updated_after_export_are_exported_again(SessionLocal):
+    """匯出後原地更新的列（最愛切換的 ON CONFLICT 更新、ORM 更新）會出現在下次增量匯出"""
+    engine = SessionLocal.kw["bind"]
+    table = EXPORT_TABLES["practice_card_feedback"]
+    watermark = utcnow()
+    batches = iter_column_batches(engine, table, until=watermark)
+    exported = [i for batch in batches for i in batch["id"]]
+    assert len(exported) == 75
+
+    db = SessionLocal()
+    try:
+        feedback = db.query(PracticeCardFeedback).order_by(PracticeCardFeedback.id).first()
+        PracticeCardFeedbackRepository(db).set_favorite(feedback.session_id, feedback.practice_id,
+                                                        not feedback.is_favorite)
+        edited = db.query(PracticeCardFeedback).order_by(PracticeCardFeedback.id.desc()).first()
+        edited.feedback_text = "補充說明"
+        db.commit()
+        ids = (feedback.id, edited.id)
+    finally:
+        db.close()
+
+    resumed = [i for batch in iter_column_batches(engine, table, since=watermark, until=utcnow())
+               for i in batch["id"]]
+    assert resumed == list(ids)
+
+
+def test_incremental_parquet_export_round_trip(SessionLocal, tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(settings, "EXPORT_WATERMARK_LAG_SECONDS", 0)
+    engine = SessionLocal.kw["bind"]
+
+    first = export_all(engine, str(tmp_path), tables=["practice_card_feedback"], batch_size=20)
+    assert pq.ParquetFile(first[0]["path"]).metadata.num_row_groups == 4
+    assert pq.read_table(first[0]["path"]).num_rows == 75
+
+    again = export_all(engine, str(tmp_path), tables=["practice_card_feedback"], incremental=True)
+    assert again[0]["rows"] == 0 and again[0]["watermark"] >= first[0]["watermark"]
+
+
+def test_export_endpoint_rejects_unknown_table(SessionLocal):
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        response = TestClient(app).get("/api/v1/admin/feedback-analytics/export/symptoms")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    assert response.status_code == 404
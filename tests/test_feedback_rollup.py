@@ -0,0 +1,69 @@
+"""
+回饋彙總表測試 (API-207.7)
+"""
+import pytest
+from backend.database.repositories import (
+    FeedbackRollupRepository,
+    PracticeCardFeedbackRepository,
+    SessionFeedbackRepository
+)
+from backend.models.feedback_rollup import PracticeCardFeedbackRollup
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.services.feedback_rollup import rebuild_rollups, verify_rollups
+from backend.services.feedback_service import (
+    create_practice_card_feedback,
+    create_session_feedback,
+    toggle_practice_card_favorite
+)
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+
+@pytest.fixture
+def db():
+    SessionLocal = create_benchmark_db()
+    seed_database(SessionLocal(), build_catalog(n_symptoms=8, n_cards=30, n_sessions=40, seed=5))
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_rollups_follow_orm_writes(db):
+    assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+
+    feedback = create_practice_card_feedback(db, session_id=1, practice_id=3, rating=4)
+    toggle_practice_card_favorite(db, feedback.id, True)
+    PracticeCardFeedbackRepository(db).update(feedback.id, rating=2)
+    create_session_feedback(db, session_id=2, rating="applicable", feedback_type="delayed")
+
+    raw = PracticeCardFeedbackRepository(db).get_summary_stats(3)
+    rollup = FeedbackRollupRepository(db).get_practice_summary(3)
+    assert rollup["rating_distribution"] == raw["rating_distribution"]
+    assert rollup["favorite_count"] == raw["favorite_count"]
+    session_raw = SessionFeedbackRepository(db).get_summary_stats()
+    assert FeedbackRollupRepository(db).get_session_summary() == session_raw
+
+    db.delete(db.get(PracticeCardFeedback, feedback.id))
+    db.commit()
+    assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
+
+
+def test_rollup_is_keyed_by_chosen_symptom(db):
+    feedback = create_practice_card_feedback(db, session_id=1, practice_id=3, rating=5,
+                                             is_favorite=True)
+    symptom_id = feedback.session.chosen_symptom_id
+
+    row = db.query(PracticeCardFeedbackRollup).filter_by(
+        practice_id=3, symptom_id=symptom_id, day=feedback.created_at.date()
+    ).one()
+    assert row.rating_5 >= 1 and row.favorite_count >= 1
+
+
+def test_rebuild_restores_drifted_rollups(db):
+    db.query(PracticeCardFeedbackRollup).delete()
+    db.commit()
+    assert verify_rollups(db)["practice_card_feedback"] is False
+
+    counts = rebuild_rollups(db)
+
+    assert counts["practice_card_feedback_rollup"] > 0
+    assert verify_rollups(db) == {"practice_card_feedback": True, "session_feedback": True}
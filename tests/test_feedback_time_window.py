@@ -0,0 +1,93 @@
+"""
+時間區間回饋分析測試 (API-207.8)
+"""
+from datetime import date, datetime
+import pytest
+from fastapi.testclient import TestClient
+from backend.core.config import settings
+from backend.database.base import get_db
+from backend.database.repositories import PracticeCardFeedbackRepository
+from backend.main import app
+from backend.models.practice_card_feedback import PracticeCardFeedback
+from backend.models.session_feedback import SessionFeedback
+from backend.services.feedback_partitions import add_months, feedback_is_partitioned, partition_name
+from benchmarks.synthetic_catalog import build_catalog, create_benchmark_db, seed_database
+
+# 2025-12-01（週一）到 2025-12-14 每天 10:30 一筆練習卡回饋與一筆會話回饋
+DAYS = 14
+
+
+@pytest.fixture(scope="module")
+def client():
+    SessionLocal = create_benchmark_db()
+    catalog = build_catalog(n_symptoms=4, n_cards=10, n_sessions=DAYS, feedback_per_session=1,
+                            seed=3)
+    for i, feedback in enumerate(catalog["card_feedback"]):
+        feedback.created_at = datetime(2025, 12, 1 + i, 10, 30)
+        feedback.rating = 4
+        feedback.practice_id = 1
+    for i, feedback in enumerate(catalog["session_feedback"]):
+        feedback.created_at = datetime(2025, 12, 1 + i, 10, 30)
+    seed_database(SessionLocal(), catalog)
+
+    def override_get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_summary_window_filters_rollups_and_raw_rows(client):
+    # 整日邊界讀彙總表，非整日邊界讀原始表，兩者結果一致
+    by_day = client.get("/api/v1/admin/feedback-analytics/summary",
+                        params={"from": "2025-12-03", "to": "2025-12-10"}).json()
+    by_time = client.get("/api/v1/admin/feedback-analytics/summary",
+                         params={"from": "2025-12-03T00:00:01", "to": "2025-12-10T00:00:00"}).json()
+
+    assert by_day["rating_count"] == 7 and by_day["total_feedback_count"] == 7
+    assert by_time["rating_count"] == 7
+    assert client.get("/api/v1/admin/feedback-analytics/summary").json()["rating_count"] == DAYS
+
+
+def test_week_and_hour_buckets(client):
+    data = client.get("/api/v1/admin/feedback-analytics/practice-cards/1",
+                      params={"bucket": "week"}).json()
+    # 週以週一為起點
+    trend = [(row["bucket"], row["rating_count"], row["avg_rating"])
+             for row in data["rating_trend"]]
+    assert trend == [("2025-12-01", 7, 4.0), ("2025-12-08", 7, 4.0)]
+
+    hourly = client.get("/api/v1/admin/feedback-analytics/summary",
+                        params={"from": "2025-12-05", "to": "2025-12-06", "bucket": "hour"}).json()
+    buckets = [row["bucket"] for row in hourly["trend"]["practice_card_feedback"]]
+    assert buckets == ["2025-12-05T10:00:00"]
+    assert hourly["trend"]["session_feedback"][0]["total_count"] == 1
+
+
+def test_invalid_window_is_rejected(client):
+    assert client.get("/api/v1/admin/feedback-analytics/summary",
+                      params={"from": "2025-12-10", "to": "2025-12-01"}).status_code == 400
+    assert client.get("/api/v1/admin/feedback-analytics/summary",
+                      params={"bucket": "year"}).status_code == 422
+
+
+def test_partition_month_helpers():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    name = partition_name("practice_card_feedback", date(2026, 2, 1))
+    assert name == "practice_card_feedback_p202602"
+
+
+def test_favorite_upsert_follows_database_not_setting(monkeypatch):
+    """分區與否以資料庫實際狀態為準：設定開啟但資料表未分區時仍使用 ON CONFLICT"""
+    monkeypatch.setattr(settings, "FEEDBACK_PARTITIONING", True)
+    db = create_benchmark_db()()
+    try:
+        assert feedback_is_partitioned(db.get_bind()) is False
+        assert PracticeCardFeedbackRepository(db).supports_favorite_upsert()
+    finally:
+        db.close()
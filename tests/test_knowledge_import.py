@@ -0,0 +1,226 @@
+"""
+知識庫串流導入測試 (TOOL-105.5)
+"""
+import json
+import numpy as np
+import pytest
+from backend.services.knowledge_import_service import (
+    iter_knowledge_fragments,
+    stream_import_knowledge,
+    load_import_checkpoint,
+    build_fragment_record
+)
+from backend.services.vector_store import compute_content_hash
+from backend.services.embedding_store import EmbeddingStore
+
+
+class FakeModel:
+    """以文本長度生成固定向量的模擬嵌入模型"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32):
+        self.calls.append(len(texts))
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+
+class FakeStore:
+    """記錄 upsert 的模擬向量儲存，可在指定批次拋出錯誤"""
+
+    def __init__(self, fail_on_batch=None):
+        self.rows = {}
+        self.hashes = {}
+        self.metadatas = {}
+        self.batches = 0
+        self.saves = 0
+        self.fail_on_batch = fail_on_batch
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.batches += 1
+        if self.batches == self.fail_on_batch:
+            raise RuntimeError("模擬寫入失敗")
+        assert isinstance(embeddings, np.ndarray)
+        for fid, doc, meta in zip(ids, documents, metadatas):
+            self.rows[fid] = doc
+            self.hashes[fid] = meta["content_hash"]
+            self.metadatas[fid] = meta
+
+    def get_content_hashes(self, ids):
+        return {fid: self.hashes[fid] for fid in ids if fid in self.hashes}
+
+    def source_fragment_ids(self, source, from_position=0):
+        return [fid for fid, meta in self.metadatas.items()
+                if meta.get("fragment_source") == source
+                and meta.get("fragment_position", -1) >= from_position]
+
+    def delete(self, ids):
+        for fid in ids:
+            for rows in (self.rows, self.hashes, self.metadatas):
+                rows.pop(fid, None)
+
+    def save(self):
+        self.saves += 1
+
+
+@pytest.fixture
+def embedding_store(tmp_path):
+    return EmbeddingStore("fake-model", path=str(tmp_path / "embeddings"))
+
+
+def make_snippets(n):
+    return [
+        {
+            "id": f"s{i}",
+            "symptom": f"症狀{i}",
+            "practice_tips": ["要點"],
+            "pitfalls": [],
+            "review_status": "approved" if i % 5 else "pending"
+        }
+        for i in range(n)
+    ]
+
+
+def test_iter_json_streams_nested_array(tmp_path):
+    """小區塊讀取時仍能正確解析 knowledge_snippets 陣列"""
+    path = tmp_path / "snippets.json"
+    snippets = make_snippets(12)
+    payload = {"meta": {"n": 12}, "knowledge_snippets": snippets}
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+    assert list(iter_knowledge_fragments(str(path), chunk_size=7)) == snippets
+
+
+def test_iter_jsonl(tmp_path):
+    path = tmp_path / "fragments.jsonl"
+    rows = [{"id": f"f{i}", "text": f"片段內容 {i}", "metadata": {"source": "video_transcript"}}
+            for i in range(3)]
+    path.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in rows) + "\n",
+                    encoding="utf-8")
+
+    assert list(iter_knowledge_fragments(str(path))) == rows
+
+
+def test_stream_import_batches_and_skips_unapproved(tmp_path, embedding_store):
+    path = tmp_path / "snippets.json"
+    path.write_text(json.dumps({"knowledge_snippets": make_snippets(10)}, ensure_ascii=False),
+                    encoding="utf-8")
+    model, store = FakeModel(), FakeStore()
+
+    result = stream_import_knowledge(str(path), batch_size=4, embedding_model=model,
+                                     vector_store=store, embedding_store=embedding_store)
+
+    assert result["imported_count"] == 8
+    assert result["processed_count"] == 10
+    assert "s0" not in store.rows and "s5" not in store.rows
+    assert max(model.calls) <= 4
+    # 量化索引只在導入結束時保存一次，而非每批重寫
+    assert (store.batches, store.saves) == (3, 1)
+
+
+def test_stream_import_resumes_from_checkpoint(tmp_path, embedding_store):
+    path = tmp_path / "snippets.json"
+    path.write_text(json.dumps({"knowledge_snippets": make_snippets(10)}, ensure_ascii=False),
+                    encoding="utf-8")
+    checkpoint_path = str(tmp_path / "import.ckpt")
+
+    # 第二批寫入失敗，檢查點只應記錄第一批
+    with pytest.raises(RuntimeError):
+        stream_import_knowledge(str(path), batch_size=4, checkpoint_path=checkpoint_path,
+                                embedding_model=FakeModel(),
+                                vector_store=FakeStore(fail_on_batch=2),
+                                embedding_store=embedding_store)
+    assert load_import_checkpoint(checkpoint_path, str(path))["processed"] == 4
+
+    model, store = FakeModel(), FakeStore()
+    result = stream_import_knowledge(str(path), batch_size=4, checkpoint_path=checkpoint_path,
+                                     embedding_model=model, vector_store=store,
+                                     embedding_store=embedding_store)
+
+    assert sorted(store.rows) == ["s4", "s6", "s7", "s8", "s9"]
+    assert result["total_imported"] == 8
+    assert result["processed_count"] == 10
+
+
+def test_content_hash_normalizes_text_and_includes_model():
+    assert compute_content_hash("外腳 承重", "m1") == compute_content_hash("  外腳\u3000承重\n", "m1")
+    assert compute_content_hash("外腳 承重", "m1") != compute_content_hash("外腳 承重", "m2")
+
+
+def test_missing_id_is_derived_from_source_and_position():
+    """缺少ID的片段以來源與位置生成ID；內容修改時ID不變，只有 content_hash 改變"""
+    snippet = {"symptom": "重心太後", "practice_tips": ["身體前傾"]}
+    first = build_fragment_record(snippet, "a.json", 3)
+    edited = build_fragment_record({**snippet, "dosage": "3 趟"}, "a.json", 3)
+
+    assert first[0] == edited[0] and first[0].startswith("snippet_")
+    assert first[2]["content_hash"] != edited[2]["content_hash"]
+    assert first[0] != build_fragment_record(snippet, "b.json", 3)[0]
+    assert first[0] != build_fragment_record(snippet, "a.json", 4)[0]
+    assert build_fragment_record({**snippet, "id": "k1"}, "a.json", 3)[0] == "k1"
+
+
+def test_edited_or_removed_idless_fragments_leave_no_stale_entries(tmp_path, embedding_store):
+    path = tmp_path / "snippets.jsonl"
+    rows = [{"text": f"片段內容 {i}"} for i in range(4)]
+    path.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in rows), encoding="utf-8")
+    store = FakeStore()
+    stream_import_knowledge(str(path), batch_size=4, embedding_model=FakeModel(),
+                            vector_store=store, embedding_store=embedding_store)
+    assert len(store.rows) == 4
+
+    # 修改一個片段並刪除最後一個：集合中不應殘留舊內容
+    rows[1] = {"text": "修改後的片段內容"}
+    path.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in rows[:3]),
+                    encoding="utf-8")
+    stream_import_knowledge(str(path), batch_size=4, embedding_model=FakeModel(),
+                            vector_store=store, embedding_store=embedding_store)
+
+    assert sorted(store.rows.values()) == sorted(["片段內容 0", "修改後的片段內容", "片段內容 2"])
+
+
+def test_rerun_only_reembeds_changed_fragments(tmp_path, embedding_store):
+    path = tmp_path / "snippets.json"
+    snippets = make_snippets(10)
+    path.write_text(json.dumps({"knowledge_snippets": snippets}, ensure_ascii=False),
+                    encoding="utf-8")
+    store = FakeStore()
+    stream_import_knowledge(str(path), batch_size=4, embedding_model=FakeModel(),
+                            vector_store=store, embedding_store=embedding_store)
+
+    # 內容完全相同：不呼叫模型
+    model = FakeModel()
+    result = stream_import_knowledge(str(path), batch_size=4, embedding_model=model,
+                                     vector_store=store, embedding_store=embedding_store)
+    assert model.calls == []
+    assert result["imported_count"] == 0
+    assert result["skipped_count"] == 8
+
+    # 修改一個片段：只重新向量化該片段
+    snippets[3]["practice_tips"] = ["新的要點"]
+    path.write_text(json.dumps({"knowledge_snippets": snippets}, ensure_ascii=False),
+                    encoding="utf-8")
+    model = FakeModel()
+    result = stream_import_knowledge(str(path), batch_size=4, embedding_model=model,
+                                     vector_store=store, embedding_store=embedding_store)
+    assert model.calls == [1]
+    assert result["imported_count"] == 1
+    assert "新的要點" in store.rows["s3"]
+
+
+def test_reimport_into_new_collection_uses_embedding_store(tmp_path, embedding_store):
+    """集合重建後重新導入：嵌入向量全部來自嵌入儲存，不呼叫模型"""
+    path = tmp_path / "snippets.json"
+    path.write_text(json.dumps({"knowledge_snippets": make_snippets(10)}, ensure_ascii=False),
+                    encoding="utf-8")
+    stream_import_knowledge(str(path), batch_size=4, embedding_model=FakeModel(),
+                            vector_store=FakeStore(), embedding_store=embedding_store)
+
+    store = FakeStore()
+    reopened = EmbeddingStore("fake-model", path=str(tmp_path / "embeddings"))
+    result = stream_import_knowledge(str(path), batch_size=4, embedding_model=FakeModel(),
+                                     vector_store=store,
+                                     embedding_store=reopened)
+    assert result["imported_count"] == 8
+    assert result["embedding_cache_misses"] == 0
+    assert result["embedding_cache_hits"] == 8
@@ -0,0 +1,137 @@
+"""
+LLM 客戶端與樁服務測試
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from backend.services import llm_client
+from backend.services.llm_client import LLMClient, AsyncLLMClient, LLMError, backoff_delay
+from backend.services.llm_stub import handle_stub_request, stub_transport, STUB_TASK_REPLIES
+
+
+class FlakyTransport(httpx.MockTransport):
+    """前幾次請求回傳指定狀態碼，之後交給樁服務"""
+
+    def __init__(self, failures, status_code=503):
+        self.requests = 0
+
+        def handler(request):
+            self.requests += 1
+            if self.requests <= failures:
+                return httpx.Response(status_code, json={"error": "busy"})
+            return handle_stub_request(request)
+
+        super().__init__(handler)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(llm_client.time, "sleep", lambda seconds: None)
+
+
+def test_stub_is_deterministic():
+    client = LLMClient(transport=stub_transport())
+    assert client.complete("外腳承重") == client.complete("外腳承重")
+    assert client.complete("外腳承重") != client.complete("重心太後")
+    reply = client.complete("x", system="任務: practice_card\n...")
+    assert reply == STUB_TASK_REPLIES["practice_card"]
+    client.close()
+
+
+def test_stream_reassembles_to_full_reply():
+    client = LLMClient(transport=stub_transport())
+    system = "任務: followup_questions"
+    with client.stream("需要追問嗎", system=system) as tokens:
+        chunks = list(tokens)
+
+    assert len(chunks) > 1
+    assert json.loads("".join(chunks)) == json.loads(client.complete("需要追問嗎", system=system))
+    client.close()
+
+
+def test_retries_transient_errors():
+    transport = FlakyTransport(failures=2)
+    client = LLMClient(transport=transport, max_retries=2)
+
+    assert client.complete("你好").startswith("stub")
+    assert transport.requests == 3
+
+
+def test_gives_up_after_max_retries_and_skips_client_errors():
+    client = LLMClient(transport=FlakyTransport(failures=5), max_retries=1)
+    with pytest.raises(LLMError):
+        client.complete("你好")
+
+    transport = FlakyTransport(failures=1, status_code=400)
+    with pytest.raises(LLMError):
+        LLMClient(transport=transport, max_retries=3).complete("你好")
+    assert transport.requests == 1
+
+
+def test_concurrency_limit_fails_fast_instead_of_blocking():
+    client = LLMClient(transport=stub_transport(), max_concurrency=1, queue_timeout=0.01)
+    client._slots.acquire()
+    with pytest.raises(LLMError):
+        client.complete("你好")
+    client._slots.release()
+    assert client.complete("你好")
+
+
+def test_non_json_body_raises_llm_error():
+    html = httpx.MockTransport(lambda request: httpx.Response(
+        200, text="<html><body>502 Bad Gateway</body></html>",
+        headers={"Content-Type": "text/html"}))
+    client = LLMClient(transport=html, max_concurrency=1)
+    with pytest.raises(LLMError):
+        client.complete("你好")
+    assert client._slots.acquire(timeout=0)
+
+    async def run():
+        async_client = AsyncLLMClient(transport=html)
+        try:
+            await async_client.complete("你好")
+        finally:
+            await async_client.aclose()
+
+    with pytest.raises(LLMError):
+        asyncio.run(run())
+
+
+def test_abandoned_stream_releases_its_slot():
+    client = LLMClient(transport=stub_transport(), max_concurrency=1, queue_timeout=0.01)
+    with client.stream("外腳承重") as tokens:
+        assert next(tokens)
+    # 提前離開 with 區塊：串流已關閉，名額已歸還
+    assert client.complete("外腳承重")
+
+    with pytest.raises(RuntimeError):
+        with client.stream("外腳承重") as tokens:
+            next(tokens)
+            raise RuntimeError("呼叫端中斷")
+    assert client.complete("外腳承重")
+
+
+def test_backoff_delay_has_jitter_and_honours_retry_after():
+    delays = {backoff_delay(3) for _ in range(20)}
+    assert len(delays) > 1
+    assert all(0 <= d <= 2.0 for d in delays)
+    assert backoff_delay(0, retry_after="1.5") >= 1.5
+
+
+def test_async_client_complete_and_stream():
+    async def run():
+        client = AsyncLLMClient(transport=stub_transport())
+        text = await client.complete("外腳承重")
+        async with client.stream("外腳承重") as tokens:
+            streamed = "".join([chunk async for chunk in tokens])
+        async with client.stream("外腳承重") as tokens:
+            async for _ in tokens:
+                break
+        released = not client._slots.locked()
+        await client.aclose()
+        return text, streamed, released
+
+    text, streamed, released = asyncio.run(run())
+    assert text == streamed
+    assert released
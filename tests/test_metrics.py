@@ -0,0 +1,62 @@
+"""
+延遲指標測試
+"""
+from fastapi.testclient import TestClient
+from backend.core.metrics import MetricsRegistry, quantile, timed
+from backend.main import app
+
+
+def test_quantile_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert quantile(samples, 0.5) == 50.0
+    assert quantile(samples, 0.95) == 95.0
+    assert quantile(samples, 0.99) == 99.0
+    assert quantile([], 0.5) == 0.0
+
+
+def test_timed_as_context_manager_and_decorator():
+    registry = MetricsRegistry()
+
+    with timed("ranking", registry):
+        pass
+
+    @timed("filtering", registry)
+    def work():
+        return 42
+
+    assert work() == 42
+    assert work() == 42
+
+    series = registry.snapshot()["series"]["turnfix_stage_duration_seconds"]
+    assert series["ranking"]["count"] == 1
+    assert series["filtering"]["count"] == 2
+
+
+def test_slo_breaches_and_prometheus_output():
+    registry = MetricsRegistry(slo_seconds=1.0)
+    registry.observe_request("GET", "/api/v1/ski-tips", 200, 0.2)
+    registry.observe_request("GET", "/api/v1/ski-tips", 200, 3.0)
+    registry.observe_request("GET", "/api/v1/ski-tips", 404, 0.1)
+
+    assert registry.snapshot()["slo_breaches"] == {"GET,/api/v1/ski-tips": 1}
+    assert registry.snapshot()["requests"] == {
+        "GET,/api/v1/ski-tips,200": 2,
+        "GET,/api/v1/ski-tips,404": 1
+    }
+
+    text = registry.render_prometheus()
+    route = 'method="GET",route="/api/v1/ski-tips"'
+    assert f'turnfix_http_request_duration_seconds_bucket{{{route},le="+Inf"}} 3' in text
+    assert f'turnfix_http_request_duration_seconds_quantile{{{route},quantile="0.95"}} 3.0' in text
+    assert f'turnfix_http_requests_total{{{route},status="404"}} 1' in text
+    assert 'turnfix_http_slo_breaches_total{method="GET",route="/api/v1/ski-tips"} 1' in text
+    assert "turnfix_slo_target_seconds 1.0" in text
+
+
+def test_metrics_endpoint_labels_requests_by_route_template():
+    client = TestClient(app)
+    client.get("/health")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'route="/health"' in response.text
@@ -0,0 +1,73 @@
+"""
+請求取樣剖析測試
+"""
+import time
+from fastapi.testclient import TestClient
+from backend.core import profiling as profiling_module
+from backend.core.profiling import ProfilingState, StackSampler
+from backend.main import app
+
+
+def make_state(tmp_path, **overrides):
+    state = ProfilingState()
+    state.enabled = True
+    state.sample_rate = 0.0
+    state.directory = tmp_path
+    state.max_captures = 3
+    for key, value in overrides.items():
+        setattr(state, key, value)
+    return state
+
+
+def test_header_or_sample_rate_selects_requests(tmp_path):
+    state = make_state(tmp_path)
+    assert state.should_profile([(b"x-turnfix-profile", b"1")])
+    assert not state.should_profile([])
+
+    state.sample_rate = 1.0
+    assert state.should_profile([])
+
+    state.enabled = False
+    assert not state.should_profile([(b"x-turnfix-profile", b"1")])
+
+
+def test_sampler_collapses_busy_stacks():
+    def busy():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    busy()
+    sampler.stop()
+
+    assert sampler.samples > 0
+    assert any("test_profiling:busy" in stack for stack in sampler.stacks)
+
+
+def test_captures_rotate_and_are_listed(tmp_path):
+    state = make_state(tmp_path)
+    sampler = StackSampler()
+    sampler.stacks["MainThread;app:handler"] = 2
+
+    for i in range(5):
+        state.save(sampler, "GET", "/api/v1/ski-tips", 200, 0.01 * i)
+
+    captures = state.list_captures()
+    assert len(captures) == 3
+    assert state.read_capture(captures[0]["name"]) == "MainThread;app:handler 2\n"
+    assert state.read_capture("../secret.collapsed") is None
+
+
+def test_profiled_request_is_listed_by_admin_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling_module, "profiling_state", make_state(tmp_path))
+    monkeypatch.setattr("backend.api.v1.admin.profiling_state", profiling_module.profiling_state)
+    client = TestClient(app)
+
+    client.get("/health", headers={"X-TurnFix-Profile": "1"})
+
+    response = client.get("/api/v1/admin/profiling")
+    captures = response.json()["captures"]
+    assert len(captures) == 1
+    assert "_GET_health_200_" in captures[0]["name"]
@@ -0,0 +1,72 @@
+"""
+SQL 查詢計數測試
+"""
+import logging
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.core import query_stats as query_stats_module
+from backend.core.query_stats import QueryStatsMiddleware, capture_queries
+from backend.database.base import Base
+from backend.database.repositories import SymptomRepository
+from backend.models.symptom import Symptom  # 註冊 symptoms 資料表
+
+
+@pytest.fixture
+def SessionLocal():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_capture_counts_queries_from_any_engine(SessionLocal):
+    db = SessionLocal()
+    with capture_queries() as stats:
+        SymptomRepository(db).get_all()
+        SymptomRepository(db).get_all()
+    db.close()
+
+    assert stats.count == 2
+    assert all("symptoms" in statement for statement in stats.statements)
+
+
+def test_assert_max_queries_fixture_fails_on_regression(SessionLocal, assert_max_queries):
+    db = SessionLocal()
+    with assert_max_queries(1):
+        SymptomRepository(db).get_all()
+
+    with pytest.raises(AssertionError, match="執行了 2 次查詢"):
+        with assert_max_queries(1):
+            db.execute(text("SELECT 1"))
+            db.execute(text("SELECT 2"))
+    db.close()
+
+
+def test_debug_headers_and_slow_query_log(SessionLocal, monkeypatch, caplog):
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, debug=True)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/probe")
+    def probe(db=Depends(get_db)):
+        db.execute(text("SELECT :value"), {"value": 42})
+        db.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    monkeypatch.setattr(query_stats_module.settings, "SLOW_QUERY_THRESHOLD_MS", 0.0)
+    with caplog.at_level(logging.WARNING, logger="backend.core.query_stats"):
+        response = TestClient(app).get("/probe")
+
+    assert response.headers["x-db-query-count"] == "2"
+    assert float(response.headers["x-db-time-ms"]) >= 0
+    assert any("42" in record.getMessage() for record in caplog.records)
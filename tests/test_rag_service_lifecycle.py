@@ -0,0 +1,62 @@
+"""
+全局 RAG 服務延遲建立與生命週期測試
+"""
+import subprocess
+import sys
+import pytest
+from backend.services import rag_service as rag_module
+
+
+@pytest.fixture(autouse=True)
+def reset_service(monkeypatch):
+    monkeypatch.setattr(rag_module, "_rag_service", None)
+    yield
+    rag_module._rag_service = None
+
+
+class FakeVectorStore:
+    saved = False
+
+    def save(self):
+        FakeVectorStore.saved = True
+
+
+class FakeRAGService:
+    created = 0
+
+    def __init__(self):
+        FakeRAGService.created += 1
+        self.vector_store = FakeVectorStore()
+
+
+def test_import_does_not_load_model_or_chroma():
+    code = ("import sys, backend.services.ski_diagnosis_service; "
+            "print('sentence_transformers' in sys.modules or 'chromadb' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True)
+    assert output.stdout.strip() == "False"
+
+
+def test_service_created_once_on_first_access(monkeypatch):
+    monkeypatch.setattr(rag_module, "RAGService", FakeRAGService)
+    FakeRAGService.created = 0
+
+    assert rag_module._rag_service is None
+    first = rag_module.get_rag_service()
+    assert rag_module.rag_service is first
+    assert FakeRAGService.created == 1
+
+    rag_module.shutdown_rag_service()
+    assert FakeVectorStore.saved
+    assert rag_module._rag_service is None
+
+
+def test_disabled_switch_keeps_model_unloaded(monkeypatch):
+    monkeypatch.setattr(rag_module, "RAGService", FakeRAGService)
+    monkeypatch.setattr(rag_module.settings, "RAG_ENABLED", False)
+    FakeRAGService.created = 0
+
+    assert rag_module.init_rag_service() is None
+    with pytest.raises(RuntimeError):
+        rag_module.get_rag_service()
+    assert FakeRAGService.created == 0
@@ -0,0 +1,74 @@
+"""
+啟動暖機與就緒檢查測試
+"""
+from fastapi.testclient import TestClient
+from backend.core import readiness as readiness_module
+from backend.core.readiness import Readiness, WARMUP_STEPS
+from backend.main import app
+
+
+def test_not_ready_until_every_step_is_ready_or_skipped():
+    state = Readiness()
+    assert not state.is_ready()
+
+    for name in WARMUP_STEPS[:-1]:
+        state.run(name, lambda: None)
+    assert not state.is_ready()
+
+    state.skip(WARMUP_STEPS[-1], "測試")
+    assert state.is_ready()
+    assert state.snapshot()["components"][WARMUP_STEPS[0]]["duration_ms"] >= 0
+
+
+def test_failed_step_records_error():
+    state = Readiness()
+
+    def boom():
+        raise RuntimeError("模型不存在")
+
+    assert state.run("embedding_model", boom) is False
+    component = state.snapshot()["components"]["embedding_model"]
+    assert component["status"] == "failed"
+    assert "模型不存在" in component["error"]
+
+
+def test_optional_step_failure_is_degraded_but_serving(monkeypatch):
+    state = Readiness()
+    monkeypatch.setattr("backend.main.readiness", state)
+
+    def boom():
+        raise RuntimeError("分數表計算失敗")
+
+    for name in WARMUP_STEPS:
+        state.run(name, boom if name == "ranking_scores" else (lambda: None))
+    response = TestClient(app).get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+    assert response.json()["components"]["ranking_scores"]["status"] == "degraded"
+
+
+def test_ready_endpoint_reflects_state(monkeypatch):
+    state = Readiness()
+    monkeypatch.setattr("backend.main.readiness", state)
+    client = TestClient(app)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+
+    for name in WARMUP_STEPS:
+        state.run(name, lambda: None)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert set(response.json()["components"]) == set(WARMUP_STEPS)
+
+
+def test_warmup_skips_model_when_rag_disabled(monkeypatch):
+    monkeypatch.setattr(readiness_module.settings, "RAG_ENABLED", False)
+    state = Readiness()
+    readiness_module.run_warmup(state)
+
+    components = state.snapshot()["components"]
+    assert components["embedding_model"]["status"] == "skipped"
+    assert components["database"]["status"] == "ready"
@@ -0,0 +1,79 @@
+"""
+練習卡生成語意快取測試
+"""
+import numpy as np
+from backend.services import semantic_cache as semantic_cache_module
+from backend.services.semantic_cache import SemanticCache
+
+CARD = {"goal": "完成外腳承重再過中立", "tips": ["視線外緣"]}
+
+
+def test_hit_requires_similarity_symptom_and_slots():
+    cache = SemanticCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    cache.put([1.0, 0.0, 0.0], "重心太後", {"level": "中級", "terrain": ""}, CARD)
+
+    assert cache.get([0.99, 0.05, 0.0], "重心太後", {"level": "中級"}) == CARD
+    assert cache.get([0.0, 1.0, 0.0], "重心太後", {"level": "中級"}) is None
+    assert cache.get([1.0, 0.0, 0.0], "入彎晚", {"level": "中級"}) is None
+    assert cache.get([1.0, 0.0, 0.0], "重心太後", {"level": "初級"}) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_returned_value_is_a_copy():
+    cache = SemanticCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+    cache.put([1.0, 0.0], "重心太後", None, CARD)
+    cache.get([1.0, 0.0], "重心太後", None)["tips"].append("被修改")
+    assert cache.get([1.0, 0.0], "重心太後", None) == CARD
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "monotonic", lambda: now[0])
+    cache = SemanticCache(threshold=0.9, ttl_seconds=10, max_entries=10)
+    cache.put([1.0, 0.0], "重心太後", None, CARD)
+
+    now[0] += 11
+    assert cache.get([1.0, 0.0], "重心太後", None) is None
+    assert len(cache) == 0
+
+
+def test_size_limit_evicts_least_recently_used():
+    cache = SemanticCache(threshold=0.99, ttl_seconds=60, max_entries=2)
+    cache.put([1.0, 0.0, 0.0], "A", None, "a")
+    cache.put([0.0, 1.0, 0.0], "B", None, "b")
+    cache.get([1.0, 0.0, 0.0], "A", None)
+    cache.put([0.0, 0.0, 1.0], "C", None, "c")
+
+    assert len(cache) == 2
+    assert cache.get([0.0, 1.0, 0.0], "B", None) is None
+    assert cache.get([1.0, 0.0, 0.0], "A", None) == "a"
+
+
+def test_purge_by_symptom():
+    cache = SemanticCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+    rng = np.random.default_rng(0)
+    for _ in range(3):
+        cache.put(rng.standard_normal(8), "重心太後", None, CARD)
+    cache.put(rng.standard_normal(8), "入彎晚", None, CARD)
+
+    assert cache.purge("重心太後") == 3
+    assert len(cache) == 1
+    assert cache.purge() == 1
+
+
+def test_disabled_cache_skips_context_embedding(monkeypatch):
+    from backend.services import rag_service as rag_module
+    from backend.models.symptom import Symptom
+
+    class FailingModel:
+        def encode(self, texts):
+            raise AssertionError("快取停用時不應向量化上下文")
+
+    monkeypatch.setattr(rag_module.settings, "SEMANTIC_CACHE_ENABLED", False)
+    service = rag_module.RAGService.__new__(rag_module.RAGService)
+    service.embedding_model = FailingModel()
+
+    card = service.generate_practice_card_from_knowledge(
+        "轉彎時重心太後", Symptom(name="重心太後"), [{"content": "身體前傾，壓住雪靴前緣"}]
+    )
+    assert card is not None
@@ -0,0 +1,184 @@
+"""
+向量儲存與量化索引測試
+"""
+import numpy as np
+import pytest
+from backend.services.vector_store import (
+    QuantizedIndex,
+    VectorStore,
+    quantize_int8,
+    dequantize_int8,
+    normalize_embeddings
+)
+
+
+class FakeCollection:
+    """模擬 ChromaDB 集合，保存向量、文件與元數據"""
+
+    name = "knowledge_fragments"
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, embeddings, documents, metadatas, ids):
+        assert isinstance(embeddings, list)
+        for fid, embedding, doc, meta in zip(ids, embeddings, documents, metadatas):
+            self.rows[fid] = (doc, meta, embedding)
+
+    upsert = add
+
+    def delete(self, ids):
+        for fid in ids:
+            self.rows.pop(fid, None)
+
+    def count(self):
+        self.counts = getattr(self, "counts", 0) + 1
+        return len(self.rows)
+
+    def get(self, ids=None, include=(), limit=None, offset=0):
+        found = [fid for fid in ids if fid in self.rows] if ids is not None else list(self.rows)
+        found = found[offset:offset + limit] if limit is not None else found
+        return {
+            "ids": found,
+            "documents": [self.rows[fid][0] for fid in found],
+            "metadatas": [self.rows[fid][1] for fid in found],
+            "embeddings": [self.rows[fid][2] for fid in found]
+        }
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    return normalize_embeddings(rng.standard_normal((500, 64)))
+
+
+def test_int8_round_trip(corpus):
+    """int8 量化誤差應小於每向量 scale 的一半"""
+    codes, scales = quantize_int8(corpus)
+    assert codes.dtype == np.int8
+    restored = dequantize_int8(codes, scales)
+    assert np.all(np.abs(restored - corpus) <= scales[:, None] / 2 + 1e-6)
+
+
+@pytest.mark.parametrize("mode", ["int8", "float16"])
+def test_quantized_search_matches_exact_top1(corpus, mode):
+    """以資料本身查詢時，重排後的第一名必須是自己"""
+    index = QuantizedIndex(mode)
+    index.upsert([str(i) for i in range(len(corpus))], corpus)
+
+    for i in (0, 17, 499):
+        hits = index.search(corpus[i], k=3, rescore_candidates=20)
+        assert hits[0][0] == str(i)
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_int8_uses_quarter_of_float32_memory(corpus):
+    index = QuantizedIndex("int8")
+    index.upsert([str(i) for i in range(len(corpus))], corpus)
+    assert index.nbytes()["resident"] < corpus.nbytes / 3.5
+
+
+def test_upsert_overwrites_existing_rows(corpus):
+    index = QuantizedIndex("int8")
+    index.upsert(["a", "b"], corpus[:2])
+    index.upsert(["a"], corpus[2:3])
+
+    assert len(index) == 2
+    assert index.search(corpus[2], k=1)[0][0] == "a"
+
+
+def test_save_and_load_with_memmap(tmp_path, corpus):
+    index = QuantizedIndex("int8")
+    index.upsert([str(i) for i in range(len(corpus))], corpus)
+    index.save(str(tmp_path), "fragments")
+
+    loaded = QuantizedIndex.load(str(tmp_path), "fragments", "int8")
+    assert loaded.ids == index.ids
+    assert isinstance(loaded.full, np.memmap)
+    assert loaded.search(corpus[42], k=1)[0][0] == "42"
+
+
+def test_vector_store_query_uses_quantized_index(tmp_path, corpus):
+    store = VectorStore(FakeCollection(), quantization="int8", index_dir=str(tmp_path))
+    store.add(
+        ids=["x", "y"],
+        embeddings=corpus[:2],
+        documents=["文件X", "文件Y"],
+        metadatas=[{"source": "x"}, {"source": "y"}]
+    )
+
+    results = store.query(corpus[1], n_results=1)
+    assert results["ids"] == [["y"]]
+    assert results["documents"] == [["文件Y"]]
+    assert results["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_vector_store_query_returns_embeddings(tmp_path, corpus):
+    store = VectorStore(FakeCollection(), quantization="int8", index_dir=str(tmp_path))
+    store.add(ids=["x", "y"], embeddings=corpus[:2], documents=["X", "Y"], metadatas=[{}, {}])
+
+    results = store.query(corpus[0], n_results=2, include_embeddings=True)
+    assert results["ids"] == [["x", "y"]]
+    np.testing.assert_allclose(results["embeddings"][0][0], corpus[0], atol=1e-6)
+
+
+def test_upsert_grows_buffers_and_keeps_full_precision_on_disk(corpus):
+    index = QuantizedIndex("int8")
+    for start in range(0, len(corpus), 10):
+        index.upsert([str(i) for i in range(start, start + 10)], corpus[start:start + 10])
+
+    # 倍增容量：50 次小批次新增只重新配置 log2(50) 次左右，預留容量不超過兩倍
+    assert len(index) == len(corpus) and index._codes.shape[0] < 2 * len(corpus)
+    assert isinstance(index.full, np.memmap)
+    assert index.nbytes()["full_precision"] == corpus.nbytes
+    assert index.nbytes()["resident"] < corpus.nbytes / 3.5 * 2
+    np.testing.assert_allclose(index.get_vectors(["123"])[0], corpus[123], atol=1e-6)
+
+
+def test_vector_store_rebuilds_index_that_drifted_from_collection(tmp_path, corpus):
+    collection = FakeCollection()
+    store = VectorStore(collection, quantization="int8", index_dir=str(tmp_path))
+    store.add(ids=["x", "y"], embeddings=corpus[:2], documents=["X", "Y"], metadatas=[{}, {}])
+    store.save()
+
+    # 其他程序寫入集合、且未更新量化索引
+    collection.add(embeddings=corpus[2:3].tolist(), documents=["Z"], metadatas=[{}], ids=["z"])
+    reopened = VectorStore(collection, quantization="int8", index_dir=str(tmp_path))
+    assert len(reopened.index) == 2
+
+    assert reopened.query(corpus[2], n_results=1)["ids"] == [["z"]]
+    assert len(reopened.index) == 3
+    assert len(QuantizedIndex.load(str(tmp_path), collection.name, "int8")) == 3
+
+
+def test_drift_check_runs_periodically_not_per_query(tmp_path, corpus, monkeypatch, caplog):
+    from backend.services import vector_store as vector_store_module
+    collection = FakeCollection()
+    store = VectorStore(collection, quantization="int8", index_dir=str(tmp_path))
+    store.add(ids=["x", "y"], embeddings=corpus[:2], documents=["X", "Y"], metadatas=[{}, {}])
+
+    clock = [1000.0]
+    monkeypatch.setattr(vector_store_module.time, "monotonic", lambda: clock[0])
+    for _ in range(5):
+        store.query(corpus[0], n_results=1)
+    assert collection.counts == 1
+
+    # 刪除片段後下一次查詢立即比對並重建
+    store.delete(["y"])
+    with caplog.at_level("INFO", logger=vector_store_module.__name__):
+        store.query(corpus[0], n_results=1)
+    assert collection.counts == 2 and len(store.index) == 1
+    assert any(r.levelname == "WARNING" for r in caplog.records)
+
+    # 間隔到期後才再比對
+    clock[0] += vector_store_module.settings.INDEX_DRIFT_CHECK_SECONDS
+    store.query(corpus[0], n_results=1)
+    assert collection.counts == 3
+
+
+def test_explicit_rebuild_logs_info(tmp_path, corpus, caplog):
+    store = VectorStore(FakeCollection(), quantization="int8", index_dir=str(tmp_path))
+    store.add(ids=["x"], embeddings=corpus[:1], documents=["X"], metadatas=[{}])
+    with caplog.at_level("INFO", logger="backend.services.vector_store"):
+        store.rebuild_index()
+    assert [r.levelname for r in caplog.records] == ["INFO"]
@@ -37,6 +37,7 @@ def main():
     import_parser = subparsers.add_parser('import', help='將審核後的知識導入向量數據庫')
     import_parser.add_argument('--input', '-i', required=True, help='審核後知識片段的JSON文件路徑')
     import_parser.add_argument('--report', '-r', help='導出報告文件路徑')
+    import_parser.add_argument('--workers', type=int, help='向量化進程數（大於 1 時以多進程分片向量化）')
 
     args = parser.parse_args()
 
@@ -89,7 +90,7 @@ def main():
     elif args.command == 'import':
         # 執行知識導入
         from backend.services.knowledge_import_service import import_approved_knowledge_snippets
-        result = import_approved_knowledge_snippets(args.input, args.report)
+        result = import_approved_knowledge_snippets(args.input, args.report, args.workers)
         
         if result['success']:
             print(f"知識導入成功: {result['imported_count']} 個知識片段已導入")